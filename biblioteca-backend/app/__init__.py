@@ -1,49 +1,143 @@
 # /app/__init__.py
+import os
+import time
+_IMPORT_START = time.perf_counter() # Perfil de arranque (ver app/utils/startup.py)
+
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_bcrypt import Bcrypt
 from flask_cors import CORS
 from config import Config
+from app.utils.db_routing import RoutingSession
 
-db = SQLAlchemy()
-migrate = Migrate()
+db = SQLAlchemy(session_options={'class_': RoutingSession}) # Lecturas de peticiones GET a réplicas (si las hay)
 jwt = JWTManager()
 bcrypt = Bcrypt()
 
+# --- CONFIGURACIÓN DE CORS (también la aplican las rutas asíncronas de app/aio) ---
+CORS_RESOURCES = {r"/api/v1/*": {
+    "origins": "http://localhost:3000",  # Permite solo a tu frontend
+    "methods": ["GET", "POST", "PUT", "DELETE"],  # Permite todos los métodos que usaremos
+    "allow_headers": ["Content-Type", "Authorization"],  # Permite las cabeceras necesarias
+    "expose_headers": ["X-Next-Cursor"]  # Cabecera de paginación por cursor visible para el frontend
+}}
+
+_IMPORT_END = time.perf_counter()
+
+
+def uses_migrate(app):
+    """Flask-Migrate solo hace falta para `flask db ...`: importarlo carga Alembic (~150 ms por worker)."""
+    return app.config.get('MIGRATE_ALWAYS', False) or os.environ.get('FLASK_RUN_FROM_CLI') == 'true'
+
+
 def create_app(config_class=Config):
+    inicio = time.perf_counter()
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    # Perfil de arranque (fases de create_app, primera petición) y calentamiento opcional (WARMUP_ENABLED)
+    from app.utils.startup import init_startup, finish_startup
+    startup = init_startup(app, _IMPORT_START, _IMPORT_END)
+
+    # Serialización JSON (orjson si está instalado) con fechas en ISO 8601
+    with startup.fase('app.utils.json_provider'):
+        from app.utils.json_provider import init_json_provider
+        init_json_provider(app)
+
     # --- CONFIGURACIÓN DE CORS DEFINITIVA Y GLOBAL ---
     # Esto aplica las reglas a todas las rutas que empiecen con /api/v1/
-    CORS(app, resources={r"/api/v1/*": {
-        "origins": "http://localhost:3000",  # Permite solo a tu frontend
-        "methods": ["GET", "POST", "PUT", "DELETE"],  # Permite todos los métodos que usaremos
-        "allow_headers": ["Content-Type", "Authorization"]  # Permite las cabeceras necesarias
-    }})
+    CORS(app, resources=CORS_RESOURCES)
+
+    # Pool de conexiones y binds de las réplicas de lectura (antes de db.init_app, que crea los engines)
+    from app.utils.db_routing import init_db_routing
+    init_db_routing(app)
 
     # Inicializar extensiones
-    db.init_app(app)
-    migrate.init_app(app, db)
-    jwt.init_app(app)
-    bcrypt.init_app(app)
+    with startup.fase('extensiones'):
+        db.init_app(app)
+        if uses_migrate(app):
+            from flask_migrate import Migrate
+            Migrate(app, db)
+        jwt.init_app(app)
+        bcrypt.init_app(app)
+
+    # Métricas por endpoint (latencia, consultas, tiempo de SQL, espera del pool) para /api/v1/admin/metrics
+    with startup.fase('app.utils.metrics'):
+        from app.utils.metrics import init_metrics
+        init_metrics(app)
+
+    # Compresión gzip/brotli de las respuestas según Accept-Encoding (after_request: se mide en las métricas)
+    with startup.fase('app.utils.compression'):
+        from app.utils.compression import init_compression
+        init_compression(app)
+
+    # Motor de búsqueda del catálogo (el backend se resuelve en el primer uso)
+    with startup.fase('app.libros.search'):
+        from app.libros.search import init_search
+        init_search(app)
+
+    # Versión del catálogo para GET condicional y snapshots de /libros, /generos y /autores
+    with startup.fase('app.libros.cache'):
+        from app.libros.cache import init_catalog_cache
+        init_catalog_cache(app)
+
+    # Caché de autores/géneros por clave normalizada para las escrituras de libros
+    with startup.fase('app.libros.nombres'):
+        from app.libros.nombres import init_name_cache
+        init_name_cache(app)
+
+    # Pool acotado para verificar contraseñas (bcrypt) fuera del hilo de la petición
+    with startup.fase('app.auth.hashing'):
+        from app.auth.hashing import init_password_hasher
+        init_password_hasher(app)
+
+    # Revocación de tokens JWT (logout, usuarios eliminados o con rol/estado cambiado)
+    with startup.fase('app.auth.blocklist'):
+        from app.auth.blocklist import init_token_blocklist
+        init_token_blocklist(app, jwt)
+
+    # Caché del rol/estado de cada usuario para @require_role
+    with startup.fase('app.auth.decorators'):
+        from app.auth.decorators import init_role_cache
+        init_role_cache(app)
+
+    # Escáner de préstamos vencidos (hilo opcional según OVERDUE_SCAN_INTERVAL)
+    with startup.fase('app.bibliotecario.vencimientos'):
+        from app.bibliotecario.vencimientos import init_overdue_scanner
+        init_overdue_scanner(app)
+
+    # Cola de reservas: plazo de recogida y expiración (hilo opcional según HOLD_EXPIRY_INTERVAL)
+    with startup.fase('app.bibliotecario.reservas'):
+        from app.bibliotecario.reservas import init_hold_queue
+        init_hold_queue(app)
 
     # Registrar Blueprints (módulos de la API)
-    from app.auth.routes import auth_bp
-    app.register_blueprint(auth_bp, url_prefix='/api/v1/auth')
-    
-    from app.libros.routes import libros_bp
-    app.register_blueprint(libros_bp, url_prefix='/api/v1/libros')
+    with startup.fase('app.auth.routes'):
+        from app.auth.routes import auth_bp
+        app.register_blueprint(auth_bp, url_prefix='/api/v1/auth')
+
+    with startup.fase('app.libros.routes'):
+        from app.libros.routes import libros_bp
+        app.register_blueprint(libros_bp, url_prefix='/api/v1/libros')
+
+    with startup.fase('app.lector.routes'):
+        from app.lector.routes import lector_bp
+        app.register_blueprint(lector_bp, url_prefix='/api/v1/lector')
+
+    with startup.fase('app.admin.routes'):
+        from app.admin.routes import admin_bp
+        app.register_blueprint(admin_bp, url_prefix='/api/v1/admin')
 
-    from app.lector.routes import lector_bp
-    app.register_blueprint(lector_bp, url_prefix='/api/v1/lector')
+    with startup.fase('app.bibliotecario.routes'):
+        from app.bibliotecario.routes import bibliotecario_bp
+        app.register_blueprint(bibliotecario_bp, url_prefix='/api/v1/bibliotecario')
 
-    from app.admin.routes import admin_bp
-    app.register_blueprint(admin_bp, url_prefix='/api/v1/admin')
+    # Comando `flask seed` (datos sintéticos para pruebas de carga)
+    from app.utils.seed import seed_command
+    app.cli.add_command(seed_command)
 
-    from app.bibliotecario.routes import bibliotecario_bp
-    app.register_blueprint(bibliotecario_bp, url_prefix='/api/v1/bibliotecario')
+    # Mappers configurados y, con WARMUP_ENABLED, pools abiertos y rutas calientes antes de atender tráfico
+    finish_startup(app, inicio)
 
-    return app
\ No newline at end of file
+    return app
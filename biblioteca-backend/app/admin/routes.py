@@ -1,81 +1,54 @@
 # app/admin/routes.py
 
-from flask import Blueprint, jsonify, request # Importar 'request' para acceder a los datos de la solicitud
-from app.models import db, Usuario, Rol, Prestamo, Multa # Asegúrate de que todos los modelos estén importados aquí
-from flask_jwt_extended import jwt_required, get_jwt_identity # Importar para proteger las rutas
+from flask import Blueprint, Response, jsonify, request # Importar 'request' para acceder a los datos de la solicitud
+from app.models import db, Usuario, Rol, Prestamo, Multa, ContadorUsuario # Asegúrate de que todos los modelos estén importados aquí
+from flask_jwt_extended import jwt_required # Importar para proteger las rutas
 from sqlalchemy import func # Importar func para funciones de agregación SQL
 from datetime import datetime # Importar datetime para manejar fechas
 import traceback # Para imprimir el traceback completo en caso de errores
+from app.auth.decorators import require_role, invalidate_user # Autorización por rol a partir del claim del JWT
+from app.auth.blocklist import revoke_user_tokens
+from app.bibliotecario.reservas import liberar_reservas
+from app.utils.pagination import get_limit, get_cursor, encode_cursor, apply_keyset, is_paginated, paginated_response
+from app.utils.streaming import wants_stream, stream_rows, ndjson_response
+from app.utils.metrics import get_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from app.utils.startup import get_startup_profile
+from app.utils import stats # Contadores agregados de los paneles
+from app.utils.stats import read_counters, recompute_counters
 
 admin_bp = Blueprint('admin_bp', __name__, url_prefix='/api/v1/admin')
 
-# --- FUNCIÓN DE AYUDA PARA VERIFICAR ROL DE ADMIN ---
-# Esta función verifica si el usuario autenticado tiene el rol de "Admin".
-def check_admin():
-    user_id_str = get_jwt_identity() # Obtiene la identidad del usuario del token JWT (que es un string)
-    
-    try:
-        user_id_int = int(user_id_str) # Intenta convertir la identidad a INT para buscar en la BD
-    except (ValueError, TypeError):
-        print("DEBUG: check_admin - ID de usuario inválido en token.")
-        return False
-
-    user = db.session.get(Usuario, user_id_int) # Busca el usuario por ID en la base de datos
-    
-    # Comprueba si el usuario existe y si su rol es "Admin"
-    # Se usa hasattr para verificar si los atributos 'rol' y 'nombre' existen antes de acceder a ellos.
-    if not user or not hasattr(user, 'rol') or not hasattr(user.rol, 'nombre') or user.rol.nombre != 'Admin':
-        rol_db = user.rol.nombre if user and hasattr(user, 'rol') and hasattr(user.rol, 'nombre') else 'N/A'
-        print(f"DEBUG: Acceso denegado en check_admin. User ID: {user_id_int}, Rol DB: {rol_db}. Rol requerido: Admin.")
-        return False
-    print(f"DEBUG: Acceso permitido en check_admin. User ID: {user_id_int}, Rol DB: {user.rol.nombre}.")
-    return True
-
 # --- ENDPOINT: RESUMEN DEL PANEL DE ADMINISTRACIÓN ---
 # Devuelve estadísticas generales para el dashboard del administrador.
+# Todos los contadores salen de stats_counters en una sola consulta por clave primaria
+PANEL_COUNTERS = [
+    stats.USUARIOS_TOTAL, stats.PRESTAMOS_ACTIVOS, stats.MULTAS_PENDIENTES,
+    stats.usuarios_estado('Activo'), stats.usuarios_estado('Suspendido'), stats.usuarios_estado('Inactivo'),
+    stats.usuarios_rol('Lector'), stats.usuarios_rol('Bibliotecario'), stats.usuarios_rol('Admin'), # Asume 'Admin' como el nombre de rol en tu BD
+]
+
+
+def panel_summary(c):
+    """Cuerpo del resumen a partir de los contadores de PANEL_COUNTERS (compartido con app/aio/routes.py)."""
+    return {
+        "totalUsuarios": c[stats.USUARIOS_TOTAL],
+        "usuariosActivos": c[stats.usuarios_estado('Activo')],
+        "prestamosActivos": c[stats.PRESTAMOS_ACTIVOS],
+        "multasPendientes": c[stats.MULTAS_PENDIENTES],
+        "lectores": c[stats.usuarios_rol('Lector')],
+        "bibliotecarios": c[stats.usuarios_rol('Bibliotecario')],
+        "administradores": c[stats.usuarios_rol('Admin')],
+        "usuariosSuspendidos": c[stats.usuarios_estado('Suspendido')],
+        "usuariosInactivos": c[stats.usuarios_estado('Inactivo')],
+    }
+
+
 @admin_bp.route('/panel/summary', methods=['GET'])
 @jwt_required() # Requiere un token JWT válido
+@require_role('Admin')
 def get_panel_summary():
-    # Verifica si el usuario tiene permisos de administrador
-    if not check_admin():
-        return jsonify({"message": "Acceso restringido a administradores"}), 403
-    
     try:
-        total_usuarios = Usuario.query.count() # Cuenta el total de usuarios
-        
-        # Conteo de usuarios activos. Si el modelo Usuario tiene un campo 'estado', úsalo.
-        # Si no, se considera que todos los usuarios existentes son "activos" por defecto.
-        usuarios_activos = Usuario.query.filter_by(estado='Activo').count() if hasattr(Usuario, 'estado') else total_usuarios
-        
-        # Conteo de préstamos activos (asumiendo que el modelo Prestamo tiene un campo 'estado')
-        prestamos_activos = Prestamo.query.filter_by(estado='Activo').count()
-
-        # Conteo de multas pendientes (asumiendo que el modelo Multa tiene un campo 'estado')
-        multas_pendientes = Multa.query.filter_by(estado='Pendiente').count()
-
-        # Conteo de usuarios por rol, uniéndose a la tabla Rol
-        lectores = Usuario.query.join(Rol).filter(Rol.nombre == 'Lector').count()
-        bibliotecarios = Usuario.query.join(Rol).filter(Rol.nombre == 'Bibliotecario').count()
-        administradores = Usuario.query.join(Rol).filter(Rol.nombre == 'Admin').count() # Asume 'Admin' como el nombre de rol en tu BD
-
-        # Conteo de usuarios suspendidos/inactivos (si el modelo Usuario tiene un campo 'estado')
-        usuarios_suspendidos = Usuario.query.filter_by(estado='Suspendido').count() if hasattr(Usuario, 'estado') else 0
-        usuarios_inactivos = Usuario.query.filter_by(estado='Inactivo').count() if hasattr(Usuario, 'estado') else 0
-
-
-        summary_data = {
-            "totalUsuarios": total_usuarios,
-            "usuariosActivos": usuarios_activos,
-            "prestamosActivos": prestamos_activos,
-            "multasPendientes": multas_pendientes,
-            "lectores": lectores,
-            "bibliotecarios": bibliotecarios,
-            "administradores": administradores,
-            "usuariosSuspendidos": usuarios_suspendidos,
-            "usuariosInactivos": usuarios_inactivos,
-        }
-
-        return jsonify(summary_data), 200
+        return jsonify(panel_summary(read_counters(PANEL_COUNTERS))), 200
 
     except Exception as e:
         db.session.rollback() # Deshacer cualquier cambio pendiente en la sesión de la base de datos
@@ -83,69 +56,123 @@ def get_panel_summary():
         traceback.print_exc() # Imprimir el traceback completo para depuración
         return jsonify({"message": "Error al obtener el resumen del panel de administración", "error": str(e)}), 500
 
-# --- ENDPOINT: LISTAR TODOS LOS USUARIOS ---
-# Devuelve una lista detallada de todos los usuarios registrados.
+# --- FUNCIÓN DE AYUDA PARA SERIALIZAR UNA FILA DEL LISTADO DE USUARIOS ---
+# Recibe una fila (usuario, rol_nombre, prestamos_activos, prestamos_historicos, multas_pendientes).
+def serialize_usuario(row):
+    usuario, rol_nombre, activos, historicos, pendientes = row
+    return {
+        "id": usuario.id,
+        # Usar getattr para acceder a atributos que podrían ser opcionales o None
+        "nombre": getattr(usuario, 'nombre', ''),
+        "apellidoPaterno": getattr(usuario, 'apellido_paterno', ''),
+        "apellidoMaterno": getattr(usuario, 'apellido_materno', ''),
+        "email": getattr(usuario, 'email', ''),
+        "rol": rol_nombre or 'Desconocido',
+        "estado": usuario.estado or 'Activo',
+        
+        # Formatear fechas a ISO 8601 si los campos existen y tienen valor
+        "fechaRegistro": getattr(usuario, 'fecha_registro', None),
+        
+        # Campos que no existen en tu modelo Usuario según models.py, se devuelven como None
+        "ultimoAcceso": None, 
+        "numeroUsuario": None, 
+        "avatar": None, 
+        
+        # Campos que sí existen en models.py
+        "telefono": getattr(usuario, 'telefono', None),
+        "direccion": getattr(usuario, 'direccion', None),
+        "fechaNacimiento": getattr(usuario, 'fecha_nacimiento', None),
+        "genero": getattr(usuario, 'genero', None),
+
+        "prestamosActivos": activos or 0,
+        "prestamosHistoricos": historicos or 0,
+        "multasPendientes": pendientes or 0,
+    }
+
+# --- ENDPOINT: LISTAR TODOS LOS USUARIOS (PAGINADO) ---
+# Devuelve una página de usuarios con sus contadores de préstamos y multas.
+# Parámetros: ?limit=50&cursor=<X-Next-Cursor>&sort=<campo o -campo>&rol=<nombre de rol>&estado=<estado>
+# Campos de orden: id, nombre, apellidoPaterno, email, rol.
+# Toda la página (usuarios + rol + contadores) sale de UNA sola consulta con subconsultas correlacionadas,
+# así que el costo depende del tamaño de la página y no del historial total de préstamos.
+# Con ?stream=1 (o Accept: application/x-ndjson) devuelve todos los usuarios filtrados en NDJSON.
+# Sin ?limit= ni ?cursor= devuelve la lista completa (misma consulta, sin LIMIT), como antes de paginar.
+USER_SORT_FIELDS = {
+    'id': Usuario.id,
+    'nombre': Usuario.nombre,
+    'apellidoPaterno': Usuario.apellido_paterno,
+    'email': Usuario.email,
+    'rol': Rol.nombre,
+}
+
 @admin_bp.route('/usuarios', methods=['GET'])
 @jwt_required() # Requiere un token JWT válido
+@require_role('Admin')
 def get_all_users():
-    # Verifica si el usuario tiene permisos de administrador
-    if not check_admin():
-        return jsonify({"message": "Acceso restringido a administradores"}), 403
+    sort = request.args.get('sort', 'id')
+    descending = sort.startswith('-')
+    sort_column = USER_SORT_FIELDS.get(sort.lstrip('-'))
+    if sort_column is None:
+        return jsonify({"message": f"Campo de orden no válido: '{sort}'"}), 400
+    try:
+        limit = get_limit()
+        cursor = get_cursor()
+    except (ValueError, TypeError):
+        return jsonify({"message": "Parámetros de paginación inválidos"}), 400
 
     try:
-        usuarios = Usuario.query.order_by(Usuario.id).all() # Obtiene todos los usuarios, ordenados por ID
-        resultado = []
-        for usuario in usuarios:
-            # Inicializar contadores para evitar errores si las relaciones no existen o están vacías
-            prestamos_activos_count = 0
-            prestamos_historicos_count = 0
-            multas_pendientes_count = 0
-
-            # Contar préstamos y multas si la relación 'prestamos' existe y no está vacía
-            if hasattr(usuario, 'prestamos') and usuario.prestamos:
-                # Filtrar en Python los objetos Prestamo ya cargados por SQLAlchemy
-                prestamos_activos_count = sum(1 for p in usuario.prestamos if p.estado == 'Activo')
-                prestamos_historicos_count = sum(1 for p in usuario.prestamos if p.estado != 'Activo')
-                
-                # Iterar sobre las multas de cada préstamo para sumar las pendientes
-                for prestamo in usuario.prestamos:
-                    if hasattr(prestamo, 'multas') and prestamo.multas:
-                        multas_pendientes_count += sum(1 for m in prestamo.multas if m.estado == 'Pendiente')
-
-            user_data = {
-                "id": usuario.id,
-                # Usar getattr para acceder a atributos que podrían ser opcionales o None
-                "nombre": getattr(usuario, 'nombre', ''),
-                "apellidoPaterno": getattr(usuario, 'apellido_paterno', ''),
-                "apellidoMaterno": getattr(usuario, 'apellido_materno', ''),
-                "email": getattr(usuario, 'email', ''),
-                # Obtener el nombre del rol. Asegurarse que 'rol' y 'nombre' existen en el objeto.
-                "rol": usuario.rol.nombre if hasattr(usuario, 'rol') and hasattr(usuario.rol, 'nombre') else 'Desconocido',
-                
-                # 'estado' del usuario: Asumiendo "Activo" si no hay campo 'estado' en models.py
-                "estado": getattr(usuario, 'estado', 'Activo'), 
-                
-                # Formatear fechas a ISO 8601 si los campos existen y tienen valor
-                "fechaRegistro": usuario.fecha_registro.isoformat() if hasattr(usuario, 'fecha_registro') and usuario.fecha_registro else None,
-                
-                # Campos que no existen en tu modelo Usuario según models.py, se devuelven como None
-                "ultimoAcceso": None, 
-                "numeroUsuario": None, 
-                "avatar": None, 
-                
-                # Campos que sí existen en models.py
-                "telefono": getattr(usuario, 'telefono', None),
-                "direccion": getattr(usuario, 'direccion', None),
-                "fechaNacimiento": usuario.fecha_nacimiento.isoformat() if hasattr(usuario, 'fecha_nacimiento') and usuario.fecha_nacimiento else None,
-                "genero": getattr(usuario, 'genero', None),
-
-                "prestamosActivos": prestamos_activos_count,
-                "prestamosHistoricos": prestamos_historicos_count,
-                "multasPendientes": multas_pendientes_count,
-            }
-            resultado.append(user_data)
-        
-        return jsonify(resultado), 200
+        # Contadores por usuario como subconsultas escalares correlacionadas
+        prestamos_activos = (db.session.query(func.count(Prestamo.id))
+                             .filter(Prestamo.id_usuario == Usuario.id, Prestamo.estado.in_(('Activo', 'Vencido')))
+                             .correlate(Usuario).scalar_subquery())
+        prestamos_historicos = (db.session.query(func.count(Prestamo.id))
+                                .filter(Prestamo.id_usuario == Usuario.id, Prestamo.estado.notin_(('Activo', 'Vencido')))
+                                .correlate(Usuario).scalar_subquery())
+        multas_pendientes = (db.session.query(func.count(Multa.id))
+                             .join(Prestamo, Multa.id_prestamo == Prestamo.id)
+                             .filter(Prestamo.id_usuario == Usuario.id, Multa.estado == 'Pendiente')
+                             .correlate(Usuario).scalar_subquery())
+
+        query = (db.session.query(
+                    Usuario,
+                    Rol.nombre.label('rol_nombre'),
+                    prestamos_activos.label('prestamos_activos'),
+                    prestamos_historicos.label('prestamos_historicos'),
+                    multas_pendientes.label('multas_pendientes'))
+                 .join(Rol, Usuario.rol_id == Rol.id))
+
+        if request.args.get('rol'):
+            query = query.filter(Rol.nombre == request.args['rol'])
+        if request.args.get('estado'):
+            query = query.filter(Usuario.estado == request.args['estado'])
+
+        query = apply_keyset(query, sort_column, Usuario.id, cursor, descending)
+
+        # Modo streaming (NDJSON): todos los usuarios filtrados con un cursor del lado del servidor
+        if wants_stream():
+            return ndjson_response((serialize_usuario(row) for row in stream_rows(query)), 'get_all_users')
+
+        # Sin ?limit= ni ?cursor=: todos los usuarios, como antes de la paginación
+        if not is_paginated():
+            return jsonify([serialize_usuario(row) for row in query.all()]), 200
+
+        rows = query.limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        resultado = [serialize_usuario(row) for row in rows]
+
+        next_cursor = None
+        if has_more:
+            last_usuario, last_rol = rows[-1][0], rows[-1][1]
+            sort_key = sort.lstrip('-')
+            if sort_key == 'id':
+                next_cursor = encode_cursor(last_usuario.id)
+            else:
+                value = last_rol if sort_key == 'rol' else getattr(last_usuario, sort_column.key)
+                next_cursor = encode_cursor(value, last_usuario.id)
+
+        return paginated_response(jsonify(resultado), next_cursor), 200
 
     except Exception as e:
         db.session.rollback() # Deshacer la transacción en caso de error
@@ -157,11 +184,8 @@ def get_all_users():
 # Permite a un administrador crear un nuevo usuario en el sistema.
 @admin_bp.route('/usuarios', methods=['POST'])
 @jwt_required()
+@require_role('Admin')
 def add_user():
-    # Verifica si el usuario tiene permisos de administrador
-    if not check_admin():
-        return jsonify({"message": "Acceso restringido a administradores"}), 403
-
     data = request.get_json() # Obtiene los datos JSON de la solicitud
 
     # Validación de campos obligatorios
@@ -170,6 +194,10 @@ def add_user():
         if not data.get(field):
             return jsonify({"message": f"El campo '{field}' es obligatorio"}), 400
 
+    # El estado debe ser uno de los que cuenta el panel (stats_counters solo tiene esas filas)
+    if data.get('estado', 'Activo') not in stats.ESTADOS_USUARIO:
+        return jsonify({"message": f"El estado '{data['estado']}' no es válido"}), 400
+
     # Verificar si el email ya existe en la base de datos
     if Usuario.query.filter_by(email=data['email']).first():
         return jsonify({"message": "El email ya está registrado"}), 409 # 409 Conflict
@@ -192,14 +220,16 @@ def add_user():
             fecha_nacimiento=datetime.strptime(data['fechaNacimiento'], '%Y-%m-%d').date() if data.get('fechaNacimiento') else None,
             telefono=data.get('telefono'),
             direccion=data.get('direccion'),
-            genero=data.get('genero')
-            # Si el campo 'estado' se añadió a Usuario en models.py, incluirlo aquí:
-            # estado=data.get('estado', 'Activo') 
+            genero=data.get('genero'),
+            estado=data.get('estado', 'Activo')
         )
         # Establecer la contraseña usando el método del modelo Usuario
         nuevo_usuario.set_password(data['password'])
 
         db.session.add(nuevo_usuario) # Añadir el nuevo usuario a la sesión
+        db.session.flush() # ID del usuario para su fila de contadores del panel
+        db.session.add(ContadorUsuario(id_usuario=nuevo_usuario.id))
+        stats.add_user_counters(rol.nombre, nuevo_usuario.estado)
         db.session.commit() # Guardar los cambios en la base de datos
 
         # Después de commit, nuevo_usuario.id tendrá el ID asignado por la BD
@@ -215,17 +245,24 @@ def add_user():
 # Permite a un administrador actualizar los datos de un usuario existente.
 @admin_bp.route('/usuarios/<int:user_id>', methods=['PUT', 'PATCH'])
 @jwt_required()
+@require_role('Admin')
 def update_user(user_id):
-    if not check_admin():
-        return jsonify({"message": "Acceso restringido a administradores"}), 403
-
     data = request.get_json()
     user_to_update = db.session.get(Usuario, user_id) # Busca el usuario por su ID
 
     if not user_to_update:
         return jsonify({"message": "Usuario no encontrado"}), 404
 
+    # El estado debe ser uno de los que cuenta el panel (stats_counters solo tiene esas filas)
+    if 'estado' in data and data['estado'] not in stats.ESTADOS_USUARIO:
+        return jsonify({"message": f"El estado '{data['estado']}' no es válido"}), 400
+
     try:
+        # Rol y estado previos, para ajustar los contadores del panel si cambian
+        rol_anterior = user_to_update.rol.nombre
+        rol_id_anterior = user_to_update.rol_id
+        estado_anterior = user_to_update.estado
+
         # Actualizar campos básicos
         user_to_update.nombre = data.get('nombre', user_to_update.nombre)
         user_to_update.apellido_paterno = data.get('apellidoPaterno', user_to_update.apellido_paterno)
@@ -244,6 +281,9 @@ def update_user(user_id):
             if not rol_obj:
                 return jsonify({"message": f"El rol '{new_rol_name}' no es válido"}), 400
             user_to_update.rol_id = rol_obj.id
+            if rol_obj.nombre != rol_anterior:
+                stats.add_counter(stats.usuarios_rol(rol_anterior), -1)
+                stats.add_counter(stats.usuarios_rol(rol_obj.nombre), 1)
 
         # Actualizar campos opcionales del perfil
         user_to_update.telefono = data.get('telefono', user_to_update.telefono)
@@ -259,9 +299,16 @@ def update_user(user_id):
         # Si el campo 'estado' se añadió a Usuario en models.py, actualizarlo aquí:
         if hasattr(user_to_update, 'estado') and 'estado' in data:
             user_to_update.estado = data['estado']
+            if user_to_update.estado != estado_anterior:
+                stats.add_counter(stats.usuarios_estado(estado_anterior), -1)
+                stats.add_counter(stats.usuarios_estado(user_to_update.estado), 1)
 
+        # Un cambio de rol o de estado invalida los tokens ya emitidos (llevan el rol anterior en sus claims)
+        if user_to_update.rol_id != rol_id_anterior or user_to_update.estado != estado_anterior:
+            revoke_user_tokens(user_id)
 
         db.session.commit() # Guardar los cambios
+        invalidate_user(user_id) # El rol cacheado para autorización puede haber cambiado
 
         return jsonify({"message": "Usuario actualizado exitosamente", "user_id": user_to_update.id}), 200
 
@@ -276,10 +323,8 @@ def update_user(user_id):
 # Permite a un administrador eliminar un usuario existente.
 @admin_bp.route('/usuarios/<int:user_id>', methods=['DELETE'])
 @jwt_required()
+@require_role('Admin')
 def delete_user(user_id):
-    if not check_admin():
-        return jsonify({"message": "Acceso restringido a administradores"}), 403
-
     user_to_delete = db.session.get(Usuario, user_id) # Busca el usuario por su ID
 
     if not user_to_delete:
@@ -292,7 +337,7 @@ def delete_user(user_id):
         # Verificar préstamos activos
         # Corregido: Filtrar la InstrumentedList en Python
         if hasattr(user_to_delete, 'prestamos') and user_to_delete.prestamos:
-            active_loans = [p for p in user_to_delete.prestamos if p.estado == 'Activo']
+            active_loans = [p for p in user_to_delete.prestamos if p.estado in ('Activo', 'Vencido')] # Vencido: aún sin devolver
             if active_loans: # Si la lista de préstamos activos no está vacía
                 return jsonify({"message": "No se puede eliminar el usuario: tiene préstamos activos."}), 409
 
@@ -311,8 +356,13 @@ def delete_user(user_id):
             return jsonify({"message": "No se puede eliminar el usuario: tiene multas pendientes."}), 409
 
         # Si no tiene préstamos activos ni multas pendientes, proceder con la eliminación
+        stats.add_user_counters(user_to_delete.rol.nombre, user_to_delete.estado, sign=-1)
+        ContadorUsuario.query.filter_by(id_usuario=user_id).delete(synchronize_session=False)
+        liberar_reservas(id_usuario=user_id) # Sus copias apartadas pasan a la siguiente reserva de cada cola
         db.session.delete(user_to_delete) # Eliminar el usuario
+        revoke_user_tokens(user_id) # Sus tokens quedan revocados en todos los endpoints
         db.session.commit() # Guardar los cambios
+        invalidate_user(user_id) # Sus tokens dejan de pasar @require_role
 
         return jsonify({"message": "Usuario eliminado exitosamente"}), 200
 
@@ -321,3 +371,38 @@ def delete_user(user_id):
         print(f"ERROR EN delete_user: {e}")
         traceback.print_exc() # Imprimir el traceback completo
         return jsonify({"message": "Error interno del servidor al eliminar usuario", "error": str(e)}), 500
+
+
+# --- ENDPOINT: RECALCULAR CONTADORES DEL PANEL (POST) ---
+# Recalcula stats_counters (y los contadores por usuario del panel del lector) desde las tablas base
+# para reparar cualquier desviación.
+@admin_bp.route('/stats/recalcular', methods=['POST'])
+@jwt_required()
+@require_role('Admin')
+def recalcular_stats():
+    try:
+        valores = recompute_counters(usuarios=True)
+        return jsonify({"message": "Contadores recalculados exitosamente", "contadores": valores}), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR EN recalcular_stats: {e}")
+        traceback.print_exc()
+        return jsonify({"message": "Error al recalcular los contadores", "error": str(e)}), 500
+
+# --- ENDPOINT: MÉTRICAS EN FORMATO PROMETHEUS ---
+# Latencia, consultas SQL y errores por endpoint, espera del pool de conexiones (ver app/utils/metrics.py).
+# Prometheus puede consultarlo con un token de administrador (bearer_token en la configuración del scrape).
+@admin_bp.route('/metrics', methods=['GET'])
+@jwt_required()
+@require_role('Admin')
+def get_metrics_endpoint():
+    return Response(get_metrics().render(), content_type=METRICS_CONTENT_TYPE)
+
+# --- ENDPOINT: PERFIL DE ARRANQUE DEL WORKER ---
+# Tiempos de create_app() por fase, calentamiento y primera petición del proceso que responde (ver
+# app/utils/startup.py). Con varios workers cada uno tiene el suyo (campo pid).
+@admin_bp.route('/startup', methods=['GET'])
+@jwt_required()
+@require_role('Admin')
+def get_startup_report():
+    return jsonify(get_startup_profile().report()), 200
@@ -0,0 +1,85 @@
+# app/aio/database.py
+#
+# Engines asíncronos de SQLAlchemy para las lecturas del modo ASGI (ver app/aio/factory.py).
+#
+# Se crean a partir de la misma configuración que los engines de Flask-SQLAlchemy: SQLALCHEMY_DATABASE_URI y
+# DATABASE_REPLICA_URLS con el driver asíncrono equivalente (mysql+pymysql -> mysql+aiomysql,
+# sqlite -> sqlite+aiosqlite) y las mismas opciones DB_POOL_*. ASYNC_DATABASE_URL permite fijar otro driver
+# (p. ej. mysql+asyncmy://...) para la principal. Las réplicas se eligen con el mismo ReplicaRouter que el modo
+# WSGI, así que "read-your-writes" se respeta también aquí: las escrituras (que siguen pasando por Flask en
+# este mismo proceso) marcan al cliente y sus lecturas siguientes van a la principal.
+
+from contextlib import asynccontextmanager
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.utils.db_routing import client_key, pool_options, REPLICA_BIND_PREFIX
+
+ASYNC_DRIVERS = {
+    'mysql': 'mysql+aiomysql',
+    'mariadb': 'mariadb+aiomysql',
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+
+def async_url(url):
+    """La URL con el driver asíncrono equivalente (se conserva si ya es asíncrono)."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No hay driver asíncrono configurado para '{backend}'")
+    if url.drivername in ('mysql+asyncmy', 'mysql+aiomysql', 'mariadb+aiomysql', 'sqlite+aiosqlite', 'postgresql+asyncpg'):
+        return url
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+class AsyncDatabase:
+    """Engine asíncrono de la principal y de cada réplica, con el mismo enrutado que el modo WSGI."""
+
+    def __init__(self, flask_app):
+        config = flask_app.config
+        principal = config.get('ASYNC_DATABASE_URL') or config['SQLALCHEMY_DATABASE_URI']
+        self.engine = create_async_engine(async_url(principal), **pool_options(flask_app, principal))
+        self.replicas = {
+            f'{REPLICA_BIND_PREFIX}{n}': create_async_engine(async_url(url), **pool_options(flask_app, url))
+            for n, url in enumerate(config['DATABASE_REPLICA_URLS'])
+        }
+        self.router = flask_app.extensions['db_router']
+
+    def read_engine(self, request):
+        """Réplica por turno, o la principal si no hay réplicas o el cliente escribió hace poco."""
+        if not self.replicas or self.router.is_sticky(
+                client_key(request.headers.get('Authorization'), request.client.host if request.client else None)):
+            return self.engine
+        return self.replicas[self.router.next_replica()]
+
+    @asynccontextmanager
+    async def session(self, request):
+        """Sesión de solo lectura para una petición (sin expirar objetos: no hay commit)."""
+        async with AsyncSession(self.read_engine(request), expire_on_commit=False) as session:
+            yield session
+
+    async def prime(self, conexiones):
+        """Abre `conexiones` conexiones por engine (hasta el tamaño de su pool) y las deja en el pool."""
+        abiertas = 0
+        for engine in [self.engine, *self.replicas.values()]:
+            pool = engine.sync_engine.pool
+            retenidas = []
+            try:
+                for _ in range(min(conexiones, pool.size()) if hasattr(pool, 'size') else 1):
+                    conn = await engine.connect()
+                    retenidas.append(conn)
+                    await conn.execute(text('SELECT 1'))
+            finally:
+                for conn in retenidas:
+                    await conn.close()
+            abiertas += len(retenidas)
+        return abiertas
+
+    async def dispose(self):
+        await self.engine.dispose()
+        for engine in self.replicas.values():
+            await engine.dispose()
@@ -0,0 +1,47 @@
+# app/aio/factory.py
+#
+# Modo de servicio ASGI (opcional): uvicorn asgi:app
+#
+# Los GET de lectura más frecuentes (app/aio/routes.py) se atienden como corrutinas sobre engines asíncronos de
+# SQLAlchemy (aiomysql/asyncmy, aiosqlite): una petición que espera a la base de datos no ocupa un hilo, así que
+# un solo proceso mantiene miles de conexiones abiertas. El resto de la API (escrituras, login, búsquedas,
+# NDJSON, administración) la sigue atendiendo la misma aplicación Flask de create_app(), montada con a2wsgi en
+# un pool de hilos; comparten modelos, configuración, JWT, cachés en memoria y el enrutado a réplicas.
+#
+# Comparativa de capacidad frente a WSGI: benchmarks/asgi_vs_wsgi.py
+
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+from app import create_app
+from app.aio.database import AsyncDatabase
+from config import Config
+
+
+def create_asgi_app(config_class=Config):
+    flask_app = create_app(config_class)
+    flask_app.config.setdefault('ASGI_WSGI_WORKERS', 10) # Hilos para las peticiones que atiende Flask
+    wsgi = WSGIMiddleware(flask_app, workers=flask_app.config['ASGI_WSGI_WORKERS'])
+    database = AsyncDatabase(flask_app)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        # Con WARMUP_ENABLED, create_app() ya calentó los engines de Flask; faltan los asíncronos de app/aio
+        if flask_app.config['WARMUP_ENABLED']:
+            try:
+                conexiones = await database.prime(flask_app.config['WARMUP_POOL_CONNECTIONS'])
+                (flask_app.extensions['startup'].warmup or {})['conexionesAsync'] = conexiones
+            except Exception as e:
+                print(f"ERROR EN calentamiento asíncrono: {e}")
+        yield
+        await database.dispose()
+
+    from app.aio.routes import ROUTES
+    app = Starlette(routes=ROUTES + [Mount('/', app=wsgi)], lifespan=lifespan)
+    app.state.flask_app = flask_app
+    app.state.db = database
+    app.state.wsgi = wsgi
+    return app
@@ -0,0 +1,366 @@
+# app/aio/routes.py
+#
+# Versiones asíncronas de los GET de lectura más frecuentes (catálogo, géneros, autores, resúmenes de los
+# paneles y listados del lector) para el modo ASGI (ver app/aio/factory.py).
+#
+# Devuelven exactamente lo mismo que sus equivalentes de Flask: usan los mismos serializadores, contadores,
+# ETags y snapshots del catálogo (la caché de snapshots es la misma instancia, así que una página calculada por
+# un modo la sirve también el otro). Mientras esperan a la base de datos no ocupan ningún hilo.
+#
+# Todo lo que no es el camino común se delega en la aplicación Flask, que responde igual que siempre:
+#   - autenticación: el token se valida con Flask-JWT-Extended (firma, caducidad, revocación) y el rol con
+#     require_role, dentro de un contexto de Flask; si algo falla se delega y Flask devuelve su 401/403/422.
+#     Ese paso no toca la base de datos en el caso normal (filtro de revocaciones y caché de roles en memoria);
+#     cuando sí lo hace es una consulta síncrona corta, como mucho cada pocos segundos por usuario;
+#   - NDJSON (?stream=1), filas que aún no existen (contadores, versión del catálogo) y errores de datos.
+
+import traceback
+
+from flask_jwt_extended import get_jwt, get_jwt_identity, verify_jwt_in_request
+from sqlalchemy import select
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from starlette.routing import Route
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import http_date, parse_accept_header, parse_date, parse_etags
+
+from app import CORS_RESOURCES
+from app.models import (Autor, CatalogoVersion, ContadorUsuario, Genero, Libro, Multa, Prestamo, Solicitud,
+                        StatsCounter, Usuario)
+from app.auth.decorators import current_user_role
+from app.libros.cache import VERSION_ROW_ID, not_modified, snapshot_etag, snapshot_key
+from app.libros.facetas import armar_facetas, consultas_facetas, filtrar_libros, filtros_catalogo, DEFAULT_LIMITE_FACETAS
+from app.libros.routes import serialize_autor, serialize_genero, serialize_libro
+from app.lector.routes import get_fecha_cursor, serialize_multa, serialize_prestamo
+from app.admin import routes as admin_routes
+from app.bibliotecario import routes as bibliotecario_routes
+from app.lector import routes as lector_routes
+from app.utils import stats
+from app.utils.compression import compressible, not_modified_etag, weak_etag
+from app.utils.json_provider import dumps_compact
+from app.utils.pagination import apply_keyset, encode_cursor, get_cursor, get_limit, is_paginated
+from app.utils.streaming import NDJSON_MIMETYPE
+
+CORS_OPTIONS = CORS_RESOURCES[r"/api/v1/*"]
+
+
+# --- FUNCIONES DE AYUDA ---
+def delegar(request):
+    """La aplicación WSGI de Flask como respuesta: atiende la petición tal cual."""
+    return request.app.state.wsgi
+
+
+async def identidad(request, *roles):
+    """ID del usuario del token si es válido (y tiene uno de los roles); None para delegar en Flask.
+
+    La verificación puede consultar la base de datos con la sesión síncrona de Flask (sincronización de las
+    revocaciones, confirmación de un positivo del filtro de Bloom, rol actual si venció en la caché), así que
+    corre en el pool de hilos: una consulta lenta no detiene el bucle de eventos.
+    """
+    authorization = request.headers.get('Authorization')
+    if not authorization:
+        return None
+    return await run_in_threadpool(_verificar_token, request.app.state.flask_app, request.url.path, authorization, roles)
+
+
+def _verificar_token(flask_app, path, authorization, roles):
+    with flask_app.test_request_context(path, headers={'Authorization': authorization}):
+        try:
+            verify_jwt_in_request()
+            user_id = int(get_jwt_identity())
+        except Exception:
+            return None
+        if roles:
+            rol = get_jwt().get('rol')
+            if rol not in roles or current_user_role(user_id) != rol:
+                return None
+        return user_id
+
+
+def wants_stream(request):
+    if request.query_params.get('stream', '').lower() in ('1', 'true', 'si', 'yes'):
+        return True
+    accept = parse_accept_header(request.headers.get('Accept'), MIMEAccept)
+    return accept.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def cors_headers(request):
+    """Las mismas cabeceras que añade flask-cors a /api/v1/* (un único origen literal: sin Vary: Origin)."""
+    origins = CORS_OPTIONS['origins']
+    origins = [origins] if isinstance(origins, str) else origins
+    origin = request.headers.get('Origin')
+    if origin is None:
+        allow = ', '.join(sorted(origins)) # always_send de flask-cors
+    elif origin.lower() in (o.lower() for o in origins):
+        allow = origin
+    else:
+        return {}
+    return {'Access-Control-Allow-Origin': allow,
+            'Access-Control-Expose-Headers': ', '.join(CORS_OPTIONS['expose_headers'])}
+
+
+def json_body(request, data):
+    # El mismo proveedor y formato compacto que jsonify(), para que las respuestas sean idénticas byte a byte
+    return dumps_compact(request.app.state.flask_app.json, data) + b'\n'
+
+
+def encoded_response(request, body, status, headers):
+    """Response JSON con la misma compresión (y ETag débil si se comprime) que aplica Flask en after_request."""
+    compressor = request.app.state.flask_app.extensions['compression']
+    if compressor is not None:
+        etag = headers.get('ETag')
+        if status == 304:
+            if etag:
+                headers['ETag'] = not_modified_etag(etag, parse_etags(request.headers.get('If-None-Match')))
+        elif compressible(status, 'application/json', None):
+            headers['Vary'] = f"{headers['Vary']}, Accept-Encoding" if 'Vary' in headers else 'Accept-Encoding'
+            encoding = compressor.negotiate(request.headers.get('Accept-Encoding'))
+            if encoding and len(body) >= compressor.min_size:
+                body = compressor.compress(body, encoding, etag.strip('"') if etag and not etag.startswith('W/') else None)
+                headers['Content-Encoding'] = encoding
+                if etag:
+                    headers['ETag'] = weak_etag(etag)
+    return Response(body, status, headers=headers, media_type=None if status == 304 else 'application/json')
+
+
+def json_response(request, data, status=200, headers=None):
+    return encoded_response(request, json_body(request, data), status, {**(headers or {}), **cors_headers(request)})
+
+
+def error_response(request, nombre, message, e):
+    print(f"ERROR EN {nombre} (asgi): {e}")
+    traceback.print_exc()
+    return json_response(request, {'message': message, 'error': str(e)}, 500)
+
+
+async def catalog_version(request, session):
+    """(version, actualizado) del catálogo desde la caché compartida con Flask, o None si la fila no existe."""
+    cache = request.app.state.flask_app.extensions['catalogo_cache']
+    version = cache.cached_version()
+    if version is None:
+        row = await session.get(CatalogoVersion, VERSION_ROW_ID)
+        if row is None:
+            return None # La crea Flask en la principal
+        version = cache.store_version((row.version, row.actualizado))
+    return version
+
+
+async def versioned_snapshot(request, name, render):
+    """Igual que app.libros.cache.versioned_snapshot: ETag/Last-Modified, 304 y snapshot por versión.
+
+    render(session) devuelve (datos, cabeceras X-) o una Response (que no se cachea).
+    """
+    cache = request.app.state.flask_app.extensions['catalogo_cache']
+    async with request.app.state.db.session(request) as session:
+        version = await catalog_version(request, session)
+        if version is None:
+            return delegar(request)
+        version, last_modified = version
+        key = snapshot_key(name, request.query_params.multi_items())
+        etag = snapshot_etag(name, version, key)
+        headers = {'ETag': f'"{etag}"', 'Last-Modified': http_date(last_modified),
+                   'Cache-Control': 'no-cache', 'Vary': 'Accept', **cors_headers(request)}
+
+        if not_modified(etag, last_modified, parse_etags(request.headers.get('If-None-Match')),
+                        parse_date(request.headers.get('If-Modified-Since'))):
+            return encoded_response(request, b'', 304, headers)
+
+        entry = cache.get(key, version)
+        if entry is None:
+            resultado = await render(session)
+            if isinstance(resultado, Response):
+                return resultado
+            data, extra = resultado
+            body = json_body(request, data)
+            cache.put(key, version, body, 200, extra)
+        else:
+            _, body, _, extra = entry
+    return encoded_response(request, body, 200, {**dict(extra), **headers})
+
+
+async def keyset_page(session, stmt, fecha_column, id_column, fecha_of, limit, cursor):
+    """Como lector.routes.keyset_page, sobre un select() asíncrono."""
+    stmt = apply_keyset(stmt, fecha_column, id_column, cursor, descending=True).limit(limit + 1)
+    filas = (await session.scalars(stmt)).unique().all()
+    has_more = len(filas) > limit
+    filas = filas[:limit]
+    next_cursor = encode_cursor(fecha_of(filas[-1]).isoformat(), filas[-1].id) if has_more else None
+    return filas, next_cursor
+
+
+# --- CATÁLOGO: GET /api/v1/libros, /facetas, /generos, /autores ---
+async def get_libros(request):
+    if wants_stream(request) or await identidad(request) is None:
+        return delegar(request)
+
+    async def render(session):
+        # Los parámetros se validan después del 304, igual que en Flask
+        try:
+            args = request.query_params
+            limit = get_limit(args=args)
+            cursor = get_cursor(args)
+            last_id = int(cursor[0]) if cursor else None
+        except (ValueError, TypeError):
+            return json_response(request, {'message': 'Parámetros de paginación inválidos'}, 400)
+
+        stmt = filtrar_libros(select(Libro).options(selectinload(Libro.autores), selectinload(Libro.generos)),
+                              Libro.id, **filtros_catalogo(args))
+        if not is_paginated(args):
+            return [serialize_libro(libro) for libro in (await session.scalars(stmt.order_by(Libro.id))).all()], []
+        if last_id is not None:
+            stmt = stmt.where(Libro.id > last_id)
+        libros = (await session.scalars(stmt.order_by(Libro.id).limit(limit + 1))).all()
+        has_more = len(libros) > limit
+        libros = libros[:limit]
+        extra = [('X-Next-Cursor', encode_cursor(libros[-1].id))] if has_more else []
+        return [serialize_libro(libro) for libro in libros], extra
+
+    try:
+        return await versioned_snapshot(request, 'libros', render)
+    except Exception as e:
+        return error_response(request, 'get_libros (Libros API)', 'Error al obtener los libros', e)
+
+
+async def get_facetas(request):
+    if await identidad(request) is None:
+        return delegar(request)
+
+    async def render(session):
+        filtros = filtros_catalogo(request.query_params)
+        disponibilidad, generos, autores = consultas_facetas(
+            filtros, get_limit(default=DEFAULT_LIMITE_FACETAS, args=request.query_params))
+        return armar_facetas(filtros, (await session.execute(disponibilidad)).one(),
+                             (await session.execute(generos)).all(), (await session.execute(autores)).all()), []
+
+    try:
+        return await versioned_snapshot(request, 'facetas', render)
+    except Exception as e:
+        return error_response(request, 'get_facetas', 'Error al obtener las facetas del catálogo', e)
+
+
+async def get_generos(request):
+    async def render(session):
+        return [serialize_genero(genero) for genero in await session.scalars(select(Genero))], []
+
+    try:
+        return await versioned_snapshot(request, 'generos', render)
+    except Exception as e:
+        return error_response(request, 'get_generos', 'Error al obtener los géneros', e)
+
+
+async def get_autores(request):
+    async def render(session):
+        return [serialize_autor(autor) for autor in await session.scalars(select(Autor))], []
+
+    try:
+        return await versioned_snapshot(request, 'autores', render)
+    except Exception as e:
+        return error_response(request, 'get_autores', 'Error al obtener los autores', e)
+
+
+# --- RESÚMENES DE LOS PANELES ---
+async def read_counters(request, nombres):
+    """Contadores de stats_counters en una consulta; None si falta alguno (Flask los recalcula)."""
+    async with request.app.state.db.session(request) as session:
+        rows = dict((await session.execute(
+            select(StatsCounter.nombre, StatsCounter.valor).where(StatsCounter.nombre.in_(nombres))
+        )).all())
+    return rows if len(rows) == len(set(nombres)) else None
+
+
+def counters_summary(module, rol, nombre):
+    async def endpoint(request):
+        if await identidad(request, rol) is None:
+            return delegar(request)
+        try:
+            c = await read_counters(request, module.PANEL_COUNTERS)
+            if c is None:
+                return delegar(request)
+            return json_response(request, module.panel_summary(c))
+        except Exception as e:
+            return error_response(request, nombre, 'Error al obtener el resumen del panel', e)
+    endpoint.__name__ = nombre
+    return endpoint
+
+
+async def get_lector_summary(request):
+    user_id = await identidad(request)
+    if user_id is None:
+        return delegar(request)
+    try:
+        async with request.app.state.db.session(request) as session:
+            usuario = await session.get(Usuario, user_id)
+            fila = await session.get(ContadorUsuario, user_id)
+        if usuario is None or fila is None:
+            return delegar(request) # Usuario inexistente (404) o contadores por crear: los resuelve Flask
+        c = {campo: getattr(fila, campo) for campo in stats.CAMPOS_USUARIO}
+        return json_response(request, lector_routes.panel_summary(usuario, c))
+    except Exception as e:
+        return error_response(request, 'get_panel_summary (lector)', 'Error al calcular el resumen del panel', e)
+
+
+# --- LISTADOS DEL LECTOR: /historial, /prestamos, /multas ---
+def lector_listing(nombre, message, build, fecha_column, id_column, fecha_of, serialize):
+    async def endpoint(request):
+        user_id = await identidad(request)
+        if user_id is None:
+            return delegar(request)
+        try:
+            limit = get_limit(args=request.query_params)
+            cursor = get_fecha_cursor(request.query_params)
+        except (ValueError, TypeError):
+            return json_response(request, {'message': 'Parámetros de paginación inválidos'}, 400)
+        try:
+            async with request.app.state.db.session(request) as session:
+                filas, next_cursor = await keyset_page(session, build(user_id, request.query_params),
+                                                       fecha_column, id_column, fecha_of, limit, cursor)
+                data = [serialize(fila) for fila in filas]
+            return json_response(request, data, headers={'X-Next-Cursor': next_cursor} if next_cursor else None)
+        except Exception as e:
+            return error_response(request, nombre, message, e)
+    endpoint.__name__ = nombre
+    return endpoint
+
+
+def prestamos_select(user_id):
+    return (select(Prestamo).where(Prestamo.id_usuario == user_id)
+            .options(joinedload(Prestamo.solicitud_origen).selectinload(Solicitud.libros)))
+
+
+def historial_select(user_id, args):
+    stmt = prestamos_select(user_id)
+    return stmt.where(Prestamo.estado == args['estado']) if args.get('estado') else stmt
+
+
+def prestamos_activos_select(user_id, args):
+    return prestamos_select(user_id).where(Prestamo.estado.in_(('Activo', 'Vencido')))
+
+
+def multas_select(user_id, args):
+    stmt = (select(Multa).join(Prestamo, Multa.id_prestamo == Prestamo.id)
+            .where(Prestamo.id_usuario == user_id)
+            .options(contains_eager(Multa.prestamo_origen).joinedload(Prestamo.solicitud_origen).selectinload(Solicitud.libros)))
+    return stmt.where(Multa.estado == args['estado']) if args.get('estado') else stmt
+
+
+ROUTES = [
+    Route('/api/v1/libros', get_libros, methods=['GET']),
+    Route('/api/v1/libros/', get_libros, methods=['GET']),
+    Route('/api/v1/libros/facetas', get_facetas, methods=['GET']),
+    Route('/api/v1/libros/generos', get_generos, methods=['GET']),
+    Route('/api/v1/libros/autores', get_autores, methods=['GET']),
+    Route('/api/v1/admin/panel/summary', counters_summary(admin_routes, 'Admin', 'get_panel_summary'), methods=['GET']),
+    Route('/api/v1/bibliotecario/panel/summary',
+          counters_summary(bibliotecario_routes, 'Bibliotecario', 'get_bibliotecario_summary'), methods=['GET']),
+    Route('/api/v1/lector/panel/summary', get_lector_summary, methods=['GET']),
+    Route('/api/v1/lector/historial', lector_listing(
+        'get_historial', 'Error al obtener el historial de préstamos', historial_select,
+        Prestamo.fecha_inicio, Prestamo.id, lambda p: p.fecha_inicio, serialize_prestamo), methods=['GET']),
+    Route('/api/v1/lector/prestamos', lector_listing(
+        'get_prestamos_activos', 'Error al obtener los préstamos activos', prestamos_activos_select,
+        Prestamo.fecha_inicio, Prestamo.id, lambda p: p.fecha_inicio, serialize_prestamo), methods=['GET']),
+    Route('/api/v1/lector/multas', lector_listing(
+        'get_multas', 'Error al obtener las multas', multas_select,
+        Multa.fecha_generacion, Multa.id, lambda m: m.fecha_generacion, serialize_multa), methods=['GET']),
+]
@@ -0,0 +1,244 @@
+# app/auth/blocklist.py
+#
+# Revocación de tokens JWT (token_in_blocklist_loader de Flask-JWT-Extended) sin consultar la base de datos
+# en cada petición.
+#
+# Las revocaciones se guardan en la tabla token_revocado (ver models.py) y cada proceso mantiene en memoria:
+#   - un filtro de Bloom con los jti revocados: si el filtro dice "no está" (el caso normal) el token es
+#     válido sin tocar la base de datos; si dice "puede estar" se confirma con una consulta por clave única;
+#   - el instante de corte por usuario ("todos sus tokens emitidos hasta aquí están revocados").
+# El estado se sincroniza de forma incremental (filas con id mayor que el último visto) como mucho una vez
+# cada REVOCATION_SYNC_INTERVAL segundos, y al instante tras un commit en este mismo proceso que revoque algo.
+# El id se asigna al insertar pero la fila se ve al hacer commit: si la revocación 11 se confirma antes que la
+# 10, la sincronización que ve la 11 deja el 10 como "hueco" y lo vuelve a pedir en las siguientes durante
+# REVOCATION_GAP_TTL segundos (más que cualquier transacción; un INSERT deshecho deja un hueco que nunca se llena).
+# Un hilo en segundo plano borra cada REVOCATION_COMPACT_INTERVAL segundos las filas ya expiradas (el token
+# revocado ya no sería válido de todos modos) y reconstruye el filtro, que no admite borrados.
+
+import calendar
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event, or_
+from sqlalchemy.orm import Session
+
+from app.models import db, TokenRevocado
+from app.utils.db_routing import use_primary
+
+_PENDING_KEY = 'revocaciones_pendientes'
+
+
+class BloomFilter:
+    """Filtro de Bloom con hashing doble sobre blake2b. Sin falsos negativos; falsos positivos ~error_rate."""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(1, capacity)
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+def _epoch(dt):
+    return calendar.timegm(dt.utctimetuple())
+
+
+class TokenBlocklist:
+    MAX_GAPS = 1000 # Ids sin confirmar que se vuelven a pedir (los más recientes)
+
+    def __init__(self, sync_interval=5.0, capacity=100000, error_rate=0.01, gap_ttl=300.0):
+        self.sync_interval = sync_interval
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.gap_ttl = gap_ttl
+        self._lock = threading.Lock()
+        self._reset(capacity)
+
+    def _reset(self, capacity):
+        self._bloom = BloomFilter(capacity, self.error_rate)
+        self._cortes = {}  # id_usuario -> epoch: tokens con iat <= corte están revocados
+        self._last_id = 0
+        self._gaps = {}  # id aún no visible (insertado sin commit, o deshecho) -> instante en que se detectó
+        self._next_sync = 0.0
+
+    def _apply(self, rows):
+        ahora = time.monotonic()
+        for row_id, jti, id_usuario, revocado_desde in rows:
+            if self._gaps.pop(row_id, None) is None and row_id > self._last_id + 1 and self._last_id:
+                # Ids saltados: transacciones que aún no hacen commit (o que se deshicieron)
+                for hueco in range(max(self._last_id + 1, row_id - self.MAX_GAPS), row_id):
+                    self._gaps[hueco] = ahora
+            if jti:
+                self._bloom.add(jti)
+            if id_usuario is not None and revocado_desde is not None:
+                corte = _epoch(revocado_desde)
+                if corte > self._cortes.get(id_usuario, 0):
+                    self._cortes[id_usuario] = corte
+            self._last_id = max(self._last_id, row_id)
+        while len(self._gaps) > self.MAX_GAPS:
+            del self._gaps[min(self._gaps)]
+
+    def sync(self, force=False):
+        """Trae las revocaciones nuevas. Normalmente no hace nada (una consulta como mucho por intervalo)."""
+        with self._lock:
+            if not force and time.monotonic() < self._next_sync:
+                return
+            self._next_sync = time.monotonic() + self.sync_interval # Los demás hilos no repiten la consulta
+            last_id = self._last_id
+            vencidos = time.monotonic() - self.gap_ttl
+            self._gaps = {hueco: desde for hueco, desde in self._gaps.items() if desde >= vencidos}
+            huecos = list(self._gaps)
+        nuevas = TokenRevocado.id > last_id
+        with use_primary(): # Una revocación no debe esperar al retraso de replicación
+            rows = (db.session.query(TokenRevocado.id, TokenRevocado.jti, TokenRevocado.id_usuario, TokenRevocado.revocado_desde)
+                    .filter(or_(nuevas, TokenRevocado.id.in_(huecos)) if huecos else nuevas)
+                    .order_by(TokenRevocado.id).all())
+        nuevos = sum(1 for row in rows if row.jti)
+        with self._lock:
+            if last_id and self._bloom.count + nuevos > self._bloom.capacity:
+                # Filtro lleno (más falsos positivos): se recarga todo con el doble de capacidad
+                self.capacity *= 2
+                self._last_id = 0
+            else:
+                if last_id == 0: # Carga completa
+                    self.capacity = max(self.capacity, nuevos * 2)
+                    self._reset(self.capacity)
+                    self._next_sync = time.monotonic() + self.sync_interval
+                self._apply(rows)
+                return
+        self.sync(force=True)
+
+    def rebuild(self):
+        """Reconstruye el estado completo desde la tabla (tras compactar)."""
+        with self._lock:
+            self._last_id = 0
+        self.sync(force=True)
+
+    def invalidate(self):
+        """Fuerza una sincronización en la próxima comprobación (tras un commit local que revocó tokens)."""
+        with self._lock:
+            self._next_sync = 0.0
+
+    def is_revoked(self, jwt_payload):
+        self.sync()
+        corte = self._cortes.get(_user_id(jwt_payload))
+        if corte is not None and jwt_payload.get('iat', 0) <= corte:
+            return True
+        jti = jwt_payload.get('jti')
+        if not jti or jti not in self._bloom:
+            return False
+        # Positivo del filtro (revocado de verdad o falso positivo): se confirma en la base de datos
+        with use_primary():
+            return db.session.query(TokenRevocado.id).filter(TokenRevocado.jti == jti).first() is not None
+
+
+def _user_id(jwt_payload):
+    try:
+        return int(jwt_payload.get('sub'))
+    except (TypeError, ValueError):
+        return None
+
+
+def get_blocklist():
+    return current_app.extensions['token_blocklist']
+
+
+def _max_token_lifetime():
+    expires = current_app.config.get('JWT_ACCESS_TOKEN_EXPIRES')
+    if isinstance(expires, int) and not isinstance(expires, bool):
+        expires = timedelta(seconds=expires)
+    return expires if isinstance(expires, timedelta) else timedelta(days=30) # Tokens sin caducidad
+
+
+def revoke_token(jwt_payload):
+    """Revoca un token concreto (p. ej. logout). Se aplica al hacer commit de la sesión actual."""
+    db.session.add(TokenRevocado(
+        jti=jwt_payload['jti'],
+        id_usuario=_user_id(jwt_payload),
+        expira=datetime.utcfromtimestamp(jwt_payload['exp']) if jwt_payload.get('exp') else datetime.utcnow() + _max_token_lifetime(),
+    ))
+    db.session.info[_PENDING_KEY] = True
+
+
+def revoke_user_tokens(user_id):
+    """Revoca todos los tokens emitidos hasta ahora para un usuario. Se aplica al hacer commit."""
+    ahora = datetime.utcnow()
+    db.session.add(TokenRevocado(id_usuario=user_id, revocado_desde=ahora, expira=ahora + _max_token_lifetime()))
+    db.session.info[_PENDING_KEY] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    if session.info.pop(_PENDING_KEY, False):
+        try:
+            get_blocklist().invalidate()
+        except RuntimeError: # Commit fuera de un contexto de aplicación
+            pass
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending(session, previous_transaction):
+    if session.in_transaction():
+        return
+    session.info.pop(_PENDING_KEY, None)
+
+
+def compact_revocations(ahora=None):
+    """Borra las revocaciones expiradas y reconstruye el filtro. Devuelve el número de filas borradas."""
+    ahora = ahora or datetime.utcnow()
+    borradas = TokenRevocado.query.filter(TokenRevocado.expira < ahora).delete(synchronize_session=False)
+    db.session.commit()
+    get_blocklist().rebuild()
+    return borradas
+
+
+def _compaction_loop(app, interval):
+    while True:
+        time.sleep(interval)
+        with app.app_context():
+            try:
+                compact_revocations()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception("Error al compactar las revocaciones de tokens")
+            finally:
+                db.session.remove()
+
+
+def init_token_blocklist(app, jwt):
+    app.config.setdefault('REVOCATION_SYNC_INTERVAL', 5.0)
+    app.config.setdefault('REVOCATION_COMPACT_INTERVAL', 3600) # Segundos; 0 = sin hilo de compactación
+    app.config.setdefault('REVOCATION_BLOOM_CAPACITY', 100000)
+    app.config.setdefault('REVOCATION_GAP_TTL', 300.0) # Segundos que se vuelve a pedir un id saltado
+    app.extensions['token_blocklist'] = TokenBlocklist(
+        sync_interval=app.config['REVOCATION_SYNC_INTERVAL'],
+        capacity=app.config['REVOCATION_BLOOM_CAPACITY'],
+        gap_ttl=app.config['REVOCATION_GAP_TTL'],
+    )
+
+    @jwt.token_in_blocklist_loader
+    def _token_revocado(jwt_header, jwt_payload):
+        return get_blocklist().is_revoked(jwt_payload)
+
+    interval = app.config['REVOCATION_COMPACT_INTERVAL']
+    if interval and interval > 0:
+        hilo = threading.Thread(target=_compaction_loop, args=(app, interval), name='token-compaction', daemon=True)
+        hilo.start()
@@ -0,0 +1,107 @@
+# app/auth/decorators.py
+#
+# Autorización por rol sin consultar la base de datos en cada petición.
+#
+# El rol viaja firmado en el JWT (claim 'rol', ver auth/routes.py:login), así que se confía en él.
+# Para que un usuario degradado o eliminado no conserve el acceso hasta que caduque su token, se guarda
+# una caché pequeña con TTL del estado de cada usuario (rol actual, o None si ya no existe o no está 'Activo').
+# En el peor caso cuesta una consulta por usuario cada ROLE_CACHE_TTL segundos. update_user/delete_user
+# invalidan la entrada en el acto (en este proceso; en otros workers se corrige al vencer el TTL).
+
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, jsonify
+from flask_jwt_extended import get_jwt, get_jwt_identity
+
+from app.models import db, Usuario, Rol
+from app.utils.db_routing import use_primary
+
+ROLE_MESSAGES = {
+    'Admin': 'Acceso restringido a administradores',
+    'Bibliotecario': 'Acceso restringido a bibliotecarios',
+    'Lector': 'Acceso restringido a lectores',
+}
+
+_MISSING = object()
+
+
+class UserStateCache:
+    def __init__(self, ttl=30.0, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # user_id -> (rol o None, expira_en)
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] < time.monotonic():
+                return _MISSING
+            return entry[0]
+
+    def put(self, user_id, rol):
+        with self._lock:
+            self._entries[user_id] = (rol, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+
+def init_role_cache(app):
+    app.config.setdefault('ROLE_CACHE_TTL', 30.0)
+    app.config.setdefault('ROLE_CACHE_MAX_ENTRIES', 10000)
+    app.extensions['rol_cache'] = UserStateCache(
+        ttl=app.config['ROLE_CACHE_TTL'],
+        max_entries=app.config['ROLE_CACHE_MAX_ENTRIES'],
+    )
+
+
+def invalidate_user(user_id):
+    """Olvida el estado cacheado de un usuario (llamar después de cambiar su rol o eliminarlo)."""
+    current_app.extensions['rol_cache'].invalidate(user_id)
+
+
+def current_user_role(user_id):
+    """Rol actual del usuario según la caché (o la BD si la entrada venció). None si no existe o no está activo."""
+    cache = current_app.extensions['rol_cache']
+    rol = cache.get(user_id)
+    if rol is _MISSING:
+        with use_primary(): # Un cambio de rol recién hecho puede no haber llegado aún a la réplica
+            rol = (db.session.query(Rol.nombre).join(Usuario, Usuario.rol_id == Rol.id)
+                   .filter(Usuario.id == user_id, Usuario.estado == 'Activo').scalar())
+        cache.put(user_id, rol)
+    return rol
+
+
+def require_role(*roles):
+    """Restringe una vista a los roles indicados. Debe ir debajo de @jwt_required()."""
+    message = ROLE_MESSAGES.get(roles[0], 'Acceso denegado') if len(roles) == 1 else 'Acceso denegado'
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            rol_token = get_jwt().get('rol')
+            if rol_token not in roles:
+                return jsonify({"message": message}), 403
+
+            try:
+                user_id = int(get_jwt_identity())
+            except (ValueError, TypeError):
+                return jsonify({"message": message}), 403
+
+            # El claim está firmado, pero puede haber quedado obsoleto si el usuario cambió de rol o se eliminó
+            if current_user_role(user_id) != rol_token:
+                return jsonify({"message": message}), 403
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,116 @@
+# app/auth/hashing.py
+#
+# Verificación de contraseñas (bcrypt) fuera del hilo de la petición, con un pool acotado y control de admisión.
+#
+# bcrypt es deliberadamente caro (~250 ms con costo 12). Si cada login lo ejecuta en su propio hilo de
+# petición, una ráfaga de logins ocupa todos los núcleos y el tráfico del catálogo se queda esperando CPU.
+# Aquí el trabajo va a un ThreadPoolExecutor de BCRYPT_WORKERS hilos (bcrypt libera el GIL), así que como
+# mucho esos núcleos se dedican a hashes. Si ya hay BCRYPT_MAX_PENDING verificaciones en cola o en curso, el
+# login se rechaza al instante con 503 + Retry-After en lugar de ocupar un worker esperando.
+#
+# El costo se configura con BCRYPT_LOG_ROUNDS (lo usa Flask-Bcrypt al generar hashes). Si el hash guardado de
+# un usuario tiene otro costo, se vuelve a calcular con el costo actual tras un login correcto.
+# BCRYPT_WORKERS=0 verifica en el propio hilo de la petición (sin pool ni límite).
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import bcrypt as bcrypt_lib
+from flask import current_app
+
+
+class HasherSaturado(Exception):
+    """Hay demasiadas verificaciones de contraseña pendientes: el login debe reintentarse más tarde."""
+
+
+class PasswordHasher:
+    def __init__(self, workers=2, max_pending=32, timeout=10.0):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt') if workers else None
+        self._slots = threading.BoundedSemaphore(max_pending) if workers else None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.rechazados = 0
+
+    def _run(self, fn, *args):
+        if self._executor is None:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rechazados += 1
+            raise HasherSaturado()
+        with self._lock:
+            self.pending += 1
+
+        def release(_future):
+            with self._lock:
+                self.pending -= 1
+            self._slots.release()
+
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(release) # El cupo se libera cuando termina el hash, aunque la petición haya expirado
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise HasherSaturado()
+
+    def check(self, password_hash, password):
+        return self._run(_checkpw, password_hash, password)
+
+    def hash(self, password, rounds):
+        return self._run(_hashpw, password, rounds)
+
+
+def _checkpw(password_hash, password):
+    try:
+        return bcrypt_lib.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+    except ValueError: # Hash con formato inválido
+        return False
+
+
+def _hashpw(password, rounds):
+    return bcrypt_lib.hashpw(password.encode('utf-8'), bcrypt_lib.gensalt(rounds=rounds)).decode('utf-8')
+
+
+def hash_rounds(password_hash):
+    """Costo con el que se generó un hash bcrypt ('$2b$12$...' -> 12), o None si no se reconoce."""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def init_password_hasher(app):
+    app.config.setdefault('BCRYPT_LOG_ROUNDS', 12)
+    app.config.setdefault('BCRYPT_WORKERS', 2)
+    app.config.setdefault('BCRYPT_MAX_PENDING', 32)
+    app.config.setdefault('BCRYPT_TIMEOUT', 10.0)
+    app.extensions['password_hasher'] = PasswordHasher(
+        workers=app.config['BCRYPT_WORKERS'],
+        max_pending=app.config['BCRYPT_MAX_PENDING'],
+        timeout=app.config['BCRYPT_TIMEOUT'],
+    )
+
+
+def get_password_hasher():
+    return current_app.extensions['password_hasher']
+
+
+def verify_password(usuario, password):
+    """Verifica la contraseña de un usuario en el pool de bcrypt. Lanza HasherSaturado si no hay cupo.
+
+    Si es correcta y el hash tiene un costo distinto de BCRYPT_LOG_ROUNDS, actualiza usuario.password_hash
+    (el llamador debe hacer commit). Devuelve True/False.
+    """
+    hasher = get_password_hasher()
+    if not hasher.check(usuario.password_hash, password):
+        return False
+    rounds = current_app.config['BCRYPT_LOG_ROUNDS']
+    if hash_rounds(usuario.password_hash) != rounds:
+        try:
+            usuario.password_hash = hasher.hash(password, rounds)
+        except HasherSaturado:
+            pass # El rehash es oportunista: se hará en el próximo login
+    return True
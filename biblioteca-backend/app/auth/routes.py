@@ -2,7 +2,10 @@
 
 from flask import Blueprint, request, jsonify
 from app.models import db, Usuario # Asegúrate de que Usuario está importado
-from flask_jwt_extended import create_access_token # Asegúrate de que create_access_token está importado
+from app.auth.hashing import verify_password, HasherSaturado
+from app.auth.blocklist import revoke_token
+import traceback # Para imprimir el traceback completo en caso de errores
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt # Asegúrate de que create_access_token está importado
 from datetime import datetime
 # Importaciones necesarias para el hashing de contraseña si Usuario.set_password/check_password las usan
 # from app import bcrypt # Si tu modelo Usuario usa bcrypt de la instancia global
@@ -22,9 +25,18 @@ def login():
 
     user = Usuario.query.filter_by(email=data.get('email')).first()
 
-    # Asumo que user.check_password está bien definido en tu modelo Usuario
-    # y maneja el hashing de contraseña.
-    if user and user.check_password(data.get('password')):
+    # La verificación bcrypt corre en un pool acotado (ver auth/hashing.py); si está saturado se responde 503
+    # de inmediato para no dejar el worker bloqueado esperando turno.
+    try:
+        password_ok = user is not None and verify_password(user, data.get('password'))
+    except HasherSaturado:
+        response = jsonify({"message": "Demasiados inicios de sesión simultáneos, intenta de nuevo en unos segundos"})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+
+    if password_ok:
+        if db.session.is_modified(user): # Hash recalculado con el costo actual (BCRYPT_LOG_ROUNDS)
+            db.session.commit()
         # --- CAMBIO CRUCIAL AQUÍ ---
         # Convertimos user.id a string para la identidad del token
         access_token = create_access_token(identity=str(user.id), additional_claims={'rol': user.rol.nombre})
@@ -39,4 +51,19 @@ def login():
             }
         ), 200
 
-    return jsonify({"message": "Credenciales inválidas"}), 401
\ No newline at end of file
+    return jsonify({"message": "Credenciales inválidas"}), 401
+
+# --- ENDPOINT: CERRAR SESIÓN ---
+# Revoca el token con el que se hace la petición (ver auth/blocklist.py); deja de ser válido en todos los workers.
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    try:
+        revoke_token(get_jwt())
+        db.session.commit()
+        return jsonify({"message": "Sesión cerrada exitosamente"}), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR EN logout: {e}")
+        traceback.print_exc()
+        return jsonify({"message": "Error al cerrar la sesión", "error": str(e)}), 500
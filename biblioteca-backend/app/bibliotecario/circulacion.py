@@ -0,0 +1,145 @@
+# app/bibliotecario/circulacion.py
+#
+# Lógica de circulación compartida por los endpoints del bibliotecario.
+#
+# La aprobación de solicitudes es segura ante concurrencia: el cambio de estado de la solicitud y el
+# descuento de copias se hacen con UPDATE condicionales atómicos (WHERE estado = 'Pendiente' /
+# WHERE cantidad > 0) y se comprueba el número de filas afectadas. Si dos bibliotecarios aprueban a la vez,
+# solo uno gana la solicitud, y nunca se prestan más copias de las que hay. Cada préstamo registra el ejemplar
+# entregado, que pasa a 'Prestado' en la misma transacción (ver ejemplares.py).
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import selectinload
+
+from app.models import db, Libro, Solicitud, Prestamo
+from app.libros.cache import bump_catalog_version
+from app.bibliotecario.ejemplares import tomar_ejemplar
+from app.utils import stats
+
+# Regla de negocio: fecha_devolucion_limite a 15 días (RN-02)
+DIAS_PRESTAMO = 15
+
+# Tamaño de bloque (una transacción por bloque) para la aprobación masiva
+BULK_CHUNK_SIZE = 100
+
+
+class AprobacionError(Exception):
+    """La solicitud no se puede aprobar; lleva el mensaje y el código HTTP a devolver."""
+
+    def __init__(self, message, status=409):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _aprobar(solicitud, ahora):
+    """Aprueba una solicitud ya cargada (con sus libros) dentro de la transacción actual.
+
+    Devuelve las filas de Prestamo a insertar. Lanza AprobacionError si no se puede aprobar; en ese caso el
+    llamador debe deshacer la transacción (o el savepoint) para devolver las copias ya descontadas.
+    """
+    if not solicitud.libros:
+        raise AprobacionError("La solicitud no tiene libros asociados.", 400)
+
+    # Transición de estado atómica: solo una aprobación concurrente puede ganar
+    result = db.session.execute(
+        update(Solicitud)
+        .where(Solicitud.id == solicitud.id, Solicitud.estado == 'Pendiente')
+        .values(estado='Aprobada')
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        raise AprobacionError("La solicitud no está en estado pendiente", 400)
+
+    # Descuento condicional de copias, en orden de ID para que transacciones concurrentes no se bloqueen mutuamente.
+    # El UPDATE deja bloqueada la fila del libro, así que la copia que se entrega se elige sin competir con nadie.
+    ejemplares = {}
+    for libro in sorted(solicitud.libros, key=lambda l: l.id):
+        result = db.session.execute(
+            update(Libro)
+            .where(Libro.id == libro.id, Libro.cantidad > 0)
+            .values(cantidad=Libro.cantidad - 1)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            raise AprobacionError(f"Libro '{libro.nombre}' no tiene copias disponibles.", 409)
+        ejemplares[libro.id] = tomar_ejemplar(libro.id, 'Disponible', 'Prestado')
+
+    stats.add_counter(stats.SOLICITUDES_PENDIENTES, -1)
+    stats.add_counter(stats.PRESTAMOS_ACTIVOS, len(solicitud.libros))
+    stats.add_counter(stats.COPIAS_DISPONIBLES, -len(solicitud.libros))
+    stats.add_user_counter(solicitud.id_usuario_lector, stats.USUARIO_SOLICITUDES_PENDIENTES, -1)
+    stats.add_user_counter(solicitud.id_usuario_lector, stats.USUARIO_PRESTAMOS_ACTIVOS, len(solicitud.libros))
+    stats.add_user_counter(solicitud.id_usuario_lector, stats.USUARIO_PRESTAMOS_TOTAL, len(solicitud.libros))
+
+    # Una entrada en la tabla Prestamo por CADA libro solicitado
+    return [{
+        'id_solicitud': solicitud.id,
+        'id_usuario': solicitud.id_usuario_lector,
+        'libro_id': libro.id,
+        'ejemplar_id': ejemplares[libro.id],
+        'fecha_inicio': ahora,
+        'fecha_devolucion_limite': ahora + timedelta(days=DIAS_PRESTAMO),
+        'estado': 'Activo',
+    } for libro in solicitud.libros]
+
+
+def aprobar_solicitud(solicitud_id):
+    """Aprueba una solicitud y hace commit. Lanza AprobacionError (tras rollback) si no se puede."""
+    solicitud = Solicitud.query.options(selectinload(Solicitud.libros)).filter_by(id=solicitud_id).first()
+    if not solicitud:
+        raise AprobacionError("Solicitud no encontrada", 404)
+    try:
+        prestamos = _aprobar(solicitud, datetime.utcnow())
+    except AprobacionError:
+        db.session.rollback()
+        raise
+    db.session.execute(insert(Prestamo), prestamos)
+    bump_catalog_version() # Cambió la cantidad disponible que muestra el catálogo
+    db.session.commit()
+
+
+def aprobar_solicitudes(solicitud_ids, chunk_size=BULK_CHUNK_SIZE):
+    """Aprueba muchas solicitudes: una transacción por bloque y un savepoint por solicitud.
+
+    Devuelve una lista de resultados [{'id', 'estado', 'message'}] en el mismo orden recibido.
+    """
+    resultados = []
+    ids = list(dict.fromkeys(solicitud_ids)) # Sin duplicados, conservando el orden
+    for start in range(0, len(ids), chunk_size):
+        bloque = ids[start:start + chunk_size]
+        solicitudes = {s.id: s for s in Solicitud.query.options(selectinload(Solicitud.libros)).filter(Solicitud.id.in_(bloque))}
+        ahora = datetime.utcnow()
+        prestamos = []
+        resultados_bloque = []
+        for solicitud_id in bloque:
+            solicitud = solicitudes.get(solicitud_id)
+            if solicitud is None:
+                resultados_bloque.append({'id': solicitud_id, 'estado': 'error', 'message': "Solicitud no encontrada"})
+                continue
+            savepoint = db.session.begin_nested()
+            try:
+                nuevos = _aprobar(solicitud, ahora)
+                savepoint.commit()
+            except AprobacionError as e:
+                savepoint.rollback()
+                resultados_bloque.append({'id': solicitud_id, 'estado': 'error', 'message': e.message})
+                continue
+            prestamos.extend(nuevos)
+            resultados_bloque.append({'id': solicitud_id, 'estado': 'Aprobada', 'message': "Solicitud aprobada"})
+
+        try:
+            if prestamos:
+                db.session.execute(insert(Prestamo), prestamos)
+                bump_catalog_version()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            resultados_bloque = [
+                {'id': r['id'], 'estado': 'error', 'message': f"Error al guardar el bloque: {e}" if r['estado'] == 'Aprobada' else r['message']}
+                for r in resultados_bloque
+            ]
+        resultados.extend(resultados_bloque)
+    return resultados
@@ -0,0 +1,203 @@
+# app/bibliotecario/devoluciones.py
+#
+# Devolución de préstamos en el mostrador, por lotes.
+#
+# Cada elemento es un id de préstamo, el código de barras de un ejemplar (se devuelve el préstamo abierto de esa
+# copia) o un ISBN escaneado (se devuelve el préstamo abierto más antiguo de ese libro, opcionalmente solo de un
+# lector). Cada bloque de hasta RETURN_CHUNK_SIZE elementos es una transacción
+# con un número fijo de sentencias, sin importar cuántos libros traiga:
+#   1. Lectura de los préstamos (por id, por ejemplar y por libro_id, índice (libro_id, estado)) con FOR UPDATE.
+#   2. Un UPDATE condicional que los pasa a 'Devuelto' (WHERE estado IN ('Activo', 'Vencido')): si otro
+#      mostrador devolvió alguno a la vez, el bloque se vuelve a leer.
+#   3. Multas de los devueltos con retraso: la multa 'Pendiente' que ya creó el escáner de vencimientos se
+#      cierra con el monto final; si todavía no existe se crea con un INSERT en bloque.
+#   4. Las copias vuelven por libro con reservas.devolver_copias (primero la cola de reservas, después
+#      'Disponible' y Libro.cantidad con un UPDATE atómico).
+
+from collections import defaultdict
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import bindparam, insert, select, update
+
+from app.models import db, Libro, Prestamo, Multa, Ejemplar
+from app.bibliotecario import reservas
+from app.utils import stats
+
+ESTADOS_ABIERTOS = ('Activo', 'Vencido')
+
+# Elementos por bloque/transacción (un carro de mostrador cabe en uno)
+RETURN_CHUNK_SIZE = 200
+
+
+def _dias_retraso(limite, ahora):
+    # Igual que el escáner de vencimientos: vence al terminar el día límite y se cuentan días naturales
+    return max(0, (ahora.date() - limite.date()).days)
+
+
+def _resolver(elementos, id_usuario):
+    """Asigna a cada elemento su préstamo abierto. Devuelve (préstamos por posición, errores por posición)."""
+    columnas = (Prestamo.id, Prestamo.id_usuario, Prestamo.libro_id, Prestamo.ejemplar_id, Prestamo.estado,
+                Prestamo.fecha_devolucion_limite)
+    ids = {e['prestamoId'] for e in elementos if 'prestamoId' in e}
+    codigos = {e['codigoBarras'] for e in elementos if 'codigoBarras' in e}
+    isbns = {e['isbn'] for e in elementos if 'isbn' in e}
+    prestamos = {}
+    if ids:
+        prestamos = {p.id: p for p in db.session.execute(select(*columnas).where(Prestamo.id.in_(ids)).with_for_update())}
+
+    # Por código de barras: el préstamo abierto de esa copia (None si la copia existe pero no está prestada)
+    por_codigo = {}
+    if codigos:
+        por_codigo = {fila.codigo_barras: fila if fila.id is not None else None for fila in db.session.execute(
+            select(Ejemplar.codigo_barras, *columnas)
+            .outerjoin(Prestamo, (Prestamo.ejemplar_id == Ejemplar.id) & Prestamo.estado.in_(ESTADOS_ABIERTOS))
+            .where(Ejemplar.codigo_barras.in_(codigos))
+            .with_for_update()
+        )}
+
+    abiertos_por_libro = defaultdict(list)
+    libro_por_isbn = {}
+    if isbns:
+        libro_por_isbn = dict(db.session.execute(select(Libro.isbn, Libro.id).where(Libro.isbn.in_(isbns))).all())
+        if libro_por_isbn:
+            query = (select(*columnas)
+                     .where(Prestamo.libro_id.in_(libro_por_isbn.values()), Prestamo.estado.in_(ESTADOS_ABIERTOS))
+                     .order_by(Prestamo.fecha_inicio, Prestamo.id)
+                     .with_for_update())
+            if id_usuario is not None:
+                query = query.where(Prestamo.id_usuario == id_usuario)
+            pedidos = ids | {p.id for p in por_codigo.values() if p is not None}
+            for p in db.session.execute(query):
+                if p.id not in pedidos: # Los pedidos por id o por código de barras no se reparten entre los ISBN
+                    abiertos_por_libro[p.libro_id].append(p)
+
+    asignados, errores, usados = {}, {}, set()
+    for pos, e in enumerate(elementos):
+        if 'prestamoId' in e:
+            p = prestamos.get(e['prestamoId'])
+            if p is None or (id_usuario is not None and p.id_usuario != id_usuario):
+                errores[pos] = ("Préstamo no encontrado", 404)
+            elif p.estado not in ESTADOS_ABIERTOS:
+                errores[pos] = ("El préstamo ya fue devuelto", 409)
+            elif p.id in usados:
+                errores[pos] = ("Préstamo repetido en la petición", 409)
+            else:
+                asignados[pos] = p
+                usados.add(p.id)
+        elif 'codigoBarras' in e:
+            p = por_codigo.get(e['codigoBarras'])
+            if e['codigoBarras'] not in por_codigo:
+                errores[pos] = ("Código de barras no encontrado", 404)
+            elif p is None or (id_usuario is not None and p.id_usuario != id_usuario):
+                errores[pos] = ("El ejemplar no tiene un préstamo abierto", 409)
+            elif p.id in usados:
+                errores[pos] = ("Préstamo repetido en la petición", 409)
+            else:
+                asignados[pos] = p
+                usados.add(p.id)
+        else:
+            libro_id = libro_por_isbn.get(e['isbn'])
+            if libro_id is None:
+                errores[pos] = ("ISBN no encontrado", 404)
+            elif not abiertos_por_libro[libro_id]:
+                errores[pos] = ("No hay préstamos abiertos de este libro", 409)
+            else:
+                asignados[pos] = abiertos_por_libro[libro_id].pop(0) # El más antiguo primero
+                usados.add(asignados[pos].id)
+    return asignados, errores
+
+
+def _devolver_bloque(elementos, id_usuario, ahora, tarifa):
+    """Devuelve un bloque en la transacción actual. Lanza LookupError si otro mostrador se adelantó."""
+    asignados, errores = _resolver(elementos, id_usuario)
+    filas = list(asignados.values())
+    if filas:
+        devueltos = db.session.execute(
+            update(Prestamo)
+            .where(Prestamo.id.in_([p.id for p in filas]), Prestamo.estado.in_(ESTADOS_ABIERTOS))
+            .values(estado='Devuelto', fecha_devolucion_real=ahora)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if devueltos != len(filas):
+            raise LookupError("Préstamos devueltos a la vez por otra petición")
+
+    # Multas: se cierra la pendiente con el monto final o se crea si el escáner aún no pasó
+    retrasos = {p.id: _dias_retraso(p.fecha_devolucion_limite, ahora) for p in filas}
+    tardios = [p for p in filas if retrasos[p.id] > 0]
+    montos = {}
+    if tardios:
+        existentes = db.session.execute(
+            select(Multa.id, Multa.id_prestamo, Multa.estado).where(Multa.id_prestamo.in_([p.id for p in tardios]))
+        ).all()
+        con_multa = {m.id_prestamo for m in existentes}
+        pendientes = [m for m in existentes if m.estado == 'Pendiente']
+        if pendientes:
+            db.session.execute(
+                update(Multa.__table__).where(Multa.id == bindparam('mid')).values(monto=bindparam('nuevo_monto')),
+                [{'mid': m.id, 'nuevo_monto': tarifa * retrasos[m.id_prestamo]} for m in pendientes],
+            )
+            montos.update({m.id_prestamo: tarifa * retrasos[m.id_prestamo] for m in pendientes})
+        nuevas = [{'id_prestamo': p.id, 'monto': tarifa * retrasos[p.id], 'fecha_generacion': ahora, 'estado': 'Pendiente'}
+                  for p in tardios if p.id not in con_multa]
+        if nuevas:
+            db.session.execute(insert(Multa), nuevas)
+            montos.update({m['id_prestamo']: m['monto'] for m in nuevas})
+            stats.add_counter(stats.MULTAS_PENDIENTES, len(nuevas))
+            for p in tardios:
+                if p.id not in con_multa:
+                    stats.add_user_counter(p.id_usuario, stats.USUARIO_MULTAS_PENDIENTES, 1)
+
+    # Copias: en orden de libro para bloquear las filas siempre en el mismo orden
+    ejemplares = defaultdict(list)
+    for p in filas:
+        if p.libro_id is not None:
+            ejemplares[p.libro_id].append(p.ejemplar_id)
+    for libro_id in sorted(ejemplares):
+        reservas.devolver_copias(libro_id, ejemplares[libro_id], ahora)
+
+    activos = [p for p in filas if p.estado == 'Activo'] # 'Vencido' ya salió del contador global de activos
+    stats.add_counter(stats.PRESTAMOS_ACTIVOS, -len(activos))
+    for p in filas: # Por usuario, 'Vencido' sigue contando como préstamo sin devolver hasta ahora
+        stats.add_user_counter(p.id_usuario, stats.USUARIO_PRESTAMOS_ACTIVOS, -1)
+
+    resultados = []
+    for pos, e in enumerate(elementos):
+        if pos in errores:
+            message, status = errores[pos]
+            resultados.append({**e, 'estado': 'error', 'status': status, 'message': message})
+        else:
+            p = asignados[pos]
+            resultados.append({**e, 'estado': 'Devuelto', 'prestamoId': p.id, 'idUsuario': p.id_usuario,
+                               'diasRetraso': retrasos[p.id], 'multa': montos.get(p.id)})
+    return resultados
+
+
+def devolver_prestamos(elementos, id_usuario=None, ahora=None, chunk_size=RETURN_CHUNK_SIZE):
+    """Devuelve préstamos por id ({'prestamoId': 1}), por ejemplar ({'codigoBarras': '...'}) o por ISBN
+    ({'isbn': '...'}); una transacción por bloque.
+
+    Devuelve un resultado por elemento, en el mismo orden recibido.
+    """
+    ahora = ahora or datetime.utcnow()
+    tarifa = current_app.config['MULTA_TARIFA_DIARIA']
+    resultados = []
+    for start in range(0, len(elementos), chunk_size):
+        bloque = elementos[start:start + chunk_size]
+        for _ in range(3):
+            try:
+                resultados_bloque = _devolver_bloque(bloque, id_usuario, ahora, tarifa)
+                db.session.commit()
+                break
+            except LookupError:
+                db.session.rollback() # Se vuelven a leer los préstamos ya con lo que devolvió la otra petición
+            except Exception as e:
+                db.session.rollback()
+                resultados_bloque = [{**elemento, 'estado': 'error', 'status': 500, 'message': f"Error al guardar el bloque: {e}"}
+                                     for elemento in bloque]
+                break
+        else:
+            resultados_bloque = [{**elemento, 'estado': 'error', 'status': 409, 'message': "Conflicto con otra devolución; reintente"}
+                                 for elemento in bloque]
+        resultados.extend(resultados_bloque)
+    return resultados
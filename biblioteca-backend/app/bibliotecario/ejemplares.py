@@ -0,0 +1,251 @@
+# app/bibliotecario/ejemplares.py
+#
+# Inventario por copia física (ejemplar) con su código de barras y estado.
+#
+# Estados: 'Disponible' (en la estantería), 'Prestado', 'Apartado' (reservado para la primera reserva asignada de su
+# libro, ver reservas.py) y 'Baja'. Las copias apartadas no se atan a una reserva concreta: cada libro tiene tantas
+# como reservas 'Asignada', y la entrega toma cualquiera de ellas.
+#
+# Cada libro mantiene dos contadores en su propia fila, actualizados en la misma transacción que el estado de la copia:
+#   - Libro.cantidad: ejemplares 'Disponible' (la disponibilidad del catálogo y de la aprobación es una lectura
+#     por clave primaria);
+#   - Libro.total_ejemplares: ejemplares que no están de baja.
+# Los totales de la biblioteca salen de stats_counters (copias_disponibles, ejemplares_total), sin SUM sobre libro.
+#
+# Orden de bloqueo: primero la fila del libro (UPDATE de sus contadores) y después sus ejemplares, igual en la
+# aprobación, la baja y el alta; así dos operaciones sobre el mismo libro se esperan en lugar de cruzarse. Las filas
+# compartidas (stats_counters, catalogo_version) se actualizan al final, en el commit (hooks before_commit).
+# Las funciones no hacen commit.
+
+from datetime import datetime
+
+from sqlalchemy import bindparam, func, insert, select, update
+
+from app.models import db, Libro, Ejemplar, Prestamo
+from app.libros.cache import bump_catalog_version
+from app.utils import stats
+
+ESTADOS = ('Disponible', 'Prestado', 'Apartado', 'Baja')
+
+MAX_EJEMPLARES_POR_ALTA = 1000
+
+
+class EjemplarError(Exception):
+    """La operación sobre el inventario no se puede hacer; lleva el mensaje y el código HTTP a devolver."""
+
+    def __init__(self, message, status=409):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def codigo_barras(libro_id, numero):
+    """Código generado para el ejemplar número `numero` de un libro (el guion evita choques entre longitudes)."""
+    return f'{libro_id:07d}-{numero:03d}'
+
+
+def filas_ejemplares(libro_id, desde, cantidad, estado='Disponible', ahora=None):
+    """Filas para insertar en bloque `cantidad` ejemplares de un libro, numerados a partir de `desde`."""
+    ahora = ahora or datetime.utcnow()
+    return [{'libro_id': libro_id, 'codigo_barras': codigo_barras(libro_id, n), 'estado': estado, 'fecha_alta': ahora}
+            for n in range(desde, desde + cantidad)]
+
+
+def tomar_ejemplar(libro_id, de_estado, a_estado):
+    """Pasa una copia del libro de `de_estado` a `a_estado` y devuelve su id (None si no hay ninguna registrada)."""
+    for _ in range(3): # Solo se repite si otra transacción se llevó la misma copia (sin FOR UPDATE, p. ej. SQLite)
+        ejemplar_id = db.session.scalar(
+            select(Ejemplar.id)
+            .where(Ejemplar.libro_id == libro_id, Ejemplar.estado == de_estado)
+            .order_by(Ejemplar.id)
+            .limit(1)
+            .with_for_update()
+        )
+        if ejemplar_id is None:
+            return None
+        result = db.session.execute(
+            update(Ejemplar)
+            .where(Ejemplar.id == ejemplar_id, Ejemplar.estado == de_estado)
+            .values(estado=a_estado)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            return ejemplar_id
+    return None
+
+
+def ejemplares_en_estado(libro_id, estado, cantidad):
+    """Ids de `cantidad` copias del libro en ese estado, completados con None si hay menos registradas."""
+    ids = db.session.scalars(
+        select(Ejemplar.id)
+        .where(Ejemplar.libro_id == libro_id, Ejemplar.estado == estado)
+        .order_by(Ejemplar.id)
+        .limit(cantidad)
+        .with_for_update()
+    ).all()
+    return list(ids) + [None] * (cantidad - len(ids))
+
+
+def marcar_ejemplares(ids, estado):
+    ids = [i for i in ids if i is not None]
+    if ids:
+        db.session.execute(
+            update(Ejemplar)
+            .where(Ejemplar.id.in_(ids))
+            .values(estado=estado)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def alta_ejemplares(libro_id, cantidad=0, codigos=None, ahora=None):
+    """Da de alta copias nuevas de un libro (con los códigos dados o generados) y las libera.
+
+    Las copias nuevas atienden primero la cola de reservas del libro; el resto queda 'Disponible'. Devuelve las
+    filas insertadas ({'id', 'codigo_barras'}). Un código repetido lanza IntegrityError (el llamador deshace).
+    """
+    from app.bibliotecario.reservas import devolver_copias
+
+    codigos = list(codigos or [])
+    cantidad = len(codigos) or cantidad
+    if cantidad <= 0:
+        return []
+    ahora = ahora or datetime.utcnow()
+
+    # El UPDATE bloquea la fila del libro: la numeración de sus códigos no se cruza con otra alta simultánea
+    db.session.execute(
+        update(Libro)
+        .where(Libro.id == libro_id)
+        .values(total_ejemplares=Libro.total_ejemplares + cantidad)
+        .execution_options(synchronize_session=False)
+    )
+    existentes = db.session.scalar(select(func.count(Ejemplar.id)).where(Ejemplar.libro_id == libro_id))
+    filas = filas_ejemplares(libro_id, existentes + 1, cantidad, ahora=ahora)
+    for fila, codigo in zip(filas, codigos):
+        fila['codigo_barras'] = codigo
+    db.session.execute(insert(Ejemplar), filas)
+    nuevos = db.session.execute(
+        select(Ejemplar.id, Ejemplar.codigo_barras)
+        .where(Ejemplar.codigo_barras.in_([fila['codigo_barras'] for fila in filas]))
+        .order_by(Ejemplar.id)
+    ).all()
+    stats.add_counter(stats.EJEMPLARES_TOTAL, cantidad)
+    devolver_copias(libro_id, [e.id for e in nuevos], ahora)
+    bump_catalog_version() # Cambió el total de ejemplares que muestra el catálogo
+    return [{'id': e.id, 'codigo_barras': e.codigo_barras} for e in nuevos]
+
+
+def _baja(libro_id, ids, ahora):
+    """Da de baja copias 'Disponible' ya elegidas del libro. Lanza EjemplarError si alguna dejó de estarlo."""
+    result = db.session.execute(
+        update(Libro)
+        .where(Libro.id == libro_id, Libro.cantidad >= len(ids))
+        .values(cantidad=Libro.cantidad - len(ids), total_ejemplares=Libro.total_ejemplares - len(ids))
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        raise EjemplarError("El libro no tiene tantas copias disponibles.", 409)
+    result = db.session.execute(
+        update(Ejemplar)
+        .where(Ejemplar.id.in_(ids), Ejemplar.estado == 'Disponible')
+        .values(estado='Baja', fecha_baja=ahora)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(ids):
+        raise EjemplarError("El ejemplar no está disponible (prestado, apartado o ya dado de baja).", 409)
+    stats.add_counter(stats.COPIAS_DISPONIBLES, -len(ids))
+    stats.add_counter(stats.EJEMPLARES_TOTAL, -len(ids))
+    bump_catalog_version()
+
+
+def baja_ejemplar(ejemplar_id, ahora=None):
+    """Da de baja una copia concreta; solo si está 'Disponible'. Lanza EjemplarError (el llamador deshace)."""
+    ejemplar = db.session.get(Ejemplar, ejemplar_id)
+    if not ejemplar:
+        raise EjemplarError("Ejemplar no encontrado", 404)
+    if ejemplar.estado != 'Disponible':
+        raise EjemplarError("El ejemplar no está disponible (prestado, apartado o ya dado de baja).", 409)
+    _baja(ejemplar.libro_id, [ejemplar_id], ahora or datetime.utcnow())
+
+
+def baja_disponibles(libro_id, cantidad, ahora=None):
+    """Da de baja `cantidad` copias disponibles del libro (las más recientes). Lanza EjemplarError si no hay tantas."""
+    db.session.execute(select(Libro.id).where(Libro.id == libro_id).with_for_update()) # Primero el libro (ver arriba)
+    ids = db.session.scalars(
+        select(Ejemplar.id)
+        .where(Ejemplar.libro_id == libro_id, Ejemplar.estado == 'Disponible')
+        .order_by(Ejemplar.id.desc())
+        .limit(cantidad)
+        .with_for_update()
+    ).all()
+    if len(ids) < cantidad:
+        raise EjemplarError("El libro no tiene tantas copias disponibles.", 409)
+    _baja(libro_id, ids, ahora or datetime.utcnow())
+
+
+def crear_ejemplares_faltantes(batch_size=5000):
+    """Registra las copias de los datos que aún no las tienen (carga masiva, ver utils/seed.py). Sin commit.
+
+    - libros sin ningún ejemplar: `cantidad` copias 'Disponible';
+    - préstamos abiertos sin ejemplar: una copia 'Prestado' enlazada al préstamo.
+    Ajusta Libro.total_ejemplares pero no stats_counters: recalcularlos después (recompute_counters).
+    """
+    creados = 0
+    ultimo_id = 0
+    while True:
+        libros = db.session.execute(
+            select(Libro.id, Libro.cantidad)
+            .where(Libro.id > ultimo_id, Libro.total_ejemplares == 0)
+            .order_by(Libro.id)
+            .limit(batch_size)
+        ).all()
+        if not libros:
+            break
+        ultimo_id = libros[-1].id
+        filas = [fila for libro in libros if libro.cantidad for fila in filas_ejemplares(libro.id, 1, libro.cantidad)]
+        if filas:
+            db.session.execute(insert(Ejemplar), filas)
+            db.session.execute(
+                update(Libro)
+                .where(Libro.id.in_([libro.id for libro in libros if libro.cantidad]))
+                .values(total_ejemplares=Libro.cantidad)
+                .execution_options(synchronize_session=False)
+            )
+            creados += len(filas)
+
+    while True:
+        prestamos = db.session.execute(
+            select(Prestamo.id, Prestamo.libro_id)
+            .where(Prestamo.ejemplar_id.is_(None), Prestamo.libro_id.isnot(None), Prestamo.estado.in_(('Activo', 'Vencido')))
+            .order_by(Prestamo.id)
+            .limit(batch_size)
+        ).all()
+        if not prestamos:
+            break
+        # Numeración a continuación de las copias que ya tiene cada libro
+        por_libro = {}
+        for p in prestamos:
+            por_libro.setdefault(p.libro_id, []).append(p.id)
+        existentes = dict(db.session.execute(
+            select(Ejemplar.libro_id, func.count(Ejemplar.id))
+            .where(Ejemplar.libro_id.in_(por_libro))
+            .group_by(Ejemplar.libro_id)
+        ).all())
+        filas, enlaces = [], []
+        for libro_id, prestamo_ids in por_libro.items():
+            nuevas = filas_ejemplares(libro_id, existentes.get(libro_id, 0) + 1, len(prestamo_ids), estado='Prestado')
+            filas.extend(nuevas)
+            enlaces.extend(zip(prestamo_ids, (fila['codigo_barras'] for fila in nuevas)))
+        db.session.execute(insert(Ejemplar), filas)
+        ids = dict(db.session.execute(
+            select(Ejemplar.codigo_barras, Ejemplar.id).where(Ejemplar.codigo_barras.in_([fila['codigo_barras'] for fila in filas]))
+        ).all())
+        db.session.execute(
+            update(Prestamo.__table__).where(Prestamo.id == bindparam('pid')).values(ejemplar_id=bindparam('eid')),
+            [{'pid': prestamo_id, 'eid': ids[codigo]} for prestamo_id, codigo in enlaces],
+        )
+        db.session.execute(
+            update(Libro.__table__).where(Libro.id == bindparam('lid')).values(total_ejemplares=Libro.total_ejemplares + bindparam('n')),
+            [{'lid': libro_id, 'n': len(prestamo_ids)} for libro_id, prestamo_ids in por_libro.items()],
+        )
+        creados += len(filas)
+    return creados
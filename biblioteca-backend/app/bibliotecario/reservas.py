@@ -0,0 +1,278 @@
+# app/bibliotecario/reservas.py
+#
+# Cola de reservas (holds) por libro.
+#
+# Cuando un libro no tiene copias (cantidad = 0) el lector puede ponerse en su cola. La cola es FIFO por id en la
+# tabla reserva, con índice (libro_id, estado, id):
+#   - Al volver una copia (devolver_copias) se asignan las cabezas de la cola: un SELECT ... LIMIT n sobre ese
+#     índice (bloqueado con FOR UPDATE para que dos devoluciones simultáneas no se den la misma reserva) y un
+#     UPDATE condicional WHERE estado = 'En espera'. Lee solo las n reservas asignadas, así que el coste no depende
+#     de cuántas personas haya en la cola. Las copias asignadas quedan 'Apartado' (ver ejemplares.py); las que
+#     nadie espera vuelven a 'Disponible' y a Libro.cantidad.
+#   - Una reserva asignada queda apartada HOLD_PICKUP_DAYS días; el bibliotecario la entrega como préstamo
+#     (entregar_reserva) o, si nadie la recoge, expirar_reservas la marca 'Expirada' por lotes (índice
+#     (estado, expira)) y pasa la copia a la siguiente de la cola.
+# Todas las funciones trabajan en la transacción actual; las que terminan una operación completa hacen commit.
+
+import threading
+import time as time_module
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.models import db, Libro, Reserva, Solicitud, Prestamo
+from app.libros.cache import bump_catalog_version
+from app.bibliotecario.circulacion import DIAS_PRESTAMO
+from app.bibliotecario.ejemplares import ejemplares_en_estado, marcar_ejemplares, tomar_ejemplar
+from app.utils import stats
+
+ESTADOS_ACTIVOS = ('En espera', 'Asignada')
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class ReservaError(Exception):
+    """La operación sobre la reserva no se puede hacer; lleva el mensaje y el código HTTP a devolver."""
+
+    def __init__(self, message, status=409):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def asignar_copias(libro_id, copias, ahora=None):
+    """Asigna hasta 'copias' copias a las primeras reservas 'En espera' del libro. Devuelve cuántas asignó."""
+    ahora = ahora or datetime.utcnow()
+    expira = ahora + timedelta(days=current_app.config['HOLD_PICKUP_DAYS'])
+    asignadas = 0
+    for _ in range(3): # Solo se repite si otra transacción se llevó alguna cabeza (sin FOR UPDATE, p. ej. SQLite)
+        if asignadas >= copias:
+            break
+        ids = db.session.scalars(
+            select(Reserva.id)
+            .where(Reserva.libro_id == libro_id, Reserva.estado == 'En espera')
+            .order_by(Reserva.id)
+            .limit(copias - asignadas)
+            .with_for_update()
+        ).all()
+        if not ids:
+            break
+        asignadas += db.session.execute(
+            update(Reserva)
+            .where(Reserva.id.in_(ids), Reserva.estado == 'En espera')
+            .values(estado='Asignada', fecha_asignacion=ahora, expira=expira)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+    return asignadas
+
+
+def devolver_copias(libro_id, ejemplares, ahora=None):
+    """Copias del libro que vuelven a estar libres (ids de Ejemplar; None si la copia no está registrada).
+
+    Primero se asignan a la cola (quedan 'Apartado'); el resto pasa a 'Disponible' y suma a Libro.cantidad.
+    Devuelve cuántas se asignaron a reservas. No hace commit.
+    """
+    copias = len(ejemplares)
+    asignadas = asignar_copias(libro_id, copias, ahora)
+    libres = copias - asignadas
+    marcar_ejemplares(ejemplares[:asignadas], 'Apartado')
+    if libres:
+        db.session.execute(
+            update(Libro)
+            .where(Libro.id == libro_id)
+            .values(cantidad=Libro.cantidad + libres)
+            .execution_options(synchronize_session=False)
+        )
+        marcar_ejemplares(ejemplares[asignadas:], 'Disponible')
+        stats.add_counter(stats.COPIAS_DISPONIBLES, libres)
+        bump_catalog_version() # Cambió la cantidad disponible que muestra el catálogo
+    return asignadas
+
+
+def crear_reserva(id_usuario, libro_id):
+    """Pone al lector en la cola del libro y hace commit. Lanza ReservaError si no procede."""
+    libro = db.session.get(Libro, libro_id)
+    if not libro:
+        raise ReservaError("Libro no encontrado", 404)
+    if (libro.cantidad or 0) > 0:
+        raise ReservaError("El libro tiene copias disponibles: solicita el préstamo directamente.", 409)
+
+    reserva = Reserva(libro_id=libro_id, id_usuario=id_usuario, estado='En espera', fecha_reserva=datetime.utcnow())
+    try:
+        with db.session.begin_nested():
+            db.session.add(reserva)
+    except IntegrityError:
+        db.session.rollback()
+        raise ReservaError("Ya tienes una reserva activa para este libro.", 409)
+    stats.add_user_counter(id_usuario, stats.USUARIO_RESERVAS_ACTIVAS, 1)
+    db.session.commit()
+    return reserva
+
+
+def cancelar_reserva(reserva_id, id_usuario):
+    """El lector cancela su reserva (en espera o asignada) y hace commit; una copia apartada pasa a la cola."""
+    reserva = db.session.get(Reserva, reserva_id)
+    if not reserva or reserva.id_usuario != id_usuario:
+        raise ReservaError("Reserva no encontrada", 404)
+    if reserva.estado not in ESTADOS_ACTIVOS:
+        raise ReservaError("La reserva ya no está activa", 400)
+
+    estado_anterior = reserva.estado
+    result = db.session.execute(
+        update(Reserva)
+        .where(Reserva.id == reserva_id, Reserva.estado == estado_anterior)
+        .values(estado='Cancelada', activa=None)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.session.rollback()
+        raise ReservaError("La reserva cambió de estado; vuelve a intentarlo.", 409)
+    if estado_anterior == 'Asignada':
+        devolver_copias(reserva.libro_id, ejemplares_en_estado(reserva.libro_id, 'Apartado', 1))
+    stats.add_user_counter(id_usuario, stats.USUARIO_RESERVAS_ACTIVAS, -1)
+    db.session.commit()
+
+
+def entregar_reserva(reserva_id, ahora=None):
+    """Entrega al lector la copia apartada: crea la solicitud aprobada y su préstamo y hace commit.
+
+    Devuelve el id del préstamo. La copia ya se descontó al asignarla, así que Libro.cantidad no cambia.
+    """
+    ahora = ahora or datetime.utcnow()
+    reserva = db.session.get(Reserva, reserva_id)
+    if not reserva:
+        raise ReservaError("Reserva no encontrada", 404)
+    if reserva.estado != 'Asignada':
+        raise ReservaError("La reserva no tiene una copia asignada", 400)
+
+    result = db.session.execute(
+        update(Reserva)
+        .where(Reserva.id == reserva_id, Reserva.estado == 'Asignada', Reserva.expira >= ahora)
+        .values(estado='Completada', activa=None)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.session.rollback()
+        raise ReservaError("La reserva expiró o cambió de estado.", 409)
+
+    ejemplar_id = tomar_ejemplar(reserva.libro_id, 'Apartado', 'Prestado')
+    solicitud = Solicitud(id_usuario_lector=reserva.id_usuario, fecha_solicitud=ahora, estado='Aprobada')
+    solicitud.libros.append(reserva.libro)
+    db.session.add(solicitud)
+    db.session.flush()
+    prestamo_id = db.session.execute(insert(Prestamo).values(
+        id_solicitud=solicitud.id,
+        id_usuario=reserva.id_usuario,
+        libro_id=reserva.libro_id,
+        ejemplar_id=ejemplar_id,
+        fecha_inicio=ahora,
+        fecha_devolucion_limite=ahora + timedelta(days=DIAS_PRESTAMO),
+        estado='Activo',
+    )).inserted_primary_key[0]
+
+    stats.add_counter(stats.PRESTAMOS_ACTIVOS, 1)
+    stats.add_user_counter(reserva.id_usuario, stats.USUARIO_RESERVAS_ACTIVAS, -1)
+    stats.add_user_counter(reserva.id_usuario, stats.USUARIO_PRESTAMOS_ACTIVOS, 1)
+    stats.add_user_counter(reserva.id_usuario, stats.USUARIO_PRESTAMOS_TOTAL, 1)
+    db.session.commit()
+    return prestamo_id
+
+
+def expirar_reservas(ahora, batch_size=DEFAULT_BATCH_SIZE):
+    """Expira por lotes las reservas asignadas sin recoger y reasigna sus copias. Devuelve (expiradas, reasignadas)."""
+    total_expiradas = total_reasignadas = 0
+    while True:
+        filas = db.session.execute(
+            select(Reserva.id, Reserva.libro_id, Reserva.id_usuario)
+            .where(Reserva.estado == 'Asignada', Reserva.expira < ahora)
+            .order_by(Reserva.expira, Reserva.id)
+            .limit(batch_size)
+            .with_for_update()
+        ).all()
+        if not filas:
+            break
+
+        expiradas = db.session.execute(
+            update(Reserva)
+            .where(Reserva.id.in_([fila.id for fila in filas]), Reserva.estado == 'Asignada')
+            .values(estado='Expirada', activa=None)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if expiradas != len(filas):
+            db.session.rollback() # Alguna se entregó o canceló a la vez: se vuelve a leer el lote
+            continue
+
+        # Copias liberadas por libro, en orden de id para bloquear las filas siempre en el mismo orden
+        for libro_id, copias in sorted(Counter(fila.libro_id for fila in filas).items()):
+            total_reasignadas += devolver_copias(libro_id, ejemplares_en_estado(libro_id, 'Apartado', copias), ahora)
+        for fila in filas:
+            stats.add_user_counter(fila.id_usuario, stats.USUARIO_RESERVAS_ACTIVAS, -1)
+        db.session.commit()
+        total_expiradas += expiradas
+    return total_expiradas, total_reasignadas
+
+
+def run_hold_expiry(ahora=None, batch_size=None):
+    """Ejecuta la expiración completa y devuelve un resumen."""
+    inicio = time_module.perf_counter()
+    ahora = ahora or datetime.utcnow()
+    batch_size = batch_size or current_app.config['HOLD_EXPIRY_BATCH_SIZE']
+
+    expiradas, reasignadas = expirar_reservas(ahora, batch_size)
+    return {
+        'reservasExpiradas': expiradas,
+        'copiasReasignadas': reasignadas,
+        'segundos': round(time_module.perf_counter() - inicio, 3),
+    }
+
+
+def liberar_reservas(libro_id=None, id_usuario=None):
+    """Borra las reservas de un libro o de un usuario que se va a eliminar (sin commit).
+
+    Las copias apartadas para un usuario eliminado pasan a la cola de su libro.
+    """
+    condicion = Reserva.libro_id == libro_id if libro_id is not None else Reserva.id_usuario == id_usuario
+    activas = db.session.execute(
+        select(Reserva.libro_id, Reserva.id_usuario, Reserva.estado)
+        .where(condicion, Reserva.estado.in_(ESTADOS_ACTIVOS))
+    ).all()
+    db.session.execute(Reserva.__table__.delete().where(condicion))
+    if libro_id is not None:
+        for fila in activas:
+            stats.add_user_counter(fila.id_usuario, stats.USUARIO_RESERVAS_ACTIVAS, -1)
+    else: # Los contadores del usuario eliminado se borran con él
+        asignadas = Counter(fila.libro_id for fila in activas if fila.estado == 'Asignada')
+        for otro_libro_id, copias in sorted(asignadas.items()):
+            devolver_copias(otro_libro_id, ejemplares_en_estado(otro_libro_id, 'Apartado', copias))
+
+
+def _scheduler_loop(app, interval):
+    while True:
+        time_module.sleep(interval)
+        with app.app_context():
+            try:
+                resumen = run_hold_expiry()
+                app.logger.info("Expiración de reservas: %s", resumen)
+            except Exception:
+                db.session.rollback()
+                app.logger.exception("Error al expirar reservas")
+            finally:
+                db.session.remove()
+
+
+def init_hold_queue(app):
+    """Configura la cola de reservas y, si HOLD_EXPIRY_INTERVAL > 0, arranca la expiración en un hilo del proceso.
+
+    Igual que el escáner de vencimientos, con varios workers conviene activarlo solo en uno (o usar
+    'flask bibliotecario reservas-expirar' desde cron); ejecutarlo en paralelo no duplica nada.
+    """
+    app.config.setdefault('HOLD_PICKUP_DAYS', 3) # Días para recoger una copia apartada
+    app.config.setdefault('HOLD_EXPIRY_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    app.config.setdefault('HOLD_EXPIRY_INTERVAL', 0) # Segundos; 0 = desactivado
+    interval = app.config['HOLD_EXPIRY_INTERVAL']
+    if interval and interval > 0:
+        hilo = threading.Thread(target=_scheduler_loop, args=(app, interval), name='hold-expiry', daemon=True)
+        hilo.start()
@@ -1,64 +1,53 @@
 # app/bibliotecario/routes.py
 
 from flask import Blueprint, jsonify, request
-from app.models import db, Usuario, Rol, Prestamo, Multa, Libro, Solicitud # Asegúrate de importar todos los modelos necesarios
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import func
-from datetime import datetime, timedelta # Importar datetime y timedelta
+from app.models import db, Prestamo, Multa, Solicitud, Reserva # Asegúrate de importar todos los modelos necesarios
+from flask_jwt_extended import jwt_required
+from sqlalchemy import update
+from sqlalchemy.orm import joinedload, selectinload # Carga anticipada de relaciones (evita el N+1)
+from datetime import datetime # Importar datetime
 import traceback # Para imprimir el traceback completo en caso de errores
+from app.auth.decorators import require_role # Autorización por rol a partir del claim del JWT
+from app.utils import stats # Contadores agregados de los paneles
+from app.utils.stats import read_counters
+from app.utils.streaming import wants_stream, iter_keyset, ndjson_response
+from app.bibliotecario import circulacion # Aprobación atómica de solicitudes
+from app.bibliotecario.vencimientos import run_overdue_scan
+from app.bibliotecario import reservas # Cola de reservas por libro
+from app.bibliotecario.devoluciones import devolver_prestamos
+import click # Opciones de los comandos CLI del blueprint
 
-bibliotecario_bp = Blueprint('bibliotecario_bp', __name__, url_prefix='/api/v1/bibliotecario')
-
-# --- FUNCIÓN DE AYUDA PARA VERIFICAR ROL DE BIBLIOTECARIO ---
-# Esta función verifica si el usuario autenticado tiene el rol de "Bibliotecario".
-def check_bibliotecario():
-    user_id_str = get_jwt_identity() # Obtiene la identidad del usuario del token JWT (que es un string)
-    try:
-        user_id_int = int(user_id_str) # Intenta convertir la identidad a INT para buscar en la BD
-    except (ValueError, TypeError):
-        print("DEBUG: check_bibliotecario - ID de usuario inválido en token.")
-        return False
-    
-    user = db.session.get(Usuario, user_id_int) # Busca el usuario por ID en la base de datos
-    
-    # Comprueba si el usuario existe y si su rol es "Bibliotecario"
-    # Se usa hasattr para verificar si los atributos 'rol' y 'nombre' existen antes de acceder a ellos.
-    if not user or not hasattr(user, 'rol') or not hasattr(user.rol, 'nombre') or user.rol.nombre != 'Bibliotecario':
-        rol_db = user.rol.nombre if user and hasattr(user, 'rol') and hasattr(user.rol, 'nombre') else 'N/A'
-        print(f"DEBUG: Acceso denegado en check_bibliotecario. User ID: {user_id_int}, Rol DB: {rol_db}. Rol requerido: Bibliotecario.")
-        return False
-    print(f"DEBUG: Acceso permitido en check_bibliotecario. User ID: {user_id_int}, Rol DB: {user.rol.nombre}.")
-    return True
+bibliotecario_bp = Blueprint('bibliotecario_bp', __name__, url_prefix='/api/v1/bibliotecario', cli_group='bibliotecario')
 
 # --- ENDPOINT: RESUMEN DEL PANEL DE BIBLIOTECARIO ---
 # Devuelve estadísticas generales para el dashboard del bibliotecario.
-@bibliotecario_bp.route('/panel/summary', methods=['GET'])
-@jwt_required() # Requiere un token JWT válido
-def get_bibliotecario_summary():
-    if not check_bibliotecario():
-        return jsonify({"message": "Acceso restringido a bibliotecarios"}), 403
-    
-    try:
-        # Préstamos Pendientes de Autorización (Solicitudes con estado 'Pendiente')
-        prestamos_pendientes_autorizacion = Solicitud.query.filter_by(estado='Pendiente').count()
+# Todos los valores salen de stats_counters en una sola consulta (sin COUNT ni SUM sobre las tablas)
+PANEL_COUNTERS = [
+    stats.SOLICITUDES_PENDIENTES, # Préstamos Pendientes de Autorización (Solicitudes 'Pendiente')
+    stats.MULTAS_PENDIENTES,      # Multas Activas (Multas 'Pendiente')
+    stats.LIBROS_TOTAL,           # Libros en Catálogo
+    stats.COPIAS_DISPONIBLES,     # Copias Disponibles (ejemplares 'Disponible')
+    stats.EJEMPLARES_TOTAL,       # Ejemplares en inventario (sin los dados de baja)
+]
 
-        # Multas Activas (Multas con estado 'Pendiente')
-        multas_activas = Multa.query.filter_by(estado='Pendiente').count()
 
-        # Libros en Catálogo (Total de entradas en la tabla Libro)
-        libros_en_catalogo = Libro.query.count()
+def panel_summary(c):
+    """Cuerpo del resumen a partir de los contadores de PANEL_COUNTERS (compartido con app/aio/routes.py)."""
+    return {
+        "prestamosPendientes": c[stats.SOLICITUDES_PENDIENTES],
+        "multasActivas": c[stats.MULTAS_PENDIENTES],
+        "librosEnCatalogo": c[stats.LIBROS_TOTAL],
+        "copiasDisponibles": c[stats.COPIAS_DISPONIBLES],
+        "totalEjemplares": c[stats.EJEMPLARES_TOTAL],
+    }
 
-        # Copias Disponibles (Suma de la 'cantidad' de todos los libros)
-        copias_disponibles = db.session.query(func.sum(Libro.cantidad)).scalar() or 0
-        
-        summary_data = {
-            "prestamosPendientes": prestamos_pendientes_autorizacion,
-            "multasActivas": multas_activas,
-            "librosEnCatalogo": libros_en_catalogo,
-            "copiasDisponibles": copias_disponibles,
-        }
 
-        return jsonify(summary_data), 200
+@bibliotecario_bp.route('/panel/summary', methods=['GET'])
+@jwt_required() # Requiere un token JWT válido
+@require_role('Bibliotecario')
+def get_bibliotecario_summary():
+    try:
+        return jsonify(panel_summary(read_counters(PANEL_COUNTERS))), 200
 
     except Exception as e:
         db.session.rollback() # Deshacer cualquier cambio pendiente en la sesión de la base de datos
@@ -66,43 +55,46 @@ def get_bibliotecario_summary():
         traceback.print_exc()
         return jsonify({"message": "Error al obtener el resumen del panel del bibliotecario", "error": str(e)}), 500
 
+# --- FUNCIÓN DE AYUDA PARA SERIALIZAR UNA SOLICITUD PENDIENTE ---
+# Espera 'lector' y 'libros' ya cargados (joinedload/selectinload) para no disparar consultas por fila.
+def serialize_solicitud(sol):
+    lector_data = {
+        "id": sol.lector.id,
+        "nombre": f"{sol.lector.nombre} {sol.lector.apellido_paterno}".strip(),
+        "email": sol.lector.email,
+    } if sol.lector else None
+
+    libros_solicitados = [{
+        "id": libro_sol.id,
+        "nombre": libro_sol.nombre,
+        "isbn": libro_sol.isbn,
+    } for libro_sol in sol.libros]
+
+    return {
+        "id": sol.id,
+        "usuario": lector_data,
+        "fechaSolicitud": sol.fecha_solicitud,
+        "estado": sol.estado,
+        "libros": libros_solicitados
+    }
+
 # --- ENDPOINT: PRÉSTAMOS PENDIENTES DE AUTORIZACIÓN ---
 # Devuelve una lista de solicitudes de préstamo que están pendientes de aprobación.
+# Las solicitudes se leen por lotes keyset con su lector y sus libros precargados (consultas constantes por lote).
+# Con ?stream=1 (o Accept: application/x-ndjson) se envían en NDJSON a medida que se leen.
 @bibliotecario_bp.route('/prestamos-pendientes', methods=['GET'])
 @jwt_required()
+@require_role('Bibliotecario')
 def get_pending_loans():
-    if not check_bibliotecario():
-        return jsonify({"message": "Acceso restringido a bibliotecarios"}), 403
-
     try:
-        solicitudes = Solicitud.query.filter_by(estado='Pendiente').all()
-        
-        resultado = []
-        for sol in solicitudes:
-            # Asegúrate de que sol.lector exista antes de acceder a sus atributos
-            lector_data = {
-                "id": sol.lector.id if sol.lector else None,
-                "nombre": f"{sol.lector.nombre} {sol.lector.apellido_paterno}".strip() if sol.lector else "Desconocido",
-                "email": sol.lector.email if sol.lector else "Desconocido",
-            } if sol.lector else None
-
-            libros_solicitados = []
-            if hasattr(sol, 'libros') and sol.libros:
-                for libro_sol in sol.libros:
-                    libros_solicitados.append({
-                        "id": libro_sol.id,
-                        "nombre": libro_sol.nombre,
-                        "isbn": libro_sol.isbn,
-                    })
-            
-            resultado.append({
-                "id": sol.id,
-                "usuario": lector_data,
-                "fechaSolicitud": sol.fecha_solicitud.isoformat() if sol.fecha_solicitud else None,
-                "estado": sol.estado,
-                "libros": libros_solicitados
-            })
-        
+        query = (Solicitud.query.filter_by(estado='Pendiente')
+                 .options(joinedload(Solicitud.lector), selectinload(Solicitud.libros)))
+        solicitudes = iter_keyset(query, Solicitud.id, Solicitud.id, lambda sol: [sol.id])
+
+        if wants_stream():
+            return ndjson_response((serialize_solicitud(sol) for sol in solicitudes), 'get_pending_loans')
+
+        resultado = [serialize_solicitud(sol) for sol in solicitudes]
         return jsonify(resultado), 200
 
     except Exception as e:
@@ -114,55 +106,16 @@ def get_pending_loans():
 # --- ENDPOINT: APROBAR SOLICITUD DE PRÉSTAMO (POST) ---
 # Este endpoint permite a un bibliotecario aprobar una solicitud de préstamo pendiente.
 # Implica actualizar el estado de la Solicitud y crear una entrada en la tabla Prestamo.
+# La lógica (segura ante aprobaciones concurrentes) vive en app/bibliotecario/circulacion.py.
 @bibliotecario_bp.route('/solicitudes/<int:solicitud_id>/aprobar', methods=['POST'])
 @jwt_required()
+@require_role('Bibliotecario')
 def aprobar_solicitud(solicitud_id):
-    if not check_bibliotecario():
-        return jsonify({"message": "Acceso restringido a bibliotecarios"}), 403
-    
     try:
-        solicitud = db.session.get(Solicitud, solicitud_id)
-        if not solicitud:
-            return jsonify({"message": "Solicitud no encontrada"}), 404
-        if solicitud.estado != 'Pendiente':
-            return jsonify({"message": "La solicitud no está en estado pendiente"}), 400
-        
-        # Lógica para verificar disponibilidad de copias
-        if not solicitud.libros or len(solicitud.libros) == 0:
-            return jsonify({"message": "La solicitud no tiene libros asociados."}), 400
-        
-        for libro_solicitado_en_solicitud in solicitud.libros:
-            if libro_solicitado_en_solicitud.cantidad <= 0:
-                return jsonify({"message": f"Libro '{libro_solicitado_en_solicitud.nombre}' no tiene copias disponibles."}), 409 # Conflict si no hay copias
-
-        # Actualizar el estado de la Solicitud
-        solicitud.estado = 'Aprobada'
-
-        # Crear una entrada en la tabla Prestamo por CADA libro solicitado
-        fecha_inicio_prestamo = datetime.utcnow()
-        # Regla de negocio: fecha_devolucion_limite a 15 días (RN-02)
-        fecha_devolucion_limite_prestamo = fecha_inicio_prestamo + timedelta(days=15)
-        
-        for libro_a_prestar in solicitud.libros:
-            # Crear el objeto Prestamo
-            nuevo_prestamo = Prestamo(
-                id_solicitud=solicitud.id, # Vincula el préstamo a la solicitud
-                id_usuario=solicitud.id_usuario_lector, # El usuario que hizo la solicitud
-                fecha_inicio=fecha_inicio_prestamo,
-                fecha_devolucion_limite=fecha_devolucion_limite_prestamo,
-                estado='Activo' # El préstamo se inicia como activo
-            )
-            db.session.add(nuevo_prestamo)
-            
-            # Disminuir la cantidad de copias disponibles del libro en el catálogo
-            libro_a_prestar.cantidad -= 1
-            # Asegurar que la cantidad no sea negativa
-            if libro_a_prestar.cantidad < 0:
-                libro_a_prestar.cantidad = 0
-
-        db.session.commit() # Guardar todos los cambios en la base de datos
-
+        circulacion.aprobar_solicitud(solicitud_id)
         return jsonify({"message": "Solicitud aprobada y préstamo(s) creado(s) exitosamente"}), 200
+    except circulacion.AprobacionError as e:
+        return jsonify({"message": e.message}), e.status
     except Exception as e:
         db.session.rollback()
         print(f"ERROR EN aprobar_solicitud: {e}")
@@ -170,22 +123,59 @@ def aprobar_solicitud(solicitud_id):
         return jsonify({"message": "Error al aprobar solicitud", "error": str(e)}), 500
 
 
+# --- ENDPOINT: APROBACIÓN MASIVA DE SOLICITUDES (POST) ---
+# Cuerpo: {"ids": [1, 2, 3, ...]}. Aprueba en bloques de 100 (una transacción por bloque) y devuelve el
+# resultado de cada solicitud; una solicitud sin copias no impide aprobar las demás del bloque.
+@bibliotecario_bp.route('/solicitudes/aprobar', methods=['POST'])
+@jwt_required()
+@require_role('Bibliotecario')
+def aprobar_solicitudes():
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, int) for i in ids):
+        return jsonify({"message": "El campo 'ids' debe ser una lista de IDs de solicitud"}), 400
+    if len(ids) > 5000:
+        return jsonify({"message": "No se pueden aprobar más de 5000 solicitudes por petición"}), 400
+
+    try:
+        resultados = circulacion.aprobar_solicitudes(ids)
+        aprobadas = sum(1 for r in resultados if r['estado'] == 'Aprobada')
+        return jsonify({
+            "aprobadas": aprobadas,
+            "fallidas": len(resultados) - aprobadas,
+            "resultados": resultados,
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR EN aprobar_solicitudes: {e}")
+        traceback.print_exc()
+        return jsonify({"message": "Error al aprobar solicitudes", "error": str(e)}), 500
+
+
 # --- ENDPOINT: RECHAZAR SOLICITUD DE PRÉSTAMO (POST) ---
 # Este endpoint permite a un bibliotecario rechazar una solicitud de préstamo pendiente.
 @bibliotecario_bp.route('/solicitudes/<int:solicitud_id>/rechazar', methods=['POST'])
 @jwt_required()
+@require_role('Bibliotecario')
 def rechazar_solicitud(solicitud_id):
-    if not check_bibliotecario():
-        return jsonify({"message": "Acceso restringido a bibliotecarios"}), 403
-    
     try:
         solicitud = db.session.get(Solicitud, solicitud_id)
         if not solicitud:
             return jsonify({"message": "Solicitud no encontrada"}), 404
-        if solicitud.estado != 'Pendiente':
+
+        # Transición condicional, como en la aprobación (circulacion.py): si una aprobación concurrente ganó, no
+        # se sobrescribe y los contadores no se descuentan dos veces
+        result = db.session.execute(
+            update(Solicitud)
+            .where(Solicitud.id == solicitud_id, Solicitud.estado == 'Pendiente')
+            .values(estado='Rechazada')
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            db.session.rollback()
             return jsonify({"message": "La solicitud no está en estado pendiente"}), 400
-        
-        solicitud.estado = 'Rechazada' # Simplemente cambia el estado a 'Rechazada'
+        stats.add_counter(stats.SOLICITUDES_PENDIENTES, -1)
+        stats.add_user_counter(solicitud.id_usuario_lector, stats.USUARIO_SOLICITUDES_PENDIENTES, -1)
         db.session.commit()
         return jsonify({"message": "Solicitud rechazada exitosamente"}), 200
     except Exception as e:
@@ -195,57 +185,64 @@ def rechazar_solicitud(solicitud_id):
         return jsonify({"message": "Error al rechazar solicitud", "error": str(e)}), 500
 
 
+# --- FUNCIÓN DE AYUDA PARA SERIALIZAR UNA MULTA ---
+# Espera el préstamo, su usuario y los libros de la solicitud ya cargados (ver get_active_fines).
+def serialize_multa(multa):
+    prestamo = multa.prestamo_origen # nombre del backref en models.py
+
+    user_data = None
+    book_data = None
+
+    if prestamo:
+        if prestamo.usuario_prestamo: # backref en models.py
+            user_data = {
+                "id": prestamo.usuario_prestamo.id,
+                "nombre": f"{prestamo.usuario_prestamo.nombre} {prestamo.usuario_prestamo.apellido_paterno}".strip(),
+                "email": prestamo.usuario_prestamo.email
+            }
+        # Si un préstamo puede tener múltiples libros, o si un libro es el "principal"
+        # Esta parte podría necesitar más lógica si un préstamo no tiene un solo libro claro.
+        if prestamo.solicitud_origen and prestamo.solicitud_origen.libros:
+            # Asumiendo el primer libro de la solicitud si hay varios, o ajusta la lógica
+            main_book = prestamo.solicitud_origen.libros[0]
+            book_data = {
+                "id": main_book.id,
+                "nombre": main_book.nombre,
+                "isbn": main_book.isbn
+            }
+
+    return {
+        "id": multa.id,
+        "monto": multa.monto,
+        "fechaGeneracion": multa.fecha_generacion,
+        "estado": multa.estado,
+        "usuario": user_data,
+        "libro": book_data,
+        "idPrestamo": multa.id_prestamo,
+        # Calcula 'diasRetraso' en el frontend o aquí si tienes la fecha de devolución real/limite
+        # Para calcular diasRetraso aquí: (datetime.utcnow() - prestamo.fecha_devolucion_limite).days
+    }
+
 # --- ENDPOINT: GESTIÓN DE MULTAS (Listar Multas Activas/Pendientes para Bibliotecario) ---
 # Este endpoint listará las multas que el bibliotecario necesita gestionar.
+# Las multas se leen por lotes keyset con préstamo, usuario y libros precargados (consultas constantes por lote).
+# Con ?stream=1 (o Accept: application/x-ndjson) se envían en NDJSON a medida que se leen.
 @bibliotecario_bp.route('/multas', methods=['GET'])
 @jwt_required()
+@require_role('Bibliotecario')
 def get_active_fines():
-    if not check_bibliotecario():
-        return jsonify({"message": "Acceso restringido a bibliotecarios"}), 403
-    
     try:
         # Obtener todas las multas que están 'Pendiente'
-        multas = Multa.query.filter_by(estado='Pendiente').all()
-        
-        resultado = []
-        for multa in multas:
-            # Necesitamos obtener información del usuario y del libro asociado a la multa
-            # Se asume que Multa tiene una relación con Prestamo, y Prestamo con Usuario/Libro
-            prestamo = multa.prestamo_origen # nombre del backref en models.py
-            
-            user_data = None
-            book_data = None
-            
-            if prestamo:
-                if hasattr(prestamo, 'usuario_prestamo') and prestamo.usuario_prestamo: # backref en models.py
-                    user_data = {
-                        "id": prestamo.usuario_prestamo.id,
-                        "nombre": f"{prestamo.usuario_prestamo.nombre} {prestamo.usuario_prestamo.apellido_paterno}".strip(),
-                        "email": prestamo.usuario_prestamo.email
-                    }
-                # Si un préstamo puede tener múltiples libros, o si un libro es el "principal"
-                # Esta parte podría necesitar más lógica si un préstamo no tiene un solo libro claro.
-                if hasattr(prestamo.solicitud_origen, 'libros') and prestamo.solicitud_origen.libros:
-                    # Asumiendo el primer libro de la solicitud si hay varios, o ajusta la lógica
-                    main_book = prestamo.solicitud_origen.libros[0] 
-                    book_data = {
-                        "id": main_book.id,
-                        "nombre": main_book.nombre,
-                        "isbn": main_book.isbn
-                    }
-            
-            resultado.append({
-                "id": multa.id,
-                "monto": multa.monto,
-                "fechaGeneracion": multa.fecha_generacion.isoformat() if multa.fecha_generacion else None,
-                "estado": multa.estado,
-                "usuario": user_data,
-                "libro": book_data,
-                "idPrestamo": multa.id_prestamo,
-                # Calcula 'diasRetraso' en el frontend o aquí si tienes la fecha de devolución real/limite
-                # Para calcular diasRetraso aquí: (datetime.utcnow() - prestamo.fecha_devolucion_limite).days
-            })
-        
+        prestamo = joinedload(Multa.prestamo_origen)
+        query = (Multa.query.filter_by(estado='Pendiente')
+                 .options(prestamo.joinedload(Prestamo.usuario_prestamo),
+                          prestamo.joinedload(Prestamo.solicitud_origen).selectinload(Solicitud.libros)))
+        multas = iter_keyset(query, Multa.id, Multa.id, lambda multa: [multa.id])
+
+        if wants_stream():
+            return ndjson_response((serialize_multa(multa) for multa in multas), 'get_active_fines')
+
+        resultado = [serialize_multa(multa) for multa in multas]
         return jsonify(resultado), 200
 
     except Exception as e:
@@ -258,10 +255,8 @@ def get_active_fines():
 # Este endpoint permite al bibliotecario marcar una multa como pagada o condonarla.
 @bibliotecario_bp.route('/multas/<int:multa_id>/procesar', methods=['POST'])
 @jwt_required()
+@require_role('Bibliotecario')
 def process_fine(multa_id):
-    if not check_bibliotecario():
-        return jsonify({"message": "Acceso restringido a bibliotecarios"}), 403
-    
     data = request.get_json()
     action = data.get('action') # 'pagar' o 'condonar'
     
@@ -271,17 +266,28 @@ def process_fine(multa_id):
     multa = db.session.get(Multa, multa_id)
     if not multa:
         return jsonify({"message": "Multa no encontrada"}), 404
-    if multa.estado != 'Pendiente':
-        return jsonify({"message": "La multa ya no está pendiente"}), 400
-    
+
     try:
         if action == 'pagar':
-            multa.estado = 'Pagada'
+            nuevo_estado = 'Pagada'
             message = "Multa marcada como pagada exitosamente"
         elif action == 'condonar':
-            multa.estado = 'Condonada' # Podrías tener un estado 'Condonada' en tu modelo Multa
+            nuevo_estado = 'Condonada'
             message = "Multa condonada exitosamente"
-        
+
+        # Transición condicional: de dos pagos/condonaciones concurrentes solo uno cambia la fila y descuenta
+        # los contadores
+        result = db.session.execute(
+            update(Multa)
+            .where(Multa.id == multa_id, Multa.estado == 'Pendiente')
+            .values(estado=nuevo_estado)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            db.session.rollback()
+            return jsonify({"message": "La multa ya no está pendiente"}), 400
+        stats.add_counter(stats.MULTAS_PENDIENTES, -1)
+        stats.add_user_counter(multa.prestamo_origen.id_usuario, stats.USUARIO_MULTAS_PENDIENTES, -1)
         db.session.commit()
         return jsonify({"message": message}), 200
     except Exception as e:
@@ -289,3 +295,160 @@ def process_fine(multa_id):
         print(f"ERROR EN process_fine: {e}")
         traceback.print_exc()
         return jsonify({"message": "Error al procesar multa", "error": str(e)}), 500
+
+
+# --- ENDPOINT: EJECUTAR EL ESCANEO DE PRÉSTAMOS VENCIDOS (POST) ---
+# Marca como 'Vencido' los préstamos fuera de plazo y crea/actualiza sus multas. Es idempotente.
+@bibliotecario_bp.route('/vencimientos/escanear', methods=['POST'])
+@jwt_required()
+@require_role('Bibliotecario')
+def escanear_vencimientos():
+    try:
+        resumen = run_overdue_scan()
+        return jsonify(resumen), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR EN escanear_vencimientos: {e}")
+        traceback.print_exc()
+        return jsonify({"message": "Error al escanear préstamos vencidos", "error": str(e)}), 500
+
+
+# --- ENDPOINT: DEVOLUCIÓN DE PRÉSTAMOS POR LOTES (POST) ---
+# Cuerpo: {"prestamos": [1, 2, ...], "codigos": ["0000042-001", ...], "isbns": ["978...", ...], "idUsuario": 7 (opcional)}.
+# Cada código de barras devuelve el préstamo abierto de ese ejemplar; cada ISBN, el préstamo abierto más antiguo
+# de ese libro (del lector indicado, si viene idUsuario).
+# Marca los préstamos como 'Devuelto', genera las multas por retraso y devuelve las copias (a la cola de
+# reservas primero); una transacción por bloque de 200 (ver app/bibliotecario/devoluciones.py).
+@bibliotecario_bp.route('/devoluciones', methods=['POST'])
+@jwt_required()
+@require_role('Bibliotecario')
+def devolver_prestamos_endpoint():
+    data = request.get_json(silent=True) or {}
+    prestamos = data.get('prestamos') or []
+    codigos = data.get('codigos') or []
+    isbns = data.get('isbns') or []
+    id_usuario = data.get('idUsuario')
+    if not isinstance(prestamos, list) or not all(isinstance(i, int) for i in prestamos):
+        return jsonify({"message": "El campo 'prestamos' debe ser una lista de IDs de préstamo"}), 400
+    if not isinstance(codigos, list) or not all(isinstance(c, str) and c.strip() for c in codigos):
+        return jsonify({"message": "El campo 'codigos' debe ser una lista de códigos de barras"}), 400
+    if not isinstance(isbns, list) or not all(isinstance(i, str) and i.strip() for i in isbns):
+        return jsonify({"message": "El campo 'isbns' debe ser una lista de ISBN"}), 400
+    if id_usuario is not None and not isinstance(id_usuario, int):
+        return jsonify({"message": "El campo 'idUsuario' debe ser un ID de usuario"}), 400
+    if not prestamos and not codigos and not isbns:
+        return jsonify({"message": "Indique 'prestamos', 'codigos' o 'isbns'"}), 400
+    if len(prestamos) + len(codigos) + len(isbns) > 5000:
+        return jsonify({"message": "No se pueden devolver más de 5000 préstamos por petición"}), 400
+
+    try:
+        elementos = ([{'prestamoId': i} for i in prestamos] + [{'codigoBarras': c.strip()} for c in codigos]
+                     + [{'isbn': isbn.strip()} for isbn in isbns])
+        resultados = devolver_prestamos(elementos, id_usuario=id_usuario)
+        devueltos = [r for r in resultados if r['estado'] == 'Devuelto']
+        return jsonify({
+            "devueltos": len(devueltos),
+            "fallidos": len(resultados) - len(devueltos),
+            "conMulta": sum(1 for r in devueltos if r['multa'] is not None), # Devueltos con retraso
+            "resultados": resultados,
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR EN devolver_prestamos: {e}")
+        traceback.print_exc()
+        return jsonify({"message": "Error al devolver préstamos", "error": str(e)}), 500
+
+
+# --- ENDPOINT: RESERVAS CON COPIA APARTADA (GET) ---
+# Reservas 'Asignada' pendientes de entregar en el mostrador, por orden de llegada. ?libro_id= para un libro.
+# Con ?stream=1 (o Accept: application/x-ndjson) se envían en NDJSON a medida que se leen.
+def serialize_reserva(reserva):
+    return {
+        "id": reserva.id,
+        "usuario": {
+            "id": reserva.usuario.id,
+            "nombre": f"{reserva.usuario.nombre} {reserva.usuario.apellido_paterno}".strip(),
+            "email": reserva.usuario.email,
+        },
+        "libro": {"id": reserva.libro.id, "nombre": reserva.libro.nombre, "isbn": reserva.libro.isbn},
+        "fechaReserva": reserva.fecha_reserva,
+        "fechaAsignacion": reserva.fecha_asignacion,
+        "expira": reserva.expira,
+    }
+
+
+@bibliotecario_bp.route('/reservas', methods=['GET'])
+@jwt_required()
+@require_role('Bibliotecario')
+def get_reservas_asignadas():
+    try:
+        query = (Reserva.query.filter_by(estado='Asignada')
+                 .options(joinedload(Reserva.usuario), joinedload(Reserva.libro)))
+        if request.args.get('libro_id', type=int):
+            query = query.filter(Reserva.libro_id == request.args.get('libro_id', type=int))
+        filas = iter_keyset(query, Reserva.id, Reserva.id, lambda reserva: [reserva.id])
+
+        if wants_stream():
+            return ndjson_response((serialize_reserva(reserva) for reserva in filas), 'get_reservas_asignadas')
+
+        return jsonify([serialize_reserva(reserva) for reserva in filas]), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR EN get_reservas_asignadas: {e}")
+        traceback.print_exc()
+        return jsonify({"message": "Error al obtener reservas", "error": str(e)}), 500
+
+
+# --- ENDPOINT: ENTREGAR UNA RESERVA (POST) ---
+# El lector recoge la copia apartada: la reserva pasa a 'Completada' y se crea su préstamo.
+@bibliotecario_bp.route('/reservas/<int:reserva_id>/entregar', methods=['POST'])
+@jwt_required()
+@require_role('Bibliotecario')
+def entregar_reserva(reserva_id):
+    try:
+        prestamo_id = reservas.entregar_reserva(reserva_id)
+        return jsonify({"message": "Reserva entregada y préstamo creado exitosamente", "prestamo_id": prestamo_id}), 200
+    except reservas.ReservaError as e:
+        return jsonify({"message": e.message}), e.status
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR EN entregar_reserva: {e}")
+        traceback.print_exc()
+        return jsonify({"message": "Error al entregar la reserva", "error": str(e)}), 500
+
+
+# --- ENDPOINT: EXPIRAR RESERVAS SIN RECOGER (POST) ---
+# Expira las reservas asignadas fuera de plazo y pasa sus copias a la siguiente de cada cola. Es idempotente.
+@bibliotecario_bp.route('/reservas/expirar', methods=['POST'])
+@jwt_required()
+@require_role('Bibliotecario')
+def expirar_reservas():
+    try:
+        resumen = reservas.run_hold_expiry()
+        return jsonify(resumen), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR EN expirar_reservas: {e}")
+        traceback.print_exc()
+        return jsonify({"message": "Error al expirar reservas", "error": str(e)}), 500
+
+
+# --- COMANDO CLI: ESCANEO DE PRÉSTAMOS VENCIDOS ---
+# Uso: flask bibliotecario vencimientos [--tarifa 10] [--lote 5000]   (pensado para cron)
+@bibliotecario_bp.cli.command('vencimientos')
+@click.option('--tarifa', type=float, default=None, help='Monto por día de retraso (por defecto MULTA_TARIFA_DIARIA).')
+@click.option('--lote', type=int, default=None, help='Préstamos por lote/transacción.')
+def vencimientos_command(tarifa, lote):
+    resumen = run_overdue_scan(tarifa=tarifa, batch_size=lote)
+    print(f"Préstamos vencidos: {resumen['prestamosVencidos']} | multas creadas: {resumen['multasCreadas']} | "
+          f"multas actualizadas: {resumen['multasActualizadas']} | {resumen['segundos']} s")
+
+
+# --- COMANDO CLI: EXPIRACIÓN DE RESERVAS ---
+# Uso: flask bibliotecario reservas-expirar [--lote 1000]   (pensado para cron)
+@bibliotecario_bp.cli.command('reservas-expirar')
+@click.option('--lote', type=int, default=None, help='Reservas por lote/transacción.')
+def reservas_expirar_command(lote):
+    resumen = reservas.run_hold_expiry(batch_size=lote)
+    print(f"Reservas expiradas: {resumen['reservasExpiradas']} | copias reasignadas: {resumen['copiasReasignadas']} | "
+          f"{resumen['segundos']} s")
@@ -0,0 +1,161 @@
+# app/bibliotecario/vencimientos.py
+#
+# Escáner de préstamos vencidos y generación de multas.
+#
+# Trabaja por lotes y solo con sentencias por conjunto (sin recorrer préstamos en Python):
+#   1. Préstamos 'Activo' con fecha_devolucion_limite anterior a hoy (índice (estado, fecha_devolucion_limite)):
+#      se pasan a 'Vencido' y se crea su multa 'Pendiente' con INSERT ... SELECT. Cada lote hace commit.
+#   2. Multas 'Pendiente' de préstamos 'Vencido' aún no devueltos: se recalcula su monto con un UPDATE.
+# El monto es MULTA_TARIFA_DIARIA * días de retraso, calculado desde las fechas, así que repetir el escaneo el
+# mismo día no cambia nada (idempotente). Como cada lote saca sus préstamos del estado 'Activo', si el proceso
+# se interrumpe basta con volver a ejecutarlo para continuar donde quedó.
+# Una multa pagada o condonada no se vuelve a crear ni a modificar.
+
+import threading
+import time as time_module
+from datetime import datetime, time
+
+from flask import current_app
+from sqlalchemy import Integer, cast, exists, func, insert, literal, select, update
+
+from app.models import db, Prestamo, Multa
+from app.utils import stats
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+def _dias_retraso(columna, ahora):
+    """Expresión SQL con los días naturales transcurridos desde 'columna' hasta 'ahora'."""
+    dialect = db.engine.dialect.name
+    if dialect in ('mysql', 'mariadb'):
+        return func.datediff(ahora, columna)
+    if dialect == 'sqlite':
+        return cast(func.julianday(func.date(ahora)) - func.julianday(func.date(columna)), Integer)
+    return func.date_part('day', func.date_trunc('day', ahora) - func.date_trunc('day', columna))
+
+
+def marcar_vencidos(ahora, tarifa, batch_size=DEFAULT_BATCH_SIZE):
+    """Paso 1: pasa a 'Vencido' los préstamos activos fuera de plazo y crea sus multas. Devuelve (vencidos, multas)."""
+    limite = datetime.combine(ahora.date(), time.min) # Vence al terminar el día límite
+    total_vencidos = total_multas = 0
+    while True:
+        filas = db.session.execute(
+            select(Prestamo.id, Prestamo.id_usuario)
+            .where(Prestamo.estado == 'Activo', Prestamo.fecha_devolucion_limite < limite)
+            .order_by(Prestamo.fecha_devolucion_limite, Prestamo.id)
+            .limit(batch_size)
+        ).all()
+        if not filas:
+            break
+        ids = [fila.id for fila in filas]
+
+        vencidos = db.session.execute(
+            update(Prestamo)
+            .where(Prestamo.id.in_(ids), Prestamo.estado == 'Activo')
+            .values(estado='Vencido')
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+        ya_tiene_multa = exists().where(Multa.id_prestamo == Prestamo.id)
+        multas = db.session.execute(
+            insert(Multa).from_select(
+                ['id_prestamo', 'monto', 'fecha_generacion', 'estado'],
+                select(
+                    Prestamo.id,
+                    literal(tarifa) * _dias_retraso(Prestamo.fecha_devolucion_limite, ahora),
+                    literal(ahora),
+                    literal('Pendiente'),
+                ).where(Prestamo.id.in_(ids), Prestamo.estado == 'Vencido', ~ya_tiene_multa)
+            )
+        ).rowcount
+
+        stats.add_counter(stats.PRESTAMOS_ACTIVOS, -vencidos)
+        stats.add_counter(stats.MULTAS_PENDIENTES, multas)
+        # Por usuario: lo normal es una multa pendiente más por cada préstamo del lote (el préstamo vencido sigue sin
+        # devolver y cuenta entre sus activos); si no fue así (otra transacción cambió alguno o ya tenía multa), se
+        # recalculan los usuarios del lote
+        if vencidos == multas == len(filas):
+            for fila in filas:
+                stats.add_user_counter(fila.id_usuario, stats.USUARIO_MULTAS_PENDIENTES, 1)
+        else:
+            stats.refresh_user_counters({fila.id_usuario for fila in filas})
+        db.session.commit()
+        total_vencidos += vencidos
+        total_multas += multas
+    return total_vencidos, total_multas
+
+
+def actualizar_montos(ahora, tarifa, batch_size=DEFAULT_BATCH_SIZE):
+    """Paso 2: recalcula el monto de las multas pendientes de préstamos vencidos sin devolver."""
+    total = 0
+    last_id = 0
+    while True:
+        ids = db.session.scalars(
+            select(Multa.id)
+            .join(Prestamo, Multa.id_prestamo == Prestamo.id)
+            .where(Multa.id > last_id, Multa.estado == 'Pendiente',
+                   Prestamo.estado == 'Vencido', Prestamo.fecha_devolucion_real.is_(None))
+            .order_by(Multa.id)
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            break
+
+        fecha_limite = (select(Prestamo.fecha_devolucion_limite)
+                        .where(Prestamo.id == Multa.id_prestamo)
+                        .scalar_subquery())
+        total += db.session.execute(
+            update(Multa)
+            .where(Multa.id.in_(ids), Multa.estado == 'Pendiente')
+            .values(monto=literal(tarifa) * _dias_retraso(fecha_limite, ahora))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        last_id = ids[-1]
+    return total
+
+
+def run_overdue_scan(ahora=None, tarifa=None, batch_size=None):
+    """Ejecuta el escaneo completo y devuelve un resumen."""
+    inicio = time_module.perf_counter()
+    ahora = ahora or datetime.utcnow()
+    tarifa = tarifa if tarifa is not None else current_app.config['MULTA_TARIFA_DIARIA']
+    batch_size = batch_size or current_app.config['OVERDUE_SCAN_BATCH_SIZE']
+
+    vencidos, multas_creadas = marcar_vencidos(ahora, tarifa, batch_size)
+    multas_actualizadas = actualizar_montos(ahora, tarifa, batch_size)
+    return {
+        'prestamosVencidos': vencidos,
+        'multasCreadas': multas_creadas,
+        'multasActualizadas': multas_actualizadas,
+        'segundos': round(time_module.perf_counter() - inicio, 3),
+    }
+
+
+def _scheduler_loop(app, interval):
+    while True:
+        time_module.sleep(interval)
+        with app.app_context():
+            try:
+                resumen = run_overdue_scan()
+                app.logger.info("Escaneo de vencimientos: %s", resumen)
+            except Exception:
+                db.session.rollback()
+                app.logger.exception("Error en el escaneo de préstamos vencidos")
+            finally:
+                db.session.remove()
+
+
+def init_overdue_scanner(app):
+    """Configura el escáner y, si OVERDUE_SCAN_INTERVAL > 0, lo arranca en un hilo del proceso.
+
+    Con varios workers conviene activarlo solo en uno (o usar 'flask bibliotecario vencimientos' desde cron);
+    aunque se ejecute en paralelo el resultado es el mismo, porque el escaneo es idempotente.
+    """
+    app.config.setdefault('MULTA_TARIFA_DIARIA', 10.0)
+    app.config.setdefault('OVERDUE_SCAN_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    app.config.setdefault('OVERDUE_SCAN_INTERVAL', 0) # Segundos; 0 = desactivado
+    interval = app.config['OVERDUE_SCAN_INTERVAL']
+    if interval and interval > 0:
+        hilo = threading.Thread(target=_scheduler_loop, args=(app, interval), name='overdue-scanner', daemon=True)
+        hilo.start()
@@ -1,42 +1,254 @@
 # /app/lector/routes.py
 
-from flask import Blueprint, jsonify
+from datetime import datetime
+
+from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import Usuario, Prestamo, Multa # Importamos los modelos que necesitamos
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased, contains_eager, joinedload, selectinload
+from app.models import db, Usuario, Prestamo, Multa, Solicitud, Reserva # Importamos los modelos que necesitamos
+from app.utils.pagination import get_limit, get_cursor, encode_cursor, apply_keyset, paginated_response
+from app.utils import stats # Contadores por usuario del panel
+from app.bibliotecario import reservas # Cola de reservas por libro
+import traceback # Para imprimir el traceback completo en caso de errores
 
 # Creamos el nuevo blueprint
 lector_bp = Blueprint('lector', __name__)
 
+def panel_summary(usuario, c):
+    """Cuerpo del resumen a partir de los contadores del usuario (compartido con app/aio/routes.py)."""
+    return {
+        "nombreCompleto": f"{usuario.nombre} {usuario.apellido_paterno}",
+        "prestamosActivos": c[stats.USUARIO_PRESTAMOS_ACTIVOS],
+        "multasActivas": c[stats.USUARIO_MULTAS_PENDIENTES],
+        "reservasPendientes": c[stats.USUARIO_RESERVAS_ACTIVAS], # Reservas en cola o con copia apartada
+        "solicitudesPendientes": c[stats.USUARIO_SOLICITUDES_PENDIENTES], # Solicitudes aún sin aprobar
+        "totalPrestados": c[stats.USUARIO_PRESTAMOS_TOTAL],
+    }
+
+
 @lector_bp.route('/panel/summary', methods=['GET'])
 @jwt_required() # ¡Esta línea protege la ruta!
 def get_panel_summary():
     # Obtenemos la identidad (el ID) del usuario desde el token JWT
-    current_user_id = get_jwt_identity()
-    
+    current_user_id = int(get_jwt_identity())
+
     # Buscamos al usuario en la base de datos
-    usuario = Usuario.query.get(current_user_id)
+    usuario = db.session.get(Usuario, current_user_id)
     if not usuario:
         return jsonify({"message": "Usuario no encontrado"}), 404
 
-    # Calculamos las estadísticas
+    # Las estadísticas salen de los contadores del usuario (una lectura por clave primaria, sin COUNT)
+    try:
+        return jsonify(panel_summary(usuario, stats.read_user_counters(current_user_id))), 200
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR EN get_panel_summary (lector): {e}")
+        traceback.print_exc()
+        return jsonify({'message': 'Error al calcular el resumen del panel', 'error': str(e)}), 500
+
+
+# --- FUNCIONES DE AYUDA PARA LOS LISTADOS DEL LECTOR ---
+# Paginación keyset de más reciente a más antiguo sobre (fecha, id); el cursor es [fecha ISO, id].
+def get_fecha_cursor(args=None):
+    cursor = get_cursor(args)
+    if cursor is None:
+        return None
+    fecha, last_id = cursor
+    return [datetime.fromisoformat(fecha), int(last_id)]
+
+
+def keyset_page(query, fecha_column, id_column, fecha_of, limit, cursor):
+    """Devuelve (filas, next_cursor). Pide una fila de más para saber si hay otra página sin un COUNT."""
+    filas = apply_keyset(query, fecha_column, id_column, cursor, descending=True).limit(limit + 1).all()
+    has_more = len(filas) > limit
+    filas = filas[:limit]
+    next_cursor = encode_cursor(fecha_of(filas[-1]).isoformat(), filas[-1].id) if has_more else None
+    return filas, next_cursor
+
+
+def serialize_libros(solicitud):
+    if not solicitud:
+        return []
+    return [{"id": libro.id, "nombre": libro.nombre, "isbn": libro.isbn} for libro in solicitud.libros]
+
+
+# Espera la solicitud de origen y sus libros ya cargados (ver prestamos_query).
+def serialize_prestamo(prestamo):
+    return {
+        "id": prestamo.id,
+        "idSolicitud": prestamo.id_solicitud,
+        "fechaInicio": prestamo.fecha_inicio,
+        "fechaDevolucionLimite": prestamo.fecha_devolucion_limite,
+        "fechaDevolucionReal": prestamo.fecha_devolucion_real,
+        "estado": prestamo.estado,
+        "libros": serialize_libros(prestamo.solicitud_origen),
+    }
+
+
+# Espera el préstamo de origen, su solicitud y sus libros ya cargados (ver get_multas).
+def serialize_multa(multa):
+    return {
+        "id": multa.id,
+        "monto": multa.monto,
+        "fechaGeneracion": multa.fecha_generacion,
+        "estado": multa.estado,
+        "idPrestamo": multa.id_prestamo,
+        "fechaDevolucionLimite": multa.prestamo_origen.fecha_devolucion_limite,
+        "libros": serialize_libros(multa.prestamo_origen.solicitud_origen),
+    }
+
+
+def prestamos_query(user_id):
+    # Índice (id_usuario, fecha_inicio, id): la página se lee en orden sin ordenar todo el historial del lector
+    return (Prestamo.query.filter(Prestamo.id_usuario == user_id)
+            .options(joinedload(Prestamo.solicitud_origen).selectinload(Solicitud.libros)))
+
+
+# --- ENDPOINT: HISTORIAL DE PRÉSTAMOS DEL LECTOR ---
+# Todos los préstamos del usuario actual, del más reciente al más antiguo.
+# ?limit=50&cursor=<X-Next-Cursor>&estado=Devuelto (opcional)
+@lector_bp.route('/historial', methods=['GET'])
+@jwt_required()
+def get_historial():
+    try:
+        limit = get_limit()
+        cursor = get_fecha_cursor()
+    except (ValueError, TypeError):
+        return jsonify({'message': 'Parámetros de paginación inválidos'}), 400
+
+    try:
+        query = prestamos_query(int(get_jwt_identity()))
+        if request.args.get('estado'):
+            query = query.filter(Prestamo.estado == request.args['estado'])
+        prestamos, next_cursor = keyset_page(query, Prestamo.fecha_inicio, Prestamo.id, lambda p: p.fecha_inicio, limit, cursor)
+        return paginated_response(jsonify([serialize_prestamo(p) for p in prestamos]), next_cursor), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR EN get_historial: {e}")
+        traceback.print_exc()
+        return jsonify({'message': 'Error al obtener el historial de préstamos', 'error': str(e)}), 500
+
+
+# --- ENDPOINT: PRÉSTAMOS EN CURSO DEL LECTOR ---
+# Préstamos sin devolver (activos o vencidos) del usuario actual, del más reciente al más antiguo.
+@lector_bp.route('/prestamos', methods=['GET'])
+@jwt_required()
+def get_prestamos_activos():
+    try:
+        limit = get_limit()
+        cursor = get_fecha_cursor()
+    except (ValueError, TypeError):
+        return jsonify({'message': 'Parámetros de paginación inválidos'}), 400
+
+    try:
+        query = prestamos_query(int(get_jwt_identity())).filter(Prestamo.estado.in_(('Activo', 'Vencido')))
+        prestamos, next_cursor = keyset_page(query, Prestamo.fecha_inicio, Prestamo.id, lambda p: p.fecha_inicio, limit, cursor)
+        return paginated_response(jsonify([serialize_prestamo(p) for p in prestamos]), next_cursor), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR EN get_prestamos_activos: {e}")
+        traceback.print_exc()
+        return jsonify({'message': 'Error al obtener los préstamos activos', 'error': str(e)}), 500
+
+
+# --- ENDPOINT: MULTAS DEL LECTOR ---
+# Multas del usuario actual, de la más reciente a la más antigua (keyset sobre (fecha_generacion, id)).
+# ?estado=Pendiente para ver solo las que faltan por pagar.
+@lector_bp.route('/multas', methods=['GET'])
+@jwt_required()
+def get_multas():
+    try:
+        limit = get_limit()
+        cursor = get_fecha_cursor()
+    except (ValueError, TypeError):
+        return jsonify({'message': 'Parámetros de paginación inválidos'}), 400
+
+    try:
+        query = (Multa.query.join(Prestamo, Multa.id_prestamo == Prestamo.id)
+                 .filter(Prestamo.id_usuario == int(get_jwt_identity()))
+                 .options(contains_eager(Multa.prestamo_origen).joinedload(Prestamo.solicitud_origen).selectinload(Solicitud.libros)))
+        if request.args.get('estado'):
+            query = query.filter(Multa.estado == request.args['estado'])
+        multas, next_cursor = keyset_page(query, Multa.fecha_generacion, Multa.id, lambda m: m.fecha_generacion, limit, cursor)
+
+        return paginated_response(jsonify([serialize_multa(multa) for multa in multas]), next_cursor), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR EN get_multas (lector): {e}")
+        traceback.print_exc()
+        return jsonify({'message': 'Error al obtener las multas', 'error': str(e)}), 500
+
+
+# --- ENDPOINTS: RESERVAS DEL LECTOR ---
+# Cola FIFO por libro para los libros sin copias (lógica en app/bibliotecario/reservas.py).
+def serialize_reserva(reserva, posicion=None):
+    return {
+        "id": reserva.id,
+        "libro": {"id": reserva.libro.id, "nombre": reserva.libro.nombre, "isbn": reserva.libro.isbn},
+        "estado": reserva.estado,
+        "fechaReserva": reserva.fecha_reserva,
+        "posicion": posicion, # Lugar en la cola (solo 'En espera')
+        "expira": reserva.expira, # Límite para recoger la copia apartada
+    }
+
+
+# Reservas activas del usuario actual con su posición en la cola (una sola consulta)
+@lector_bp.route('/reservas', methods=['GET'])
+@jwt_required()
+def get_reservas():
     try:
-        prestamos_activos = Prestamo.query.filter_by(id_usuario=current_user_id, estado='Activo').count()
-        multas_activas = Multa.query.join(Prestamo).filter(
-            Prestamo.id_usuario == current_user_id, 
-            Multa.estado == 'Pendiente'
-        ).count()
-        # ... aquí podríamos añadir más cálculos en el futuro ...
+        anterior = aliased(Reserva)
+        # Reservas por delante en la misma cola: rango del índice (libro_id, estado, id)
+        posicion = (select(func.count(anterior.id))
+                    .where(anterior.libro_id == Reserva.libro_id, anterior.estado == 'En espera', anterior.id <= Reserva.id)
+                    .correlate(Reserva).scalar_subquery())
+        filas = (db.session.query(Reserva, posicion)
+                 .options(joinedload(Reserva.libro))
+                 .filter(Reserva.id_usuario == int(get_jwt_identity()), Reserva.estado.in_(reservas.ESTADOS_ACTIVOS))
+                 .order_by(Reserva.id)
+                 .all())
+        return jsonify([serialize_reserva(r, p if r.estado == 'En espera' else None) for r, p in filas]), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR EN get_reservas: {e}")
+        traceback.print_exc()
+        return jsonify({'message': 'Error al obtener las reservas', 'error': str(e)}), 500
+
+
+# Cuerpo: {"libroId": 123}. Solo para libros sin copias disponibles; una reserva activa por libro.
+@lector_bp.route('/reservas', methods=['POST'])
+@jwt_required()
+def crear_reserva():
+    data = request.get_json(silent=True) or {}
+    libro_id = data.get('libroId')
+    if not isinstance(libro_id, int):
+        return jsonify({'message': "El campo 'libroId' es obligatorio"}), 400
 
-        # Creamos el objeto JSON de respuesta
-        summary_data = {
-            "nombreCompleto": f"{usuario.nombre} {usuario.apellido_paterno}",
-            "prestamosActivos": prestamos_activos,
-            "multasActivas": multas_activas,
-            "reservasPendientes": 0, # Placeholder por ahora
-            "totalPrestados": 0,    # Placeholder por ahora
-        }
+    try:
+        reserva = reservas.crear_reserva(int(get_jwt_identity()), libro_id)
+        return jsonify({'message': 'Reserva creada exitosamente', 'reserva': serialize_reserva(reserva)}), 201
+    except reservas.ReservaError as e:
+        return jsonify({'message': e.message}), e.status
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR EN crear_reserva: {e}")
+        traceback.print_exc()
+        return jsonify({'message': 'Error al crear la reserva', 'error': str(e)}), 500
 
-        return jsonify(summary_data), 200
 
+# Si la reserva ya tenía una copia apartada, la copia pasa a la siguiente reserva de la cola.
+@lector_bp.route('/reservas/<int:reserva_id>', methods=['DELETE'])
+@jwt_required()
+def cancelar_reserva(reserva_id):
+    try:
+        reservas.cancelar_reserva(reserva_id, int(get_jwt_identity()))
+        return jsonify({'message': 'Reserva cancelada exitosamente'}), 200
+    except reservas.ReservaError as e:
+        return jsonify({'message': e.message}), e.status
     except Exception as e:
-        return jsonify({'message': 'Error al calcular el resumen del panel', 'error': str(e)}), 500
\ No newline at end of file
+        db.session.rollback()
+        print(f"ERROR EN cancelar_reserva: {e}")
+        traceback.print_exc()
+        return jsonify({'message': 'Error al cancelar la reserva', 'error': str(e)}), 500
@@ -0,0 +1,214 @@
+# app/libros/cache.py
+#
+# GET condicional y snapshots versionados del catálogo.
+#
+# Las escrituras que cambian el catálogo llaman a bump_catalog_version() antes del commit, y catalogo_version.version
+# se incrementa una vez al confirmar esa transacción (hook before_commit). Las lecturas usan esa versión para:
+#   - devolver un ETag fuerte y Last-Modified; si el cliente manda If-None-Match/If-Modified-Since y la
+#     versión no cambió, se responde 304 sin consultar la base de datos;
+#   - guardar en memoria los bytes ya serializados de la respuesta de la versión actual (salvo en modo
+#     streaming NDJSON, que se genera al enviarse y solo lleva ETag).
+# La versión se cachea en el proceso durante CATALOG_VERSION_TTL segundos; las escrituras hechas en este
+# mismo proceso la invalidan al confirmar la transacción, las de otros workers se ven al vencer el TTL.
+
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from urllib.parse import urlencode
+
+from flask import current_app, request, make_response
+from sqlalchemy import event, insert, update
+from sqlalchemy.orm import Session
+
+from app.models import db, CatalogoVersion
+from app.utils.streaming import wants_stream
+from app.utils.db_routing import use_primary
+
+VERSION_ROW_ID = 1
+
+
+class CatalogSnapshotCache:
+    def __init__(self, ttl=2.0, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._version = None       # (version, actualizado)
+        self._version_checked = 0.0
+        self._snapshots = OrderedDict()  # clave -> (version, body, status, headers)
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+            self._snapshots.clear()
+
+    def cached_version(self):
+        """(version, actualizado) si se leyó hace menos de ttl segundos; si no, None."""
+        with self._lock:
+            if self._version is not None and time.monotonic() - self._version_checked < self.ttl:
+                return self._version
+        return None
+
+    def store_version(self, version):
+        with self._lock:
+            if self._version is None or self._version[0] != version[0]:
+                self._snapshots.clear() # Los snapshots de versiones anteriores ya no sirven
+            self._version = version
+            self._version_checked = time.monotonic()
+        return version
+
+    def current_version(self):
+        version = self.cached_version()
+        if version is not None:
+            return version
+        row = db.session.get(CatalogoVersion, VERSION_ROW_ID)
+        if row is None:
+            with use_primary(): # La fila se crea en la principal (una réplica puede no tenerla todavía)
+                row = db.session.get(CatalogoVersion, VERSION_ROW_ID)
+                if row is None:
+                    row = CatalogoVersion(id=VERSION_ROW_ID, version=1, actualizado=datetime.utcnow())
+                    db.session.add(row)
+                    db.session.commit()
+        return self.store_version((row.version, row.actualizado))
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._snapshots.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._snapshots.move_to_end(key)
+            return entry
+
+    def put(self, key, version, body, status, headers):
+        with self._lock:
+            self._snapshots[key] = (version, body, status, headers)
+            self._snapshots.move_to_end(key)
+            while len(self._snapshots) > self.max_entries:
+                self._snapshots.popitem(last=False)
+
+
+def init_catalog_cache(app):
+    app.config.setdefault('CATALOG_VERSION_TTL', 2.0)
+    app.config.setdefault('CATALOG_SNAPSHOT_MAX_ENTRIES', 256)
+    app.extensions['catalogo_cache'] = CatalogSnapshotCache(
+        ttl=app.config['CATALOG_VERSION_TTL'],
+        max_entries=app.config['CATALOG_SNAPSHOT_MAX_ENTRIES'],
+    )
+
+
+def get_catalog_cache():
+    return current_app.extensions['catalogo_cache']
+
+
+@event.listens_for(Session, 'before_commit')
+def _apply_version_bump(session):
+    # Una sola vez por transacción y al confirmar: la fila de la versión (la más disputada) se bloquea después de
+    # las filas de libros y ejemplares de la operación y solo mientras dura el commit, como en stats.py
+    if not session.info.get('catalogo_modificado'):
+        return
+    result = session.execute(
+        update(CatalogoVersion)
+        .where(CatalogoVersion.id == VERSION_ROW_ID)
+        .values(version=CatalogoVersion.version + 1, actualizado=datetime.utcnow())
+    )
+    if result.rowcount == 0:
+        session.execute(insert(CatalogoVersion).values(id=VERSION_ROW_ID, version=2, actualizado=datetime.utcnow()))
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    if session.info.pop('catalogo_modificado', False):
+        try:
+            get_catalog_cache().invalidate()
+        except (RuntimeError, KeyError): # Commit fuera de un contexto de aplicación
+            pass
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending(session, previous_transaction):
+    if session.in_transaction():
+        return # Rollback de un savepoint: la transacción exterior sigue viva
+    session.info.pop('catalogo_modificado', None)
+
+
+def bump_catalog_version():
+    """Marca que la transacción actual cambia el catálogo; la versión se incrementa al confirmarla."""
+    db.session.info['catalogo_modificado'] = True
+
+
+def catalog_version():
+    """Número de versión actual del catálogo (cacheado en el proceso)."""
+    return get_catalog_cache().current_version()[0]
+
+
+def not_modified(etag, last_modified, if_none_match, if_modified_since):
+    """True si el GET condicional (ETags y fecha ya parseados por werkzeug) permite responder 304.
+
+    If-None-Match compara en modo débil: el cliente puede tener la versión comprimida (W/"...", ver
+    utils/compression.py) del mismo snapshot.
+    """
+    if if_none_match:
+        return if_none_match.contains_weak(etag)
+    if if_modified_since:
+        return last_modified.replace(microsecond=0) <= if_modified_since.replace(tzinfo=None)
+    return False
+
+
+def snapshot_key(name, args, streaming=False):
+    """Clave del snapshot: nombre + parámetros de consulta en forma canónica. args: pares (clave, valor).
+
+    Claves y valores van codificados (urlencode): un valor con '&' o '=' no puede hacerse pasar por otros
+    parámetros (?genero_id=2%26limit%3D10 y ?genero_id=2&limit=10 son snapshots distintos).
+    """
+    params = urlencode(sorted(args))
+    key = f'{name}?{params}'
+    if streaming:
+        key += '#ndjson' # El modo NDJSON también se puede pedir por cabecera Accept
+    return key
+
+
+def snapshot_etag(name, version, key):
+    return f'{name}-v{version}-{hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]}'
+
+
+def versioned_snapshot(name):
+    """Decorador para GETs del catálogo: ETag/Last-Modified, 304 y respuesta pre-serializada por versión."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = get_catalog_cache()
+            version, last_modified = cache.current_version()
+
+            # La clave incluye los parámetros de consulta (página, filtros...) de forma canónica
+            streaming = wants_stream()
+            key = snapshot_key(name, request.args.items(multi=True), streaming)
+            etag = snapshot_etag(name, version, key)
+
+            if not_modified(etag, last_modified, request.if_none_match, request.if_modified_since):
+                response = make_response('', 304)
+            else:
+                entry = None if streaming else cache.get(key, version)
+                if streaming:
+                    response = make_response(view(*args, **kwargs)) # Se genera al enviarse: no se cachea
+                    if response.status_code != 200:
+                        return response
+                elif entry is None:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response # Los errores no se cachean ni llevan ETag
+                    headers = [(h, v) for h, v in response.headers.items() if h.lower().startswith('x-')]
+                    cache.put(key, version, response.get_data(), response.status_code, headers)
+                else:
+                    _, body, status, headers = entry
+                    response = make_response(body, status, headers)
+                    response.mimetype = 'application/json'
+
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.headers['Cache-Control'] = 'no-cache' # El cliente siempre revalida con If-None-Match
+            response.vary.add('Accept')
+            return response
+        return wrapper
+    return decorator
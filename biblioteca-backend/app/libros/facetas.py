@@ -0,0 +1,102 @@
+# app/libros/facetas.py
+#
+# Filtros del catálogo y recuentos por faceta (libros por género, por autor y disponibles / no disponibles).
+#
+# Los filtros son los de GET /libros: ?genero_id=<id>&autor_id=<id>&disponible=<si|no>. Cada faceta se cuenta con
+# los demás filtros aplicados, no con el suyo: con genero_id=3 la faceta de géneros dice cuántos libros habría al
+# cambiar a cada otro género (la selección en el catálogo es de un valor por faceta).
+#
+# Son tres consultas agrupadas, pensadas para millones de libros:
+#   - géneros y autores: GROUP BY sobre la tabla de asociación, que recorre su índice (genero_id, libro_id) /
+#     (autor_id, libro_id) sin tocar la tabla libro salvo para filtrar por disponibilidad; los nombres se leen
+#     después solo para los `limite` valores con más libros;
+#   - disponibilidad: COUNT y SUM sobre el índice de libro.cantidad (o las filas del género/autor filtrado).
+# El resultado se guarda como snapshot por firma de filtros y versión del catálogo (cache.versioned_snapshot):
+# solo se recalcula cuando cambia la versión, y los clientes revalidan con If-None-Match.
+#
+# Las funciones devuelven sentencias select() para que las ejecute tanto la sesión de Flask como la asíncrona
+# del modo ASGI (app/aio/routes.py).
+
+from sqlalchemy import and_, case, func, select
+
+from app.models import Autor, Genero, Libro, libro_autor, libro_genero
+
+DEFAULT_LIMITE_FACETAS = 20
+
+VALORES_SI = ('1', 'true', 'si', 'sí', 'yes')
+VALORES_NO = ('0', 'false', 'no')
+
+
+def _int_param(args, name):
+    """Como request.args.get(name, type=int): None si falta o no es un entero."""
+    try:
+        return int(args[name])
+    except (KeyError, ValueError, TypeError):
+        return None
+
+
+def filtros_catalogo(args):
+    """Filtros del catálogo a partir de los parámetros de consulta (los valores inválidos se ignoran)."""
+    disponible = (args.get('disponible') or '').lower()
+    return {
+        'genero_id': _int_param(args, 'genero_id'),
+        'autor_id': _int_param(args, 'autor_id'),
+        'disponible': True if disponible in VALORES_SI else False if disponible in VALORES_NO else None,
+    }
+
+
+def filtrar_libros(stmt, libro_id, genero_id=None, autor_id=None, disponible=None, con_libro=True):
+    """Aplica los filtros a una consulta cuyas filas tienen el id de libro `libro_id`.
+
+    Vale para Libro.query y para select(). con_libro=False si la tabla libro no está en el FROM (se une solo
+    cuando hace falta filtrar por disponibilidad).
+    """
+    if genero_id is not None:
+        filtro_genero = libro_genero.alias('filtro_genero')
+        stmt = stmt.join(filtro_genero, and_(filtro_genero.c.libro_id == libro_id, filtro_genero.c.genero_id == genero_id))
+    if autor_id is not None:
+        filtro_autor = libro_autor.alias('filtro_autor')
+        stmt = stmt.join(filtro_autor, and_(filtro_autor.c.libro_id == libro_id, filtro_autor.c.autor_id == autor_id))
+    if disponible is not None:
+        if not con_libro:
+            stmt = stmt.join(Libro, Libro.id == libro_id)
+        stmt = stmt.filter(Libro.cantidad > 0 if disponible else Libro.cantidad <= 0)
+    return stmt
+
+
+def _faceta(asociacion, columna, modelo, columnas_nombre, filtros, limite):
+    """Los `limite` valores con más libros: recuento sobre la tabla de asociación y nombres de esos valores."""
+    total = func.count().label('total')
+    recuento = filtrar_libros(
+        select(columna.label('valor_id'), total).select_from(asociacion),
+        asociacion.c.libro_id, con_libro=False, **filtros,
+    ).group_by(columna).order_by(total.desc(), columna).limit(limite).subquery()
+    return (
+        select(modelo.id, *columnas_nombre, recuento.c.total)
+        .join(recuento, recuento.c.valor_id == modelo.id)
+        .order_by(recuento.c.total.desc(), modelo.id)
+    )
+
+
+def consultas_facetas(filtros, limite=DEFAULT_LIMITE_FACETAS):
+    """(disponibilidad, géneros, autores): las tres consultas agrupadas para los filtros dados."""
+    sin = lambda nombre: {k: v for k, v in filtros.items() if k != nombre}
+    disponibilidad = filtrar_libros(
+        select(func.count(Libro.id), func.coalesce(func.sum(case((Libro.cantidad > 0, 1), else_=0)), 0)),
+        Libro.id, **sin('disponible'),
+    )
+    generos = _faceta(libro_genero, libro_genero.c.genero_id, Genero, (Genero.nombre,), sin('genero_id'), limite)
+    autores = _faceta(libro_autor, libro_autor.c.autor_id, Autor, (Autor.nombre, Autor.ap_paterno), sin('autor_id'), limite)
+    return disponibilidad, generos, autores
+
+
+def armar_facetas(filtros, disponibilidad, generos, autores):
+    """Cuerpo de la respuesta a partir de las filas de consultas_facetas()."""
+    total, disponibles = disponibilidad
+    no_disponibles = total - disponibles
+    return {
+        'total': total if filtros['disponible'] is None else disponibles if filtros['disponible'] else no_disponibles,
+        'disponibilidad': {'disponibles': disponibles, 'noDisponibles': no_disponibles},
+        'generos': [{'id': g.id, 'nombre': g.nombre, 'total': g.total} for g in generos],
+        'autores': [{'id': a.id, 'nombre': f"{a.nombre} {a.ap_paterno or ''}".strip(), 'total': a.total} for a in autores],
+    }
@@ -0,0 +1,177 @@
+# app/libros/importer.py
+#
+# Importación masiva de libros desde CSV o JSONL.
+#
+# El archivo se lee como flujo y se procesa en bloques de IMPORT_CHUNK_SIZE filas; por cada bloque:
+#   1. se validan las filas y se descartan los ISBN repetidos (en el archivo o ya existentes, 1 consulta);
+#   2. se resuelven todos los autores y géneros del bloque por clave normalizada (libros/nombres.py),
+#      creando en bloque los que faltan;
+#   3. se insertan en bloque los libros, sus ejemplares (uno 'Disponible' por copia), sus filas de
+#      libro_autor/libro_genero y sus documentos de búsqueda;
+#   4. se actualizan los contadores y la versión del catálogo, y se hace commit.
+# La memoria depende del tamaño del bloque, no del archivo. Los errores se informan por número de fila.
+#
+# Formato CSV (con cabecera): isbn,nombre,cantidad,autores,generos — autores/géneros separados por ';'.
+# Formato JSONL: un objeto por línea con las mismas claves; autores/géneros como lista o texto con ';'.
+
+import csv
+import io
+import json
+import time
+
+from sqlalchemy import insert
+
+from app.models import db, Libro, Ejemplar, libro_autor, libro_genero
+from app.libros.search import documento_from_values, index_documentos
+from app.libros.nombres import clave, resolve_autores, resolve_generos
+from app.libros.cache import bump_catalog_version
+from app.bibliotecario.ejemplares import filas_ejemplares
+from app.utils import stats
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000 # Para no acumular una lista de errores sin límite
+
+REQUIRED_FIELDS = ('isbn', 'nombre', 'cantidad', 'autores', 'generos')
+
+
+def _split_list(value):
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [v.strip() for v in str(value or '').split(';') if v.strip()]
+
+
+def iter_rows(stream, formato):
+    """Genera (numero_de_fila, dict) desde un flujo binario, sin cargar el archivo completo."""
+    text_stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if formato == 'csv':
+        for numero, row in enumerate(csv.DictReader(text_stream), start=2): # la fila 1 es la cabecera
+            yield numero, row
+    else:
+        for numero, line in enumerate(text_stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield numero, None
+                continue
+            yield numero, row if isinstance(row, dict) else None
+
+
+def _parse_row(row):
+    """Valida y normaliza una fila. Devuelve (libro, None) o (None, mensaje_de_error)."""
+    if row is None:
+        return None, "Fila con formato inválido"
+    for field in REQUIRED_FIELDS:
+        if not row.get(field):
+            return None, f"El campo '{field}' es obligatorio"
+    try:
+        cantidad = int(row['cantidad'])
+    except (ValueError, TypeError):
+        return None, "El campo 'cantidad' debe ser un entero"
+    if cantidad < 0:
+        return None, "El campo 'cantidad' no puede ser negativo"
+    isbn = str(row['isbn']).strip()
+    if len(isbn) > 20:
+        return None, "El ISBN no puede tener más de 20 caracteres"
+    autores = _split_list(row['autores'])
+    generos = _split_list(row['generos'])
+    if not autores or not generos:
+        return None, "Se requiere al menos un autor y un género"
+    return {
+        'isbn': isbn,
+        'nombre': str(row['nombre']).strip(),
+        'cantidad': cantidad,
+        'autores': list(dict.fromkeys(autores)),
+        'generos': list(dict.fromkeys(generos)),
+    }, None
+
+
+def _load_chunk(libros):
+    """Inserta un bloque de libros ya validados y sin ISBN repetidos. No hace commit."""
+    # Todos los autores y géneros del bloque, por clave normalizada (los que faltan se crean en bloque)
+    autores = resolve_autores({a for libro in libros for a in libro['autores']})
+    generos = resolve_generos({g for libro in libros for g in libro['generos']})
+
+    db.session.execute(insert(Libro), [
+        {'isbn': l['isbn'], 'nombre': l['nombre'], 'cantidad': l['cantidad'], 'total_ejemplares': l['cantidad']}
+        for l in libros
+    ])
+    libro_ids = dict(db.session.query(Libro.isbn, Libro.id).filter(Libro.isbn.in_([l['isbn'] for l in libros])))
+
+    filas_autor, filas_genero, documentos, ejemplares = set(), set(), [], []
+    for libro in libros:
+        libro_id = libro_ids[libro['isbn']]
+        ejemplares.extend(filas_ejemplares(libro_id, 1, libro['cantidad']))
+        autores_libro = list(dict.fromkeys(autores[clave(a)] for a in libro['autores']))
+        generos_libro = list(dict.fromkeys(generos[clave(g)] for g in libro['generos']))
+        filas_autor.update((libro_id, autor_id) for autor_id, _ in autores_libro)
+        filas_genero.update((libro_id, genero_id) for genero_id, _ in generos_libro)
+        documentos.append({'libro_id': libro_id, **documento_from_values(
+            libro['nombre'], libro['isbn'], [n for _, n in autores_libro], [n for _, n in generos_libro])})
+
+    db.session.execute(libro_autor.insert(), [{'libro_id': l, 'autor_id': a} for l, a in filas_autor])
+    db.session.execute(libro_genero.insert(), [{'libro_id': l, 'genero_id': g} for l, g in filas_genero])
+    if ejemplares:
+        db.session.execute(insert(Ejemplar), ejemplares)
+    index_documentos(documentos)
+
+    stats.add_counter(stats.LIBROS_TOTAL, len(libros))
+    stats.add_counter(stats.COPIAS_DISPONIBLES, len(ejemplares))
+    stats.add_counter(stats.EJEMPLARES_TOTAL, len(ejemplares))
+    bump_catalog_version()
+
+
+def import_libros(stream, formato, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Importa libros desde un flujo CSV/JSONL. Hace commit por bloque y devuelve un resumen con errores."""
+    resumen = {'procesadas': 0, 'insertadas': 0, 'totalErrores': 0, 'errores': []}
+    inicio = time.perf_counter()
+
+    def error(numero, isbn, mensaje):
+        resumen['totalErrores'] += 1
+        if len(resumen['errores']) < MAX_REPORTED_ERRORS:
+            resumen['errores'].append({'fila': numero, 'isbn': isbn, 'error': mensaje})
+
+    def flush(bloque):
+        # ISBN ya existentes en la base de datos: una sola consulta por bloque
+        existentes = {isbn for (isbn,) in db.session.query(Libro.isbn).filter(Libro.isbn.in_([l['isbn'] for _, l in bloque]))}
+        validos = []
+        for numero, libro in bloque:
+            if libro['isbn'] in existentes:
+                error(numero, libro['isbn'], "Ya existe un libro con ese ISBN")
+            else:
+                validos.append(libro)
+        if not validos:
+            return
+        try:
+            _load_chunk(validos)
+            db.session.commit()
+            resumen['insertadas'] += len(validos)
+        except Exception as e:
+            db.session.rollback()
+            for numero, libro in bloque:
+                if libro['isbn'] not in existentes:
+                    error(numero, libro['isbn'], f"Error al insertar el bloque: {e}")
+
+    bloque, isbns_bloque = [], set()
+    for numero, row in iter_rows(stream, formato):
+        resumen['procesadas'] += 1
+        libro, mensaje = _parse_row(row)
+        if mensaje:
+            error(numero, (row or {}).get('isbn'), mensaje)
+            continue
+        if libro['isbn'] in isbns_bloque:
+            error(numero, libro['isbn'], "ISBN repetido en el archivo")
+            continue
+        bloque.append((numero, libro))
+        isbns_bloque.add(libro['isbn'])
+        if len(bloque) >= chunk_size:
+            flush(bloque)
+            bloque, isbns_bloque = [], set()
+    if bloque:
+        flush(bloque)
+
+    segundos = time.perf_counter() - inicio
+    resumen['segundos'] = round(segundos, 3)
+    resumen['librosPorSegundo'] = round(resumen['insertadas'] / segundos, 1) if segundos > 0 else None
+    return resumen
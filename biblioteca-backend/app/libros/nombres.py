@@ -0,0 +1,175 @@
+# app/libros/nombres.py
+#
+# Resolución de nombres de autores y géneros a sus ids, con clave normalizada y caché por proceso.
+#
+# Cada autor/género tiene una columna `clave` con índice único: el nombre completo en minúsculas, sin acentos y
+# con los espacios colapsados ('Gabriel  García Márquez' -> 'gabriel garcia marquez'). Así 'garcia marquez' y
+# 'García Márquez' son el mismo autor y no se acumulan duplicados.
+#
+# resolve_autores()/resolve_generos() reciben todos los nombres de una escritura y devuelven
+# {clave: (id, nombre)}: los que están en la caché no tocan la base de datos; el resto se busca con una sola
+# consulta por clave (índice único) y los que faltan se crean con un único INSERT en bloque. Lo resuelto se
+# pasa a la caché al hacer commit (un rollback lo descarta, igual que los ids de filas que nunca existieron), y
+# si la transacción borró algún autor o género la caché se vacía en ese commit.
+
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import event, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import db, Autor, Genero, libro_autor, libro_genero
+from app.libros.search import fold_text
+
+_PENDING_KEY = 'nombres_resueltos'
+_INVALIDATE_KEY = 'nombres_borrados'
+
+
+def clave(texto):
+    """Clave normalizada de un nombre: minúsculas, sin acentos y con un solo espacio entre palabras."""
+    return ' '.join(fold_text(texto or '').split())
+
+
+def split_autor(nombre_completo):
+    """Divide 'Nombre Apellido...' en (nombre, ap_paterno)."""
+    parts = ' '.join((nombre_completo or '').split()).split(' ', 1)
+    return parts[0], (parts[1] if len(parts) > 1 else None)
+
+
+class NameCache:
+    """LRU de clave -> (id, nombre) por tipo ('autor' o 'genero')."""
+
+    def __init__(self, max_entries=50000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (tipo, clave) -> (id, nombre)
+
+    def get_many(self, tipo, claves):
+        encontrados = {}
+        with self._lock:
+            for c in claves:
+                entry = self._entries.get((tipo, c))
+                if entry is not None:
+                    self._entries.move_to_end((tipo, c))
+                    encontrados[c] = entry
+        return encontrados
+
+    def put_many(self, tipo, valores):
+        with self._lock:
+            for c, entry in valores.items():
+                self._entries[(tipo, c)] = entry
+                self._entries.move_to_end((tipo, c))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def get_name_cache():
+    return current_app.extensions['nombres_cache']
+
+
+def init_name_cache(app):
+    app.config.setdefault('NAME_CACHE_MAX_ENTRIES', 50000)
+    app.extensions['nombres_cache'] = NameCache(max_entries=app.config['NAME_CACHE_MAX_ENTRIES'])
+
+
+@event.listens_for(Session, 'before_flush')
+def _before_flush(session, flush_context, instances):
+    if any(isinstance(obj, (Autor, Genero)) for obj in session.deleted):
+        session.info[_INVALIDATE_KEY] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    pendientes = session.info.pop(_PENDING_KEY, None)
+    borrados = session.info.pop(_INVALIDATE_KEY, False)
+    if not pendientes and not borrados:
+        return
+    try:
+        cache = get_name_cache()
+    except (RuntimeError, KeyError): # Commit fuera de un contexto de aplicación
+        return
+    if borrados:
+        cache.invalidate()
+    for tipo, valores in pendientes or ():
+        cache.put_many(tipo, valores)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending(session, previous_transaction):
+    if session.in_transaction():
+        return
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_INVALIDATE_KEY, None)
+
+
+def _resolve(tipo, model, columnas, mostrar, fila_nueva, nombres):
+    por_clave = {}
+    for nombre in nombres:
+        c = clave(nombre)
+        if c:
+            por_clave.setdefault(c, nombre)
+    resueltos = get_name_cache().get_many(tipo, por_clave)
+    faltan = [c for c in por_clave if c not in resueltos]
+    if not faltan:
+        return resueltos
+
+    def load(claves, bloquear=False):
+        query = db.session.query(model.id, model.clave, *columnas).filter(model.clave.in_(claves))
+        if bloquear:
+            # Lectura con bloqueo (FOR SHARE): en REPEATABLE READ (MySQL) una lectura normal usa la instantánea
+            # de la transacción y no vería la fila que otra transacción acaba de confirmar
+            query = query.with_for_update(read=True)
+        for row in query:
+            resueltos[row.clave] = (row.id, mostrar(row))
+
+    load(faltan)
+    for intento in range(2):
+        nuevas = [c for c in faltan if c not in resueltos]
+        if not nuevas:
+            break
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(model), [{'clave': c, **fila_nueva(por_clave[c])} for c in nuevas])
+            load(nuevas)
+        except IntegrityError:
+            if intento: # Otra escritura creó alguno a la vez: se reintenta una vez con los que sigan faltando
+                raise
+            load(nuevas, bloquear=True)
+    db.session.info.setdefault(_PENDING_KEY, []).append((tipo, {c: resueltos[c] for c in faltan}))
+    return resueltos
+
+
+def resolve_autores(nombres):
+    """{clave: (id, 'Nombre Apellido')} de los autores dados, creando los que no existen. No hace commit."""
+    def fila_nueva(nombre):
+        nombre, ap_paterno = split_autor(nombre)
+        return {'nombre': nombre, 'ap_paterno': ap_paterno}
+    return _resolve('autor', Autor, (Autor.nombre, Autor.ap_paterno),
+                    lambda row: f"{row.nombre} {row.ap_paterno or ''}".strip(), fila_nueva, nombres)
+
+
+def resolve_generos(nombres):
+    """{clave: (id, nombre)} de los géneros dados, creando los que no existen. No hace commit."""
+    return _resolve('genero', Genero, (Genero.nombre,), lambda row: row.nombre,
+                    lambda nombre: {'nombre': ' '.join(nombre.split())}, nombres)
+
+
+def set_libro_nombres(libro_id, autores=None, generos=None, reemplazar=False):
+    """Escribe las filas de libro_autor/libro_genero de un libro a partir de lo devuelto por resolve_*.
+
+    Con reemplazar=True borra antes las asociaciones existentes del tipo indicado (autores/generos no None).
+    """
+    for tabla, columna, resueltos in ((libro_autor, 'autor_id', autores), (libro_genero, 'genero_id', generos)):
+        if resueltos is None:
+            continue
+        if reemplazar:
+            db.session.execute(tabla.delete().where(tabla.c.libro_id == libro_id))
+        ids = dict.fromkeys(entry[0] for entry in resueltos.values())
+        if ids:
+            db.session.execute(tabla.insert(), [{'libro_id': libro_id, columna: i} for i in ids])
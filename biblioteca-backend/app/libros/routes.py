@@ -1,54 +1,220 @@
 # app/libros/routes.py
 
 from flask import Blueprint, jsonify, request
-from app.models import db, Libro, Autor, Genero # Asegúrate de que todos los modelos estén importados
-from flask_jwt_extended import jwt_required, get_jwt_identity # Importar para proteger rutas
+from app.models import db, Libro, Autor, Genero, Ejemplar, Prestamo # Asegúrate de que todos los modelos estén importados
+from app.utils.pagination import get_limit, get_cursor, encode_cursor, is_paginated, paginated_response
+from app.utils.streaming import wants_stream, iter_keyset, ndjson_response
+from app.libros.search import index_libro, index_documentos, documento_from_values, remove_libro, search_libros, rebuild_index
+from app.libros.nombres import resolve_autores, resolve_generos, set_libro_nombres
+from app.libros.cache import versioned_snapshot, bump_catalog_version
+from app.libros.facetas import filtros_catalogo, filtrar_libros, consultas_facetas, armar_facetas, DEFAULT_LIMITE_FACETAS
+from app.auth.decorators import require_role
+from app.utils import stats # Contadores agregados de los paneles
+from app.libros.importer import import_libros, DEFAULT_CHUNK_SIZE
+from app.bibliotecario.reservas import liberar_reservas # Cola de reservas por libro
+from app.bibliotecario.ejemplares import (alta_ejemplares, baja_disponibles, baja_ejemplar, EjemplarError,
+                                          MAX_EJEMPLARES_POR_ALTA) # Inventario por copia
+from flask_jwt_extended import jwt_required # Importar para proteger rutas
 from sqlalchemy import func # Importar func para funciones de agregación SQL (si se necesitan)
+from sqlalchemy.orm import selectinload # Carga por lotes de relaciones (evita el N+1)
+from sqlalchemy.exc import IntegrityError # Código de barras repetido
 import traceback # Para imprimir el traceback completo en caso de errores
+import click # Argumentos de los comandos CLI del blueprint
 
 libros_bp = Blueprint('libros', __name__)
 
-# --- ENDPOINT: OBTENER LISTA DE LIBROS ---
+# --- FUNCIÓN DE AYUDA PARA SERIALIZAR UN LIBRO ---
+# Espera que 'autores' y 'generos' ya estén cargados (selectinload) para no disparar consultas extra.
+def serialize_libro(libro):
+    return {
+        'id': libro.id,
+        'nombre': getattr(libro, 'nombre', ''),
+        'isbn': getattr(libro, 'isbn', ''),
+        'cantidad': getattr(libro, 'cantidad', 0), # Copias disponibles
+        'totalEjemplares': getattr(libro, 'total_ejemplares', 0),
+        'editorial': getattr(libro, 'editorial', None), # Asegúrate de que 'editorial' existe en tu modelo Libro
+        'edicion': getattr(libro, 'edicion', None),     # Asegúrate de que 'edicion' existe en tu modelo Libro
+        'autores': [f"{autor.nombre} {autor.ap_paterno or ''}".strip() for autor in libro.autores],
+        'generos': [genero.nombre for genero in libro.generos],
+        'portada': getattr(libro, 'portada', '/placeholder.svg'), # Si tienes campo 'portada'
+        'rating': getattr(libro, 'rating', 0.0), # Si tienes campo 'rating'
+    }
+
+def serialize_genero(genero):
+    return {'id': genero.id, 'nombre': genero.nombre}
+
+
+def serialize_autor(autor):
+    return {'id': autor.id, 'nombre': f"{autor.nombre} {getattr(autor, 'ap_paterno', '')}".strip()}
+
+# --- ENDPOINT: OBTENER LISTA DE LIBROS (PAGINADA) ---
+# Paginación por cursor (keyset) sobre Libro.id: ?limit=50&cursor=<X-Next-Cursor de la página anterior>
+# Sin ?limit= ni ?cursor= devuelve el catálogo completo, como antes (los clientes que no siguen X-Next-Cursor).
+# Filtros opcionales: ?genero_id=<id>&autor_id=<id>&disponible=<si|no> (ver libros/facetas.py)
+# Cada página cuesta siempre 3 consultas: la página de libros + 1 selectinload para autores + 1 para géneros.
+# Con ?stream=1 (o Accept: application/x-ndjson) devuelve todo el catálogo filtrado en NDJSON, un libro por línea.
 # <<< CAMBIO CRUCIAL AQUÍ: Definir la ruta para ambas versiones (con y sin barra final) >>>
 @libros_bp.route('', methods=['GET']) # Para /api/v1/libros
 @libros_bp.route('/', methods=['GET']) # Para /api/v1/libros/
 @jwt_required() # Asegúrate de proteger esta ruta si el catálogo público lo requiere
+@versioned_snapshot('libros') # ETag por versión del catálogo; 304 sin tocar la base de datos
 def get_libros():
     try:
-        libros = Libro.query.all()
-        resultado = []
-        for libro in libros:
-            # Asegúrate de que 'autores' y 'generos' sean relaciones y los campos existan
-            autores_nombres = [f"{autor.nombre} {getattr(autor, 'ap_paterno', '')}".strip() for autor in libro.autores] if hasattr(libro, 'autores') else []
-            generos_nombres = [genero.nombre for genero in libro.generos] if hasattr(libro, 'generos') else []
-
-            libro_data = {
-                'id': libro.id,
-                'nombre': getattr(libro, 'nombre', ''),
-                'isbn': getattr(libro, 'isbn', ''),
-                'cantidad': getattr(libro, 'cantidad', 0),
-                'editorial': getattr(libro, 'editorial', None), # Asegúrate de que 'editorial' existe en tu modelo Libro
-                'edicion': getattr(libro, 'edicion', None),     # Asegúrate de que 'edicion' existe en tu modelo Libro
-                'autores': autores_nombres,
-                'generos': generos_nombres,
-                'portada': getattr(libro, 'portada', '/placeholder.svg'), # Si tienes campo 'portada'
-                'rating': getattr(libro, 'rating', 0.0), # Si tienes campo 'rating'
-            }
-            resultado.append(libro_data)
-        return jsonify(resultado), 200
+        limit = get_limit()
+        cursor = get_cursor()
+        last_id = int(cursor[0]) if cursor else None
+    except (ValueError, TypeError):
+        return jsonify({'message': 'Parámetros de paginación inválidos'}), 400
+
+    try:
+        query = Libro.query.options(selectinload(Libro.autores), selectinload(Libro.generos))
+
+        # Los filtros de género/autor se resuelven con un JOIN contra la tabla de asociación (usa su clave primaria compuesta)
+        query = filtrar_libros(query, Libro.id, **filtros_catalogo(request.args))
+
+        # Modo streaming (NDJSON): todo el catálogo filtrado por lotes keyset, desde el cursor si viene
+        if wants_stream():
+            libros = iter_keyset(query, Libro.id, Libro.id, lambda libro: [libro.id], cursor=cursor)
+            return ndjson_response((serialize_libro(libro) for libro in libros), 'get_libros')
+
+        if not is_paginated():
+            return jsonify([serialize_libro(libro) for libro in query.order_by(Libro.id).all()]), 200
+
+        if last_id is not None:
+            query = query.filter(Libro.id > last_id)
+
+        # Se pide una fila de más para saber si existe una página siguiente sin hacer un COUNT
+        libros = query.order_by(Libro.id).limit(limit + 1).all()
+        has_more = len(libros) > limit
+        libros = libros[:limit]
+
+        next_cursor = encode_cursor(libros[-1].id) if has_more else None
+        resultado = [serialize_libro(libro) for libro in libros]
+        return paginated_response(jsonify(resultado), next_cursor), 200
     except Exception as e:
         db.session.rollback() # Siempre hacer rollback en un except
         print(f"ERROR EN get_libros (Libros API): {e}")
         traceback.print_exc()
         return jsonify({'message': 'Error al obtener los libros', 'error': str(e)}), 500
 
+# --- ENDPOINT: FACETAS DEL CATÁLOGO ---
+# Recuentos de libros por género, por autor y disponibles / no disponibles para los filtros de GET /libros
+# (?genero_id=&autor_id=&disponible=); ?limit= valores por faceta, los de más libros primero (20 por defecto).
+# Snapshot por firma de filtros y versión del catálogo, como el listado: 3 consultas agrupadas solo tras un cambio.
+@libros_bp.route('/facetas', methods=['GET'])
+@jwt_required()
+@versioned_snapshot('facetas')
+def get_facetas():
+    try:
+        filtros = filtros_catalogo(request.args)
+        disponibilidad, generos, autores = consultas_facetas(filtros, get_limit(default=DEFAULT_LIMITE_FACETAS))
+        return jsonify(armar_facetas(filtros, db.session.execute(disponibilidad).one(),
+                                     db.session.execute(generos).all(), db.session.execute(autores).all())), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR EN get_facetas: {e}")
+        traceback.print_exc()
+        return jsonify({'message': 'Error al obtener las facetas del catálogo', 'error': str(e)}), 500
+
+# --- ENDPOINT: BÚSQUEDA DE TEXTO COMPLETO EN EL CATÁLOGO ---
+# Busca en título, ISBN, autores y géneros (sin distinguir mayúsculas ni acentos) y ordena por relevancia.
+# ?q=garcia marquez&limit=20&cursor=<X-Next-Cursor>
+@libros_bp.route('/search', methods=['GET'])
+@jwt_required()
+def search_libros_endpoint():
+    q = (request.args.get('q') or '').strip()
+    if not q:
+        return jsonify({'message': "El parámetro 'q' es obligatorio"}), 400
+    try:
+        limit = get_limit()
+        cursor = get_cursor()
+        offset = int(cursor[0]) if cursor else 0
+    except (ValueError, TypeError):
+        return jsonify({'message': 'Parámetros de paginación inválidos'}), 400
+
+    try:
+        hits = search_libros(q, limit + 1, offset)
+        has_more = len(hits) > limit
+        hits = hits[:limit]
+
+        # Cargamos los libros de la página en una sola consulta y respetamos el orden del ranking
+        ids = [libro_id for libro_id, _ in hits]
+        libros = {libro.id: libro for libro in Libro.query.options(
+            selectinload(Libro.autores), selectinload(Libro.generos)
+        ).filter(Libro.id.in_(ids)).all()} if ids else {}
+
+        resultado = []
+        for libro_id, score in hits:
+            if libro_id in libros:
+                libro_data = serialize_libro(libros[libro_id])
+                libro_data['relevancia'] = round(score, 4)
+                resultado.append(libro_data)
+
+        next_cursor = encode_cursor(offset + limit) if has_more else None
+        return paginated_response(jsonify(resultado), next_cursor), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR EN search_libros: {e}")
+        traceback.print_exc()
+        return jsonify({'message': 'Error al buscar libros', 'error': str(e)}), 500
+
+# --- COMANDO CLI: RECONSTRUIR EL ÍNDICE DE BÚSQUEDA ---
+# Uso: flask libros reindex
+@libros_bp.cli.command('reindex')
+def reindex_command():
+    total = rebuild_index()
+    print(f"Índice de búsqueda reconstruido: {total} libros.")
+
+# --- ENDPOINT: IMPORTACIÓN MASIVA DE LIBROS (POST) ---
+# Recibe un archivo CSV o JSONL (multipart, campo 'archivo') y lo procesa por bloques con inserciones en lote.
+# El formato se toma de ?formato=csv|jsonl o de la extensión del archivo. Devuelve errores por fila y el
+# rendimiento obtenido (librosPorSegundo).
+@libros_bp.route('/import', methods=['POST'])
+@jwt_required()
+@require_role('Bibliotecario')
+def import_libros_endpoint():
+    archivo = request.files.get('archivo')
+    if archivo is None:
+        return jsonify({"message": "Se requiere un archivo en el campo 'archivo'"}), 400
+
+    formato = (request.args.get('formato') or (archivo.filename or '').rsplit('.', 1)[-1]).lower()
+    if formato == 'ndjson':
+        formato = 'jsonl'
+    if formato not in ('csv', 'jsonl'):
+        return jsonify({"message": "Formato no soportado. Use 'csv' o 'jsonl'."}), 400
+
+    chunk_size = request.args.get('chunk', DEFAULT_CHUNK_SIZE, type=int)
+    chunk_size = max(1, min(chunk_size, 5000))
+
+    try:
+        resumen = import_libros(archivo.stream, formato, chunk_size=chunk_size)
+        return jsonify(resumen), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR EN import_libros: {e}")
+        traceback.print_exc()
+        return jsonify({"message": "Error interno del servidor al importar libros", "error": str(e)}), 500
+
+# --- COMANDO CLI: IMPORTACIÓN MASIVA DESDE UN ARCHIVO LOCAL ---
+# Uso: flask libros import libros.csv   (útil para medir el rendimiento sin pasar por HTTP)
+@libros_bp.cli.command('import')
+@click.argument('ruta', type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk', default=DEFAULT_CHUNK_SIZE, show_default=True, help='Filas por bloque/transacción.')
+def import_command(ruta, chunk):
+    formato = 'csv' if ruta.lower().endswith('.csv') else 'jsonl'
+    with open(ruta, 'rb') as stream:
+        resumen = import_libros(stream, formato, chunk_size=chunk)
+    print(f"Filas procesadas: {resumen['procesadas']} | insertadas: {resumen['insertadas']} | "
+          f"errores: {resumen['totalErrores']} | {resumen['segundos']} s | {resumen['librosPorSegundo']} libros/s")
+
 # --- ENDPOINT: OBTENER GÉNEROS ---
 @libros_bp.route('/generos', methods=['GET'])
 # No requiere jwt_required si los géneros son públicos
+@versioned_snapshot('generos')
 def get_generos():
     try:
         generos = Genero.query.all()
-        resultado = [{'id': genero.id, 'nombre': genero.nombre} for genero in generos]
+        resultado = [serialize_genero(genero) for genero in generos]
         return jsonify(resultado), 200
     except Exception as e:
         db.session.rollback()
@@ -59,10 +225,11 @@ def get_generos():
 # --- ENDPOINT: OBTENER AUTORES ---
 @libros_bp.route('/autores', methods=['GET'])
 # No requiere jwt_required si los autores son públicos
+@versioned_snapshot('autores')
 def get_autores():
     try:
         autores = Autor.query.all()
-        resultado = [{'id': autor.id, 'nombre': f"{autor.nombre} {getattr(autor, 'ap_paterno', '')}".strip()} for autor in autores]
+        resultado = [serialize_autor(autor) for autor in autores]
         return jsonify(resultado), 200
     except Exception as e:
         db.session.rollback()
@@ -71,62 +238,49 @@ def get_autores():
         return jsonify({'message': 'Error al obtener los autores', 'error': str(e)}), 500
 
 # --- ENDPOINT: AGREGAR NUEVO LIBRO (POST) ---
-# Se asume que el bibliotecario puede añadir libros.
-# Deberías tener una función check_bibliotecario() en tu app/bibliotecario/routes.py
-# o una función genérica de verificación de rol si quieres centralizarla.
+# Solo el bibliotecario puede añadir libros (verificación centralizada en @require_role).
 @libros_bp.route('', methods=['POST']) # Para /api/v1/libros
 @libros_bp.route('/', methods=['POST']) # Para /api/v1/libros/
 @jwt_required()
+@require_role('Bibliotecario')
 def add_libro():
-    # Asumo que la verificación de rol de bibliotecario se hará aquí.
-    # Necesitarías importar check_bibliotecario de app.bibliotecario.routes o similar.
-    # if not check_bibliotecario(): return jsonify({"message": "Acceso denegado"}), 403
-    
     data = request.get_json()
     required_fields = ['isbn', 'nombre', 'cantidad', 'autores', 'generos']
     for field in required_fields:
         if not data.get(field):
             return jsonify({"message": f"El campo '{field}' es obligatorio"}), 400
 
+    cantidad = data['cantidad']
+    if not isinstance(cantidad, int) or not 0 < cantidad <= MAX_EJEMPLARES_POR_ALTA:
+        return jsonify({"message": f"El campo 'cantidad' debe ser un entero entre 1 y {MAX_EJEMPLARES_POR_ALTA}"}), 400
+
     if Libro.query.filter_by(isbn=data['isbn']).first():
         return jsonify({"message": "Ya existe un libro con ese ISBN"}), 409
 
     try:
-        # Procesar autores: buscar existentes o crear nuevos
-        autores_objs = []
-        for autor_name_full in data['autores']:
-            # Intentar dividir por espacio para nombre y apellido paterno
-            parts = autor_name_full.split(' ', 1)
-            nombre_autor = parts[0]
-            ap_paterno_autor = parts[1] if len(parts) > 1 else None
-
-            autor_obj = Autor.query.filter_by(nombre=nombre_autor, ap_paterno=ap_paterno_autor).first()
-            if not autor_obj:
-                autor_obj = Autor(nombre=nombre_autor, ap_paterno=ap_paterno_autor)
-                db.session.add(autor_obj)
-                db.session.flush() # flush para que los nuevos autores tengan ID antes de usarlos
-            autores_objs.append(autor_obj)
-
-        # Procesar géneros: buscar existentes o crear nuevos
-        generos_objs = []
-        for genero_name in data['generos']:
-            genero_obj = Genero.query.filter_by(nombre=genero_name).first()
-            if not genero_obj:
-                genero_obj = Genero(nombre=genero_name)
-                db.session.add(genero_obj)
-                db.session.flush() # flush para que los nuevos géneros tengan ID
-            generos_objs.append(genero_obj)
+        # Autores y géneros por clave normalizada: caché del proceso y una consulta para los que falten
+        autores = resolve_autores(data['autores'])
+        generos = resolve_generos(data['generos'])
 
         nuevo_libro = Libro(
             isbn=data['isbn'],
             nombre=data['nombre'],
-            cantidad=data['cantidad'],
-            editorial=data.get('editorial'), # Asumo que estos campos están en el modelo Libro
-            edicion=data.get('edicion'),     # Asumo que estos campos están en el modelo Libro
-            autores=autores_objs, # Asigna la lista de objetos Autor
-            generos=generos_objs # Asigna la lista de objetos Genero
+            cantidad=0, # Las copias se cuentan al darlas de alta (alta_ejemplares)
+            total_ejemplares=0,
+            # 'editorial' y 'edicion' ya no son columnas de Libro (ver migración 34269ac9c7f8),
+            # por eso no se pasan al constructor.
         )
         db.session.add(nuevo_libro)
+        db.session.flush() # ID del libro para sus filas de libro_autor/libro_genero
+        set_libro_nombres(nuevo_libro.id, autores, generos)
+        index_documentos([{ # Documento de búsqueda en la misma transacción
+            'libro_id': nuevo_libro.id,
+            **documento_from_values(nuevo_libro.nombre, nuevo_libro.isbn,
+                                    [nombre for _, nombre in autores.values()], [nombre for _, nombre in generos.values()]),
+        }])
+        alta_ejemplares(nuevo_libro.id, cantidad) # Un ejemplar con código de barras por copia
+        bump_catalog_version() # Invalida ETags y snapshots del catálogo
+        stats.add_counter(stats.LIBROS_TOTAL, 1)
         db.session.commit()
         return jsonify({"message": "Libro añadido exitosamente", "libro_id": nuevo_libro.id}), 201
     except Exception as e:
@@ -139,52 +293,50 @@ def add_libro():
 @libros_bp.route('/<int:libro_id>', methods=['PUT', 'PATCH']) # Para /api/v1/libros/:id
 @libros_bp.route('/<int:libro_id>/', methods=['PUT', 'PATCH']) # Para /api/v1/libros/:id/
 @jwt_required()
+@require_role('Bibliotecario')
 def update_libro(libro_id):
-    # Asumo que la verificación de rol de bibliotecario se hará aquí.
-    # if not check_bibliotecario(): return jsonify({"message": "Acceso denegado"}), 403
-    
     data = request.get_json()
     libro_to_update = db.session.get(Libro, libro_id)
     if not libro_to_update:
         return jsonify({"message": "Libro no encontrado"}), 404
+    cantidad = data.get('cantidad')
+    if cantidad is not None and (not isinstance(cantidad, int) or cantidad < 0):
+        return jsonify({"message": "El campo 'cantidad' debe ser un entero no negativo"}), 400
+    # 'cantidad' son las copias disponibles deseadas: se dan de alta ejemplares nuevos (que atienden primero la
+    # cola de reservas) o de baja los disponibles que sobran
+    cambio = cantidad - (libro_to_update.cantidad or 0) if cantidad is not None else 0
+    if cambio > MAX_EJEMPLARES_POR_ALTA:
+        return jsonify({"message": f"No se pueden añadir más de {MAX_EJEMPLARES_POR_ALTA} copias a la vez"}), 400
+    if data.get('isbn') and data['isbn'] != libro_to_update.isbn:
+        if Libro.query.filter(Libro.isbn == data['isbn'], Libro.id != libro_id).first():
+            return jsonify({"message": "Ya existe un libro con ese ISBN"}), 409
 
     try:
         libro_to_update.isbn = data.get('isbn', libro_to_update.isbn)
         libro_to_update.nombre = data.get('nombre', libro_to_update.nombre)
-        libro_to_update.cantidad = data.get('cantidad', libro_to_update.cantidad)
-        libro_to_update.editorial = data.get('editorial', libro_to_update.editorial)
-        libro_to_update.edicion = data.get('edicion', libro_to_update.edicion)
-
-        # Procesar autores si se proporcionan
-        if 'autores' in data and data['autores'] is not None:
-            autores_objs = []
-            for autor_name_full in data['autores']:
-                parts = autor_name_full.split(' ', 1)
-                nombre_autor = parts[0]
-                ap_paterno_autor = parts[1] if len(parts) > 1 else None
-                autor_obj = Autor.query.filter_by(nombre=nombre_autor, ap_paterno=ap_paterno_autor).first()
-                if not autor_obj:
-                    autor_obj = Autor(nombre=nombre_autor, ap_paterno=ap_paterno_autor)
-                    db.session.add(autor_obj)
-                autores_objs.append(autor_obj)
-            libro_to_update.autores = autores_objs # Reemplaza la lista de autores
-            db.session.flush() # flush para que los nuevos autores tengan ID antes de commit
-
-        # Procesar géneros si se proporcionan
-        if 'generos' in data and data['generos'] is not None:
-            generos_objs = []
-            for genero_name in data['generos']:
-                genero_obj = Genero.query.filter_by(nombre=genero_name).first()
-                if not genero_obj:
-                    genero_obj = Genero(nombre=genero_name)
-                    db.session.add(genero_obj)
-                generos_objs.append(genero_obj)
-            libro_to_update.generos = generos_objs # Reemplaza la lista de géneros
-            db.session.flush() # flush para que los nuevos géneros tengan ID
+        if cambio > 0:
+            alta_ejemplares(libro_to_update.id, cambio)
+        elif cambio < 0:
+            baja_disponibles(libro_to_update.id, -cambio)
+        # 'editorial' y 'edicion' ya no son columnas de Libro (ver migración 34269ac9c7f8)
 
+        # Reemplazar autores/géneros si se proporcionan (resueltos por clave normalizada, ver libros/nombres.py)
+        autores = resolve_autores(data['autores']) if data.get('autores') is not None else None
+        generos = resolve_generos(data['generos']) if data.get('generos') is not None else None
+        if autores is not None or generos is not None:
+            set_libro_nombres(libro_to_update.id, autores, generos, reemplazar=True)
+            db.session.expire(libro_to_update, ['autores', 'generos']) # Se recargan al reindexar
 
+        index_libro(libro_to_update) # Reindexar con los datos nuevos en la misma transacción
+        bump_catalog_version()
         db.session.commit()
         return jsonify({"message": "Libro actualizado exitosamente", "libro_id": libro_to_update.id}), 200
+    except EjemplarError as e:
+        db.session.rollback()
+        return jsonify({"message": e.message}), e.status
+    except IntegrityError:
+        db.session.rollback() # Otro libro tomó el mismo ISBN a la vez
+        return jsonify({"message": "Ya existe un libro con ese ISBN"}), 409
     except Exception as e:
         db.session.rollback()
         print(f"ERROR EN update_libro: {e}")
@@ -195,26 +347,124 @@ def update_libro(libro_id):
 @libros_bp.route('/<int:libro_id>', methods=['DELETE']) # Para /api/v1/libros/:id
 @libros_bp.route('/<int:libro_id>/', methods=['DELETE']) # Para /api/v1/libros/:id/
 @jwt_required()
+@require_role('Bibliotecario')
 def delete_libro(libro_id):
-    # Asumo que la verificación de rol de bibliotecario se hará aquí.
-    # if not check_bibliotecario(): return jsonify({"message": "Acceso denegado"}), 403
-    
-    libro_to_delete = db.session.get(Libro, libro_id)
+    # Fila del libro bloqueada: una aprobación concurrente (que descuenta su cantidad) espera a este borrado
+    libro_to_delete = db.session.get(Libro, libro_id, with_for_update=True)
     if not libro_to_delete:
         return jsonify({"message": "Libro no encontrado"}), 404
-    
-    try:
-        # Regla de negocio: No permitir eliminar si hay préstamos activos asociados a este libro.
-        # Esto requeriría una relación directa entre Prestamo y Libro (ej. libro_prestado_id = db.Column(db.Integer, db.ForeignKey('libro.id')) )
-        # Si tienes esa relación:
-        # if Prestamo.query.filter_by(libro_id=libro_id, estado='Activo').first():
-        #    return jsonify({"message": "No se puede eliminar el libro: tiene préstamos activos."}), 409
 
+    # Regla de negocio: no se elimina un libro con copias prestadas (sus préstamos no podrían devolverse)
+    if Prestamo.query.filter(Prestamo.libro_id == libro_id, Prestamo.estado.in_(('Activo', 'Vencido'))).first():
+        db.session.rollback()
+        return jsonify({"message": "No se puede eliminar el libro: tiene préstamos activos."}), 409
+
+    try:
+        liberar_reservas(libro_id=libro_id) # Su cola de reservas desaparece con el libro
+        remove_libro(libro_id) # Quitar su documento del índice de búsqueda
+        # Los préstamos ya devueltos se conservan en el historial, sin referencia al libro ni a sus ejemplares
+        db.session.execute(db.update(Prestamo).where(Prestamo.libro_id == libro_id, Prestamo.estado == 'Devuelto')
+                           .values(libro_id=None, ejemplar_id=None).execution_options(synchronize_session=False))
+        db.session.execute(db.delete(Ejemplar).where(Ejemplar.libro_id == libro_id))
         db.session.delete(libro_to_delete)
+        bump_catalog_version()
+        stats.add_counter(stats.LIBROS_TOTAL, -1)
+        stats.add_counter(stats.COPIAS_DISPONIBLES, -(libro_to_delete.cantidad or 0))
+        stats.add_counter(stats.EJEMPLARES_TOTAL, -(libro_to_delete.total_ejemplares or 0))
         db.session.commit()
         return jsonify({"message": "Libro eliminado exitosamente"}), 200
     except Exception as e:
         db.session.rollback()
         print(f"ERROR EN delete_libro: {e}")
         traceback.print_exc()
-        return jsonify({"message": "Error interno del servidor al eliminar libro", "error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"message": "Error interno del servidor al eliminar libro", "error": str(e)}), 500
+
+# --- ENDPOINT: Ejemplares (copias físicas) de un libro ---
+# Solo el bibliotecario gestiona el inventario por copia (ver bibliotecario/ejemplares.py).
+@libros_bp.route('/<int:libro_id>/ejemplares', methods=['GET'])
+@jwt_required()
+@require_role('Bibliotecario')
+def get_ejemplares(libro_id):
+    libro = db.session.get(Libro, libro_id)
+    if not libro:
+        return jsonify({"message": "Libro no encontrado"}), 404
+
+    try:
+        ejemplares = db.session.scalars(
+            db.select(Ejemplar).where(Ejemplar.libro_id == libro_id).order_by(Ejemplar.id)
+        ).all()
+        return jsonify({
+            "libroId": libro.id,
+            "disponibles": libro.cantidad or 0,
+            "totalEjemplares": libro.total_ejemplares or 0,
+            "ejemplares": [{
+                'id': e.id,
+                'codigoBarras': e.codigo_barras,
+                'estado': e.estado,
+                'fechaAlta': e.fecha_alta,
+                'fechaBaja': e.fecha_baja,
+            } for e in ejemplares],
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR EN get_ejemplares: {e}")
+        traceback.print_exc()
+        return jsonify({"message": "Error interno del servidor al obtener ejemplares", "error": str(e)}), 500
+
+
+@libros_bp.route('/<int:libro_id>/ejemplares', methods=['POST'])
+@jwt_required()
+@require_role('Bibliotecario')
+def add_ejemplares(libro_id):
+    data = request.get_json(silent=True) or {}
+    codigos = data.get('codigos')
+    cantidad = data.get('cantidad')
+    if codigos is not None:
+        if (not isinstance(codigos, list) or not codigos
+                or not all(isinstance(c, str) and c.strip() and len(c.strip()) <= 32 for c in codigos)):
+            return jsonify({"message": "'codigos' debe ser una lista de códigos de barras (texto, máximo 32 caracteres)"}), 400
+        codigos = [c.strip() for c in codigos]
+        if len(set(codigos)) != len(codigos):
+            return jsonify({"message": "Hay códigos de barras repetidos en la petición"}), 400
+        cantidad = len(codigos)
+    elif not isinstance(cantidad, int) or cantidad <= 0:
+        return jsonify({"message": "Indique 'cantidad' (entero positivo) o 'codigos'"}), 400
+    if cantidad > MAX_EJEMPLARES_POR_ALTA:
+        return jsonify({"message": f"No se pueden añadir más de {MAX_EJEMPLARES_POR_ALTA} ejemplares a la vez"}), 400
+
+    if not db.session.get(Libro, libro_id):
+        return jsonify({"message": "Libro no encontrado"}), 404
+
+    try:
+        nuevos = alta_ejemplares(libro_id, cantidad, codigos)
+        db.session.commit()
+        return jsonify({
+            "message": "Ejemplares añadidos exitosamente",
+            "ejemplares": [{'id': e['id'], 'codigoBarras': e['codigo_barras']} for e in nuevos],
+        }), 201
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"message": "Alguno de los códigos de barras ya está registrado"}), 409
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR EN add_ejemplares: {e}")
+        traceback.print_exc()
+        return jsonify({"message": "Error interno del servidor al añadir ejemplares", "error": str(e)}), 500
+
+
+@libros_bp.route('/ejemplares/<int:ejemplar_id>', methods=['DELETE'])
+@jwt_required()
+@require_role('Bibliotecario')
+def delete_ejemplar(ejemplar_id):
+    try:
+        baja_ejemplar(ejemplar_id)
+        db.session.commit()
+        return jsonify({"message": "Ejemplar dado de baja exitosamente"}), 200
+    except EjemplarError as e:
+        db.session.rollback()
+        return jsonify({"message": e.message}), e.status
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR EN delete_ejemplar: {e}")
+        traceback.print_exc()
+        return jsonify({"message": "Error interno del servidor al dar de baja el ejemplar", "error": str(e)}), 500
@@ -0,0 +1,384 @@
+# app/libros/search.py
+#
+# Motor de búsqueda de texto completo del catálogo.
+#
+# Cada libro tiene un documento en la tabla 'libro_busqueda' con su título, ISBN, autores y géneros ya
+# normalizados (minúsculas y sin acentos). Ese documento se escribe en la MISMA transacción que el libro
+# (ver index_libro / remove_libro), y sobre él trabaja uno de estos backends:
+#   - 'mysql':  índice FULLTEXT + MATCH ... AGAINST en modo booleano (relevancia de InnoDB).
+#   - 'sqlite': tabla virtual FTS5 sincronizada a mano, ordenada por bm25(). La primera búsqueda del proceso la
+#               carga desde libro_busqueda si no está al día (p. ej. catálogo anterior al índice).
+#   - 'memory': índice invertido en el proceso (TF-IDF). Pensado para pruebas/desarrollo: cada worker
+#               tiene su propia copia y solo ve las escrituras que se confirman en ese mismo proceso.
+# El backend se elige con SEARCH_BACKEND ('auto' por defecto: según el dialecto del motor).
+
+import bisect
+import math
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+from flask import current_app
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.models import db, Libro, LibroBusqueda
+
+# Palabras vacías más comunes del español; se ignoran en la consulta salvo que sea lo único que hay
+STOPWORDS = {'a', 'al', 'de', 'del', 'el', 'en', 'la', 'las', 'lo', 'los', 'o', 'para', 'por', 'un', 'una', 'y'}
+
+# Peso relativo de cada campo en el ranking (título > autores > géneros > ISBN)
+FIELD_WEIGHTS = {'titulo': 10.0, 'autores': 5.0, 'generos': 2.0, 'isbn': 1.0}
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+_ISBN_DASH_RE = re.compile(r'(?<=\d)-(?=\d)')  # '978-84-376' se busca como '97884376'
+
+
+def fold_text(value):
+    """Pasa a minúsculas y elimina acentos/diacríticos ('Márquez' -> 'marquez', 'Ñandú' -> 'nandu')."""
+    if not value:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', value)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(value):
+    """Divide un texto (ya normalizado o no) en tokens alfanuméricos."""
+    return _TOKEN_RE.findall(fold_text(value))
+
+
+def query_tokens(q):
+    """Tokens de una consulta de usuario, sin palabras vacías (si queda algo)."""
+    tokens = tokenize(_ISBN_DASH_RE.sub('', q or ''))
+    significant = [t for t in tokens if t not in STOPWORDS]
+    return list(dict.fromkeys(significant or tokens))
+
+
+def build_documento(libro):
+    """Construye los campos normalizados del documento de búsqueda de un libro."""
+    autores = [f"{autor.nombre} {autor.ap_paterno or ''}" for autor in libro.autores]
+    return documento_from_values(libro.nombre, libro.isbn, autores, [g.nombre for g in libro.generos])
+
+
+def documento_from_values(nombre, isbn, autores, generos):
+    """Igual que build_documento, pero a partir de valores sueltos (útil en cargas masivas)."""
+    return {
+        'titulo': ' '.join(tokenize(nombre)),
+        'isbn': fold_text(isbn or '').replace('-', ''),
+        'autores': ' '.join(tokenize(' '.join(autores))),
+        'generos': ' '.join(tokenize(' '.join(generos))),
+    }
+
+
+# --- BACKENDS ---
+
+class MySQLFullTextBackend:
+    name = 'mysql'
+
+    def sync(self, libro_id, documento):
+        pass # El índice FULLTEXT de InnoDB se mantiene solo con la fila de libro_busqueda
+
+    def sync_many(self, documentos):
+        pass
+
+    def remove(self, libro_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, tokens, limit, offset):
+        # '+token*' exige cada término y permite coincidencias por prefijo
+        boolean_query = ' '.join(f'+{t}*' for t in tokens)
+        match = "MATCH(titulo, isbn, autores, generos) AGAINST (:q IN BOOLEAN MODE)"
+        rows = db.session.execute(text(
+            f"SELECT libro_id, {match} AS score FROM libro_busqueda "
+            f"WHERE {match} ORDER BY score DESC, libro_id LIMIT :limit OFFSET :offset"
+        ), {'q': boolean_query, 'limit': limit, 'offset': offset}).all()
+        return [(row.libro_id, float(row.score)) for row in rows]
+
+
+class SQLiteFTS5Backend:
+    name = 'sqlite'
+    table = 'libro_busqueda_fts'
+
+    def __init__(self):
+        self._ready = False
+        self._loaded = False
+
+    def _ensure_table(self):
+        if self._ready:
+            return
+        db.session.execute(text(self._create_sql()))
+        self._ready = True
+
+    def _create_sql(self):
+        return (f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                "libro_id UNINDEXED, titulo, isbn, autores, generos, tokenize='unicode61 remove_diacritics 2')")
+
+    def _fill_sql(self):
+        return (f"INSERT INTO {self.table} (libro_id, titulo, isbn, autores, generos) "
+                "SELECT libro_id, titulo, isbn, autores, generos FROM libro_busqueda")
+
+    def _ensure_loaded(self):
+        """Primera búsqueda del proceso: si la tabla FTS5 no existe o no tiene los mismos documentos que
+        libro_busqueda (catálogo anterior al índice), se carga desde ahí. Va en una conexión aparte que se
+        confirma enseguida, porque la petición de búsqueda no hace commit."""
+        if self._loaded:
+            return
+        with db.engine.begin() as conn:
+            conn.execute(text(self._create_sql()))
+            indexados = conn.execute(text(f"SELECT COUNT(*) FROM {self.table}")).scalar()
+            if indexados != conn.execute(text("SELECT COUNT(*) FROM libro_busqueda")).scalar():
+                conn.execute(text(f"DELETE FROM {self.table}"))
+                conn.execute(text(self._fill_sql()))
+        self._ready = self._loaded = True
+
+    def sync(self, libro_id, documento):
+        self._ensure_table()
+        db.session.execute(text(f"DELETE FROM {self.table} WHERE libro_id = :id"), {'id': libro_id})
+        db.session.execute(text(
+            f"INSERT INTO {self.table} (libro_id, titulo, isbn, autores, generos) "
+            "VALUES (:id, :titulo, :isbn, :autores, :generos)"
+        ), {'id': libro_id, **documento})
+
+    def sync_many(self, documentos):
+        """Inserta documentos de libros NUEVOS (sin borrar antes) con un solo executemany."""
+        self._ensure_table()
+        db.session.execute(text(
+            f"INSERT INTO {self.table} (libro_id, titulo, isbn, autores, generos) "
+            "VALUES (:libro_id, :titulo, :isbn, :autores, :generos)"
+        ), documentos)
+
+    def remove(self, libro_id):
+        self._ensure_table()
+        db.session.execute(text(f"DELETE FROM {self.table} WHERE libro_id = :id"), {'id': libro_id})
+
+    def rebuild(self):
+        self._ensure_table()
+        db.session.execute(text(f"DELETE FROM {self.table}"))
+        db.session.execute(text(self._fill_sql()))
+        self._loaded = True
+
+    def search(self, tokens, limit, offset):
+        self._ensure_loaded()
+        fts_query = ' AND '.join(f'"{t}"*' for t in tokens)
+        weights = ', '.join(str(FIELD_WEIGHTS[f]) for f in ('titulo', 'isbn', 'autores', 'generos'))
+        # bm25() devuelve valores negativos: cuanto menor, más relevante
+        rows = db.session.execute(text(
+            f"SELECT libro_id, -bm25({self.table}, 0, {weights}) AS score FROM {self.table} "
+            f"WHERE {self.table} MATCH :q ORDER BY score DESC, libro_id LIMIT :limit OFFSET :offset"
+        ), {'q': fts_query, 'limit': limit, 'offset': offset}).all()
+        return [(int(row.libro_id), float(row.score)) for row in rows]
+
+
+class InMemoryInvertedIndex:
+    name = 'memory'
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = defaultdict(dict)  # token -> {libro_id: peso}
+        self._doc_tokens = {}               # libro_id -> set(tokens) (para poder borrar)
+        self._vocabulary = []               # tokens ordenados, para búsquedas por prefijo con bisect
+        self._loaded = False # Se carga desde libro_busqueda en la primera búsqueda (rebuild)
+
+    # Los cambios se encolan en la sesión y solo se aplican si la transacción se confirma
+    def sync(self, libro_id, documento):
+        db.session.info.setdefault('busqueda_pendiente', []).append((libro_id, documento))
+
+    def remove(self, libro_id):
+        db.session.info.setdefault('busqueda_pendiente', []).append((libro_id, None))
+
+    def sync_many(self, documentos):
+        pending = db.session.info.setdefault('busqueda_pendiente', [])
+        pending.extend((doc['libro_id'], {f: doc[f] for f in FIELD_WEIGHTS}) for doc in documentos)
+
+    def apply_pending(self, pending):
+        if self._loaded: # Si no, la primera búsqueda lo carga todo desde libro_busqueda
+            with self._lock:
+                for libro_id, documento in pending:
+                    self._index(libro_id, documento)
+
+    def _index(self, libro_id, documento):
+        for token in self._doc_tokens.pop(libro_id, ()):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(libro_id, None)
+                if not postings:
+                    del self._postings[token]
+                    index = bisect.bisect_left(self._vocabulary, token)
+                    if index < len(self._vocabulary) and self._vocabulary[index] == token:
+                        self._vocabulary.pop(index)
+        if documento is None:
+            return
+        weights = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in documento[field].split():
+                weights[token] += weight
+        for token, weight in weights.items():
+            if token not in self._postings:
+                bisect.insort(self._vocabulary, token)
+            self._postings[token][libro_id] = weight
+        self._doc_tokens[libro_id] = set(weights)
+
+    def rebuild(self):
+        with self._lock:
+            self._postings.clear()
+            self._doc_tokens.clear()
+            self._vocabulary = []
+            for row in db.session.query(LibroBusqueda).yield_per(1000):
+                self._index(row.libro_id, {f: getattr(row, f) for f in FIELD_WEIGHTS})
+            self._loaded = True
+
+    def _matches(self, token):
+        """Une los postings de todos los términos del vocabulario que empiezan por 'token'."""
+        matched = {}
+        start = bisect.bisect_left(self._vocabulary, token)
+        for term in self._vocabulary[start:]:
+            if not term.startswith(token):
+                break
+            for libro_id, weight in self._postings[term].items():
+                matched[libro_id] = max(matched.get(libro_id, 0.0), weight)
+        return matched
+
+    def search(self, tokens, limit, offset):
+        if not self._loaded:
+            self.rebuild()
+        with self._lock:
+            total_docs = max(len(self._doc_tokens), 1)
+            scores = None
+            for token in tokens:
+                matched = self._matches(token)
+                idf = math.log(1 + total_docs / (1 + len(matched)))
+                token_scores = {libro_id: weight * idf for libro_id, weight in matched.items()}
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {i: s + token_scores[i] for i, s in scores.items() if i in token_scores}
+                if not scores:
+                    return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[offset:offset + limit]
+
+
+# --- API DEL MÓDULO ---
+
+def _create_backend(name):
+    if name == 'auto':
+        dialect = db.engine.dialect.name
+        if dialect in ('mysql', 'mariadb'):
+            name = 'mysql'
+        elif dialect == 'sqlite' and _sqlite_has_fts5():
+            name = 'sqlite'
+        else:
+            name = 'memory'
+    backends = {'mysql': MySQLFullTextBackend, 'sqlite': SQLiteFTS5Backend, 'memory': InMemoryInvertedIndex}
+    if name not in backends:
+        raise ValueError(f"SEARCH_BACKEND desconocido: {name}")
+    return backends[name]()
+
+
+def _sqlite_has_fts5():
+    with db.engine.connect() as conn:
+        options = {row[0] for row in conn.exec_driver_sql("PRAGMA compile_options")}
+    return 'ENABLE_FTS5' in options
+
+
+def get_backend():
+    """Devuelve el backend de búsqueda de la app actual (se crea en el primer uso)."""
+    state = current_app.extensions['busqueda']
+    if state.get('backend') is None:
+        with state['lock']:
+            if state.get('backend') is None:
+                state['backend'] = _create_backend(current_app.config.get('SEARCH_BACKEND', 'auto'))
+    return state['backend']
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    pending = session.info.pop('busqueda_pendiente', None)
+    if not pending:
+        return
+    try:
+        backend = current_app.extensions['busqueda'].get('backend')
+    except (RuntimeError, KeyError): # Commit fuera de un contexto de aplicación
+        return
+    if isinstance(backend, InMemoryInvertedIndex):
+        backend.apply_pending(pending)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending(session, previous_transaction):
+    if session.in_transaction():
+        return # Rollback de un savepoint: la transacción exterior sigue viva
+    session.info.pop('busqueda_pendiente', None)
+
+
+def init_search(app):
+    app.config.setdefault('SEARCH_BACKEND', 'auto')
+    app.extensions['busqueda'] = {'backend': None, 'lock': threading.Lock()}
+
+
+def index_libro(libro):
+    """Escribe (o reescribe) el documento de búsqueda de un libro dentro de la transacción actual."""
+    if libro.id is None:
+        db.session.flush() # Necesitamos el ID del libro nuevo
+    documento = build_documento(libro)
+    db.session.merge(LibroBusqueda(libro_id=libro.id, **documento))
+    get_backend().sync(libro.id, documento)
+
+
+def index_documentos(documentos):
+    """Inserta en bloque documentos de libros nuevos: [{'libro_id': ..., 'titulo': ..., ...}, ...]."""
+    if not documentos:
+        return
+    db.session.execute(LibroBusqueda.__table__.insert(), documentos)
+    get_backend().sync_many(documentos)
+
+
+def remove_libro(libro_id):
+    """Borra el documento de búsqueda de un libro dentro de la transacción actual."""
+    LibroBusqueda.query.filter_by(libro_id=libro_id).delete(synchronize_session=False)
+    get_backend().remove(libro_id)
+
+
+def search_libros(q, limit, offset=0):
+    """Devuelve [(libro_id, score), ...] ordenados por relevancia."""
+    tokens = query_tokens(q)
+    if not tokens:
+        return []
+    return get_backend().search(tokens, limit, offset)
+
+
+def rebuild_index(batch_size=5000):
+    """Regenera libro_busqueda desde cero a partir de Libro y reconstruye el índice del backend."""
+    from app.models import Autor, Genero, libro_autor, libro_genero
+
+    LibroBusqueda.query.delete(synchronize_session=False)
+    total = 0
+    last_id = 0
+    while True:
+        # Consultas de columnas por rango de ids (sin entidades ORM): memoria acotada y sin listas IN enormes
+        libros = (db.session.query(Libro.id, Libro.nombre, Libro.isbn)
+                  .filter(Libro.id > last_id).order_by(Libro.id).limit(batch_size).all())
+        if not libros:
+            break
+        first_id, last_id = libros[0].id, libros[-1].id
+        autores, generos = defaultdict(list), defaultdict(list)
+        for libro_id, nombre, ap_paterno in (db.session.query(libro_autor.c.libro_id, Autor.nombre, Autor.ap_paterno)
+                                             .join(Autor, Autor.id == libro_autor.c.autor_id)
+                                             .filter(libro_autor.c.libro_id.between(first_id, last_id))):
+            autores[libro_id].append(f"{nombre} {ap_paterno or ''}")
+        for libro_id, nombre in (db.session.query(libro_genero.c.libro_id, Genero.nombre)
+                                 .join(Genero, Genero.id == libro_genero.c.genero_id)
+                                 .filter(libro_genero.c.libro_id.between(first_id, last_id))):
+            generos[libro_id].append(nombre)
+        db.session.execute(LibroBusqueda.__table__.insert(), [
+            {'libro_id': libro.id, **documento_from_values(libro.nombre, libro.isbn, autores[libro.id], generos[libro.id])}
+            for libro in libros
+        ])
+        total += len(libros)
+    get_backend().rebuild()
+    db.session.commit()
+    return total
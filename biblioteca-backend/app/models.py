@@ -6,12 +6,14 @@ from datetime import datetime
 # --- Tablas de Asociación ---
 libro_autor = db.Table('libro_autor',
     db.Column('libro_id', db.ForeignKey('libro.id'), primary_key=True),
-    db.Column('autor_id', db.ForeignKey('autor.id'), primary_key=True)
+    db.Column('autor_id', db.ForeignKey('autor.id'), primary_key=True),
+    db.Index('ix_libro_autor_autor', 'autor_id', 'libro_id') # Libros de un autor (la PK empieza por libro_id)
 )
 
 libro_genero = db.Table('libro_genero',
     db.Column('libro_id', db.ForeignKey('libro.id'), primary_key=True),
-    db.Column('genero_id', db.ForeignKey('genero.id'), primary_key=True)
+    db.Column('genero_id', db.ForeignKey('genero.id'), primary_key=True),
+    db.Index('ix_libro_genero_genero', 'genero_id', 'libro_id') # Libros de un género (la PK empieza por libro_id)
 )
 
 solicitud_libro = db.Table('solicitud_libro',
@@ -42,10 +44,18 @@ class Usuario(db.Model):
     telefono = db.Column(db.String(20), nullable=True)
     direccion = db.Column(db.String(255), nullable=True)
     genero = db.Column(db.String(50), nullable=True)
+
+    # Estado de la cuenta: Activo, Suspendido, Inactivo
+    estado = db.Column(db.String(20), nullable=False, default='Activo', server_default='Activo')
     
     # Relaciones existentes
     solicitudes_realizadas = db.relationship('Solicitud', foreign_keys='Solicitud.id_usuario_lector', backref='lector', lazy=True)
     prestamos = db.relationship('Prestamo', backref='usuario_prestamo', lazy=True)
+
+    __table_args__ = (
+        db.Index('ix_usuario_rol_estado', 'rol_id', 'estado'), # Listado de admin filtrado por rol (y estado)
+        db.Index('ix_usuario_estado', 'estado'),
+    )
     
     def set_password(self, password):
         self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
@@ -57,18 +67,30 @@ class Libro(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     isbn = db.Column(db.String(20), unique=True, nullable=False)
     nombre = db.Column(db.String(255), nullable=False)
-    cantidad = db.Column(db.Integer, default=1)
+    cantidad = db.Column(db.Integer, default=1) # Copias disponibles (ejemplares 'Disponible'), mantenida por la circulación
+    total_ejemplares = db.Column(db.Integer, nullable=False, default=0, server_default='0') # Ejemplares que no están de baja
     autores = db.relationship('Autor', secondary=libro_autor, backref=db.backref('libros', lazy='dynamic'))
     generos = db.relationship('Genero', secondary=libro_genero, backref=db.backref('libros', lazy='dynamic'))
 
+    __table_args__ = (
+        db.Index('ix_libro_cantidad', 'cantidad'), # Faceta y filtro de disponibilidad (ver libros/facetas.py)
+    )
+
 class Autor(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(100), nullable=False)
     ap_paterno = db.Column(db.String(100), nullable=True)
+    # Nombre completo normalizado (minúsculas, sin acentos): un autor por clave (ver libros/nombres.py)
+    clave = db.Column(db.String(201), nullable=False, unique=True, index=True)
+
+    __table_args__ = (
+        db.Index('ix_autor_nombre_ap_paterno', 'nombre', 'ap_paterno'),
+    )
 
 class Genero(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(50), unique=True, nullable=False)
+    clave = db.Column(db.String(50), nullable=False, unique=True, index=True) # Nombre normalizado (ver libros/nombres.py)
 
 class Solicitud(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -79,19 +101,146 @@ class Solicitud(db.Model):
     libros = db.relationship('Libro', secondary=solicitud_libro, backref='solicitudes')
     prestamo = db.relationship('Prestamo', backref='solicitud_origen', uselist=False, lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_solicitud_estado_fecha', 'estado', 'fecha_solicitud'), # Solicitudes pendientes por antigüedad
+        db.Index('ix_solicitud_lector', 'id_usuario_lector'),
+    )
+
 class Prestamo(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     id_solicitud = db.Column(db.Integer, db.ForeignKey('solicitud.id'), nullable=False)
     id_usuario = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False)
+    libro_id = db.Column(db.Integer, db.ForeignKey('libro.id'), nullable=True) # Libro prestado (uno por préstamo)
+    ejemplar_id = db.Column(db.Integer, db.ForeignKey('ejemplar.id'), nullable=True) # Copia física entregada
     fecha_inicio = db.Column(db.DateTime, default=datetime.utcnow)
     fecha_devolucion_limite = db.Column(db.DateTime, nullable=False)
     fecha_devolucion_real = db.Column(db.DateTime, nullable=True)
     estado = db.Column(db.String(50), default='Activo') # Activo, Devuelto, Vencido
     multas = db.relationship('Multa', backref='prestamo_origen', lazy=True)
 
+    __table_args__ = (
+        # Búsqueda de préstamos vencidos por rango de fecha dentro de un estado (ver bibliotecario/vencimientos.py)
+        db.Index('ix_prestamo_estado_fecha_limite', 'estado', 'fecha_devolucion_limite'),
+        db.Index('ix_prestamo_usuario_estado', 'id_usuario', 'estado'), # Préstamos de un usuario por estado
+        db.Index('ix_prestamo_usuario_fecha', 'id_usuario', 'fecha_inicio', 'id'), # Historial del lector (keyset)
+        db.Index('ix_prestamo_solicitud', 'id_solicitud'),
+        db.Index('ix_prestamo_libro_estado', 'libro_id', 'estado'), # Devolución por ISBN: préstamos abiertos de un libro
+    )
+
 class Multa(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     id_prestamo = db.Column(db.Integer, db.ForeignKey('prestamo.id'), nullable=False)
     monto = db.Column(db.Float, nullable=False)
     fecha_generacion = db.Column(db.DateTime, default=datetime.utcnow)
-    estado = db.Column(db.String(50), default='Pendiente') # Pendiente, Pagada
\ No newline at end of file
+    estado = db.Column(db.String(50), default='Pendiente') # Pendiente, Pagada
+
+    __table_args__ = (
+        # Multas de un préstamo por estado (el escáner de vencimientos comprueba si ya existe la multa)
+        db.Index('ix_multa_prestamo_estado', 'id_prestamo', 'estado'),
+        db.Index('ix_multa_estado', 'estado'), # Multas pendientes (panel y listado del bibliotecario)
+    )
+
+
+# --- Índice de búsqueda del catálogo ---
+# Documento desnormalizado por libro con el texto ya normalizado (minúsculas, sin acentos).
+# En MySQL se indexa con FULLTEXT; en SQLite se complementa con una tabla virtual FTS5 (ver app/libros/search.py).
+class LibroBusqueda(db.Model):
+    __tablename__ = 'libro_busqueda'
+    libro_id = db.Column(db.Integer, db.ForeignKey('libro.id', ondelete='CASCADE'), primary_key=True)
+    titulo = db.Column(db.Text, nullable=False, default='')
+    isbn = db.Column(db.String(20), nullable=False, default='')
+    autores = db.Column(db.Text, nullable=False, default='')
+    generos = db.Column(db.Text, nullable=False, default='')
+
+    __table_args__ = (
+        db.Index('ix_libro_busqueda_fulltext', 'titulo', 'isbn', 'autores', 'generos', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
+
+
+# --- Versión del catálogo ---
+# Una sola fila cuyo contador se incrementa en cada escritura del blueprint de libros.
+# Sirve para generar ETag/Last-Modified y para invalidar las respuestas cacheadas del catálogo.
+class CatalogoVersion(db.Model):
+    __tablename__ = 'catalogo_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    actualizado = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+# --- Cola de reservas por libro ---
+# Cola FIFO por libro (el orden es el id). 'En espera' -> 'Asignada' cuando vuelve una copia y se le aparta al
+# primero de la cola (tiene hasta 'expira' para recogerla) -> 'Completada' al entregarla como préstamo.
+# 'Expirada' y 'Cancelada' son finales. Ver app/bibliotecario/reservas.py.
+class Reserva(db.Model):
+    __tablename__ = 'reserva'
+    id = db.Column(db.Integer, primary_key=True)
+    libro_id = db.Column(db.Integer, db.ForeignKey('libro.id'), nullable=False)
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False)
+    fecha_reserva = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    estado = db.Column(db.String(20), nullable=False, default='En espera') # En espera, Asignada, Completada, Expirada, Cancelada
+    fecha_asignacion = db.Column(db.DateTime, nullable=True)
+    expira = db.Column(db.DateTime, nullable=True) # Límite para recoger una reserva 'Asignada'
+    # True mientras la reserva está viva y NULL después: el índice único no compara NULLs, así que un lector
+    # tiene como mucho una reserva viva por libro pero puede acumular las terminadas.
+    activa = db.Column(db.Boolean, nullable=True, default=True)
+
+    libro = db.relationship('Libro')
+    usuario = db.relationship('Usuario')
+
+    __table_args__ = (
+        db.Index('ix_reserva_libro_estado', 'libro_id', 'estado', 'id'), # Cabeza de la cola de un libro
+        db.Index('ix_reserva_estado_expira', 'estado', 'expira'), # Reservas asignadas sin recoger, por vencimiento
+        db.Index('ix_reserva_usuario_estado', 'id_usuario', 'estado'),
+        db.UniqueConstraint('libro_id', 'id_usuario', 'activa', name='uq_reserva_activa'),
+    )
+
+
+# --- Ejemplares (copias físicas) de cada libro ---
+# Libro.cantidad y Libro.total_ejemplares son los contadores de sus ejemplares 'Disponible' y no dados de baja; la
+# circulación los actualiza en la misma transacción que el estado de la copia (ver app/bibliotecario/ejemplares.py).
+class Ejemplar(db.Model):
+    __tablename__ = 'ejemplar'
+    id = db.Column(db.Integer, primary_key=True)
+    libro_id = db.Column(db.Integer, db.ForeignKey('libro.id'), nullable=False)
+    codigo_barras = db.Column(db.String(32), unique=True, nullable=False)
+    estado = db.Column(db.String(20), nullable=False, default='Disponible') # Disponible, Prestado, Apartado, Baja
+    fecha_alta = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    fecha_baja = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_ejemplar_libro_estado', 'libro_id', 'estado', 'id'), # Una copia libre (o apartada) de un libro
+    )
+
+
+# --- Contadores agregados para los paneles ---
+# Una fila por contador (p. ej. 'prestamos_activos', 'usuarios_rol:Admin'). Se actualizan en la misma transacción
+# que los cambios que los afectan (ver app/utils/stats.py) y se pueden recalcular desde cero si se desvían.
+class StatsCounter(db.Model):
+    __tablename__ = 'stats_counters'
+    nombre = db.Column(db.String(64), primary_key=True)
+    valor = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+# --- Contadores por usuario para el panel del lector ---
+# Una fila por usuario, mantenida igual que stats_counters (deltas aplicados al hacer commit, ver app/utils/stats.py).
+class ContadorUsuario(db.Model):
+    __tablename__ = 'contador_usuario'
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuario.id', ondelete='CASCADE'), primary_key=True)
+    prestamos_activos = db.Column(db.Integer, nullable=False, default=0)
+    prestamos_total = db.Column(db.Integer, nullable=False, default=0)
+    multas_pendientes = db.Column(db.Integer, nullable=False, default=0)
+    solicitudes_pendientes = db.Column(db.Integer, nullable=False, default=0)
+    reservas_activas = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+
+# --- Revocación de tokens JWT ---
+# Cada fila revoca un token concreto (jti, p. ej. logout) o todos los tokens de un usuario emitidos hasta
+# 'revocado_desde' (usuario eliminado, cambio de rol o de estado). Se consulta a través de un filtro en
+# memoria (ver app/auth/blocklist.py) y las filas se borran al pasar 'expira', cuando ya no hay token vivo.
+class TokenRevocado(db.Model):
+    __tablename__ = 'token_revocado'
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), nullable=True, unique=True)
+    id_usuario = db.Column(db.Integer, nullable=True) # Sin FK: el usuario puede haberse eliminado
+    revocado_desde = db.Column(db.DateTime, nullable=True)
+    expira = db.Column(db.DateTime, nullable=False, index=True)
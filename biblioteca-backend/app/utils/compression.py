@@ -0,0 +1,144 @@
+# app/utils/compression.py
+#
+# Compresión gzip/brotli de las respuestas, negociada con Accept-Encoding.
+#
+# Se comprimen las respuestas de tipos de texto (JSON, NDJSON, CSV...) a partir de COMPRESSION_MIN_SIZE bytes;
+# brotli solo si el paquete está instalado (si no, gzip). Los listados NDJSON se comprimen a medida que se
+# envían, vaciando el compresor en cada bloque para que el cliente siga recibiendo líneas sin esperar al final.
+#
+# Una respuesta comprimida es otra representación: su ETag pasa a ser débil (W/"..."), como hace nginx, y el
+# GET condicional compara en modo débil (cache.not_modified). Los cuerpos con ETag fuerte (snapshots del
+# catálogo) son siempre los mismos bytes para la misma etiqueta, así que se guardan ya comprimidos y solo se
+# comprimen una vez por versión del catálogo y codificación.
+#
+# Se aplica a las respuestas de Flask (after_request) y a las del modo ASGI (app/aio/routes.py).
+
+import gzip
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask import request
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header, unquote_etag
+
+try:
+    import brotli
+except ImportError: # Opcional: sin el paquete solo se ofrece gzip
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/csv', 'text/plain', 'text/html'}
+
+
+class ResponseCompressor:
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=4, cache_entries=64):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_entries = cache_entries
+        self.encodings = ['br', 'gzip'] if brotli is not None else ['gzip'] # Preferencia del servidor a igual q
+        self._lock = threading.Lock()
+        self._cache = OrderedDict() # (etag, codificación) -> cuerpo comprimido
+
+    def negotiate(self, accept_encoding):
+        """Codificación a usar según la cabecera Accept-Encoding (None: sin comprimir)."""
+        if not accept_encoding:
+            return None
+        return parse_accept_header(accept_encoding, Accept).best_match(self.encodings)
+
+    def compress(self, body, encoding, etag=None):
+        """Cuerpo comprimido; con un ETag fuerte se reutiliza el resultado de peticiones anteriores."""
+        if etag is not None:
+            with self._lock:
+                cached = self._cache.get((etag, encoding))
+                if cached is not None:
+                    self._cache.move_to_end((etag, encoding))
+                    return cached
+        if encoding == 'br':
+            data = brotli.compress(body, quality=self.brotli_quality)
+        else:
+            data = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+        if etag is not None and self.cache_entries:
+            with self._lock:
+                self._cache[(etag, encoding)] = data
+                while len(self._cache) > self.cache_entries:
+                    self._cache.popitem(last=False)
+        return data
+
+    def compress_stream(self, chunks, encoding):
+        """Comprime un iterable de bloques (bytes) sin acumularlo: cada bloque sale en cuanto se lee."""
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            for chunk in chunks:
+                data = compressor.process(chunk) + compressor.flush()
+                if data:
+                    yield data
+            yield compressor.finish()
+        else:
+            compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS) # Formato gzip
+            for chunk in chunks:
+                data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                if data:
+                    yield data
+            yield compressor.flush()
+
+
+def compressible(status, mimetype, content_encoding):
+    return 200 <= status < 300 and status != 204 and not content_encoding and mimetype in COMPRESSIBLE_MIMETYPES
+
+
+def weak_etag(etag):
+    """El valor de la cabecera ETag como etiqueta débil."""
+    return etag if etag.startswith('W/') else f'W/{etag}'
+
+
+def not_modified_etag(etag, if_none_match):
+    """ETag de un 304: la forma que mandó el cliente (débil si revalida la representación comprimida)."""
+    valor, weak = unquote_etag(etag)
+    return weak_etag(etag) if not weak and if_none_match and if_none_match.is_weak(valor) else etag
+
+
+def init_compression(app):
+    app.config.setdefault('COMPRESSION_ENABLED', True)
+    app.config.setdefault('COMPRESSION_MIN_SIZE', 1024) # Bytes; por debajo no compensa
+    app.config.setdefault('COMPRESSION_GZIP_LEVEL', 6)
+    app.config.setdefault('COMPRESSION_BROTLI_QUALITY', 4) # Calidad 4: tamaño similar a gzip 6 con menos CPU (benchmarks/json_compression.py)
+    app.config.setdefault('COMPRESSION_CACHE_ENTRIES', 64)
+    if not app.config['COMPRESSION_ENABLED']:
+        app.extensions['compression'] = None
+        return
+    compressor = ResponseCompressor(
+        min_size=app.config['COMPRESSION_MIN_SIZE'],
+        gzip_level=app.config['COMPRESSION_GZIP_LEVEL'],
+        brotli_quality=app.config['COMPRESSION_BROTLI_QUALITY'],
+        cache_entries=app.config['COMPRESSION_CACHE_ENTRIES'],
+    )
+    app.extensions['compression'] = compressor
+
+    @app.after_request
+    def _compress_response(response):
+        if response.status_code == 304:
+            if response.headers.get('ETag'):
+                response.headers['ETag'] = not_modified_etag(response.headers['ETag'], request.if_none_match)
+            return response
+        if response.direct_passthrough or not compressible(
+                response.status_code, response.mimetype, response.headers.get('Content-Encoding')):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = compressor.negotiate(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = compressor.compress_stream(response.iter_encoded(), encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            body = response.get_data()
+            if len(body) < compressor.min_size:
+                return response
+            etag, weak = response.get_etag()
+            response.set_data(compressor.compress(body, encoding, etag if etag and not weak else None))
+        response.headers['Content-Encoding'] = encoding
+        if response.headers.get('ETag'):
+            response.headers['ETag'] = weak_etag(response.headers['ETag'])
+        return response
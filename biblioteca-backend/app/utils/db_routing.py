@@ -0,0 +1,179 @@
+# app/utils/db_routing.py
+#
+# Pool de conexiones configurable y enrutado de lecturas a réplicas.
+#
+# Pool: DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE y DB_POOL_PRE_PING se aplican a la
+# base de datos principal y a cada réplica (SQLALCHEMY_ENGINE_OPTIONS explícitas tienen prioridad). Un SQLite
+# en memoria usa un pool de una sola conexión y no recibe estas opciones.
+#
+# Réplicas: cada URL de DATABASE_REPLICA_URLS se registra como bind 'replica_<n>'. Las peticiones GET/HEAD
+# leen de una réplica (turno rotatorio por petición); el resto, los flush/INSERT/UPDATE/DELETE y todo lo que
+# ocurre fuera de una petición (CLI, hilos) van a la principal. Reglas de consistencia:
+#   - dentro de una petición, en cuanto algo se escribe las lecturas siguientes van a la principal;
+#   - tras un commit con escrituras, el mismo cliente (mismo token, o misma IP si no hay token) lee de la
+#     principal durante REPLICA_STICKY_SECONDS ("read-your-writes"). Debe ser mayor que el retraso de
+#     replicación. El registro es por proceso: con varios workers conviene que el balanceador mantenga la
+#     afinidad por cliente, o basta con que el retraso de replicación sea menor que el tiempo entre peticiones;
+#   - use_primary() fuerza la principal para lecturas que no toleran retraso (revocaciones, rol actual).
+# Sin réplicas configuradas todo va a la principal como siempre.
+
+import hashlib
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+READ_METHODS = ('GET', 'HEAD')
+REPLICA_BIND_PREFIX = 'replica_'
+_UNSET = object()
+_WRITES_KEY = 'escrituras_en_peticion'
+
+
+class RoutingSession(FlaskSession):
+    """Sesión que manda las lecturas de las peticiones GET a una réplica (ver get_replica_key)."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not isinstance(clause, UpdateBase):
+            key = get_replica_key()
+            if key is not None:
+                return self._db.engines[key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter:
+    def __init__(self, bind_keys, sticky_seconds=5.0, max_clients=10000):
+        self.bind_keys = list(bind_keys)
+        self.sticky_seconds = sticky_seconds
+        self.max_clients = max_clients
+        self._turno = itertools.cycle(self.bind_keys) if self.bind_keys else None
+        self._lock = threading.Lock()
+        self._sticky = OrderedDict()  # cliente -> instante (monotonic) hasta el que lee de la principal
+
+    def next_replica(self):
+        with self._lock:
+            return next(self._turno)
+
+    def mark_sticky(self, client):
+        hasta = time.monotonic() + self.sticky_seconds
+        with self._lock:
+            self._sticky[client] = hasta
+            self._sticky.move_to_end(client)
+            # Las entradas están ordenadas por vencimiento: se descartan las vencidas y, si hace falta, las más antiguas
+            while self._sticky and (len(self._sticky) > self.max_clients or next(iter(self._sticky.values())) < time.monotonic()):
+                self._sticky.popitem(last=False)
+
+    def is_sticky(self, client):
+        with self._lock:
+            hasta = self._sticky.get(client)
+        return hasta is not None and hasta > time.monotonic()
+
+
+def client_key(authorization, remote_addr):
+    """Clave del cliente para "read-your-writes": su token o, si no hay, su IP."""
+    credencial = authorization or remote_addr or ''
+    return hashlib.blake2b(credencial.encode('utf-8'), digest_size=16).digest()
+
+
+def _client_key():
+    return client_key(request.headers.get('Authorization'), request.remote_addr)
+
+
+def get_replica_key():
+    """Bind de la réplica que atiende las lecturas de la petición actual, o None para la principal."""
+    if not has_request_context():
+        return None
+    key = g.get('db_replica', _UNSET)
+    if key is _UNSET:
+        router = current_app.extensions.get('db_router')
+        key = None
+        if router is not None and router.bind_keys and request.method in READ_METHODS \
+                and not router.is_sticky(_client_key()):
+            key = router.next_replica()
+        g.db_replica = key
+    return key
+
+
+@contextmanager
+def use_primary():
+    """Las consultas dentro del bloque leen de la base de datos principal aunque la petición sea GET."""
+    if not has_request_context():
+        yield
+        return
+    previo = g.get('db_replica', _UNSET)
+    g.db_replica = None
+    try:
+        yield
+    finally:
+        if previo is _UNSET:
+            g.pop('db_replica', None)
+        else:
+            g.db_replica = previo
+
+
+@event.listens_for(Session, 'after_flush')
+def _after_flush(session, flush_context):
+    if has_request_context():
+        g.db_replica = None # Lo que queda de la petición ya no puede leer de una réplica
+        session.info[_WRITES_KEY] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    if session.info.pop(_WRITES_KEY, False) and has_request_context():
+        router = current_app.extensions.get('db_router')
+        if router is not None and router.bind_keys:
+            router.mark_sticky(_client_key())
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_writes(session, previous_transaction):
+    if session.in_transaction():
+        return
+    session.info.pop(_WRITES_KEY, None)
+
+
+def pool_options(app, url):
+    """Opciones de pool para create_engine según la configuración DB_POOL_*."""
+    url = make_url(url)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return {}
+    return {
+        'pool_size': app.config['DB_POOL_SIZE'],
+        'max_overflow': app.config['DB_MAX_OVERFLOW'],
+        'pool_timeout': app.config['DB_POOL_TIMEOUT'],
+        'pool_recycle': app.config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': app.config['DB_POOL_PRE_PING'],
+    }
+
+
+def init_db_routing(app):
+    """Prepara SQLALCHEMY_ENGINE_OPTIONS y los binds de las réplicas. Debe llamarse antes de db.init_app()."""
+    app.config.setdefault('DB_POOL_SIZE', 10)
+    app.config.setdefault('DB_MAX_OVERFLOW', 20)
+    app.config.setdefault('DB_POOL_TIMEOUT', 10)
+    app.config.setdefault('DB_POOL_RECYCLE', 1800)
+    app.config.setdefault('DB_POOL_PRE_PING', True)
+    app.config.setdefault('DATABASE_REPLICA_URLS', [])
+    app.config.setdefault('REPLICA_STICKY_SECONDS', 5.0)
+
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **pool_options(app, app.config['SQLALCHEMY_DATABASE_URI']),
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+    }
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    bind_keys = []
+    for n, url in enumerate(app.config['DATABASE_REPLICA_URLS']):
+        key = f'{REPLICA_BIND_PREFIX}{n}'
+        binds[key] = {'url': url, **pool_options(app, url)}
+        bind_keys.append(key)
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+    app.extensions['db_router'] = ReplicaRouter(bind_keys, sticky_seconds=app.config['REPLICA_STICKY_SECONDS'])
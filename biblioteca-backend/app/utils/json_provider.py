@@ -0,0 +1,93 @@
+# app/utils/json_provider.py
+#
+# Proveedor JSON de la aplicación (app.json, usado por jsonify, request.get_json y los listados NDJSON).
+#
+# Serializa con orjson si está instalado (varias veces más rápido que json en listas grandes) y con json de la
+# biblioteca estándar si no, o si el objeto no lo admite orjson (p. ej. enteros de más de 64 bits). Las dos
+# rutas escriben lo mismo:
+#   - datetime/date en ISO 8601 (datetime.isoformat()), que es lo que esperan el frontend y los cursores; el
+#     proveedor por defecto de Flask los escribe como fecha HTTP. Los serializadores pueden devolver las fechas
+#     tal cual;
+#   - UTF-8 sin escapar (ensure_ascii=False), claves ordenadas y formato compacto (sangría en modo debug).
+# JSON_USE_ORJSON=False fuerza json (mismo formato).
+
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError: # Opcional: sin el paquete se usa json
+    orjson = None
+
+COMPACT_SEPARATORS = (',', ':')
+
+
+def _default(o):
+    """Tipos que no son JSON nativo (los mismos que el proveedor de Flask, con las fechas en ISO 8601)."""
+    if isinstance(o, date): # Incluye datetime
+        return o.isoformat()
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    ensure_ascii = False
+    default = staticmethod(_default)
+    use_orjson = orjson is not None
+
+    def dumps_bytes(self, obj, indent=False):
+        """JSON en bytes (sin pasar por str): compacto, o con sangría de 2 espacios."""
+        if self.use_orjson:
+            option = orjson.OPT_NON_STR_KEYS
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            if indent:
+                option |= orjson.OPT_INDENT_2
+            try:
+                return orjson.dumps(obj, default=_default, option=option)
+            except orjson.JSONEncodeError:
+                pass # Lo que orjson no admite lo intenta json (y lanza el mismo TypeError si tampoco puede)
+        return json.dumps(obj, default=_default, ensure_ascii=self.ensure_ascii, sort_keys=self.sort_keys,
+                          **({'indent': 2} if indent else {'separators': COMPACT_SEPARATORS})).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        if self.use_orjson and kwargs.get('separators', COMPACT_SEPARATORS) == COMPACT_SEPARATORS \
+                and set(kwargs) <= {'separators', 'indent'} and kwargs.get('indent') in (None, 2):
+            return self.dumps_bytes(obj, indent=bool(kwargs.get('indent'))).decode('utf-8')
+        kwargs.setdefault('default', _default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s) # Sus errores heredan de ValueError, como los de json
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumps_bytes(obj, indent=indent) + b'\n', mimetype=self.mimetype)
+
+
+def dumps_compact(provider, obj):
+    """JSON compacto en bytes con el proveedor de la aplicación (sea o no FastJSONProvider)."""
+    if isinstance(provider, FastJSONProvider):
+        return provider.dumps_bytes(obj)
+    return provider.dumps(obj, separators=COMPACT_SEPARATORS).encode('utf-8')
+
+
+def init_json_provider(app):
+    app.config.setdefault('JSON_USE_ORJSON', True)
+    app.json = FastJSONProvider(app)
+    app.json.use_orjson = orjson is not None and app.config['JSON_USE_ORJSON']
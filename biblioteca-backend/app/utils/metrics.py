@@ -0,0 +1,230 @@
+# app/utils/metrics.py
+#
+# Métricas por endpoint en formato de texto de Prometheus (GET /api/v1/admin/metrics).
+#
+# - Hooks de Flask (before_request/after_request): latencia, peticiones por código y errores 5xx por endpoint.
+# - Eventos del engine de SQLAlchemy (before/after_cursor_execute, handle_error): número de consultas y
+#   tiempo de SQL de cada petición, más el total de consultas y errores de SQL (también fuera de peticiones).
+# - Espera del pool: tiempo que tarda el pool en entregar una conexión (cola llena = espera larga).
+#
+# El costo por petición es un par de perf_counter() y una actualización de contadores bajo un lock; por
+# consulta, dos perf_counter() y una suma en un threading.local, así que se puede dejar activo en producción
+# (METRICS_ENABLED=False lo desactiva). Las métricas son por proceso: con varios workers, Prometheus debe
+# consultar cada uno (o sumar por instancia). La latencia de las respuestas en streaming (NDJSON) se mide
+# hasta que se entregan las cabeceras. En SQLite parte del trabajo de una consulta ocurre al leer las filas,
+# así que allí el tiempo de SQL es una cota inferior.
+# No se usa prometheus_client para no añadir una dependencia: solo se necesitan contadores e histogramas.
+
+import bisect
+import threading
+import time
+
+from flask import current_app, g, request
+from sqlalchemy import event
+
+from app.models import db
+from app.utils.startup import WARMUP_ENVIRON_KEY
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500, 1000)
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # valores de etiquetas -> [conteos por bucket..., +Inf, suma]
+
+    def observe(self, label_values, value):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for label_values, series in sorted(self._series.items()):
+            labels = _format_labels(self.labels, label_values)
+            acumulado = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                acumulado += count
+                le = f'le="{bound}"'
+                lines.append(f'{self.name}_bucket{{{labels + "," if labels else ""}{le}}} {acumulado}')
+            suffix = f'{{{labels}}}' if labels else ''
+            lines.append(f'{self.name}_sum{suffix} {series[-1]:.6f}')
+            lines.append(f'{self.name}_count{suffix} {acumulado}')
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name, help_text, labels, kind='counter'):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.kind = kind
+        self._series = {}
+
+    def inc(self, label_values=(), amount=1):
+        self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def set(self, label_values, value):
+        self._series[label_values] = value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        for label_values, value in sorted(self._series.items()):
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f'{self.name}{{{labels}}} {value}' if labels else f'{self.name} {value}')
+        return lines
+
+
+def _format_labels(names, values):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRegistry:
+    """Contadores e histogramas del proceso. Todas las escrituras van bajo un único lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()  # consultas y tiempo de SQL de la petición en curso
+        self.requests = CounterMetric('biblioteca_http_requests_total', 'Peticiones atendidas por endpoint, método y código.',
+                                      ('endpoint', 'method', 'status'))
+        self.errors = CounterMetric('biblioteca_http_request_errors_total', 'Respuestas 5xx por endpoint.',
+                                    ('endpoint', 'method'))
+        self.latency = Histogram('biblioteca_http_request_duration_seconds', 'Latencia de las peticiones por endpoint.',
+                                 ('endpoint', 'method'), LATENCY_BUCKETS)
+        self.queries = Histogram('biblioteca_db_queries_per_request', 'Consultas SQL emitidas por petición.',
+                                 ('endpoint',), QUERY_COUNT_BUCKETS)
+        self.sql_time = Histogram('biblioteca_db_time_per_request_seconds', 'Tiempo total de SQL por petición.',
+                                  ('endpoint',), LATENCY_BUCKETS)
+        self.queries_total = CounterMetric('biblioteca_db_queries_total', 'Consultas SQL ejecutadas (incluye CLI e hilos).', ())
+        self.query_errors = CounterMetric('biblioteca_db_query_errors_total', 'Consultas SQL que terminaron en error.', ())
+        self.pool_wait = Histogram('biblioteca_db_pool_wait_seconds', 'Tiempo de espera para obtener una conexión del pool.',
+                                   (), POOL_WAIT_BUCKETS)
+        self.pool_checked_out = CounterMetric('biblioteca_db_pool_checked_out', 'Conexiones del pool en uso.', (), kind='gauge')
+        self.pool_size = CounterMetric('biblioteca_db_pool_size', 'Tamaño configurado del pool.', (), kind='gauge')
+        self._engines = []
+
+    # --- Petición en curso (hilo actual) ---
+    def start_request(self):
+        self._local.active = True
+        self._local.queries = 0
+        self._local.sql_time = 0.0
+
+    def finish_request(self, endpoint, method, status, elapsed):
+        local = self._local
+        queries, sql_time = getattr(local, 'queries', 0), getattr(local, 'sql_time', 0.0)
+        local.active = False
+        with self._lock:
+            self.requests.inc((endpoint, method, str(status)))
+            if status >= 500:
+                self.errors.inc((endpoint, method))
+            self.latency.observe((endpoint, method), elapsed)
+            self.queries.observe((endpoint,), queries)
+            self.sql_time.observe((endpoint,), sql_time)
+
+    # --- Eventos de SQLAlchemy ---
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['metrics_query_start'].pop()
+        local = self._local
+        if getattr(local, 'active', False):
+            local.queries += 1
+            local.sql_time += elapsed
+        with self._lock:
+            self.queries_total.inc()
+
+    def _handle_error(self, exception_context):
+        if exception_context.connection is not None:
+            starts = exception_context.connection.info.get('metrics_query_start')
+            if starts:
+                starts.pop()
+        with self._lock:
+            self.query_errors.inc()
+
+    def _instrument_pool(self, engine):
+        # El pool no tiene un evento "antes de checkout": se envuelve su _do_get (punto único de obtención)
+        pool = engine.pool
+        if getattr(pool, '_metrics_instrumented', False):
+            return
+        original = pool._do_get
+
+        def timed_do_get():
+            inicio = time.perf_counter()
+            try:
+                return original()
+            finally:
+                elapsed = time.perf_counter() - inicio
+                with self._lock:
+                    self.pool_wait.observe((), elapsed)
+
+        pool._do_get = timed_do_get
+        pool._metrics_instrumented = True
+
+    def instrument_engine(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(engine, 'handle_error', self._handle_error)
+        event.listen(engine, 'engine_disposed', self._instrument_pool) # dispose() crea un pool nuevo
+        self._instrument_pool(engine)
+        self._engines.append(engine)
+
+    # --- Exportación ---
+    def render(self):
+        with self._lock:
+            checked_out = size = 0
+            for engine in self._engines:
+                pool = engine.pool
+                checked_out += pool.checkedout() if hasattr(pool, 'checkedout') else 0
+                size += pool.size() if hasattr(pool, 'size') else 0
+            self.pool_checked_out.set((), checked_out)
+            self.pool_size.set((), size)
+            lines = []
+            for metric in (self.requests, self.errors, self.latency, self.queries, self.sql_time,
+                           self.queries_total, self.query_errors, self.pool_wait, self.pool_checked_out, self.pool_size):
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def get_metrics():
+    return current_app.extensions['metrics']
+
+
+def init_metrics(app):
+    app.config.setdefault('METRICS_ENABLED', True)
+    registry = MetricsRegistry()
+    app.extensions['metrics'] = registry
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    with app.app_context():
+        for engine in db.engines.values():
+            registry.instrument_engine(engine)
+
+    @app.before_request
+    def _metrics_start_request():
+        if request.environ.get(WARMUP_ENVIRON_KEY): # Peticiones internas del calentamiento
+            return
+        g.metrics_start = time.perf_counter()
+        registry.start_request()
+
+    @app.after_request
+    def _metrics_finish_request(response):
+        inicio = g.pop('metrics_start', None)
+        if inicio is not None:
+            registry.finish_request(request.endpoint or 'sin_ruta', request.method, response.status_code,
+                                    time.perf_counter() - inicio)
+        return response
@@ -0,0 +1,88 @@
+# app/utils/pagination.py
+
+import base64
+import json
+
+from flask import request
+
+# Límites por defecto para la paginación por cursor (keyset)
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def is_paginated(args=None):
+    """True si la petición pide una página (?limit= o ?cursor=).
+
+    Los listados que ya existían antes de la paginación (GET /libros, GET /admin/usuarios) devuelven la lista
+    completa sin estos parámetros: los clientes que no siguen X-Next-Cursor siguen viendo todas las filas.
+    """
+    args = request.args if args is None else args
+    return 'limit' in args or 'cursor' in args
+
+
+def get_limit(default=DEFAULT_LIMIT, maximum=MAX_LIMIT, args=None):
+    """Lee el parámetro ?limit= y lo acota al rango [1, maximum]. args: otros parámetros en vez de request.args."""
+    args = request.args if args is None else args
+    try:
+        limit = int(args.get('limit', default))
+    except (ValueError, TypeError):
+        limit = default
+    return max(1, min(limit, maximum))
+
+
+def encode_cursor(*values):
+    """Codifica los valores de la última fila en un cursor opaco (base64 URL-safe)."""
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decodifica un cursor generado por encode_cursor. Lanza ValueError si es inválido."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        raise ValueError("Cursor inválido")
+    if not isinstance(values, list) or not values:
+        raise ValueError("Cursor inválido")
+    return values
+
+
+def get_cursor(args=None):
+    """Lee el parámetro ?cursor= de la petición actual (None si no viene)."""
+    cursor = (request.args if args is None else args).get('cursor')
+    return decode_cursor(cursor) if cursor else None
+
+
+def paginated_response(response, next_cursor):
+    """Añade las cabeceras de paginación a una respuesta ya construida."""
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+
+def apply_keyset(query, sort_column, id_column, cursor, descending=False):
+    """Aplica paginación keyset sobre (sort_column, id_column) y el ORDER BY correspondiente.
+
+    El cursor es [valor_de_orden, id] de la última fila de la página anterior (o None).
+    sort_column no debe admitir NULL.
+    """
+    from sqlalchemy import and_, or_
+
+    same_column = sort_column is id_column
+    if cursor:
+        if same_column:
+            last_id = cursor[-1]
+            query = query.filter(id_column < last_id if descending else id_column > last_id)
+        else:
+            value, last_id = cursor
+            if descending:
+                query = query.filter(or_(sort_column < value, and_(sort_column == value, id_column < last_id)))
+            else:
+                query = query.filter(or_(sort_column > value, and_(sort_column == value, id_column > last_id)))
+
+    if same_column:
+        return query.order_by(id_column.desc() if descending else id_column.asc())
+    if descending:
+        return query.order_by(sort_column.desc(), id_column.desc())
+    return query.order_by(sort_column.asc(), id_column.asc())
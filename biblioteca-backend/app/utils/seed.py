@@ -0,0 +1,292 @@
+# app/utils/seed.py
+#
+# Generador de datos sintéticos para pruebas de carga y dimensionamiento (comando `flask seed`).
+#
+# Crea libros (con autores y géneros), usuarios de los tres roles, solicitudes, préstamos y multas con
+# inserciones en bloque (executemany por lotes, ids explícitos), sin pasar por el ORM fila a fila, así que
+# escalas como 1M libros / 200k usuarios / 5M préstamos son viables. Los datos son deterministas para una
+# misma semilla y se añaden a los existentes (los ids continúan desde el máximo actual).
+#
+# Todas las cuentas usan la misma contraseña (se hashea una sola vez). Además se crean, si no existen,
+# tres cuentas conocidas para los benchmarks: admin@seed.local, bibliotecario@seed.local y lector@seed.local.
+#
+# Uso:
+#   flask seed --libros 1000000 --usuarios 200000 --prestamos 5000000
+#   flask seed --reset --libros 20000 --usuarios 5000 --prestamos 100000   (¡borra y recrea las tablas!)
+
+import random
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func
+
+from app.models import (
+    db, bcrypt, Rol, Usuario, Libro, Autor, Genero, Solicitud, Prestamo, Multa,
+    libro_autor, libro_genero, solicitud_libro,
+)
+from app.libros.nombres import clave
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_PASSWORD = 'biblioteca123'
+CUENTAS_BENCHMARK = {
+    'Admin': 'admin@seed.local',
+    'Bibliotecario': 'bibliotecario@seed.local',
+    'Lector': 'lector@seed.local',
+}
+
+NOMBRES = ['Ana', 'Luis', 'María', 'José', 'Carmen', 'Jorge', 'Lucía', 'Pedro', 'Sofía', 'Miguel',
+           'Elena', 'Carlos', 'Isabel', 'Javier', 'Paula', 'Diego', 'Laura', 'Andrés', 'Rosa', 'Gabriel']
+APELLIDOS = ['García', 'López', 'Martínez', 'Hernández', 'González', 'Pérez', 'Rodríguez', 'Sánchez',
+             'Ramírez', 'Cruz', 'Flores', 'Gómez', 'Morales', 'Vázquez', 'Reyes', 'Jiménez', 'Torres',
+             'Díaz', 'Ruiz', 'Mendoza', 'Castillo', 'Ortiz', 'Moreno', 'Romero', 'Álvarez']
+GENEROS = ['Novela', 'Cuento', 'Poesía', 'Ensayo', 'Historia', 'Ciencia ficción', 'Fantasía', 'Terror',
+           'Misterio', 'Romance', 'Biografía', 'Filosofía', 'Ciencia', 'Matemáticas', 'Informática',
+           'Arte', 'Música', 'Infantil', 'Juvenil', 'Teatro', 'Economía', 'Psicología', 'Derecho',
+           'Medicina', 'Viajes', 'Cocina', 'Deportes', 'Religión', 'Política', 'Educación']
+PALABRAS_TITULO = ['sombra', 'viento', 'ciudad', 'memoria', 'río', 'noche', 'jardín', 'silencio', 'camino',
+                   'tiempo', 'mar', 'fuego', 'destino', 'casa', 'luz', 'invierno', 'espejo', 'guerra',
+                   'secreto', 'isla', 'montaña', 'voz', 'ángel', 'laberinto', 'horizonte', 'libro']
+
+# Distribución de estados de los préstamos generados (el resto queda 'Devuelto')
+PROPORCION_ACTIVOS = 0.15
+PROPORCION_VENCIDOS = 0.05
+PROPORCION_SOLICITUDES_PENDIENTES = 0.02
+
+
+def _max_id(model):
+    return db.session.query(func.coalesce(func.max(model.id), 0)).scalar()
+
+
+def _insert_rows(target, rows):
+    """INSERT en bloque (executemany) a nivel de tabla, sin el procesamiento por fila del ORM."""
+    if rows:
+        table = getattr(target, '__table__', target)
+        db.session.execute(table.insert(), rows)
+
+
+def _insert_batches(target, rows, batch_size):
+    """Inserta un iterable de dicts por lotes, con un commit por lote. Devuelve el número de filas."""
+    total = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            _insert_rows(target, batch)
+            db.session.commit()
+            total += len(batch)
+            batch = []
+    if batch:
+        _insert_rows(target, batch)
+        db.session.commit()
+        total += len(batch)
+    return total
+
+
+def _ensure_roles():
+    roles = {rol.nombre: rol.id for rol in Rol.query.all()}
+    for nombre in ('Lector', 'Bibliotecario', 'Admin'):
+        if nombre not in roles:
+            rol = Rol(nombre=nombre)
+            db.session.add(rol)
+            db.session.flush()
+            roles[nombre] = rol.id
+    db.session.commit()
+    return roles
+
+
+def _ensure_generos():
+    existentes = {g.clave for g in Genero.query.all()}
+    nuevos = [{'nombre': nombre, 'clave': clave(nombre)} for nombre in GENEROS if clave(nombre) not in existentes]
+    if nuevos:
+        _insert_batches(Genero, nuevos, DEFAULT_BATCH_SIZE)
+    return [g.id for g in Genero.query.order_by(Genero.id).all()]
+
+
+def analyze_tables():
+    """Actualiza las estadísticas del optimizador tras una carga masiva (sin ellas SQLite elige malos índices)."""
+    with db.engine.begin() as conn:
+        if conn.dialect.name == 'sqlite':
+            conn.exec_driver_sql('ANALYZE')
+        elif conn.dialect.name in ('mysql', 'mariadb'):
+            for table in db.metadata.sorted_tables:
+                conn.exec_driver_sql(f'ANALYZE TABLE {table.name}')
+
+
+def seed_database(libros=10000, usuarios=2000, prestamos=50000, batch_size=DEFAULT_BATCH_SIZE,
+                  semilla=42, password=DEFAULT_PASSWORD, reindex=True, log=None):
+    """Añade datos sintéticos a la base de datos. Devuelve un resumen con las filas creadas por tabla."""
+    log = log or (lambda mensaje: None)
+    rnd = random.Random(semilla)
+    ahora = datetime.utcnow().replace(microsecond=0)
+    inicio = time.perf_counter()
+    resumen = {}
+
+    roles = _ensure_roles()
+    genero_ids = _ensure_generos()
+
+    # --- Autores y libros ---
+    autor_base = _max_id(Autor)
+    n_autores = max(1, libros // 4)
+
+    def filas_autores():
+        for i in range(1, n_autores + 1):
+            # El id en el apellido mantiene la clave normalizada única (ver libros/nombres.py)
+            nombre, ap_paterno = rnd.choice(NOMBRES), f'{rnd.choice(APELLIDOS)} {autor_base + i}'
+            yield {'id': autor_base + i, 'nombre': nombre, 'ap_paterno': ap_paterno, 'clave': clave(f'{nombre} {ap_paterno}')}
+
+    resumen['autores'] = _insert_batches(Autor, filas_autores(), batch_size)
+
+    libro_base = _max_id(Libro)
+
+    def filas_libros():
+        for i in range(1, libros + 1):
+            libro_id = libro_base + i
+            titulo = ' '.join(rnd.sample(PALABRAS_TITULO, rnd.randint(2, 4))).capitalize()
+            yield {'id': libro_id, 'isbn': f'978{libro_id:010d}', 'nombre': f'{titulo} {libro_id}', 'cantidad': rnd.randint(0, 8)}
+
+    resumen['libros'] = _insert_batches(Libro, filas_libros(), batch_size)
+    log(f"Libros: {resumen['libros']} ({n_autores} autores)")
+
+    def filas_libro_autor():
+        for i in range(1, libros + 1):
+            for autor_id in {autor_base + rnd.randint(1, n_autores) for _ in range(rnd.choice((1, 1, 1, 2)))}:
+                yield {'libro_id': libro_base + i, 'autor_id': autor_id}
+
+    def filas_libro_genero():
+        for i in range(1, libros + 1):
+            for genero_id in set(rnd.sample(genero_ids, min(len(genero_ids), rnd.randint(1, 3)))):
+                yield {'libro_id': libro_base + i, 'genero_id': genero_id}
+
+    _insert_batches(libro_autor, filas_libro_autor(), batch_size)
+    _insert_batches(libro_genero, filas_libro_genero(), batch_size)
+
+    # --- Usuarios (mismo hash para todos: bcrypt es deliberadamente lento) ---
+    password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+    usuario_base = _max_id(Usuario)
+    existentes = {email for (email,) in db.session.query(Usuario.email).filter(Usuario.email.in_(CUENTAS_BENCHMARK.values()))}
+    cuentas = [(rol, email) for rol, email in CUENTAS_BENCHMARK.items() if email not in existentes]
+
+    def filas_usuarios():
+        for i in range(1, usuarios + 1):
+            usuario_id = usuario_base + i
+            if i <= len(cuentas):
+                rol_nombre, email, estado = cuentas[i - 1][0], cuentas[i - 1][1], 'Activo'
+            else:
+                r = rnd.random()
+                rol_nombre = 'Admin' if r < 0.001 else 'Bibliotecario' if r < 0.01 else 'Lector'
+                email = f'usuario{usuario_id}@seed.local'
+                estado = rnd.choices(('Activo', 'Suspendido', 'Inactivo'), weights=(90, 5, 5))[0]
+            yield {
+                'id': usuario_id, 'nombre': rnd.choice(NOMBRES), 'apellido_paterno': rnd.choice(APELLIDOS),
+                'apellido_materno': rnd.choice(APELLIDOS), 'email': email, 'password_hash': password_hash,
+                'rol_id': roles[rol_nombre], 'estado': estado,
+            }
+
+    resumen['usuarios'] = _insert_batches(Usuario, filas_usuarios(), batch_size)
+    log(f"Usuarios: {resumen['usuarios']}")
+
+    # --- Solicitudes, préstamos y multas ---
+    # Cada préstamo tiene su solicitud aprobada (con un libro); además se crean solicitudes pendientes.
+    total_usuarios = usuario_base + usuarios
+    total_libros = libro_base + libros
+    if total_usuarios and total_libros and prestamos:
+        solicitud_base = _max_id(Solicitud)
+        prestamo_base = _max_id(Prestamo)
+        n_pendientes = int(prestamos * PROPORCION_SOLICITUDES_PENDIENTES)
+        dias_historial = 730
+        resumen['solicitudes'] = resumen['prestamos'] = resumen['multas'] = 0
+
+        # Solicitud, préstamo y multa se generan juntos, lote a lote, para que coincidan (usuario, fechas)
+        # sin guardar millones de filas en memoria; cada lote se inserta en orden de dependencias y se confirma.
+        for inicio_lote in range(1, prestamos + n_pendientes + 1, batch_size):
+            solicitudes, libros_solicitud, prestamos_lote, multas = [], [], [], []
+            for i in range(inicio_lote, min(inicio_lote + batch_size, prestamos + n_pendientes + 1)):
+                solicitud_id = solicitud_base + i
+                id_usuario = rnd.randint(1, total_usuarios)
+                libro_id = rnd.randint(1, total_libros)
+                libros_solicitud.append({'solicitud_id': solicitud_id, 'libro_id': libro_id})
+                if i > prestamos:
+                    solicitudes.append({'id': solicitud_id, 'id_usuario_lector': id_usuario, 'estado': 'Pendiente',
+                                        'fecha_solicitud': ahora - timedelta(minutes=rnd.randint(0, 10080))})
+                    continue
+
+                r = rnd.random()
+                if r < PROPORCION_ACTIVOS:
+                    dias, estado = rnd.randint(0, 14), 'Activo'
+                elif r < PROPORCION_ACTIVOS + PROPORCION_VENCIDOS:
+                    dias, estado = rnd.randint(16, 120), 'Vencido'
+                else:
+                    dias, estado = rnd.randint(16, dias_historial), 'Devuelto'
+                fecha_inicio = ahora - timedelta(days=dias, minutes=rnd.randint(0, 1439))
+                limite = fecha_inicio + timedelta(days=15)
+                retraso = rnd.randint(-10, 10)
+                prestamo_id = prestamo_base + i
+
+                solicitudes.append({'id': solicitud_id, 'id_usuario_lector': id_usuario, 'estado': 'Aprobada',
+                                    'fecha_solicitud': fecha_inicio - timedelta(hours=rnd.randint(1, 48))})
+                prestamos_lote.append({
+                    'id': prestamo_id, 'id_solicitud': solicitud_id, 'id_usuario': id_usuario, 'libro_id': libro_id,
+                    'fecha_inicio': fecha_inicio, 'fecha_devolucion_limite': limite,
+                    'fecha_devolucion_real': limite + timedelta(days=retraso) if estado == 'Devuelto' else None,
+                    'estado': estado,
+                })
+                if estado == 'Vencido':
+                    multas.append({'id_prestamo': prestamo_id, 'monto': 10.0 * max(1, (ahora - limite).days),
+                                   'fecha_generacion': ahora, 'estado': 'Pendiente'})
+                elif estado == 'Devuelto' and retraso > 0:
+                    multas.append({'id_prestamo': prestamo_id, 'monto': 10.0 * retraso,
+                                   'fecha_generacion': limite + timedelta(days=retraso), 'estado': 'Pagada'})
+
+            _insert_rows(Solicitud, solicitudes)
+            _insert_rows(solicitud_libro, libros_solicitud)
+            _insert_rows(Prestamo, prestamos_lote)
+            _insert_rows(Multa, multas)
+            db.session.commit()
+            resumen['solicitudes'] += len(solicitudes)
+            resumen['prestamos'] += len(prestamos_lote)
+            resumen['multas'] += len(multas)
+        log(f"Solicitudes: {resumen['solicitudes']} | Préstamos: {resumen['prestamos']} | Multas: {resumen['multas']}")
+
+    # --- Estado derivado: ejemplares, contadores de los paneles, índice de búsqueda y versión del catálogo ---
+    from app.utils.stats import recompute_counters
+    from app.libros.cache import bump_catalog_version
+    from app.bibliotecario.ejemplares import crear_ejemplares_faltantes
+
+    # Una copia registrada por cada unidad disponible y por cada préstamo abierto
+    resumen['ejemplares'] = crear_ejemplares_faltantes(batch_size)
+    db.session.commit()
+    log(f"Ejemplares: {resumen['ejemplares']}")
+    recompute_counters(usuarios=True) # Incluye los contadores por usuario del panel del lector
+    if reindex and libros:
+        from app.libros.search import rebuild_index
+        rebuild_index()
+        log("Índice de búsqueda reconstruido")
+    bump_catalog_version()
+    db.session.commit()
+    analyze_tables()
+
+    resumen['segundos'] = round(time.perf_counter() - inicio, 2)
+    return resumen
+
+
+# --- COMANDO CLI: GENERAR DATOS SINTÉTICOS ---
+@click.command('seed')
+@click.option('--libros', default=10000, show_default=True, help='Libros a crear.')
+@click.option('--usuarios', default=2000, show_default=True, help='Usuarios a crear (incluye las cuentas de benchmark).')
+@click.option('--prestamos', default=50000, show_default=True, help='Préstamos a crear (con sus solicitudes y multas).')
+@click.option('--lote', default=DEFAULT_BATCH_SIZE, show_default=True, help='Filas por lote/transacción.')
+@click.option('--semilla', default=42, show_default=True, help='Semilla del generador aleatorio.')
+@click.option('--password', default=DEFAULT_PASSWORD, show_default=True, help='Contraseña de todas las cuentas.')
+@click.option('--sin-indice', is_flag=True, help='No reconstruir el índice de búsqueda al terminar.')
+@click.option('--reset', is_flag=True, help='Borra y recrea todas las tablas antes de generar los datos.')
+@with_appcontext
+def seed_command(libros, usuarios, prestamos, lote, semilla, password, sin_indice, reset):
+    if reset:
+        click.confirm(f"Se borrarán TODAS las tablas de {db.engine.url.render_as_string(hide_password=True)}. ¿Continuar?", abort=True)
+        db.drop_all()
+        db.create_all()
+    resumen = seed_database(libros, usuarios, prestamos, batch_size=lote, semilla=semilla, password=password,
+                            reindex=not sin_indice, log=click.echo)
+    click.echo(f"Datos generados en {resumen['segundos']} s: {resumen}")
@@ -0,0 +1,211 @@
+# app/utils/startup.py
+#
+# Arranque en frío: perfil de tiempos de create_app() y calentamiento opcional antes de atender tráfico.
+#
+# Perfil (siempre activo, GET /api/v1/admin/startup):
+#   - importación del paquete app (Flask, SQLAlchemy y extensiones) y cada fase de create_app(): la importación
+#     e init_* de cada módulo y el registro de cada blueprint, con los módulos que cargó cada una;
+#   - configuración de los mappers de SQLAlchemy (se hace en create_app para que no la pague la primera petición);
+#   - calentamiento, si está activado;
+#   - primera petición atendida: cuánto tardó desde el inicio de la importación y cuánto duró.
+# STARTUP_REPORT=True imprime además un resumen al terminar create_app() y tras la primera petición. El detalle
+# por módulo de la biblioteca estándar y dependencias lo da `python -X importtime` (benchmarks/cold_start.py).
+#
+# Calentamiento (WARMUP_ENABLED=True, al final de create_app):
+#   - abre WARMUP_POOL_CONNECTIONS conexiones (por defecto DB_POOL_SIZE) en la principal y en cada réplica y las
+#     devuelve al pool, para que las primeras peticiones no paguen la conexión y el handshake;
+#   - atiende internamente WARMUP_PATHS (GET del catálogo y paneles) y un login con un email inexistente, con un
+#     token de corta duración que no corresponde a ningún usuario. Así se compilan las consultas de esas rutas
+#     (caché de sentencias de SQLAlchemy), el mapa de URLs, la verificación de JWT, los serializadores y quedan
+#     los snapshots del catálogo en memoria. Los paneles responden 404/403 tras compilar la consulta del usuario o del rol.
+#     Estas peticiones no cuentan en las métricas ni como primera petición.
+# Con gunicorn --preload, create_app() corre en el proceso maestro y las conexiones abiertas allí no deben pasar a
+# los workers: en ese caso WARMUP_ENABLED=False y se llama a warm_up(app) en el hook post_fork.
+
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from flask import current_app, request
+from flask_jwt_extended import create_access_token
+from sqlalchemy import text
+from sqlalchemy.orm import configure_mappers
+
+from app import db
+
+WARMUP_ENVIRON_KEY = 'biblioteca.warmup' # Marca de las peticiones internas del calentamiento
+
+DEFAULT_WARMUP_PATHS = [
+    ('/api/v1/libros', 'Lector'),
+    ('/api/v1/libros/facetas', 'Lector'),
+    ('/api/v1/libros/generos', None),
+    ('/api/v1/libros/autores', None),
+    ('/api/v1/lector/panel/summary', 'Lector'), # 404: usuario inexistente
+    ('/api/v1/bibliotecario/panel/summary', 'Bibliotecario'), # 403: compila la consulta del rol (@require_role)
+]
+WARMUP_LOGIN_EMAIL = 'calentamiento@localhost.invalid'
+
+
+class StartupProfile:
+    def __init__(self, import_start, import_end):
+        self.pid = os.getpid()
+        self.import_start = import_start
+        self.fases = [{'fase': 'importacion app', 'segundos': round(import_end - import_start, 4)}]
+        self.create_app_s = None
+        self.warmup = None
+        self.primera_peticion = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def fase(self, nombre):
+        """Mide un bloque de create_app() y cuenta los módulos que importa."""
+        modulos = len(sys.modules)
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.fases.append({
+                'fase': nombre,
+                'segundos': round(time.perf_counter() - inicio, 4),
+                'modulos': len(sys.modules) - modulos,
+            })
+
+    def first_request(self, endpoint, inicio, fin):
+        """Registra la primera petición real (True si es esta)."""
+        with self._lock:
+            if self.primera_peticion is not None:
+                return False
+            self.primera_peticion = {
+                'endpoint': endpoint,
+                'segundosDesdeImportacion': round(fin - self.import_start, 4),
+                'segundos': round(fin - inicio, 4),
+            }
+            return True
+
+    def report(self):
+        return {
+            'pid': self.pid,
+            'segundosCreateApp': self.create_app_s,
+            'fases': self.fases,
+            'calentamiento': self.warmup,
+            'primeraPeticion': self.primera_peticion,
+        }
+
+    def summary(self):
+        lentas = sorted(self.fases, key=lambda f: f['segundos'], reverse=True)[:5]
+        texto = f"create_app {self.create_app_s}s; fases más lentas: " + ', '.join(f"{f['fase']} {f['segundos']}s" for f in lentas)
+        if self.warmup:
+            texto += f"; calentamiento {self.warmup['segundos']}s"
+        return texto
+
+
+def get_startup_profile():
+    return current_app.extensions['startup']
+
+
+def prime_pools(app, conexiones):
+    """Abre `conexiones` conexiones por engine (hasta el tamaño de su pool) y las deja en el pool."""
+    abiertas = 0
+    with app.app_context():
+        for engine in db.engines.values():
+            n = min(conexiones, engine.pool.size()) if hasattr(engine.pool, 'size') else 1
+            retenidas = []
+            try:
+                for _ in range(n): # Todas a la vez: si se soltaran una a una, el pool reutilizaría la primera
+                    conn = engine.connect()
+                    retenidas.append(conn)
+                    conn.execute(text('SELECT 1'))
+            finally:
+                for conn in retenidas:
+                    conn.close()
+            abiertas += len(retenidas)
+    return abiertas
+
+
+def warm_up_requests(app, paths):
+    """Atiende internamente las rutas de calentamiento; devuelve el estado y la duración de cada una."""
+    client = app.test_client()
+    environ = {WARMUP_ENVIRON_KEY: True}
+    tokens = {}
+    with app.app_context():
+        for _, rol in paths:
+            if rol and rol not in tokens: # Identidad 0: ningún usuario
+                tokens[rol] = create_access_token(identity='0', additional_claims={'rol': rol},
+                                                  expires_delta=timedelta(minutes=1))
+    resultados = []
+    inicio = time.perf_counter()
+    response = client.post('/api/v1/auth/login', json={'email': WARMUP_LOGIN_EMAIL, 'password': '-'},
+                           environ_overrides=environ)
+    resultados.append({'ruta': 'POST /api/v1/auth/login', 'status': response.status_code,
+                       'segundos': round(time.perf_counter() - inicio, 4)})
+    for path, rol in paths:
+        headers = {'Authorization': f'Bearer {tokens[rol]}'} if rol else {}
+        inicio = time.perf_counter()
+        response = client.get(path, headers=headers, environ_overrides=environ)
+        response.close()
+        resultados.append({'ruta': path, 'status': response.status_code,
+                           'segundos': round(time.perf_counter() - inicio, 4)})
+    return resultados
+
+
+def warm_up(app):
+    """Calienta el proceso actual: pools de conexiones y rutas de WARMUP_PATHS. Se puede llamar tras un fork."""
+    profile = app.extensions['startup']
+    inicio = time.perf_counter()
+    warmup = {'pid': os.getpid()}
+    try:
+        t = time.perf_counter()
+        warmup['conexiones'] = prime_pools(app, app.config['WARMUP_POOL_CONNECTIONS'])
+        warmup['segundosPool'] = round(time.perf_counter() - t, 4)
+        warmup['peticiones'] = warm_up_requests(app, app.config['WARMUP_PATHS'])
+    except Exception as e:
+        # El calentamiento es una optimización: si falla (p. ej. la base de datos aún no responde) el worker
+        # arranca igual y las primeras peticiones pagan el costo como antes
+        warmup['error'] = str(e)
+        print(f"ERROR EN calentamiento: {e}")
+    warmup['segundos'] = round(time.perf_counter() - inicio, 4)
+    profile.warmup = warmup
+    return warmup
+
+
+def init_startup(app, import_start, import_end):
+    """Crea el perfil de arranque. Llamar al inicio de create_app(); finish_startup() al final."""
+    app.config.setdefault('WARMUP_ENABLED', False)
+    app.config.setdefault('WARMUP_POOL_CONNECTIONS', app.config.get('DB_POOL_SIZE', 10))
+    app.config.setdefault('WARMUP_PATHS', DEFAULT_WARMUP_PATHS)
+    app.config.setdefault('STARTUP_REPORT', False)
+    profile = StartupProfile(import_start, import_end)
+    app.extensions['startup'] = profile
+
+    @app.before_request
+    def _startup_request_start():
+        if not request.environ.get(WARMUP_ENVIRON_KEY) and profile.primera_peticion is None:
+            request.environ['biblioteca.startup_inicio'] = time.perf_counter()
+
+    @app.after_request
+    def _startup_first_request(response):
+        inicio = request.environ.get('biblioteca.startup_inicio')
+        if inicio is not None and profile.first_request(request.endpoint or 'sin_ruta', inicio, time.perf_counter()):
+            if app.config['STARTUP_REPORT']:
+                primera = profile.primera_peticion
+                print(f"[arranque {profile.pid}] primera petición {primera['endpoint']}: {primera['segundos']}s "
+                      f"({primera['segundosDesdeImportacion']}s desde la importación)")
+        return response
+
+    return profile
+
+
+def finish_startup(app, inicio):
+    """Configura los mappers, calienta si WARMUP_ENABLED y cierra el perfil de create_app()."""
+    profile = app.extensions['startup']
+    with profile.fase('configure_mappers'):
+        configure_mappers() # Relaciones entre modelos resueltas ahora y no en la primera consulta
+    if app.config['WARMUP_ENABLED']:
+        with profile.fase('calentamiento'):
+            warm_up(app)
+    profile.create_app_s = round(time.perf_counter() - inicio, 4)
+    if app.config['STARTUP_REPORT']:
+        print(f"[arranque {profile.pid}] {profile.summary()}")
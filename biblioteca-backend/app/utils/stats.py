@@ -0,0 +1,231 @@
+# app/utils/stats.py
+#
+# Contadores agregados (tabla stats_counters) para los paneles de administración y bibliotecario.
+#
+# Las rutas que cambian usuarios, libros, solicitudes, préstamos o multas llaman a add_counter() con el delta
+# correspondiente. Los deltas se acumulan en la sesión y se aplican justo antes del commit, con un
+# UPDATE ... SET valor = valor + :delta por contador, así que van en la misma transacción que el cambio y
+# se descartan si hay rollback. Los paneles leen todos sus contadores con una sola consulta por clave primaria.
+# recompute_counters() los recalcula desde las tablas base para corregir desviaciones.
+#
+# Los contadores por usuario del panel del lector (tabla contador_usuario) siguen el mismo esquema con
+# add_user_counter(); si a un usuario le falta su fila, se calcula desde las tablas base en ese momento.
+
+from sqlalchemy import bindparam, event, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import db, StatsCounter, ContadorUsuario, Usuario, Rol, Libro, Solicitud, Prestamo, Multa, Reserva
+from app.utils.db_routing import use_primary
+
+USUARIOS_TOTAL = 'usuarios_total'
+PRESTAMOS_ACTIVOS = 'prestamos_activos'
+MULTAS_PENDIENTES = 'multas_pendientes'
+SOLICITUDES_PENDIENTES = 'solicitudes_pendientes'
+LIBROS_TOTAL = 'libros_total'
+COPIAS_DISPONIBLES = 'copias_disponibles'
+EJEMPLARES_TOTAL = 'ejemplares_total'
+
+ESTADOS_USUARIO = ('Activo', 'Suspendido', 'Inactivo')
+
+# Columnas de contador_usuario
+USUARIO_PRESTAMOS_ACTIVOS = 'prestamos_activos'
+USUARIO_PRESTAMOS_TOTAL = 'prestamos_total'
+USUARIO_MULTAS_PENDIENTES = 'multas_pendientes'
+USUARIO_SOLICITUDES_PENDIENTES = 'solicitudes_pendientes'
+USUARIO_RESERVAS_ACTIVAS = 'reservas_activas' # Reservas 'En espera' o 'Asignada'
+CAMPOS_USUARIO = (USUARIO_PRESTAMOS_ACTIVOS, USUARIO_PRESTAMOS_TOTAL, USUARIO_MULTAS_PENDIENTES, USUARIO_SOLICITUDES_PENDIENTES,
+                  USUARIO_RESERVAS_ACTIVAS)
+
+_PENDING_KEY = 'stats_deltas'
+_PENDING_USER_KEY = 'stats_deltas_usuario'
+
+
+def usuarios_rol(rol_nombre):
+    return f'usuarios_rol:{rol_nombre}'
+
+
+def usuarios_estado(estado):
+    return f'usuarios_estado:{estado}'
+
+
+def add_counter(nombre, delta=1):
+    """Registra un delta para un contador; se aplica en el próximo commit de la sesión actual."""
+    if not delta:
+        return
+    pending = db.session.info.setdefault(_PENDING_KEY, {})
+    pending[nombre] = pending.get(nombre, 0) + delta
+
+
+def add_user_counters(rol_nombre, estado, sign=1):
+    """Deltas de un usuario que entra (sign=1) o sale (sign=-1) de los contadores."""
+    add_counter(USUARIOS_TOTAL, sign)
+    add_counter(usuarios_rol(rol_nombre), sign)
+    add_counter(usuarios_estado(estado or 'Activo'), sign)
+
+
+def add_user_counter(id_usuario, campo, delta=1):
+    """Registra un delta para un contador de un usuario (campo de CAMPOS_USUARIO); se aplica en el próximo commit."""
+    if not delta or id_usuario is None:
+        return
+    pending = db.session.info.setdefault(_PENDING_USER_KEY, {})
+    deltas = pending.setdefault(id_usuario, dict.fromkeys(CAMPOS_USUARIO, 0))
+    deltas[campo] += delta
+
+
+@event.listens_for(Session, 'before_commit')
+def _apply_pending_deltas(session):
+    pending_usuarios = session.info.pop(_PENDING_USER_KEY, None)
+    if pending_usuarios:
+        _apply_user_deltas(session, pending_usuarios)
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    # Orden fijo de claves para que transacciones concurrentes bloqueen las filas en el mismo orden
+    for nombre in sorted(pending):
+        delta = pending[nombre]
+        if delta:
+            session.execute(
+                update(StatsCounter)
+                .where(StatsCounter.nombre == nombre)
+                .values(valor=StatsCounter.valor + delta)
+            )
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending_deltas(session, previous_transaction):
+    if session.in_transaction():
+        return # Rollback de un savepoint: la transacción exterior (y sus deltas) siguen vivos
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_PENDING_USER_KEY, None)
+
+
+def _apply_user_deltas(session, pending):
+    ids = sorted(pending) # Mismo orden de bloqueo en transacciones concurrentes
+    existentes = set(session.scalars(select(ContadorUsuario.id_usuario).where(ContadorUsuario.id_usuario.in_(ids))))
+    for i in ids:
+        if i in existentes:
+            continue
+        # Sin fila todavía: se calcula desde las tablas base, que ya incluyen los cambios de esta transacción.
+        # read_user_counters() puede crearla a la vez (sin estos cambios): si gana, se le suma el delta
+        try:
+            with session.begin_nested():
+                _insert_user_counters(session, [i])
+        except IntegrityError:
+            existentes.add(i)
+    filas = [{'uid': i, **{f'd_{campo}': pending[i][campo] for campo in CAMPOS_USUARIO}}
+             for i in ids if i in existentes and any(pending[i].values())]
+    if filas:
+        session.execute(
+            update(ContadorUsuario.__table__)
+            .where(ContadorUsuario.id_usuario == bindparam('uid'))
+            .values({campo: getattr(ContadorUsuario, campo) + bindparam(f'd_{campo}') for campo in CAMPOS_USUARIO}),
+            filas,
+        )
+
+
+def _user_counters_select(ids=None):
+    """SELECT id_usuario + los contadores de CAMPOS_USUARIO calculados con subconsultas correlacionadas."""
+    def contar(columna, *condiciones):
+        return select(func.count()).select_from(columna.table).where(*condiciones).correlate(Usuario).scalar_subquery()
+
+    query = select(
+        Usuario.id,
+        contar(Prestamo.id, Prestamo.id_usuario == Usuario.id, Prestamo.estado.in_(('Activo', 'Vencido'))),
+        contar(Prestamo.id, Prestamo.id_usuario == Usuario.id),
+        select(func.count()).select_from(Multa).join(Prestamo, Multa.id_prestamo == Prestamo.id)
+        .where(Prestamo.id_usuario == Usuario.id, Multa.estado == 'Pendiente').correlate(Usuario).scalar_subquery(),
+        contar(Solicitud.id, Solicitud.id_usuario_lector == Usuario.id, Solicitud.estado == 'Pendiente'),
+        contar(Reserva.id, Reserva.id_usuario == Usuario.id, Reserva.estado.in_(('En espera', 'Asignada'))),
+    )
+    return query.where(Usuario.id.in_(ids)) if ids is not None else query
+
+
+def _insert_user_counters(session, ids=None):
+    session.execute(insert(ContadorUsuario).from_select(['id_usuario', *CAMPOS_USUARIO], _user_counters_select(ids)))
+
+
+def read_user_counters(id_usuario):
+    """Contadores del panel de un usuario ({campo: valor}), por clave primaria; crea la fila si falta."""
+    fila = db.session.get(ContadorUsuario, id_usuario)
+    if fila is None:
+        with use_primary(): # La fila se crea en la principal y se vuelve a leer de allí
+            try:
+                _insert_user_counters(db.session, [id_usuario])
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback() # Otra petición la creó a la vez
+            fila = db.session.get(ContadorUsuario, id_usuario)
+        if fila is None: # El usuario no existe
+            return dict.fromkeys(CAMPOS_USUARIO, 0)
+    return {campo: getattr(fila, campo) for campo in CAMPOS_USUARIO}
+
+
+def refresh_user_counters(ids):
+    """Recalcula desde las tablas base (con los cambios de la transacción actual) los contadores de unos usuarios."""
+    ids = sorted(ids)
+    pending = db.session.info.get(_PENDING_USER_KEY, {})
+    for i in ids:
+        pending.pop(i, None) # El recálculo ya incluye sus deltas pendientes
+    db.session.execute(ContadorUsuario.__table__.delete().where(ContadorUsuario.id_usuario.in_(ids)))
+    _insert_user_counters(db.session, ids)
+
+
+def recompute_user_counters():
+    """Recalcula la tabla contador_usuario completa con un solo INSERT ... SELECT (sin hacer commit)."""
+    db.session.info.pop(_PENDING_USER_KEY, None)
+    db.session.execute(ContadorUsuario.__table__.delete())
+    _insert_user_counters(db.session)
+
+
+def compute_counters():
+    """Calcula todos los contadores desde las tablas base (consultas agregadas, sin cargar filas)."""
+    valores = {
+        USUARIOS_TOTAL: db.session.query(func.count(Usuario.id)).scalar() or 0,
+        PRESTAMOS_ACTIVOS: db.session.query(func.count(Prestamo.id)).filter(Prestamo.estado == 'Activo').scalar() or 0,
+        MULTAS_PENDIENTES: db.session.query(func.count(Multa.id)).filter(Multa.estado == 'Pendiente').scalar() or 0,
+        SOLICITUDES_PENDIENTES: db.session.query(func.count(Solicitud.id)).filter(Solicitud.estado == 'Pendiente').scalar() or 0,
+        LIBROS_TOTAL: db.session.query(func.count(Libro.id)).scalar() or 0,
+        COPIAS_DISPONIBLES: db.session.query(func.coalesce(func.sum(Libro.cantidad), 0)).scalar() or 0,
+        EJEMPLARES_TOTAL: db.session.query(func.coalesce(func.sum(Libro.total_ejemplares), 0)).scalar() or 0,
+    }
+    for rol_nombre in db.session.query(Rol.nombre):
+        valores[usuarios_rol(rol_nombre[0])] = 0
+    for rol_nombre, total in db.session.query(Rol.nombre, func.count(Usuario.id)).join(Usuario, Usuario.rol_id == Rol.id).group_by(Rol.nombre):
+        valores[usuarios_rol(rol_nombre)] = total
+    for estado in ESTADOS_USUARIO:
+        valores[usuarios_estado(estado)] = 0
+    for estado, total in db.session.query(Usuario.estado, func.count(Usuario.id)).group_by(Usuario.estado):
+        valores[usuarios_estado(estado)] = total
+    return valores
+
+
+def recompute_counters(extra_nombres=(), usuarios=False):
+    """Recalcula y guarda todos los contadores (reparación de desviaciones). Devuelve los valores nuevos.
+
+    Con usuarios=True recalcula también los contadores por usuario del panel del lector.
+    """
+    valores = compute_counters()
+    for nombre in extra_nombres:
+        valores.setdefault(nombre, 0) # p. ej. un rol que todavía no existe: su fila queda en 0
+    db.session.info.pop(_PENDING_KEY, None) # Los deltas pendientes ya están incluidos en el recálculo
+    existentes = {c.nombre: c for c in StatsCounter.query.with_for_update().all()}
+    for nombre, valor in valores.items():
+        if nombre in existentes:
+            existentes[nombre].valor = valor
+        else:
+            db.session.add(StatsCounter(nombre=nombre, valor=valor))
+    if usuarios:
+        recompute_user_counters()
+    db.session.commit()
+    return valores
+
+
+def read_counters(nombres):
+    """Lee varios contadores en una sola consulta. Si falta alguno (tabla sin inicializar), los recalcula."""
+    rows = dict(db.session.query(StatsCounter.nombre, StatsCounter.valor).filter(StatsCounter.nombre.in_(nombres)).all())
+    if len(rows) < len(set(nombres)):
+        with use_primary(): # La lectura con bloqueo y la escritura van a la principal aunque la petición sea GET
+            valores = recompute_counters(extra_nombres=nombres)
+        return {nombre: valores.get(nombre, 0) for nombre in nombres}
+    return rows
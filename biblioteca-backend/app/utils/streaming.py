@@ -0,0 +1,82 @@
+# app/utils/streaming.py
+#
+# Modo streaming (NDJSON) para los listados grandes.
+#
+# Con ?stream=1 o "Accept: application/x-ndjson" los listados devuelven un objeto JSON por línea, escrito a
+# medida que se leen las filas, en lugar de construir la lista completa y llamar a jsonify al final: la
+# memoria queda acotada al tamaño del lote y el primer byte sale en cuanto llega el primer lote.
+#
+# Las filas se leen de dos formas:
+#   - stream_rows(): cursor del lado del servidor (yield_per). Para consultas de una sola sentencia.
+#   - iter_keyset(): lotes por keyset (WHERE (orden, id) > último LIMIT n). Para consultas con carga
+#     selectinload: con un cursor de servidor (SSCursor de PyMySQL) la conexión no admite otras consultas
+#     mientras el resultado sigue abierto.
+# Sin el modo streaming, las mismas funciones sirven para construir la lista de siempre.
+
+import traceback
+
+from flask import Response, current_app, request, stream_with_context
+
+from app.models import db
+from app.utils.pagination import apply_keyset
+from app.utils.json_provider import dumps_compact
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+DEFAULT_STREAM_BATCH_SIZE = 1000
+LINES_PER_CHUNK = 100 # Líneas agrupadas por cada escritura al socket
+
+
+def wants_stream():
+    """True si la petición pide NDJSON (?stream=1 o cabecera Accept)."""
+    if request.args.get('stream', '').lower() in ('1', 'true', 'si', 'yes'):
+        return True
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def stream_batch_size():
+    return current_app.config.get('STREAM_BATCH_SIZE', DEFAULT_STREAM_BATCH_SIZE)
+
+
+def stream_rows(query):
+    """Itera una consulta con cursor del lado del servidor, en lotes de stream_batch_size() filas."""
+    return query.yield_per(stream_batch_size())
+
+
+def iter_keyset(query, sort_column, id_column, cursor_of, cursor=None, descending=False):
+    """Itera una consulta por lotes keyset; cursor_of(fila) devuelve el cursor de la última fila de un lote."""
+    batch_size = stream_batch_size()
+    while True:
+        rows = apply_keyset(query, sort_column, id_column, cursor, descending).limit(batch_size).all()
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        cursor = cursor_of(rows[-1])
+
+
+def ndjson_response(items, nombre):
+    """Respuesta NDJSON escrita de forma incremental a partir de un iterable (perezoso) de dicts.
+
+    Si algo falla a mitad del envío ya no se puede responder con un 500: se registra el error y se escribe
+    una última línea {"error": ...} para que el cliente sepa que el listado está incompleto.
+    """
+    provider = current_app.json
+
+    def generate():
+        buffer = []
+        try:
+            for item in items:
+                buffer.append(dumps_compact(provider, item))
+                if len(buffer) >= LINES_PER_CHUNK:
+                    yield b'\n'.join(buffer) + b'\n'
+                    buffer = []
+            if buffer:
+                yield b'\n'.join(buffer) + b'\n'
+        except Exception as e:
+            db.session.rollback()
+            print(f"ERROR EN {nombre} (stream): {e}")
+            traceback.print_exc()
+            yield b'\n'.join(buffer + [dumps_compact(provider, {'error': str(e)})]) + b'\n'
+
+    response = Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+    response.headers['X-Accel-Buffering'] = 'no' # Evita que un proxy (nginx) acumule la respuesta completa
+    return response
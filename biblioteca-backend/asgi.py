@@ -0,0 +1,5 @@
+# /asgi.py
+# Modo ASGI: uvicorn asgi:app --workers 4  (ver app/aio/factory.py)
+from app.aio.factory import create_asgi_app
+
+app = create_asgi_app()
@@ -0,0 +1,204 @@
+# benchmarks/asgi_vs_wsgi.py
+#
+# Capacidad de conexiones concurrentes: modo ASGI (app/aio/factory.py) frente a WSGI con hilos.
+#
+# Levanta cada modo en un proceso uvicorn aparte y lo carga desde este proceso con un cliente HTTP/1.1 mínimo sobre
+# asyncio (una conexión keep-alive por cliente simulado), con --concurrencias clientes a la vez:
+#   - wsgi: la aplicación Flask de create_app() detrás de un pool de --hilos hilos (a2wsgi), el modelo de
+#     un servidor WSGI de hilos (gunicorn gthread, waitress): cada petición ocupa un hilo mientras espera a la BD;
+#   - asgi: create_asgi_app(), con las lecturas en corrutinas sobre el engine asíncrono y el resto en el mismo
+#     pool de --hilos hilos.
+# La mezcla de peticiones es la del uso normal de un lector: catálogo filtrado, resumen del panel e historial.
+# Informa peticiones/s, p50/p95/p99 y errores (conexión, timeout, estado != 200) por modo y concurrencia.
+#
+# Con el SQLite local por defecto no hay espera de red: cada consulta es CPU del mismo proceso y el modo ASGI solo
+# muestra su sobrecoste (aiosqlite pasa cada consulta por un hilo). La diferencia de capacidad aparece con una base
+# de datos remota (--database-url mysql+pymysql://...), donde cada petición WSGI retiene un hilo durante los
+# viajes de ida y vuelta a la BD y el pool de --hilos hilos se convierte en el límite de conexiones atendidas.
+#
+# Uso (desde biblioteca-backend/):
+#   python benchmarks/asgi_vs_wsgi.py --concurrencias 50,200,500 --duracion 10
+#   python benchmarks/asgi_vs_wsgi.py --database-url mysql+pymysql://... --sin-seed
+# ¡Sin --sin-seed la base de datos indicada se BORRA y se vuelve a crear!
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from load import percentil  # noqa: E402
+
+MEZCLA = (
+    lambda i: f'/api/v1/libros?limit=20&genero_id={1 + i % 30}',
+    lambda i: '/api/v1/lector/panel/summary',
+    lambda i: '/api/v1/lector/historial?limit=20',
+)
+
+
+def bench_config(database_url, hilos):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        ASGI_WSGI_WORKERS = hilos
+        DB_POOL_SIZE = hilos + 2 # Lo que puede usar a la vez un pool de `hilos` hilos
+        DB_MAX_OVERFLOW = 0
+        DB_POOL_TIMEOUT = 30
+    return BenchConfig
+
+
+def servir(modo, database_url, puerto, hilos):
+    """Proceso servidor (se lanza a sí mismo con --servir)."""
+    import uvicorn
+    from a2wsgi import WSGIMiddleware
+
+    if modo == 'asgi':
+        from app.aio.factory import create_asgi_app
+        app = create_asgi_app(bench_config(database_url, hilos))
+    else:
+        from app import create_app
+        app = WSGIMiddleware(create_app(bench_config(database_url, hilos)), workers=hilos)
+    uvicorn.run(app, host='127.0.0.1', port=puerto, log_level='warning', access_log=False, backlog=4096)
+
+
+async def peticion(reader, writer, path, token):
+    writer.write((f'GET {path} HTTP/1.1\r\nHost: bench\r\nAuthorization: Bearer {token}\r\n\r\n').encode('latin-1'))
+    await writer.drain()
+    cabecera = await reader.readuntil(b'\r\n\r\n')
+    lineas = cabecera.decode('latin-1').split('\r\n')
+    status = int(lineas[0].split()[1])
+    largo = next((int(linea.split(':', 1)[1]) for linea in lineas if linea.lower().startswith('content-length:')), 0)
+    await reader.readexactly(largo)
+    return status
+
+
+async def fase(puerto, token, concurrencia, duracion, timeout):
+    latencias, errores = [], {'conexion': 0, 'timeout': 0, 'estado': 0}
+    fin = time.perf_counter() + duracion
+
+    async def cliente(n):
+        i = n
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', puerto), timeout)
+        except (OSError, asyncio.TimeoutError):
+            errores['conexion'] += 1
+            return
+        try:
+            while time.perf_counter() < fin:
+                i += concurrencia
+                inicio = time.perf_counter()
+                try:
+                    status = await asyncio.wait_for(peticion(reader, writer, MEZCLA[i % len(MEZCLA)](i), token), timeout)
+                except asyncio.TimeoutError:
+                    errores['timeout'] += 1
+                    return # La conexión queda a mitad de respuesta: no se puede reutilizar
+                except (OSError, asyncio.IncompleteReadError):
+                    errores['conexion'] += 1
+                    return
+                if status == 200:
+                    latencias.append((time.perf_counter() - inicio) * 1000)
+                else:
+                    errores['estado'] += 1
+        finally:
+            writer.close()
+
+    await asyncio.gather(*(cliente(n) for n in range(concurrencia)))
+    latencias.sort()
+    return {
+        'peticiones_por_segundo': round(len(latencias) / duracion, 1),
+        'p50_ms': round(percentil(latencias, 50), 2) if latencias else None,
+        'p95_ms': round(percentil(latencias, 95), 2) if latencias else None,
+        'p99_ms': round(percentil(latencias, 99), 2) if latencias else None,
+        'errores': errores,
+    }
+
+
+def esperar_servidor(puerto, proceso, limite=60):
+    import socket
+    fin = time.time() + limite
+    while time.time() < fin:
+        if proceso.poll() is not None:
+            raise RuntimeError('El servidor terminó al arrancar')
+        try:
+            socket.create_connection(('127.0.0.1', puerto), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('El servidor no respondió a tiempo')
+
+
+def login(puerto):
+    import urllib.request
+    from app.utils.seed import CUENTAS_BENCHMARK, DEFAULT_PASSWORD
+    body = json.dumps({'email': CUENTAS_BENCHMARK['Lector'], 'password': DEFAULT_PASSWORD}).encode('utf-8')
+    req = urllib.request.Request(f'http://127.0.0.1:{puerto}/api/v1/auth/login', body, {'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req) as resp:
+        return json.load(resp)['access_token']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Conexiones concurrentes: ASGI frente a WSGI con hilos.')
+    parser.add_argument('--database-url', default=None, help='URL de SQLAlchemy (por defecto un SQLite temporal).')
+    parser.add_argument('--modos', default='wsgi,asgi')
+    parser.add_argument('--concurrencias', default='50,200,500', help='Clientes simultáneos por fase.')
+    parser.add_argument('--hilos', type=int, default=10, help='Hilos del pool WSGI (en ambos modos).')
+    parser.add_argument('--duracion', type=float, default=10.0, help='Segundos por fase.')
+    parser.add_argument('--timeout', type=float, default=10.0, help='Segundos máximos por petición o conexión.')
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--libros', type=int, default=5000)
+    parser.add_argument('--sin-seed', action='store_true')
+    parser.add_argument('--output', default='asgi_vs_wsgi.json')
+    parser.add_argument('--servir', choices=('wsgi', 'asgi'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_asgi.db')
+    if args.servir:
+        return servir(args.servir, database_url, args.puerto, args.hilos)
+
+    if not args.sin_seed:
+        from app import create_app, db
+        from app.utils.seed import seed_database
+        with create_app(bench_config(database_url, args.hilos)).app_context():
+            db.drop_all()
+            db.create_all()
+            seed_database(args.libros, 500, 20000)
+
+    resultados = {}
+    for modo in args.modos.split(','):
+        proceso = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--servir', modo,
+                                    '--database-url', database_url, '--puerto', str(args.puerto), '--hilos', str(args.hilos)])
+        try:
+            esperar_servidor(args.puerto, proceso)
+            token = login(args.puerto)
+            asyncio.run(fase(args.puerto, token, 10, 1.0, args.timeout)) # Calentamiento (conexiones, cachés)
+            resultados[modo] = {}
+            for concurrencia in [int(c) for c in args.concurrencias.split(',')]:
+                r = asyncio.run(fase(args.puerto, token, concurrencia, args.duracion, args.timeout))
+                resultados[modo][f'c={concurrencia}'] = r
+                print(f"{modo:5} c={concurrencia:<5} {r['peticiones_por_segundo']:>8.1f} req/s | "
+                      f"p50 {r['p50_ms']} p95 {r['p95_ms']} p99 {r['p99_ms']} ms | errores {r['errores']}")
+        finally:
+            proceso.terminate()
+            proceso.wait()
+
+    informe = {
+        'fecha': datetime.utcnow().isoformat(),
+        'database': database_url.split('://')[0],
+        'hilos': args.hilos,
+        'duracion_fase_s': args.duracion,
+        'mezcla': [f(0) for f in MEZCLA],
+        'modos': resultados,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
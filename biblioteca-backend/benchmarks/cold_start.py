@@ -0,0 +1,173 @@
+# benchmarks/cold_start.py
+#
+# Arranque en frío de un worker: importación por módulo, create_app() por fase y latencia de las primeras
+# peticiones, sin y con calentamiento (WARMUP_ENABLED, ver app/utils/startup.py).
+#
+# Cada medición es un proceso de Python nuevo (como un worker recién lanzado por el autoescalado), ejecutado con
+# `python -X importtime`: de su salida se suma lo importado por paquete (flask, sqlalchemy, app...). El
+# proceso crea la aplicación, atiende dos veces cada ruta de RUTAS con el cliente de pruebas y devuelve el perfil
+# de arranque (GET /api/v1/admin/startup). Se imprimen las medianas de --procesos y se guardan en JSON para
+# detectar regresiones entre versiones.
+#
+# Uso (desde biblioteca-backend/):
+#   python benchmarks/cold_start.py --libros 20000 --usuarios 5000 --procesos 5
+#   python benchmarks/cold_start.py --database-url mysql+pymysql://... --sin-seed
+# ¡Sin --sin-seed la base de datos indicada se BORRA y se vuelve a crear!
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.utils.seed import CUENTAS_BENCHMARK, DEFAULT_PASSWORD, seed_database  # noqa: E402
+from config import Config  # noqa: E402
+
+# (ruta, rol) de las primeras peticiones medidas en cada proceso
+RUTAS = [
+    ('/api/v1/libros', 'Lector'),
+    ('/api/v1/libros/facetas', 'Lector'),
+    ('/api/v1/lector/panel/summary', 'Lector'),
+    ('/api/v1/lector/historial', 'Lector'),
+    ('/api/v1/bibliotecario/panel/summary', 'Bibliotecario'),
+    ('/api/v1/admin/panel/summary', 'Admin'),
+]
+
+# Código del proceso medido: recibe las rutas y los tokens por variables de entorno y escribe JSON en stdout
+PROCESO = '''
+import json, os, time
+from app import create_app
+app = create_app()
+client = app.test_client()
+tokens = json.loads(os.environ['COLD_START_TOKENS'])
+rutas = []
+for ruta, rol in json.loads(os.environ['COLD_START_RUTAS']):
+    tiempos = []
+    for _ in range(2):
+        inicio = time.perf_counter()
+        response = client.get(ruta, headers={'Authorization': 'Bearer ' + tokens[rol]})
+        response.close()
+        tiempos.append(time.perf_counter() - inicio)
+    rutas.append({'ruta': ruta, 'status': response.status_code, 'primera': tiempos[0], 'segunda': tiempos[1]})
+print(json.dumps({'perfil': app.extensions['startup'].report(), 'rutas': rutas}))
+'''
+
+
+def importacion_por_paquete(stderr):
+    """Microsegundos acumulados por paquete según la salida de -X importtime.
+
+    Lo que importa el paquete app (Flask, SQLAlchemy, extensiones, módulos propios) se desglosa por paquete de
+    primer nivel; el resto de importaciones de arranque del intérprete se suma a su propio paquete.
+    """
+    paquetes = {}
+    hijos = [] # importtime escribe los módulos importados antes que el que los importa
+    for linea in stderr.splitlines():
+        if not linea.startswith('import time:') or 'cumulative' in linea:
+            continue
+        _, acumulado, nombre = linea.split('|')
+        nivel = (len(nombre) - len(nombre.lstrip()) - 1) // 2
+        if nivel == 1:
+            hijos.append((nombre.strip(), int(acumulado)))
+        elif nivel == 0:
+            desglose = hijos if nombre.strip() == 'app' else [(nombre.strip(), int(acumulado))]
+            for modulo, us in desglose:
+                paquete = modulo.split('.')[0]
+                paquetes[paquete] = paquetes.get(paquete, 0) + us
+            hijos = []
+    return paquetes
+
+
+def medir_proceso(env):
+    salida = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROCESO], env=env, capture_output=True,
+                            text=True, check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    resultado = json.loads(salida.stdout.strip().splitlines()[-1])
+    resultado['importacion'] = importacion_por_paquete(salida.stderr)
+    return resultado
+
+
+def medianas(procesos):
+    """Medianas de varios procesos: importación por paquete, fases, calentamiento y primeras peticiones."""
+    mediana = lambda valores: round(statistics.median(valores), 4)
+    paquetes = {p for r in procesos for p in r['importacion']}
+    importacion = {p: mediana([r['importacion'].get(p, 0) / 1e6 for r in procesos]) for p in paquetes}
+    fases = {}
+    for r in procesos:
+        for fase in r['perfil']['fases']:
+            fases.setdefault(fase['fase'], []).append(fase['segundos'])
+    rutas = {}
+    for r in procesos:
+        for ruta in r['rutas']:
+            rutas.setdefault(ruta['ruta'], {'primera': [], 'segunda': [], 'status': ruta['status']})
+            rutas[ruta['ruta']]['primera'].append(ruta['primera'])
+            rutas[ruta['ruta']]['segunda'].append(ruta['segunda'])
+    return {
+        'createAppS': mediana([r['perfil']['segundosCreateApp'] for r in procesos]),
+        'importacionS': dict(sorted(importacion.items(), key=lambda kv: kv[1], reverse=True)),
+        'fasesS': {nombre: mediana(valores) for nombre, valores in fases.items()},
+        'rutas': {ruta: {'status': v['status'], 'primeraS': mediana(v['primera']), 'segundaS': mediana(v['segunda'])}
+                  for ruta, v in rutas.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Arranque en frío: importación, create_app y primeras peticiones.')
+    parser.add_argument('--database-url', default=None, help='URL de SQLAlchemy (por defecto un SQLite temporal).')
+    parser.add_argument('--sin-seed', action='store_true')
+    parser.add_argument('--libros', type=int, default=20000)
+    parser.add_argument('--usuarios', type=int, default=5000)
+    parser.add_argument('--prestamos', type=int, default=50000)
+    parser.add_argument('--procesos', type=int, default=5, help='Procesos nuevos por modo (se reporta la mediana).')
+    parser.add_argument('--output', default='cold_start.json')
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_cold.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+
+    app = create_app(BenchConfig)
+    if not args.sin_seed:
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            seed_database(args.libros, args.usuarios, args.prestamos, log=print)
+
+    client = app.test_client()
+    tokens = {}
+    for rol in {rol for _, rol in RUTAS}:
+        login = client.post('/api/v1/auth/login', json={'email': CUENTAS_BENCHMARK[rol], 'password': DEFAULT_PASSWORD})
+        tokens[rol] = login.get_json()['access_token']
+
+    resultados = {}
+    for modo, warmup in (('sin_calentamiento', '0'), ('con_calentamiento', '1')):
+        env = {**os.environ, 'DATABASE_URL': database_url, 'WARMUP_ENABLED': warmup, 'STARTUP_REPORT': '0',
+               'COLD_START_TOKENS': json.dumps(tokens), 'COLD_START_RUTAS': json.dumps(RUTAS)}
+        procesos = [medir_proceso(env) for _ in range(args.procesos)]
+        resultados[modo] = medianas(procesos)
+        r = resultados[modo]
+        print(f"\n{modo}: create_app {r['createAppS']}s")
+        print('  importación: ' + ', '.join(f'{p} {s}s' for p, s in list(r['importacionS'].items())[:8]))
+        lentas = sorted(r['fasesS'].items(), key=lambda kv: kv[1], reverse=True)[:6]
+        print('  fases: ' + ', '.join(f'{f} {s}s' for f, s in lentas))
+        for ruta, v in r['rutas'].items():
+            print(f"  {ruta:40} {v['status']} primera {v['primeraS'] * 1000:.1f} ms, segunda {v['segundaS'] * 1000:.1f} ms")
+
+    informe = {
+        'fecha': datetime.utcnow().isoformat(),
+        'database': database_url.split('://')[0],
+        'procesos': args.procesos,
+        'resultados': resultados,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+# benchmarks/json_compression.py
+#
+# CPU de serialización JSON y bytes transferidos por endpoint: json de la biblioteca estándar frente a orjson
+# (app/utils/json_provider.py) y sin comprimir frente a gzip/brotli (app/utils/compression.py).
+#
+# Levanta la aplicación en el mismo proceso (cliente de pruebas de Flask) contra un SQLite temporal o la URL
+# indicada, y para cada endpoint mide:
+#   - serializar_ms: CPU para serializar el cuerpo ya construido (la lista de dicts de la respuesta), con json
+#     (proveedor por defecto de Flask) y con orjson. En los listados NDJSON, línea a línea como al enviarlos;
+#   - peticion_ms: CPU de la petición completa (consultas, serialización, compresión) con cada proveedor y
+#     codificación. Los GET del catálogo se piden en modo NDJSON o con la versión cambiada para que no los
+#     sirva el snapshot en memoria;
+#   - bytes: tamaño en la red sin comprimir, con gzip y con brotli (si está instalado), y la CPU de comprimir.
+# Las medianas de --repeticiones se imprimen y se guardan en JSON para comparar entre versiones.
+#
+# Uso (desde biblioteca-backend/):
+#   python benchmarks/json_compression.py --libros 20000 --usuarios 5000 --repeticiones 10
+#   python benchmarks/json_compression.py --database-url mysql+pymysql://... --sin-seed
+# ¡Sin --sin-seed la base de datos indicada se BORRA y se vuelve a crear!
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.utils.compression import ResponseCompressor, brotli  # noqa: E402
+from app.utils.json_provider import FastJSONProvider, orjson  # noqa: E402
+from app.utils.seed import CUENTAS_BENCHMARK, DEFAULT_PASSWORD, seed_database  # noqa: E402
+from config import Config  # noqa: E402
+
+# (nombre, ruta, rol). Los dos primeros son los documentos de varios MB (catálogo y usuarios completos).
+ENDPOINTS = [
+    ('catalogo_completo', '/api/v1/libros?stream=1', 'Lector'),
+    ('usuarios_completo', '/api/v1/admin/usuarios?stream=1', 'Admin'),
+    ('catalogo_pagina', '/api/v1/libros?limit=200', 'Lector'),
+    ('usuarios_pagina', '/api/v1/admin/usuarios?limit=200', 'Admin'),
+    ('lector_historial', '/api/v1/lector/historial?limit=200', 'Lector'),
+    ('bibliotecario_multas', '/api/v1/bibliotecario/multas', 'Bibliotecario'),
+]
+
+
+def cpu_ms(fn, repeticiones):
+    """Mediana de CPU (ms) de fn() en el proceso; devuelve también el último resultado."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.process_time()
+        resultado = fn()
+        tiempos.append((time.process_time() - inicio) * 1000)
+    return round(statistics.median(tiempos), 3), resultado
+
+
+def decodificar(response):
+    """El cuerpo como objetos de Python (lista de líneas en los listados NDJSON)."""
+    if response.mimetype == 'application/x-ndjson':
+        return [json.loads(linea) for linea in response.data.splitlines() if linea]
+    return json.loads(response.data)
+
+
+def medir_serializacion(app, cuerpo, ndjson, repeticiones):
+    proveedores = {'json': DefaultJSONProvider(app)}
+    if orjson is not None:
+        proveedores['orjson'] = FastJSONProvider(app)
+    resultado = {}
+    for nombre, proveedor in proveedores.items():
+        if isinstance(proveedor, FastJSONProvider):
+            dumps = proveedor.dumps_bytes
+        else:
+            dumps = lambda obj, p=proveedor: p.dumps(obj, separators=(',', ':')).encode('utf-8')
+        fn = (lambda: b'\n'.join(dumps(item) for item in cuerpo)) if ndjson else (lambda: dumps(cuerpo))
+        resultado[nombre], _ = cpu_ms(fn, repeticiones)
+    return resultado
+
+
+def medir_compresion(body, repeticiones):
+    compressor = ResponseCompressor(cache_entries=0)
+    resultado = {'identity': {'bytes': len(body)}}
+    for encoding in compressor.encodings:
+        ms, data = cpu_ms(lambda: compressor.compress(body, encoding), repeticiones)
+        resultado[encoding] = {'bytes': len(data), 'cpu_ms': ms, 'ratio': round(len(body) / max(len(data), 1), 1)}
+    return resultado
+
+
+def medir_peticiones(clientes, ruta, headers, repeticiones):
+    resultado = {}
+    for nombre, (app, client) in clientes.items():
+        for encoding in ['identity'] + app.extensions['compression'].encodings:
+            def peticion():
+                if 'stream=1' not in ruta:
+                    app.extensions['catalogo_cache'].invalidate() # Sin snapshot: se consulta y serializa cada vez
+                response = client.get(ruta, headers={**headers, 'Accept-Encoding': encoding})
+                return response.status_code, len(response.data) # .data consume también los listados NDJSON
+            ms, (status, largo) = cpu_ms(peticion, repeticiones)
+            resultado[f'{nombre}+{encoding}'] = {'cpu_ms': ms, 'bytes': largo, 'status': status}
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CPU de serialización JSON y bytes por endpoint (json/orjson, gzip/brotli).')
+    parser.add_argument('--database-url', default=None, help='URL de SQLAlchemy (por defecto un SQLite temporal).')
+    parser.add_argument('--sin-seed', action='store_true')
+    parser.add_argument('--libros', type=int, default=20000)
+    parser.add_argument('--usuarios', type=int, default=5000)
+    parser.add_argument('--prestamos', type=int, default=50000)
+    parser.add_argument('--repeticiones', type=int, default=10)
+    parser.add_argument('--solo', default='', help='Endpoints a medir (nombres de ENDPOINTS), separados por comas.')
+    parser.add_argument('--output', default='json_compression.json')
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_json.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        COMPRESSION_CACHE_ENTRIES = 0 # Cada petición comprime (sin reutilizar el cuerpo comprimido del snapshot)
+
+    class StdlibConfig(BenchConfig):
+        JSON_USE_ORJSON = False
+
+    app = create_app(BenchConfig)
+    if not args.sin_seed:
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            seed_database(args.libros, args.usuarios, args.prestamos, log=print)
+
+    clientes = {'orjson' if orjson is not None else 'json': (app, app.test_client())}
+    if orjson is not None:
+        stdlib = create_app(StdlibConfig)
+        clientes['json'] = (stdlib, stdlib.test_client())
+    client = app.test_client()
+    tokens = {}
+    for rol in {rol for _, _, rol in ENDPOINTS}:
+        login = client.post('/api/v1/auth/login', json={'email': CUENTAS_BENCHMARK[rol], 'password': DEFAULT_PASSWORD})
+        tokens[rol] = login.get_json()['access_token']
+
+    solo = {s.strip() for s in args.solo.split(',') if s.strip()}
+    resultados = {}
+    for nombre, ruta, rol in ENDPOINTS:
+        if solo and nombre not in solo:
+            continue
+        headers = {'Authorization': f'Bearer {tokens[rol]}'}
+        response = client.get(ruta, headers={**headers, 'Accept-Encoding': 'identity'})
+        if response.status_code != 200:
+            print(f"{nombre}: estado {response.status_code}, se omite")
+            continue
+        body = response.data
+        resultados[nombre] = {
+            'ruta': ruta,
+            'serializar_ms': medir_serializacion(app, decodificar(response), 'stream=1' in ruta, args.repeticiones),
+            'bytes': medir_compresion(body, args.repeticiones),
+            'peticion': medir_peticiones(clientes, ruta, headers, args.repeticiones),
+        }
+        r = resultados[nombre]
+        tamaños = ' '.join(f"{enc}={v['bytes'] / 1024:.0f}KB" for enc, v in r['bytes'].items())
+        compresion = ' '.join(f"{enc} {v['cpu_ms']}ms" for enc, v in r['bytes'].items() if 'cpu_ms' in v)
+        serializar = ' '.join(f"{k} {v}ms" for k, v in r['serializar_ms'].items())
+        print(f"{nombre:22} serializar: {serializar} | {tamaños} | comprimir: {compresion}")
+        print(f"{'':22} petición (CPU ms): " + ' '.join(f"{k} {v['cpu_ms']}" for k, v in r['peticion'].items()))
+
+    informe = {
+        'fecha': datetime.utcnow().isoformat(),
+        'database': database_url.split('://')[0],
+        'orjson': orjson is not None,
+        'brotli': brotli is not None,
+        'repeticiones': args.repeticiones,
+        'endpoints': resultados,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+# benchmarks/load.py
+#
+# Benchmark de carga de los endpoints de todos los blueprints (auth, libros, lector, bibliotecario, admin).
+#
+# Levanta la aplicación en el mismo proceso (cliente de pruebas de Flask, sin servidor HTTP) contra una base de
+# datos local: un SQLite temporal por defecto o la URL indicada (p. ej. un MySQL de pruebas). Si no se pasa
+# --sin-seed, la base de datos se BORRA, se recrea y se llena con `seed_database` (ver app/utils/seed.py).
+# Cada escenario se ejecuta con una concurrencia fija (hilos) y se mide por petición: latencia, código de
+# respuesta y número de consultas SQL. El informe (p50/p95/p99, throughput, consultas por petición) se guarda
+# en JSON para poder compararlo entre versiones.
+#
+# Uso (desde biblioteca-backend/):
+#   python benchmarks/load.py --concurrencia 8 --peticiones 300 --output load.json
+#   python benchmarks/load.py --database-url mysql+pymysql://root:pw@localhost/bench_db --libros 100000
+#   python benchmarks/load.py --database-url mysql+pymysql://... --sin-seed   (usa los datos existentes)
+#   python benchmarks/load.py --solo libros,admin_usuarios                    (por blueprint o por escenario)
+#
+# Nota: POST /auth/register todavía no está implementado, así que el blueprint auth se mide solo con /login.
+
+import argparse
+import itertools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.models import Genero, Solicitud  # noqa: E402
+from app.utils.seed import CUENTAS_BENCHMARK, DEFAULT_PASSWORD, seed_database  # noqa: E402
+from config import Config  # noqa: E402
+
+PALABRAS_BUSQUEDA = ['sombra', 'viento ciudad', 'memoria', 'garcia', 'novela', 'noche jardin', 'tiempo', 'ana lopez']
+
+
+def escenarios(contexto):
+    """Lista de (nombre, blueprint, rol, fabrica). fabrica(i) -> (método, ruta, json) o None si no quedan datos."""
+    generos = contexto['generos'] or [1]
+    pendientes = iter(contexto['solicitudes_pendientes'])
+    pendientes_lock = threading.Lock()
+    isbn_seq = itertools.count(1)
+    prefijo_isbn = int(time.time()) % 100000
+
+    def siguiente_pendiente(i):
+        with pendientes_lock:
+            solicitud_id = next(pendientes, None)
+        return None if solicitud_id is None else ('POST', f'/api/v1/bibliotecario/solicitudes/{solicitud_id}/aprobar', None)
+
+    def libro_nuevo(i):
+        n = next(isbn_seq)
+        return ('POST', '/api/v1/libros', {
+            'isbn': f'BENCH{prefijo_isbn:05d}{n:07d}', 'nombre': f'Libro de carga {n}', 'cantidad': 3,
+            'autores': ['Ana García'], 'generos': ['Novela'],
+        })
+
+    return [
+        ('auth_login', 'auth', None, lambda i: ('POST', '/api/v1/auth/login',
+                                                {'email': CUENTAS_BENCHMARK['Lector'], 'password': contexto['password']})),
+        ('libros_listado', 'libros', 'Lector', lambda i: ('GET', '/api/v1/libros?limit=50', None)),
+        ('libros_por_genero', 'libros', 'Lector', lambda i: ('GET', f'/api/v1/libros?limit=50&genero_id={generos[i % len(generos)]}', None)),
+        ('libros_busqueda', 'libros', 'Lector', lambda i: ('GET', f'/api/v1/libros/search?q={PALABRAS_BUSQUEDA[i % len(PALABRAS_BUSQUEDA)]}', None)),
+        ('libros_generos', 'libros', None, lambda i: ('GET', '/api/v1/libros/generos', None)),
+        ('libros_autores', 'libros', None, lambda i: ('GET', '/api/v1/libros/autores', None)),
+        ('libros_crear', 'libros', 'Bibliotecario', libro_nuevo),
+        ('lector_resumen', 'lector', 'Lector', lambda i: ('GET', '/api/v1/lector/panel/summary', None)),
+        ('bibliotecario_resumen', 'bibliotecario', 'Bibliotecario', lambda i: ('GET', '/api/v1/bibliotecario/panel/summary', None)),
+        ('bibliotecario_prestamos_pendientes', 'bibliotecario', 'Bibliotecario', lambda i: ('GET', '/api/v1/bibliotecario/prestamos-pendientes', None)),
+        ('bibliotecario_multas', 'bibliotecario', 'Bibliotecario', lambda i: ('GET', '/api/v1/bibliotecario/multas', None)),
+        ('bibliotecario_aprobar', 'bibliotecario', 'Bibliotecario', siguiente_pendiente),
+        ('admin_resumen', 'admin', 'Admin', lambda i: ('GET', '/api/v1/admin/panel/summary', None)),
+        ('admin_usuarios', 'admin', 'Admin', lambda i: ('GET', '/api/v1/admin/usuarios?limit=50', None)),
+        ('admin_usuarios_filtro', 'admin', 'Admin', lambda i: ('GET', '/api/v1/admin/usuarios?limit=50&rol=Lector&estado=Activo', None)),
+    ]
+
+
+class QueryCounter:
+    """Cuenta las sentencias SQL emitidas por el hilo actual (cada petición se atiende en un solo hilo)."""
+
+    def __init__(self, engine):
+        self._local = threading.local()
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    def reset(self):
+        self._local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self._local, 'count', 0)
+
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return None
+    k = max(0, min(len(ordenados) - 1, int(round(p / 100.0 * len(ordenados) + 0.5)) - 1))
+    return ordenados[k]
+
+
+def run_escenario(app, counter, tokens, rol, fabrica, peticiones, concurrencia, warmup):
+    local = threading.local()
+    headers = {'Authorization': f'Bearer {tokens[rol]}'} if rol else {}
+
+    def una_peticion(i):
+        peticion = fabrica(i)
+        if peticion is None:
+            return None
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        metodo, ruta, body = peticion
+        counter.reset()
+        inicio = time.perf_counter()
+        response = local.client.open(ruta, method=metodo, json=body, headers=headers)
+        latencia = (time.perf_counter() - inicio) * 1000
+        return latencia, response.status_code, counter.count
+
+    for i in range(warmup):
+        una_peticion(-1 - i)
+
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        inicio = time.perf_counter()
+        resultados = [r for r in pool.map(una_peticion, range(peticiones)) if r is not None]
+        duracion = time.perf_counter() - inicio
+
+    latencias = sorted(r[0] for r in resultados)
+    consultas = [r[2] for r in resultados]
+    codigos = Counter(r[1] for r in resultados)
+    return {
+        'peticiones': len(resultados),
+        'omitidas': peticiones - len(resultados),
+        'errores': sum(n for codigo, n in codigos.items() if codigo >= 500),
+        'codigos': {str(codigo): n for codigo, n in sorted(codigos.items())},
+        'p50_ms': round(percentil(latencias, 50), 3) if latencias else None,
+        'p95_ms': round(percentil(latencias, 95), 3) if latencias else None,
+        'p99_ms': round(percentil(latencias, 99), 3) if latencias else None,
+        'media_ms': round(statistics.fmean(latencias), 3) if latencias else None,
+        'max_ms': round(latencias[-1], 3) if latencias else None,
+        'peticiones_por_segundo': round(len(resultados) / duracion, 1) if resultados and duracion else 0.0,
+        'consultas_media': round(statistics.fmean(consultas), 2) if consultas else None,
+        'consultas_max': max(consultas) if consultas else None,
+    }
+
+
+def login(client, rol, password):
+    response = client.post('/api/v1/auth/login', json={'email': CUENTAS_BENCHMARK[rol], 'password': password})
+    if response.status_code != 200:
+        raise SystemExit(f"No se pudo iniciar sesión como {CUENTAS_BENCHMARK[rol]} ({response.status_code}). "
+                         "¿Faltan los datos de `flask seed` o la contraseña es otra?")
+    return response.get_json()['access_token']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de carga de los endpoints de la API.')
+    parser.add_argument('--database-url', default=None, help='URL de SQLAlchemy (por defecto un SQLite temporal).')
+    parser.add_argument('--sin-seed', action='store_true', help='No borrar ni generar datos: usar los existentes.')
+    parser.add_argument('--libros', type=int, default=20000)
+    parser.add_argument('--usuarios', type=int, default=5000)
+    parser.add_argument('--prestamos', type=int, default=100000)
+    parser.add_argument('--password', default=DEFAULT_PASSWORD, help='Contraseña de las cuentas de benchmark.')
+    parser.add_argument('--concurrencia', type=int, default=8, help='Peticiones simultáneas (hilos).')
+    parser.add_argument('--peticiones', type=int, default=200, help='Peticiones medidas por escenario.')
+    parser.add_argument('--warmup', type=int, default=5, help='Peticiones de calentamiento por escenario (no se miden).')
+    parser.add_argument('--solo', default='', help='Escenarios o blueprints a ejecutar, separados por comas.')
+    parser.add_argument('--output', default='load_results.json', help='Archivo JSON con los resultados.')
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_load.db')
+    engine_options = {'pool_size': args.concurrencia + 2}
+    if database_url.startswith('sqlite'):
+        engine_options['connect_args'] = {'timeout': 30, 'check_same_thread': False} # Escrituras concurrentes esperan al bloqueo
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        SQLALCHEMY_ENGINE_OPTIONS = engine_options
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        escala = None
+        if not args.sin_seed:
+            db.drop_all()
+            db.create_all()
+            resumen = seed_database(args.libros, args.usuarios, args.prestamos, password=args.password, log=print)
+            escala = {k: resumen[k] for k in ('libros', 'usuarios', 'prestamos', 'multas', 'solicitudes')}
+            print(f"Datos sintéticos creados en {resumen['segundos']} s")
+        contexto = {
+            'password': args.password,
+            'generos': [g for (g,) in db.session.query(Genero.id).order_by(Genero.id).limit(30)],
+            'solicitudes_pendientes': [s for (s,) in db.session.query(Solicitud.id).filter(Solicitud.estado == 'Pendiente')
+                                       .order_by(Solicitud.id).limit(args.peticiones + args.warmup)],
+        }
+        counter = QueryCounter(db.engine)
+
+    client = app.test_client()
+    tokens = {rol: login(client, rol, args.password) for rol in CUENTAS_BENCHMARK}
+    filtro = {nombre.strip() for nombre in args.solo.split(',') if nombre.strip()}
+
+    resultados = {}
+    print(f"\n{'escenario':36} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8} {'consultas':>9} {'5xx':>4}")
+    for nombre, blueprint, rol, fabrica in escenarios(contexto):
+        if filtro and nombre not in filtro and blueprint not in filtro:
+            continue
+        r = run_escenario(app, counter, tokens, rol, fabrica, args.peticiones, args.concurrencia, args.warmup)
+        r['blueprint'] = blueprint
+        resultados[nombre] = r
+        fmt = lambda v: f"{v:>9.2f}" if v is not None else f"{'-':>9}"
+        print(f"{nombre:36} {r['peticiones']:>5} {fmt(r['p50_ms'])} {fmt(r['p95_ms'])} {fmt(r['p99_ms'])} "
+              f"{r['peticiones_por_segundo']:>8.1f} {fmt(r['consultas_media'])} {r['errores']:>4}")
+
+    informe = {
+        'fecha': datetime.utcnow().isoformat(),
+        'dialecto': database_url.split(':', 1)[0],
+        'escala': escala,
+        'concurrencia': args.concurrencia,
+        'peticiones_por_escenario': args.peticiones,
+        'escenarios': resultados,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
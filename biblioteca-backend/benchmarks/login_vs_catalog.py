@@ -0,0 +1,131 @@
+# benchmarks/login_vs_catalog.py
+#
+# Logins por segundo frente a la latencia del catálogo durante una ráfaga de inicios de sesión.
+#
+# Para cada configuración del pool de bcrypt (--workers; 0 = verificar en el hilo de la petición, como antes)
+# mide primero el catálogo solo (línea base) y después el catálogo mientras --login-hilos hilos hacen login sin
+# pausa. Informa logins/s, rechazos 503 (control de admisión) y p50/p95/p99 de GET /libros en cada fase.
+# Todo corre en el mismo proceso con el cliente de pruebas de Flask sobre un SQLite temporal (o --database-url).
+#
+# Uso (desde biblioteca-backend/):
+#   python benchmarks/login_vs_catalog.py --workers 0,2,4 --rounds 12 --duracion 10
+# ¡La base de datos indicada se BORRA y se vuelve a crear!
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.utils.seed import CUENTAS_BENCHMARK, DEFAULT_PASSWORD, seed_database  # noqa: E402
+from config import Config  # noqa: E402
+from load import percentil  # noqa: E402
+
+
+def fase(app, token, duracion, catalogo_hilos, login_hilos):
+    """Ejecuta catálogo (y logins, si login_hilos > 0) durante `duracion` segundos."""
+    fin = time.perf_counter() + duracion
+    latencias, logins = [], {'ok': 0, 'rechazados': 0, 'otros': 0}
+    lock = threading.Lock()
+
+    def catalogo(n):
+        client = app.test_client()
+        headers = {'Authorization': f'Bearer {token}'}
+        i = n
+        while time.perf_counter() < fin:
+            i += catalogo_hilos
+            inicio = time.perf_counter()
+            client.get(f'/api/v1/libros?limit=20&genero_id={1 + i % 30}', headers=headers)
+            with lock:
+                latencias.append((time.perf_counter() - inicio) * 1000)
+
+    def login():
+        client = app.test_client()
+        body = {'email': CUENTAS_BENCHMARK['Lector'], 'password': DEFAULT_PASSWORD}
+        while time.perf_counter() < fin:
+            status = client.post('/api/v1/auth/login', json=body).status_code
+            with lock:
+                logins['ok' if status == 200 else 'rechazados' if status == 503 else 'otros'] += 1
+            if status == 503:
+                time.sleep(0.01) # Un cliente real respetaría Retry-After; aquí solo se evita girar en vacío
+
+    hilos = [threading.Thread(target=catalogo, args=(n,)) for n in range(catalogo_hilos)]
+    hilos += [threading.Thread(target=login) for _ in range(login_hilos)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    latencias.sort()
+    return {
+        'catalogo_peticiones_por_segundo': round(len(latencias) / duracion, 1),
+        'catalogo_p50_ms': round(percentil(latencias, 50), 2),
+        'catalogo_p95_ms': round(percentil(latencias, 95), 2),
+        'catalogo_p99_ms': round(percentil(latencias, 99), 2),
+        'logins_por_segundo': round(logins['ok'] / duracion, 1),
+        'logins_rechazados': logins['rechazados'],
+        'logins_otros_errores': logins['otros'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Logins/s frente a la latencia del catálogo.')
+    parser.add_argument('--database-url', default=None, help='URL de SQLAlchemy (por defecto un SQLite temporal).')
+    parser.add_argument('--workers', default='0,2', help='Configuraciones de BCRYPT_WORKERS a comparar (0 = sin pool).')
+    parser.add_argument('--max-pendientes', type=int, default=8, help='BCRYPT_MAX_PENDING para las configuraciones con pool.')
+    parser.add_argument('--rounds', type=int, default=12, help='Costo de bcrypt (BCRYPT_LOG_ROUNDS).')
+    parser.add_argument('--duracion', type=float, default=5.0, help='Segundos por fase.')
+    parser.add_argument('--catalogo-hilos', type=int, default=4)
+    parser.add_argument('--login-hilos', type=int, default=16)
+    parser.add_argument('--libros', type=int, default=5000)
+    parser.add_argument('--output', default='login_vs_catalog.json')
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_login.db')
+    resultados = {}
+    for workers in [int(w) for w in args.workers.split(',')]:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = database_url
+            SQLALCHEMY_ENGINE_OPTIONS = {'pool_size': args.catalogo_hilos + args.login_hilos + 2}
+            BCRYPT_LOG_ROUNDS = args.rounds
+            BCRYPT_WORKERS = workers
+            BCRYPT_MAX_PENDING = args.max_pendientes
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            if not resultados: # Los datos se generan una sola vez
+                db.drop_all()
+                db.create_all()
+                seed_database(args.libros, 200, 1000)
+        client = app.test_client()
+        token = client.post('/api/v1/auth/login', json={'email': CUENTAS_BENCHMARK['Lector'], 'password': DEFAULT_PASSWORD}).get_json()['access_token']
+
+        base = fase(app, token, args.duracion, args.catalogo_hilos, 0)
+        rafaga = fase(app, token, args.duracion, args.catalogo_hilos, args.login_hilos)
+        nombre = f'workers={workers}' if workers else 'sin_pool'
+        resultados[nombre] = {'solo_catalogo': base, 'con_rafaga_de_logins': rafaga}
+        print(f"{nombre:12} catálogo p95 {base['catalogo_p95_ms']:>8.2f} -> {rafaga['catalogo_p95_ms']:>8.2f} ms | "
+              f"p99 {base['catalogo_p99_ms']:>8.2f} -> {rafaga['catalogo_p99_ms']:>8.2f} ms | "
+              f"{rafaga['logins_por_segundo']:>6.1f} logins/s, {rafaga['logins_rechazados']} rechazados (503)")
+
+    informe = {
+        'fecha': datetime.utcnow().isoformat(),
+        'rounds': args.rounds,
+        'catalogo_hilos': args.catalogo_hilos,
+        'login_hilos': args.login_hilos,
+        'duracion_fase_s': args.duracion,
+        'configuraciones': resultados,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+# benchmarks/query_plans.py
+#
+# Benchmark reproducible de las consultas "calientes" con y sin los índices de filtros frecuentes.
+#
+# Crea una base de datos nueva (SQLite por defecto, o la que indique --database-url), la llena con datos
+# sintéticos deterministas, borra los índices bajo prueba, mide cada consulta y guarda su plan (EXPLAIN),
+# crea los índices, actualiza estadísticas y vuelve a medir. El resultado se imprime y se guarda en JSON para
+# poder comparar entre versiones y detectar regresiones de índices.
+#
+# Uso (desde biblioteca-backend/):
+#   python benchmarks/query_plans.py --libros 50000 --usuarios 10000 --prestamos 200000
+#   python benchmarks/query_plans.py --database-url mysql+pymysql://root:pw@localhost/bench_db --output plans.json
+# ¡La base de datos indicada se BORRA y se vuelve a crear!
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.models import Autor, Libro, Multa, Prestamo, Solicitud, Usuario, libro_autor, libro_genero  # noqa: E402
+from app.libros.facetas import consultas_facetas  # noqa: E402
+from app.utils.seed import analyze_tables, seed_database  # noqa: E402
+from config import Config  # noqa: E402
+
+# Índices cuyo efecto se mide (migraciones e5f2a7c3d9b1, f8c1b6d4e2a9 y a4d9e2b7c3f1)
+INDICES_BAJO_PRUEBA = [
+    'ix_prestamo_estado_fecha_limite', 'ix_prestamo_usuario_estado', 'ix_prestamo_solicitud',
+    'ix_multa_prestamo_estado', 'ix_multa_estado', 'ix_solicitud_estado_fecha', 'ix_solicitud_lector',
+    'ix_usuario_rol_estado', 'ix_usuario_estado', 'ix_autor_nombre_ap_paterno',
+    'ix_libro_autor_autor', 'ix_libro_genero_genero', 'ix_libro_cantidad',
+]
+
+def hot_queries(n_usuarios, n_prestamos):
+    """Consultas representativas de los endpoints (mismos filtros que las rutas)."""
+    usuario_id = max(1, n_usuarios // 2)
+    corte = datetime.utcnow() - timedelta(days=30)
+    facetas = consultas_facetas({'genero_id': None, 'autor_id': None, 'disponible': None})
+    facetas_genero = consultas_facetas({'genero_id': 7, 'autor_id': None, 'disponible': True})
+    return {
+        'lector_prestamos_activos': select(func.count(Prestamo.id)).where(Prestamo.id_usuario == usuario_id, Prestamo.estado == 'Activo'),
+        'lector_multas_pendientes': select(func.count(Multa.id)).join(Prestamo, Multa.id_prestamo == Prestamo.id)
+            .where(Prestamo.id_usuario == usuario_id, Multa.estado == 'Pendiente'),
+        'bibliotecario_multas_pendientes': select(Multa.id, Multa.monto).where(Multa.estado == 'Pendiente').order_by(Multa.id).limit(50),
+        'bibliotecario_solicitudes_pendientes': select(Solicitud.id).where(Solicitud.estado == 'Pendiente')
+            .order_by(Solicitud.fecha_solicitud).limit(50),
+        'admin_usuarios_por_rol_estado': select(Usuario.id).where(Usuario.rol_id == 2, Usuario.estado == 'Activo').order_by(Usuario.id).limit(50),
+        'admin_usuarios_por_estado': select(func.count(Usuario.id)).where(Usuario.estado == 'Suspendido'),
+        'libros_autor_por_nombre': select(Autor.id).where(Autor.nombre == 'Ana', Autor.ap_paterno == 'García'),
+        'catalogo_por_genero': select(Libro.id).join(libro_genero, libro_genero.c.libro_id == Libro.id)
+            .where(libro_genero.c.genero_id == 7).order_by(Libro.id).limit(50),
+        'catalogo_por_autor': select(Libro.id).join(libro_autor, libro_autor.c.libro_id == Libro.id)
+            .where(libro_autor.c.autor_id == 7).order_by(Libro.id).limit(50),
+        'facetas_disponibilidad': facetas[0],
+        'facetas_generos': facetas[1],
+        'facetas_autores': facetas[2],
+        'facetas_autores_por_genero_disponibles': facetas_genero[2],
+        'escaner_vencidos': select(Prestamo.id).where(Prestamo.estado == 'Activo', Prestamo.fecha_devolucion_limite < corte)
+            .order_by(Prestamo.fecha_devolucion_limite, Prestamo.id).limit(1000),
+        'multas_de_prestamo': select(Multa.id).where(Multa.id_prestamo == max(1, n_prestamos // 2), Multa.estado == 'Pendiente'),
+    }
+
+
+def explain(conn, stmt):
+    """Devuelve el plan de ejecución de una sentencia como lista de líneas."""
+    dialect = conn.dialect
+    compiled = stmt.compile(dialect=dialect)
+    params = tuple(compiled.params[k] for k in compiled.positiontup) if compiled.positional else compiled.params
+    prefix = 'EXPLAIN QUERY PLAN ' if dialect.name == 'sqlite' else 'EXPLAIN '
+    rows = conn.exec_driver_sql(prefix + str(compiled), params).all()
+    if dialect.name == 'sqlite':
+        return [row[-1] for row in rows]
+    return [' | '.join(f'{k}={v}' for k, v in row._mapping.items() if v is not None) for row in rows]
+
+
+def measure(queries, repeat):
+    resultados = {}
+    with db.engine.connect() as conn:
+        for nombre, stmt in queries.items():
+            conn.execute(stmt).all() # Calentamiento
+            tiempos = []
+            for _ in range(repeat):
+                inicio = time.perf_counter()
+                conn.execute(stmt).all()
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            tiempos.sort()
+            resultados[nombre] = {
+                'mediana_ms': round(statistics.median(tiempos), 3),
+                'p95_ms': round(tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))], 3),
+                'plan': explain(conn, stmt),
+            }
+    return resultados
+
+
+def indices_bajo_prueba():
+    indices = []
+    for table in db.metadata.sorted_tables:
+        indices.extend(ix for ix in table.indexes if ix.name in INDICES_BAJO_PRUEBA)
+    return indices
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--database-url', default=None, help='URL de SQLAlchemy (por defecto un SQLite temporal).')
+    parser.add_argument('--libros', type=int, default=20000)
+    parser.add_argument('--usuarios', type=int, default=5000)
+    parser.add_argument('--prestamos', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=30, help='Repeticiones por consulta.')
+    parser.add_argument('--output', default='query_plans.json', help='Archivo JSON con los resultados.')
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_query_plans.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        inicio = time.perf_counter()
+        seed_database(args.libros, args.usuarios, args.prestamos, reindex=False)
+        print(f"Datos sintéticos creados en {time.perf_counter() - inicio:.1f} s ({db.engine.dialect.name})")
+
+        indices = indices_bajo_prueba()
+        for index in indices:
+            index.drop(db.engine)
+        analyze_tables()
+        queries = hot_queries(args.usuarios, args.prestamos)
+        antes = measure(queries, args.repeat)
+
+        for index in indices:
+            index.create(db.engine)
+        analyze_tables()
+        despues = measure(queries, args.repeat)
+
+    informe = {
+        'fecha': datetime.utcnow().isoformat(),
+        'dialecto': database_url.split(':', 1)[0],
+        'escala': {'libros': args.libros, 'usuarios': args.usuarios, 'prestamos': args.prestamos},
+        'indices': [ix.name for ix in indices],
+        'consultas': {nombre: {'sin_indices': antes[nombre], 'con_indices': despues[nombre]} for nombre in queries},
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False)
+
+    print(f"\n{'consulta':40} {'sin índices (ms)':>18} {'con índices (ms)':>18} {'mejora':>8}")
+    for nombre, r in informe['consultas'].items():
+        a, d = r['sin_indices']['mediana_ms'], r['con_indices']['mediana_ms']
+        print(f"{nombre:40} {a:>18.3f} {d:>18.3f} {a / d if d else float('inf'):>7.1f}x")
+        print(f"    plan: {' / '.join(r['con_indices']['plan'])}")
+    print(f"\nResultados completos (con planes EXPLAIN antes y después) en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# benchmarks/replica_routing.py
+#
+# Comprobación local del enrutado a réplicas (ver app/utils/db_routing.py) con dos bases de datos.
+#
+# Con SQLite (por defecto) crea una principal y una réplica en un directorio temporal: llena la principal con
+# `seed_database` y la copia a la réplica (API de backup de sqlite3). La "réplica" no vuelve a sincronizarse, así
+# que se comporta como una réplica con retraso infinito y deja ver a dónde va cada consulta. Con MySQL se pasan
+# --database-url y --replica-url de una réplica ya configurada (no se copia nada; --sin-seed usa los datos
+# existentes) y el escrito puede llegar a la réplica antes de la última comprobación.
+#
+# Comprueba y cuenta las consultas de cada engine:
+#   1. GET del catálogo -> réplica; POST de un libro -> principal.
+#   2. Read-your-writes: el cliente que escribió ve su libro (lee de la principal durante REPLICA_STICKY_SECONDS);
+#      otro cliente no lo ve todavía en la réplica.
+#   3. Pasado REPLICA_STICKY_SECONDS, el cliente que escribió vuelve a leer de la réplica.
+#
+# Uso (desde biblioteca-backend/):
+#   python benchmarks/replica_routing.py
+#   python benchmarks/replica_routing.py --database-url mysql+pymysql://... --replica-url mysql+pymysql://... --sin-seed
+# ¡Sin --sin-seed la base de datos principal se BORRA y se vuelve a crear!
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.engine import make_url  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.utils.seed import CUENTAS_BENCHMARK, DEFAULT_PASSWORD, seed_database  # noqa: E402
+from config import Config  # noqa: E402
+
+
+def copiar_sqlite(origen, destino):
+    src, dst = sqlite3.connect(make_url(origen).database), sqlite3.connect(make_url(destino).database)
+    with dst:
+        src.backup(dst)
+    src.close()
+    dst.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Comprueba el enrutado de lecturas a réplicas.')
+    parser.add_argument('--database-url', default=None, help='Principal (por defecto un SQLite temporal).')
+    parser.add_argument('--replica-url', default=None, help='Réplica (por defecto una copia SQLite de la principal).')
+    parser.add_argument('--sticky', type=float, default=1.0, help='REPLICA_STICKY_SECONDS para la prueba.')
+    parser.add_argument('--libros', type=int, default=2000)
+    parser.add_argument('--sin-seed', action='store_true')
+    parser.add_argument('--output', default='replica_routing.json')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tmp, 'principal.db')
+    replica_url = args.replica_url or 'sqlite:///' + os.path.join(tmp, 'replica.db')
+
+    class PrincipalConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+
+    if not args.sin_seed:
+        app = create_app(PrincipalConfig)
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            seed_database(args.libros, 50, 200)
+            db.engine.dispose()
+    if not args.replica_url:
+        copiar_sqlite(database_url, replica_url)
+
+    class ReplicaConfig(PrincipalConfig):
+        DATABASE_REPLICA_URLS = [replica_url]
+        REPLICA_STICKY_SECONDS = args.sticky
+
+    app = create_app(ReplicaConfig)
+    consultas = Counter()
+    with app.app_context():
+        for key, engine in db.engines.items():
+            nombre = key or 'principal'
+            event.listen(engine, 'before_cursor_execute', lambda *a, nombre=nombre: consultas.update([nombre]))
+
+    client = app.test_client()
+
+    def login(cuenta):
+        r = client.post('/api/v1/auth/login', json={'email': CUENTAS_BENCHMARK[cuenta], 'password': DEFAULT_PASSWORD})
+        return {'Authorization': f"Bearer {r.get_json()['access_token']}"}
+
+    def medir(descripcion, fn):
+        consultas.clear()
+        resultado = fn()
+        paso = {'paso': descripcion, 'resultado': resultado, 'consultas': dict(consultas)}
+        print(f"{descripcion:60} {str(resultado):8} {dict(consultas)}")
+        return paso
+
+    def encontrado(headers, nombre):
+        r = client.get(f'/api/v1/libros/search?q={nombre}', headers=headers)
+        return any(libro['nombre'] == nombre for libro in r.get_json())
+
+    bibliotecario, lector = login('Bibliotecario'), login('Lector')
+    nombre = f'replica{uuid.uuid4().hex[:10]}'
+    libro = {'isbn': nombre, 'nombre': nombre, 'cantidad': 1, 'autores': ['Autor Replica'], 'generos': ['Replica']}
+    pasos = [
+        medir('GET /libros (catálogo)', lambda: client.get('/api/v1/libros?limit=20', headers=lector).status_code),
+        medir('POST /libros (escritura)', lambda: client.post('/api/v1/libros', json=libro, headers=bibliotecario).status_code),
+        medir('Quien escribió ve su libro (read-your-writes)', lambda: encontrado(bibliotecario, nombre)),
+        medir('Otro cliente, antes de replicar', lambda: encontrado(lector, nombre)),
+    ]
+    time.sleep(args.sticky + 0.1)
+    pasos.append(medir(f'Quien escribió, pasados {args.sticky} s', lambda: encontrado(bibliotecario, nombre)))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'principal': make_url(database_url).render_as_string(hide_password=True),
+                   'replica': make_url(replica_url).render_as_string(hide_password=True),
+                   'sticky_s': args.sticky, 'pasos': pasos}, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""Añadir indice de busqueda de libros
+
+Revision ID: a1f3c9d2b7e4
+Revises: d36b437c6804
+Create Date: 2026-10-18 10:12:31.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1f3c9d2b7e4'
+down_revision = 'd36b437c6804'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('libro_busqueda',
+    sa.Column('libro_id', sa.Integer(), nullable=False),
+    sa.Column('titulo', sa.Text(), nullable=False),
+    sa.Column('isbn', sa.String(length=20), nullable=False),
+    sa.Column('autores', sa.Text(), nullable=False),
+    sa.Column('generos', sa.Text(), nullable=False),
+    sa.ForeignKeyConstraint(['libro_id'], ['libro.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('libro_id')
+    )
+    # El índice FULLTEXT solo existe en MySQL; en SQLite la búsqueda usa una tabla FTS5 que crea la app.
+    if op.get_bind().dialect.name == 'mysql':
+        op.create_index('ix_libro_busqueda_fulltext', 'libro_busqueda', ['titulo', 'isbn', 'autores', 'generos'], unique=False, mysql_prefix='FULLTEXT')
+    # Después de migrar, poblar el índice con: flask libros reindex
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'mysql':
+        op.drop_index('ix_libro_busqueda_fulltext', table_name='libro_busqueda')
+    op.drop_table('libro_busqueda')
@@ -0,0 +1,26 @@
+"""Índice de disponibilidad de libro (libro.cantidad) para las facetas del catálogo
+
+Revision ID: a4d9e2b7c3f1
+Revises: f1c7a3e9b5d2
+Create Date: 2026-10-18 21:27:40.318096
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d9e2b7c3f1'
+down_revision = 'f1c7a3e9b5d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('libro', schema=None) as batch_op:
+        batch_op.create_index('ix_libro_cantidad', ['cantidad'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('libro', schema=None) as batch_op:
+        batch_op.drop_index('ix_libro_cantidad')
@@ -0,0 +1,37 @@
+"""Añadir tabla token_revocado
+
+Revision ID: a7d3f9c2e8b4
+Revises: f8c1b6d4e2a9
+Create Date: 2026-10-18 16:02:41.518307
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3f9c2e8b4'
+down_revision = 'f8c1b6d4e2a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('token_revocado',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('jti', sa.String(length=36), nullable=True),
+    sa.Column('id_usuario', sa.Integer(), nullable=True),
+    sa.Column('revocado_desde', sa.DateTime(), nullable=True),
+    sa.Column('expira', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('jti')
+    )
+    with op.batch_alter_table('token_revocado', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_token_revocado_expira'), ['expira'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('token_revocado', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_token_revocado_expira'))
+
+    op.drop_table('token_revocado')
@@ -0,0 +1,77 @@
+"""Clave normalizada única en autor y genero
+
+Revision ID: b2e9d5a1c7f3
+Revises: a7d3f9c2e8b4
+Create Date: 2026-10-18 17:21:09.284517
+
+"""
+import unicodedata
+from collections import defaultdict
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2e9d5a1c7f3'
+down_revision = 'a7d3f9c2e8b4'
+branch_labels = None
+depends_on = None
+
+
+def _clave(texto):
+    # Igual que app.libros.nombres.clave (copiada: la migración no depende del código de la aplicación)
+    decomposed = unicodedata.normalize('NFKD', texto or '')
+    return ' '.join(''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower().split())
+
+
+def _backfill(conn, tabla, asociacion, columna, filas):
+    """Rellena la clave y fusiona los duplicados (se conserva el id menor y se reapuntan sus libros)."""
+    grupos = defaultdict(list)
+    for fila_id, nombre in filas:
+        grupos[_clave(nombre)].append(fila_id)
+    for clave, ids in grupos.items():
+        ids.sort()
+        conservar, duplicados = ids[0], ids[1:]
+        for duplicado in duplicados:
+            # Los libros que ya tienen el conservado pierden la fila duplicada; el resto se reapunta
+            conn.execute(sa.text(
+                f"DELETE FROM {asociacion} WHERE {columna} = :dup AND libro_id IN "
+                f"(SELECT libro_id FROM (SELECT libro_id FROM {asociacion} WHERE {columna} = :keep) AS t)"
+            ), {'dup': duplicado, 'keep': conservar})
+            conn.execute(sa.text(f"UPDATE {asociacion} SET {columna} = :keep WHERE {columna} = :dup"),
+                         {'dup': duplicado, 'keep': conservar})
+            conn.execute(sa.text(f"DELETE FROM {tabla} WHERE id = :dup"), {'dup': duplicado})
+    if grupos:
+        conn.execute(sa.text(f"UPDATE {tabla} SET clave = :clave WHERE id = :id"),
+                     [{'clave': clave, 'id': ids[0]} for clave, ids in grupos.items()])
+
+
+def upgrade():
+    with op.batch_alter_table('autor', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('clave', sa.String(length=201), nullable=True))
+    with op.batch_alter_table('genero', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('clave', sa.String(length=50), nullable=True))
+
+    conn = op.get_bind()
+    autores = conn.execute(sa.text("SELECT id, nombre, ap_paterno FROM autor")).fetchall()
+    _backfill(conn, 'autor', 'libro_autor', 'autor_id',
+              [(fila.id, f"{fila.nombre} {fila.ap_paterno or ''}") for fila in autores])
+    generos = conn.execute(sa.text("SELECT id, nombre FROM genero")).fetchall()
+    _backfill(conn, 'genero', 'libro_genero', 'genero_id', [(fila.id, fila.nombre) for fila in generos])
+
+    with op.batch_alter_table('autor', schema=None) as batch_op:
+        batch_op.alter_column('clave', existing_type=sa.String(length=201), nullable=False)
+        batch_op.create_index(batch_op.f('ix_autor_clave'), ['clave'], unique=True)
+    with op.batch_alter_table('genero', schema=None) as batch_op:
+        batch_op.alter_column('clave', existing_type=sa.String(length=50), nullable=False)
+        batch_op.create_index(batch_op.f('ix_genero_clave'), ['clave'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('genero', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_genero_clave'))
+        batch_op.drop_column('clave')
+    with op.batch_alter_table('autor', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_autor_clave'))
+        batch_op.drop_column('clave')
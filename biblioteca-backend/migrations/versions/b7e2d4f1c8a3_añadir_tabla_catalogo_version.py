@@ -0,0 +1,32 @@
+"""Añadir tabla catalogo_version
+
+Revision ID: b7e2d4f1c8a3
+Revises: a1f3c9d2b7e4
+Create Date: 2026-10-18 11:03:47.918254
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2d4f1c8a3'
+down_revision = 'a1f3c9d2b7e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    catalogo_version = op.create_table('catalogo_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('actualizado', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(catalogo_version, [{'id': 1, 'version': 1, 'actualizado': datetime.utcnow()}])
+
+
+def downgrade():
+    op.drop_table('catalogo_version')
@@ -0,0 +1,32 @@
+"""Los préstamos 'Vencido' (sin devolver) cuentan en contador_usuario.prestamos_activos
+
+Revision ID: b8e4c2f6a1d3
+Revises: a4d9e2b7c3f1
+Create Date: 2026-10-18 23:12:09.517342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e4c2f6a1d3'
+down_revision = 'a4d9e2b7c3f1'
+branch_labels = None
+depends_on = None
+
+
+def _recalcular(estados):
+    op.execute(
+        "UPDATE contador_usuario SET prestamos_activos = "
+        "(SELECT COUNT(*) FROM prestamo WHERE prestamo.id_usuario = contador_usuario.id_usuario "
+        f"AND prestamo.estado IN ({estados}))"
+    )
+
+
+def upgrade():
+    _recalcular("'Activo', 'Vencido'")
+
+
+def downgrade():
+    _recalcular("'Activo'")
@@ -0,0 +1,26 @@
+"""Añadir estado a Usuario
+
+Revision ID: c4d8e1a9f2b6
+Revises: b7e2d4f1c8a3
+Create Date: 2026-10-18 11:48:20.533961
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d8e1a9f2b6'
+down_revision = 'b7e2d4f1c8a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('usuario', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('estado', sa.String(length=20), server_default='Activo', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('usuario', schema=None) as batch_op:
+        batch_op.drop_column('estado')
@@ -0,0 +1,48 @@
+"""Contadores por usuario (contador_usuario) e índice del historial del lector
+
+Revision ID: c6a4e8f1d2b9
+Revises: b2e9d5a1c7f3
+Create Date: 2026-10-18 18:05:37.641902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6a4e8f1d2b9'
+down_revision = 'b2e9d5a1c7f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('contador_usuario',
+    sa.Column('id_usuario', sa.Integer(), nullable=False),
+    sa.Column('prestamos_activos', sa.Integer(), nullable=False),
+    sa.Column('prestamos_total', sa.Integer(), nullable=False),
+    sa.Column('multas_pendientes', sa.Integer(), nullable=False),
+    sa.Column('solicitudes_pendientes', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['id_usuario'], ['usuario.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id_usuario')
+    )
+    # Carga inicial desde las tablas base (equivalente a POST /api/v1/admin/stats/recalcular)
+    op.execute(
+        "INSERT INTO contador_usuario (id_usuario, prestamos_activos, prestamos_total, multas_pendientes, solicitudes_pendientes) "
+        "SELECT usuario.id, "
+        "(SELECT COUNT(*) FROM prestamo WHERE prestamo.id_usuario = usuario.id AND prestamo.estado = 'Activo'), "
+        "(SELECT COUNT(*) FROM prestamo WHERE prestamo.id_usuario = usuario.id), "
+        "(SELECT COUNT(*) FROM multa JOIN prestamo ON multa.id_prestamo = prestamo.id "
+        "WHERE prestamo.id_usuario = usuario.id AND multa.estado = 'Pendiente'), "
+        "(SELECT COUNT(*) FROM solicitud WHERE solicitud.id_usuario_lector = usuario.id AND solicitud.estado = 'Pendiente') "
+        "FROM usuario"
+    )
+    with op.batch_alter_table('prestamo', schema=None) as batch_op:
+        batch_op.create_index('ix_prestamo_usuario_fecha', ['id_usuario', 'fecha_inicio', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('prestamo', schema=None) as batch_op:
+        batch_op.drop_index('ix_prestamo_usuario_fecha')
+
+    op.drop_table('contador_usuario')
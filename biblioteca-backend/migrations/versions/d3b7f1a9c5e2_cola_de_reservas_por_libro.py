@@ -0,0 +1,53 @@
+"""Cola de reservas por libro (reserva) y contador de reservas del lector
+
+Revision ID: d3b7f1a9c5e2
+Revises: c6a4e8f1d2b9
+Create Date: 2026-10-18 18:52:14.903216
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3b7f1a9c5e2'
+down_revision = 'c6a4e8f1d2b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('reserva',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('libro_id', sa.Integer(), nullable=False),
+    sa.Column('id_usuario', sa.Integer(), nullable=False),
+    sa.Column('fecha_reserva', sa.DateTime(), nullable=False),
+    sa.Column('estado', sa.String(length=20), nullable=False),
+    sa.Column('fecha_asignacion', sa.DateTime(), nullable=True),
+    sa.Column('expira', sa.DateTime(), nullable=True),
+    sa.Column('activa', sa.Boolean(), nullable=True),
+    sa.ForeignKeyConstraint(['id_usuario'], ['usuario.id'], ),
+    sa.ForeignKeyConstraint(['libro_id'], ['libro.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('libro_id', 'id_usuario', 'activa', name='uq_reserva_activa')
+    )
+    with op.batch_alter_table('reserva', schema=None) as batch_op:
+        batch_op.create_index('ix_reserva_libro_estado', ['libro_id', 'estado', 'id'], unique=False)
+        batch_op.create_index('ix_reserva_estado_expira', ['estado', 'expira'], unique=False)
+        batch_op.create_index('ix_reserva_usuario_estado', ['id_usuario', 'estado'], unique=False)
+
+    # Tabla nueva y vacía: todos los contadores empiezan en 0
+    with op.batch_alter_table('contador_usuario', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reservas_activas', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('contador_usuario', schema=None) as batch_op:
+        batch_op.drop_column('reservas_activas')
+
+    with op.batch_alter_table('reserva', schema=None) as batch_op:
+        batch_op.drop_index('ix_reserva_usuario_estado')
+        batch_op.drop_index('ix_reserva_estado_expira')
+        batch_op.drop_index('ix_reserva_libro_estado')
+
+    op.drop_table('reserva')
@@ -0,0 +1,45 @@
+"""Añadir tabla stats_counters
+
+Revision ID: d9a6b3e5c1f7
+Revises: c4d8e1a9f2b6
+Create Date: 2026-10-18 12:31:05.164420
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9a6b3e5c1f7'
+down_revision = 'c4d8e1a9f2b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stats_counters',
+    sa.Column('nombre', sa.String(length=64), nullable=False),
+    sa.Column('valor', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('nombre')
+    )
+    # Carga inicial desde las tablas base (equivalente a POST /api/v1/admin/stats/recalcular)
+    op.execute("INSERT INTO stats_counters (nombre, valor) SELECT 'usuarios_total', COUNT(*) FROM usuario")
+    op.execute("INSERT INTO stats_counters (nombre, valor) SELECT 'prestamos_activos', COUNT(*) FROM prestamo WHERE estado = 'Activo'")
+    op.execute("INSERT INTO stats_counters (nombre, valor) SELECT 'multas_pendientes', COUNT(*) FROM multa WHERE estado = 'Pendiente'")
+    op.execute("INSERT INTO stats_counters (nombre, valor) SELECT 'solicitudes_pendientes', COUNT(*) FROM solicitud WHERE estado = 'Pendiente'")
+    op.execute("INSERT INTO stats_counters (nombre, valor) SELECT 'libros_total', COUNT(*) FROM libro")
+    op.execute("INSERT INTO stats_counters (nombre, valor) SELECT 'copias_disponibles', COALESCE(SUM(cantidad), 0) FROM libro")
+    op.execute(
+        "INSERT INTO stats_counters (nombre, valor) "
+        "SELECT CONCAT('usuarios_rol:', rol.nombre), COUNT(usuario.id) FROM rol "
+        "LEFT JOIN usuario ON usuario.rol_id = rol.id GROUP BY rol.nombre"
+    )
+    for estado in ('Activo', 'Suspendido', 'Inactivo'):
+        op.execute(
+            f"INSERT INTO stats_counters (nombre, valor) "
+            f"SELECT 'usuarios_estado:{estado}', COUNT(*) FROM usuario WHERE estado = '{estado}'"
+        )
+
+
+def downgrade():
+    op.drop_table('stats_counters')
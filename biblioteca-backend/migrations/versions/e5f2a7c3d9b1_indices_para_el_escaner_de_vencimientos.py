@@ -0,0 +1,32 @@
+"""Indices para el escaner de vencimientos
+
+Revision ID: e5f2a7c3d9b1
+Revises: d9a6b3e5c1f7
+Create Date: 2026-10-18 13:20:44.081732
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5f2a7c3d9b1'
+down_revision = 'd9a6b3e5c1f7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('prestamo', schema=None) as batch_op:
+        batch_op.create_index('ix_prestamo_estado_fecha_limite', ['estado', 'fecha_devolucion_limite'], unique=False)
+
+    with op.batch_alter_table('multa', schema=None) as batch_op:
+        batch_op.create_index('ix_multa_prestamo_estado', ['id_prestamo', 'estado'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('multa', schema=None) as batch_op:
+        batch_op.drop_index('ix_multa_prestamo_estado')
+
+    with op.batch_alter_table('prestamo', schema=None) as batch_op:
+        batch_op.drop_index('ix_prestamo_estado_fecha_limite')
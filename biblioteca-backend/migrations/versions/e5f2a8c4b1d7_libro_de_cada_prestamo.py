@@ -0,0 +1,44 @@
+"""Libro de cada préstamo (prestamo.libro_id) para las devoluciones
+
+Revision ID: e5f2a8c4b1d7
+Revises: d3b7f1a9c5e2
+Create Date: 2026-10-18 19:34:51.117842
+
+"""
+from itertools import groupby
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5f2a8c4b1d7'
+down_revision = 'd3b7f1a9c5e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('prestamo', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('libro_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_prestamo_libro_id', 'libro', ['libro_id'], ['id'])
+        batch_op.create_index('ix_prestamo_libro_estado', ['libro_id', 'estado'], unique=False)
+
+    # Cada solicitud aprobada creó un préstamo por libro, sin guardar cuál: se emparejan por orden de id
+    conn = op.get_bind()
+    prestamos = conn.execute(sa.text("SELECT id, id_solicitud FROM prestamo ORDER BY id_solicitud, id")).fetchall()
+    libros = conn.execute(sa.text(
+        "SELECT solicitud_id, libro_id FROM solicitud_libro ORDER BY solicitud_id, libro_id")).fetchall()
+    libros_por_solicitud = {s: [fila.libro_id for fila in filas] for s, filas in groupby(libros, key=lambda f: f.solicitud_id)}
+    filas = []
+    for solicitud_id, grupo in groupby(prestamos, key=lambda f: f.id_solicitud):
+        filas.extend({'pid': p.id, 'lid': l} for p, l in zip(grupo, libros_por_solicitud.get(solicitud_id, [])))
+    for inicio in range(0, len(filas), 10000):
+        conn.execute(sa.text("UPDATE prestamo SET libro_id = :lid WHERE id = :pid"), filas[inicio:inicio + 10000])
+
+
+def downgrade():
+    with op.batch_alter_table('prestamo', schema=None) as batch_op:
+        batch_op.drop_index('ix_prestamo_libro_estado')
+        batch_op.drop_constraint('fk_prestamo_libro_id', type_='foreignkey')
+        batch_op.drop_column('libro_id')
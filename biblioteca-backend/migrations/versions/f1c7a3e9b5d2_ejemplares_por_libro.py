@@ -0,0 +1,101 @@
+"""Ejemplares por libro (ejemplar), total de ejemplares del libro y copia de cada préstamo
+
+Revision ID: f1c7a3e9b5d2
+Revises: e5f2a8c4b1d7
+Create Date: 2026-10-18 20:41:07.552310
+
+"""
+from collections import Counter
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c7a3e9b5d2'
+down_revision = 'e5f2a8c4b1d7'
+branch_labels = None
+depends_on = None
+
+LOTE = 10000
+
+
+def upgrade():
+    op.create_table('ejemplar',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('libro_id', sa.Integer(), nullable=False),
+    sa.Column('codigo_barras', sa.String(length=32), nullable=False),
+    sa.Column('estado', sa.String(length=20), nullable=False),
+    sa.Column('fecha_alta', sa.DateTime(), nullable=False),
+    sa.Column('fecha_baja', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['libro_id'], ['libro.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('codigo_barras')
+    )
+    with op.batch_alter_table('ejemplar', schema=None) as batch_op:
+        batch_op.create_index('ix_ejemplar_libro_estado', ['libro_id', 'estado', 'id'], unique=False)
+
+    with op.batch_alter_table('libro', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('total_ejemplares', sa.Integer(), nullable=False, server_default='0'))
+
+    with op.batch_alter_table('prestamo', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('ejemplar_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_prestamo_ejemplar_id', 'ejemplar', ['ejemplar_id'], ['id'])
+
+    # Se registran las copias que ya existen: las disponibles (libro.cantidad), una prestada por cada préstamo
+    # abierto y una apartada por cada reserva asignada. Los ids se fijan aquí para enlazar los préstamos sin
+    # volver a leer la tabla.
+    conn = op.get_bind()
+    ahora = datetime.utcnow()
+    libros = conn.execute(sa.text("SELECT id, cantidad FROM libro ORDER BY id")).fetchall()
+    prestamos = conn.execute(sa.text(
+        "SELECT id, libro_id FROM prestamo WHERE libro_id IS NOT NULL AND estado IN ('Activo', 'Vencido') ORDER BY id"
+    )).fetchall()
+    apartadas = Counter(fila.libro_id for fila in conn.execute(sa.text(
+        "SELECT libro_id FROM reserva WHERE estado = 'Asignada'")).fetchall())
+    prestados = {}
+    for p in prestamos:
+        prestados.setdefault(p.libro_id, []).append(p.id)
+
+    ejemplares, enlaces, totales = [], [], []
+    siguiente_id = 1
+    for libro in libros:
+        numero = 0
+        estados = (['Disponible'] * (libro.cantidad or 0) + ['Apartado'] * apartadas.get(libro.id, 0)
+                   + ['Prestado'] * len(prestados.get(libro.id, [])))
+        prestamos_libro = iter(prestados.get(libro.id, []))
+        for estado in estados:
+            numero += 1
+            ejemplares.append({'id': siguiente_id, 'libro_id': libro.id, 'codigo_barras': f'{libro.id:07d}-{numero:03d}',
+                               'estado': estado, 'fecha_alta': ahora})
+            if estado == 'Prestado':
+                enlaces.append({'pid': next(prestamos_libro), 'eid': siguiente_id})
+            siguiente_id += 1
+        if numero:
+            totales.append({'lid': libro.id, 'n': numero})
+
+    tabla = sa.table('ejemplar', sa.column('id', sa.Integer), sa.column('libro_id', sa.Integer),
+                     sa.column('codigo_barras', sa.String), sa.column('estado', sa.String), sa.column('fecha_alta', sa.DateTime))
+    for inicio in range(0, len(ejemplares), LOTE):
+        op.bulk_insert(tabla, ejemplares[inicio:inicio + LOTE])
+    for inicio in range(0, len(enlaces), LOTE):
+        conn.execute(sa.text("UPDATE prestamo SET ejemplar_id = :eid WHERE id = :pid"), enlaces[inicio:inicio + LOTE])
+    for inicio in range(0, len(totales), LOTE):
+        conn.execute(sa.text("UPDATE libro SET total_ejemplares = :n WHERE id = :lid"), totales[inicio:inicio + LOTE])
+    # stats_counters.ejemplares_total no existe todavía: read_counters lo recalcula la primera vez que se pide
+
+
+def downgrade():
+    with op.batch_alter_table('prestamo', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_prestamo_ejemplar_id', type_='foreignkey')
+        batch_op.drop_column('ejemplar_id')
+
+    with op.batch_alter_table('libro', schema=None) as batch_op:
+        batch_op.drop_column('total_ejemplares')
+
+    with op.batch_alter_table('ejemplar', schema=None) as batch_op:
+        batch_op.drop_index('ix_ejemplar_libro_estado')
+
+    op.drop_table('ejemplar')
+    op.execute("DELETE FROM stats_counters WHERE nombre = 'ejemplares_total'")
@@ -0,0 +1,42 @@
+"""Indices compuestos para filtros frecuentes
+
+Revision ID: f8c1b6d4e2a9
+Revises: e5f2a7c3d9b1
+Create Date: 2026-10-18 14:05:12.660391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f8c1b6d4e2a9'
+down_revision = 'e5f2a7c3d9b1'
+branch_labels = None
+depends_on = None
+
+# (tabla, nombre del índice, columnas). Ver benchmarks/query_plans.py para medir su efecto.
+INDICES = [
+    ('prestamo', 'ix_prestamo_usuario_estado', ['id_usuario', 'estado']),
+    ('prestamo', 'ix_prestamo_solicitud', ['id_solicitud']),
+    ('multa', 'ix_multa_estado', ['estado']),
+    ('solicitud', 'ix_solicitud_estado_fecha', ['estado', 'fecha_solicitud']),
+    ('solicitud', 'ix_solicitud_lector', ['id_usuario_lector']),
+    ('usuario', 'ix_usuario_rol_estado', ['rol_id', 'estado']),
+    ('usuario', 'ix_usuario_estado', ['estado']),
+    ('autor', 'ix_autor_nombre_ap_paterno', ['nombre', 'ap_paterno']),
+    ('libro_autor', 'ix_libro_autor_autor', ['autor_id', 'libro_id']),
+    ('libro_genero', 'ix_libro_genero_genero', ['genero_id', 'libro_id']),
+]
+
+
+def upgrade():
+    for tabla, nombre, columnas in INDICES:
+        with op.batch_alter_table(tabla, schema=None) as batch_op:
+            batch_op.create_index(nombre, columnas, unique=False)
+
+
+def downgrade():
+    for tabla, nombre, _ in reversed(INDICES):
+        with op.batch_alter_table(tabla, schema=None) as batch_op:
+            batch_op.drop_index(nombre)
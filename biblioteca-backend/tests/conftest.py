@@ -0,0 +1,96 @@
+# tests/conftest.py
+#
+# Aplicación de pruebas sobre un SQLite temporal (una base nueva por prueba) con los roles y una cuenta por rol.
+#
+# Uso (desde biblioteca-backend/):
+#   python -m pytest -q
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.models import ContadorUsuario, Libro, Rol, Solicitud, StatsCounter, Usuario  # noqa: E402
+from app.utils import stats  # noqa: E402
+from config import Config  # noqa: E402
+
+PASSWORD = 'pw'
+ROLES = ('Lector', 'Bibliotecario', 'Admin')
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'biblioteca.db')
+        DATABASE_REPLICA_URLS = []
+        BCRYPT_LOG_ROUNDS = 4 # Hashes rápidos: solo se prueban los flujos
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        roles = {nombre: Rol(nombre=nombre) for nombre in ROLES}
+        db.session.add_all(roles.values())
+        db.session.flush()
+        for nombre, rol in roles.items():
+            crear_usuario(nombre.lower(), rol)
+        db.session.commit()
+        stats.recompute_counters(usuarios=True) # Estado inicial de stats_counters y contador_usuario
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def crear_usuario(nombre, rol):
+    usuario = Usuario(nombre=nombre, apellido_paterno='Prueba', email=f'{nombre}@biblioteca.test', rol_id=rol.id)
+    usuario.set_password(PASSWORD)
+    db.session.add(usuario)
+    return usuario
+
+
+def auth(client, nombre):
+    """Cabecera Authorization de la cuenta `nombre` (login por la API)."""
+    response = client.post('/api/v1/auth/login', json={'email': f'{nombre}@biblioteca.test', 'password': PASSWORD})
+    assert response.status_code == 200, response.get_json()
+    return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+
+def assert_contadores():
+    db.session.expire_all()
+    esperados = stats.compute_counters()
+    guardados = dict(db.session.query(StatsCounter.nombre, StatsCounter.valor).filter(StatsCounter.nombre.in_(esperados)))
+    assert guardados == esperados
+
+    recalculados = {fila[0]: list(fila[1:]) for fila in db.session.execute(stats._user_counters_select())}
+    guardados = {fila.id_usuario: [getattr(fila, campo) for campo in stats.CAMPOS_USUARIO] for fila in ContadorUsuario.query}
+    assert guardados == recalculados
+
+
+def usuario_id(nombre):
+    return Usuario.query.filter_by(email=f'{nombre}@biblioteca.test').one().id
+
+
+def crear_libro(client, headers, isbn, cantidad):
+    response = client.post('/api/v1/libros', headers=headers, json={
+        'isbn': isbn, 'nombre': f'Libro {isbn}', 'cantidad': cantidad, 'autores': ['Ana Pérez'], 'generos': ['Novela'],
+    })
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['libro_id']
+
+
+def crear_solicitudes(id_usuario, libro_ids):
+    # No hay endpoint para que el lector solicite: se crean como 'Pendiente' y se recalculan los contadores
+    libros = [db.session.get(Libro, i) for i in libro_ids]
+    solicitudes = [Solicitud(id_usuario_lector=id_usuario, estado='Pendiente', libros=[libro]) for libro in libros]
+    db.session.add_all(solicitudes)
+    db.session.commit()
+    stats.recompute_counters(usuarios=True)
+    return [s.id for s in solicitudes]
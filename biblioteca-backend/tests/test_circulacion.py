@@ -0,0 +1,111 @@
+# tests/test_circulacion.py
+#
+# Circulación completa por los endpoints (aprobación, cola de reservas, devolución por lotes, multas) comprobando
+# tras cada paso que los contadores mantenidos por deltas (stats_counters y contador_usuario) coinciden con los
+# recalculados desde las tablas base.
+
+from datetime import datetime, timedelta
+
+from conftest import assert_contadores, auth, crear_libro, crear_solicitudes, crear_usuario, usuario_id
+
+from app import db
+from app.models import Libro, Multa, Prestamo, Reserva, Rol
+from app.utils import stats
+
+
+def crear_lector(nombre):
+    usuario = crear_usuario(nombre, Rol.query.filter_by(nombre='Lector').one())
+    db.session.commit()
+    stats.recompute_counters(usuarios=True) # Creado fuera de la API: se recalculan para partir de un estado exacto
+    return usuario.id
+
+
+def vencer(prestamo_id, dias):
+    prestamo = db.session.get(Prestamo, prestamo_id)
+    prestamo.fecha_devolucion_limite = datetime.utcnow() - timedelta(days=dias)
+    db.session.commit()
+
+
+def test_aprobacion_reserva_devolucion_y_multa(client):
+    bibliotecario = auth(client, 'bibliotecario')
+    lector_id = usuario_id('lector')
+    otro_id = crear_lector('otro')
+    libro_id = crear_libro(client, bibliotecario, '9780000000011', 1)
+    assert_contadores()
+
+    # Aprobación: la única copia pasa a préstamo
+    solicitud_id, = crear_solicitudes(lector_id, [libro_id])
+    response = client.post(f'/api/v1/bibliotecario/solicitudes/{solicitud_id}/aprobar', headers=bibliotecario)
+    assert response.status_code == 200, response.get_json()
+    prestamo = Prestamo.query.filter_by(id_usuario=lector_id).one()
+    assert db.session.get(Libro, libro_id).cantidad == 0
+    assert_contadores()
+
+    # Sin copias libres, el otro lector entra en la cola
+    response = client.post('/api/v1/lector/reservas', headers=auth(client, 'otro'), json={'libroId': libro_id})
+    assert response.status_code == 201, response.get_json()
+    reserva_id = response.get_json()['reserva']['id']
+    assert_contadores()
+
+    # Devolución por lotes con retraso: genera la multa y la copia se aparta para la reserva
+    vencer(prestamo.id, 3)
+    response = client.post('/api/v1/bibliotecario/devoluciones', headers=bibliotecario, json={'prestamos': [prestamo.id]})
+    assert response.status_code == 200, response.get_json()
+    assert (response.get_json()['devueltos'], response.get_json()['conMulta']) == (1, 1)
+    assert db.session.get(Reserva, reserva_id).estado == 'Asignada'
+    multa = Multa.query.filter_by(id_prestamo=prestamo.id).one()
+    assert multa.estado == 'Pendiente'
+    assert_contadores()
+
+    # Entrega de la copia apartada: préstamo nuevo para el otro lector
+    response = client.post(f'/api/v1/bibliotecario/reservas/{reserva_id}/entregar', headers=bibliotecario)
+    assert response.status_code == 200, response.get_json()
+    assert db.session.get(Prestamo, response.get_json()['prestamo_id']).id_usuario == otro_id
+    assert_contadores()
+
+    # Pago de la multa
+    response = client.post(f'/api/v1/bibliotecario/multas/{multa.id}/procesar', headers=bibliotecario,
+                           json={'action': 'pagar'})
+    assert response.status_code == 200, response.get_json()
+    response = client.post(f'/api/v1/bibliotecario/multas/{multa.id}/procesar', headers=bibliotecario,
+                           json={'action': 'condonar'})
+    assert response.status_code == 400 # Ya no está pendiente: no se descuenta otra vez
+    db.session.expire_all()
+    assert db.session.get(Multa, multa.id).estado == 'Pagada'
+    assert_contadores()
+
+
+def test_aprobacion_masiva_escaneo_y_devolucion_por_isbn(client):
+    bibliotecario = auth(client, 'bibliotecario')
+    lector_id = usuario_id('lector')
+    libro_a = crear_libro(client, bibliotecario, '9780000000028', 2)
+    libro_b = crear_libro(client, bibliotecario, '9780000000035', 1)
+    solicitudes = crear_solicitudes(lector_id, [libro_a, libro_a, libro_b, libro_b])
+    assert_contadores()
+
+    # La cuarta solicitud se queda sin copia del libro B y no impide aprobar las demás
+    response = client.post('/api/v1/bibliotecario/solicitudes/aprobar', headers=bibliotecario, json={'ids': solicitudes})
+    assert response.status_code == 200, response.get_json()
+    assert (response.get_json()['aprobadas'], response.get_json()['fallidas']) == (3, 1)
+    assert_contadores()
+
+    # El escaneo de vencimientos marca el préstamo y crea su multa
+    prestamo = Prestamo.query.filter_by(libro_id=libro_b).one()
+    vencer(prestamo.id, 2)
+    response = client.post('/api/v1/bibliotecario/vencimientos/escanear', headers=bibliotecario)
+    assert response.status_code == 200, response.get_json()
+    assert Multa.query.filter_by(id_prestamo=prestamo.id, estado='Pendiente').count() == 1
+    assert_contadores()
+
+    # El préstamo vencido sigue sin devolver: el lector no se puede eliminar
+    response = client.delete(f'/api/v1/admin/usuarios/{lector_id}', headers=auth(client, 'admin'))
+    assert response.status_code == 409
+
+    # Devolución por ISBN de todo lo prestado, incluido el préstamo vencido
+    response = client.post('/api/v1/bibliotecario/devoluciones', headers=bibliotecario, json={
+        'isbns': ['9780000000028', '9780000000028', '9780000000035'], 'idUsuario': lector_id,
+    })
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['devueltos'] == 3
+    assert [db.session.get(Libro, libro_a).cantidad, db.session.get(Libro, libro_b).cantidad] == [2, 1]
+    assert_contadores()
@@ -0,0 +1,50 @@
+# tests/test_libros.py
+#
+# Edición y borrado de libros por los endpoints del catálogo.
+
+from conftest import assert_contadores, auth, crear_libro, crear_solicitudes, usuario_id
+
+from app import db
+from app.models import Libro, Prestamo
+
+
+def test_no_se_elimina_un_libro_prestado(client):
+    bibliotecario = auth(client, 'bibliotecario')
+    libro_id = crear_libro(client, bibliotecario, '9780000000042', 1)
+    solicitud_id, = crear_solicitudes(usuario_id('lector'), [libro_id])
+    response = client.post(f'/api/v1/bibliotecario/solicitudes/{solicitud_id}/aprobar', headers=bibliotecario)
+    assert response.status_code == 200, response.get_json()
+    prestamo_id = Prestamo.query.filter_by(libro_id=libro_id).one().id
+
+    response = client.delete(f'/api/v1/libros/{libro_id}', headers=bibliotecario)
+    assert response.status_code == 409
+    assert db.session.get(Prestamo, prestamo_id).libro_id == libro_id
+
+    # Devuelto, el préstamo queda en el historial sin referencia al libro
+    response = client.post('/api/v1/bibliotecario/devoluciones', headers=bibliotecario, json={'prestamos': [prestamo_id]})
+    assert response.get_json()['devueltos'] == 1
+    response = client.delete(f'/api/v1/libros/{libro_id}', headers=bibliotecario)
+    assert response.status_code == 200, response.get_json()
+    db.session.expire_all()
+    assert db.session.get(Prestamo, prestamo_id).libro_id is None
+    assert_contadores()
+
+
+def test_editar_libro_valida_antes_de_modificar(client):
+    bibliotecario = auth(client, 'bibliotecario')
+    libro_id = crear_libro(client, bibliotecario, '9780000000059', 1)
+    crear_libro(client, bibliotecario, '9780000000066', 1)
+
+    response = client.put(f'/api/v1/libros/{libro_id}', headers=bibliotecario,
+                          json={'isbn': '9780000000073', 'cantidad': 1_000_000})
+    assert response.status_code == 400
+    response = client.put(f'/api/v1/libros/{libro_id}', headers=bibliotecario, json={'isbn': '9780000000066'})
+    assert response.status_code == 409
+    db.session.expire_all()
+    assert db.session.get(Libro, libro_id).isbn == '9780000000059'
+
+    response = client.put(f'/api/v1/libros/{libro_id}', headers=bibliotecario, json={'isbn': '9780000000073', 'cantidad': 3})
+    assert response.status_code == 200, response.get_json()
+    db.session.expire_all()
+    assert (db.session.get(Libro, libro_id).isbn, db.session.get(Libro, libro_id).cantidad) == ('9780000000073', 3)
+    assert_contadores()
@@ -49,81 +49,151 @@ interface BookCardData {
 }
 
 
+const API_URL = 'http://localhost:5000/api/v1/libros';
+const booksPerPage = 6;
+
+// Cabecera de autenticación si hay sesión (GET /libros requiere JWT)
+function authHeaders(): HeadersInit {
+  const token = typeof window !== "undefined" ? localStorage.getItem("authToken") : null;
+  return token ? { 'Authorization': `Bearer ${token}` } : {};
+}
+
 export default function CatalogoPage() {
   // --- Estados para guardar los datos que vienen de la API ---
-  const [allBooksFromApi, setAllBooksFromApi] = useState<ApiBook[]>([]);
-  const [genresFromApi, setGenresFromApi] = useState<string[]>(["Todos"]);
-  const [authorsFromApi, setAuthorsFromApi] = useState<string[]>(["Todos"]);
-  
+  const [pageBooks, setPageBooks] = useState<ApiBook[]>([]);
+  const [genresFromApi, setGenresFromApi] = useState<ApiGenre[]>([]);
+  const [authorsFromApi, setAuthorsFromApi] = useState<ApiAuthor[]>([]);
+  const [totalBooks, setTotalBooks] = useState<number | null>(null); // Total del catálogo (facetas sin filtros)
+  const [totalResults, setTotalResults] = useState<number | null>(null); // Total con los filtros actuales
+
   // --- Estados para la UI ---
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
 
-  // --- Mantenemos todos tus estados para filtros y paginación ---
+  // --- Filtros (se aplican en el servidor) y paginación por cursor ---
+  const [searchInput, setSearchInput] = useState("") // Lo que se escribe; searchTerm se actualiza con retardo
   const [searchTerm, setSearchTerm] = useState("")
-  const [selectedGenre, setSelectedGenre] = useState("Todos")
-  const [selectedAuthor, setSelectedAuthor] = useState("Todos")
+  const [selectedGenre, setSelectedGenre] = useState("Todos") // id del género o "Todos"
+  const [selectedAuthor, setSelectedAuthor] = useState("Todos") // id del autor o "Todos"
   const [sortBy, setSortBy] = useState("title")
   const [showAvailableOnly, setShowAvailableOnly] = useState(false)
-  const [currentPage, setCurrentPage] = useState(1)
-  const booksPerPage = 6
+  // cursors[i] es el cursor con el que se pide la página i (la primera sin cursor); se añade uno por cada
+  // X-Next-Cursor recibido, así "Anterior" vuelve a pedir la página con su cursor ya conocido
+  const [cursors, setCursors] = useState<(string | null)[]>([null])
+  const [pageIndex, setPageIndex] = useState(0)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
 
-  // --- useEffect para cargar los datos de la API cuando el componente se monta ---
+  // --- Géneros, autores y total del catálogo: una vez al montar ---
   useEffect(() => {
-    async function fetchData() {
-      setIsLoading(true);
-      setError(null);
+    async function fetchFilters() {
       try {
-        const [librosRes, generosRes, autoresRes] = await Promise.all([
-          fetch('http://localhost:5000/api/v1/libros'),
-          fetch('http://localhost:5000/api/v1/libros/generos'),
-          fetch('http://localhost:5000/api/v1/libros/autores')
+        const [generosRes, autoresRes, facetasRes] = await Promise.all([
+          fetch(`${API_URL}/generos`),
+          fetch(`${API_URL}/autores`),
+          fetch(`${API_URL}/facetas?limit=1`, { headers: authHeaders() }),
         ]);
-
-        if (!librosRes.ok || !generosRes.ok || !autoresRes.ok) {
+        if (!generosRes.ok || !autoresRes.ok) {
           throw new Error('La comunicación con la API falló');
         }
+        setGenresFromApi(await generosRes.json());
+        setAuthorsFromApi(await autoresRes.json());
+        if (facetasRes.ok) {
+          setTotalBooks((await facetasRes.json()).total);
+        }
+      } catch (err) {
+        setError(err instanceof Error ? err.message : "Ocurrió un error inesperado");
+      }
+    }
+    fetchFilters();
+  }, []);
+
+  // Un filtro nuevo vuelve a la primera página (en el mismo render, para pedir una sola vez)
+  function withFirstPage<T>(setter: (value: T) => void) {
+    return (value: T) => {
+      setter(value);
+      setCursors([null]);
+      setPageIndex(0);
+    };
+  }
+  const changeGenre = withFirstPage(setSelectedGenre);
+  const changeAuthor = withFirstPage(setSelectedAuthor);
+  const changeAvailableOnly = withFirstPage(setShowAvailableOnly);
+  const changeSearchTerm = withFirstPage(setSearchTerm);
+
+  // La búsqueda se lanza 300 ms después de dejar de escribir, no en cada tecla
+  useEffect(() => {
+    const timer = setTimeout(() => {
+      if (searchInput.trim() !== searchTerm) changeSearchTerm(searchInput.trim());
+    }, 300);
+    return () => clearTimeout(timer);
+  }, [searchInput]); // eslint-disable-line react-hooks/exhaustive-deps
 
-        const librosData: ApiBook[] = await librosRes.json();
-        const generosData: ApiGenre[] = await generosRes.json();
-        const autoresData: ApiAuthor[] = await autoresRes.json();
+  // --- Página actual: solo booksPerPage libros por petición ---
+  useEffect(() => {
+    const controller = new AbortController();
+    async function fetchPage() {
+      setIsLoading(true);
+      setError(null);
+      try {
+        const params = new URLSearchParams({ limit: String(booksPerPage) });
+        const cursor = cursors[pageIndex];
+        if (cursor) params.set('cursor', cursor);
+        const filtros = new URLSearchParams();
+        if (selectedGenre !== "Todos") filtros.set('genero_id', selectedGenre);
+        if (selectedAuthor !== "Todos") filtros.set('autor_id', selectedAuthor);
+        if (showAvailableOnly) filtros.set('disponible', '1');
 
-        setAllBooksFromApi(librosData);
-        setGenresFromApi(["Todos", ...generosData.map(g => g.nombre)]);
-        setAuthorsFromApi(["Todos", ...autoresData.map(a => a.nombre)]);
+        // Con texto se usa la búsqueda por relevancia (no admite filtros de género/autor/disponibilidad)
+        const term = searchTerm;
+        if (term) params.set('q', term);
+        const url = term ? `${API_URL}/search?${params}` : `${API_URL}?${params}&${filtros}`;
 
+        const [librosRes, facetasRes] = await Promise.all([
+          fetch(url, { headers: authHeaders(), signal: controller.signal }),
+          !term && pageIndex === 0
+            ? fetch(`${API_URL}/facetas?limit=1&${filtros}`, { headers: authHeaders(), signal: controller.signal })
+            : Promise.resolve(null),
+        ]);
+        if (!librosRes.ok) {
+          throw new Error('La comunicación con la API falló');
+        }
+        setPageBooks(await librosRes.json());
+        setNextCursor(librosRes.headers.get('X-Next-Cursor'));
+        if (term) {
+          setTotalResults(null);
+        } else if (facetasRes && facetasRes.ok) {
+          setTotalResults((await facetasRes.json()).total);
+        }
       } catch (err) {
+        if (err instanceof DOMException && err.name === 'AbortError') return;
         setError(err instanceof Error ? err.message : "Ocurrió un error inesperado");
       } finally {
-        setIsLoading(false);
+        if (!controller.signal.aborted) setIsLoading(false);
       }
     }
-    fetchData();
-  }, []); // El array vacío [] asegura que esto se ejecute solo una vez.
-
-  // --- Lógica de filtrado, ordenamiento y MAPEO ---
-  const filteredBooks = allBooksFromApi
-    .filter((book) => {
-      const authorString = book.autores.join(", ");
-      const matchesSearch =
-        book.nombre.toLowerCase().includes(searchTerm.toLowerCase()) ||
-        authorString.toLowerCase().includes(searchTerm.toLowerCase());
-      const matchesGenre = selectedGenre === "Todos" || book.generos.includes(selectedGenre);
-      const matchesAuthor = selectedAuthor === "Todos" || book.autores.includes(selectedAuthor);
-      const matchesAvailability = !showAvailableOnly || book.cantidad > 0;
-      return matchesSearch && matchesGenre && matchesAuthor && matchesAvailability;
-    })
-    .sort((a, b) => {
-      switch (sortBy) {
-        case "title": return a.nombre.localeCompare(b.nombre);
-        case "author": return a.autores[0].localeCompare(b.autores[0]);
-        case "rating": return b.rating - a.rating;
-        default: return 0;
-      }
-    });
+    fetchPage();
+    return () => controller.abort();
+  }, [cursors, pageIndex, searchTerm, selectedGenre, selectedAuthor, showAvailableOnly]);
+
+  const goToNextPage = () => {
+    if (!nextCursor) return;
+    setCursors((prev) => [...prev.slice(0, pageIndex + 1), nextCursor]);
+    setPageIndex((i) => i + 1);
+  };
+  const goToPreviousPage = () => setPageIndex((i) => Math.max(0, i - 1));
+
+  // --- Orden dentro de la página y MAPEO ---
+  const sortedBooks = [...pageBooks].sort((a, b) => {
+    switch (sortBy) {
+      case "title": return a.nombre.localeCompare(b.nombre);
+      case "author": return (a.autores[0] || '').localeCompare(b.autores[0] || '');
+      case "rating": return b.rating - a.rating;
+      default: return 0;
+    }
+  });
 
   // El Mapeo: Transformamos los datos de la API a la estructura que tu <BookCard> espera
-  const booksForDisplay: BookCardData[] = filteredBooks.map(apiBook => ({
+  const paginatedBooks: BookCardData[] = sortedBooks.map(apiBook => ({
     id: apiBook.id,
     title: apiBook.nombre,
     author: apiBook.autores.join(', '),
@@ -133,37 +203,39 @@ export default function CatalogoPage() {
     available: apiBook.cantidad > 0,
     availableCopies: apiBook.cantidad,
   }));
-  
-  // La paginación ahora usa los datos transformados
-  const totalPages = Math.ceil(booksForDisplay.length / booksPerPage);
-  const startIndex = (currentPage - 1) * booksPerPage;
-  const paginatedBooks = booksForDisplay.slice(startIndex, startIndex + booksPerPage);
 
   const FilterContent = () => (
     // Tu contenido de filtros se mantiene, pero ahora usa los datos de la API
     <div className="space-y-6">
       <div className="space-y-2">
         <Label>Género</Label>
-        <Select value={selectedGenre} onValueChange={setSelectedGenre}>
+        <Select value={selectedGenre} onValueChange={changeGenre} disabled={!!searchTerm}>
           <SelectTrigger><SelectValue /></SelectTrigger>
-          <SelectContent>{genresFromApi.map((g) => <SelectItem key={g} value={g}>{g}</SelectItem>)}</SelectContent>
+          <SelectContent>
+            <SelectItem value="Todos">Todos</SelectItem>
+            {genresFromApi.map((g) => <SelectItem key={g.id} value={String(g.id)}>{g.nombre}</SelectItem>)}
+          </SelectContent>
         </Select>
       </div>
       <div className="space-y-2">
         <Label>Autor</Label>
-        <Select value={selectedAuthor} onValueChange={setSelectedAuthor}>
+        <Select value={selectedAuthor} onValueChange={changeAuthor} disabled={!!searchTerm}>
           <SelectTrigger><SelectValue /></SelectTrigger>
-          <SelectContent>{authorsFromApi.map((a) => <SelectItem key={a} value={a}>{a}</SelectItem>)}</SelectContent>
+          <SelectContent>
+            <SelectItem value="Todos">Todos</SelectItem>
+            {authorsFromApi.map((a) => <SelectItem key={a.id} value={String(a.id)}>{a.nombre}</SelectItem>)}
+          </SelectContent>
         </Select>
       </div>
-      {/* ... El resto de tu componente FilterContent se mantiene igual ... */}
+      <div className="flex items-center space-x-2">
+        <Checkbox id="disponibles" checked={showAvailableOnly} disabled={!!searchTerm}
+                  onCheckedChange={(checked) => changeAvailableOnly(checked === true)} />
+        <Label htmlFor="disponibles">Solo disponibles</Label>
+      </div>
     </div>
   );
 
-  // --- Renderizado con estados de carga y error ---
-  if (isLoading) {
-    return <MainLayout><div className="container p-8 text-center">Cargando catálogo desde la base de datos...</div></MainLayout>;
-  }
+  // --- Renderizado con estado de error (la carga de cada página se muestra en la lista) ---
   if (error) {
     return <MainLayout><div className="container p-8 text-center text-red-500">Error al cargar el catálogo: {error}</div></MainLayout>;
   }
@@ -175,9 +247,15 @@ export default function CatalogoPage() {
         <div className="mb-8">
           <h1 className="text-3xl font-bold mb-4">Catálogo de Libros</h1>
           {/* Usamos los datos reales */}
-          <p className="text-muted-foreground">Explora nuestra colección de {allBooksFromApi.length} libros</p>
+          <p className="text-muted-foreground">
+            {totalBooks !== null ? `Explora nuestra colección de ${totalBooks} libros` : 'Explora nuestra colección'}
+          </p>
+        </div>
+        <div className="relative mb-6">
+          <Search className="absolute left-3 top-1/2 h-4 w-4 -translate-y-1/2 text-muted-foreground" />
+          <Input className="pl-9" placeholder="Buscar por título, autor, género o ISBN..."
+                 value={searchInput} onChange={(e) => setSearchInput(e.target.value)} />
         </div>
-        {/* ... Tu JSX para la barra de búsqueda y el sheet se mantiene igual ... */}
         <div className="flex gap-8">
           <div className="hidden md:block w-64 flex-shrink-0">
             <Card>
@@ -190,10 +268,14 @@ export default function CatalogoPage() {
           <div className="flex-1">
             <div className="flex justify-between items-center mb-6">
               <p className="text-muted-foreground">
-                Mostrando {paginatedBooks.length} de {filteredBooks.length} resultados
+                {totalResults !== null
+                  ? `Mostrando ${paginatedBooks.length} de ${totalResults} resultados`
+                  : `Mostrando ${paginatedBooks.length} resultados`}
               </p>
             </div>
-            {paginatedBooks.length > 0 ? (
+            {isLoading ? (
+              <div className="text-center py-12">Cargando catálogo desde la base de datos...</div>
+            ) : paginatedBooks.length > 0 ? (
               <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 gap-6 mb-8">
                 {/* Aquí pasamos los datos mapeados al componente BookCard */}
                 {paginatedBooks.map((book) => (
@@ -205,7 +287,15 @@ export default function CatalogoPage() {
                 <p>No se encontraron libros con los filtros aplicados</p>
               </div>
             )}
-            {/* ... Tu JSX para la paginación se mantiene igual ... */}
+            <div className="flex justify-center items-center gap-4">
+              <Button variant="outline" onClick={goToPreviousPage} disabled={isLoading || pageIndex === 0}>
+                Anterior
+              </Button>
+              <span className="text-sm text-muted-foreground">Página {pageIndex + 1}</span>
+              <Button variant="outline" onClick={goToNextPage} disabled={isLoading || !nextCursor}>
+                Siguiente
+              </Button>
+            </div>
           </div>
         </div>
       </div>